@@ -0,0 +1 @@
+"""HomeVision benchmark suites, run with `python -m benchmarks.run`"""
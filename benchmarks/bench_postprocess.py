@@ -0,0 +1,214 @@
+"""Benchmark detector pre/post-processing hot paths at varying candidate counts"""
+from typing import Dict, Iterable
+
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.modules.object_detection.methods.yolov8 import utils as yolov8_utils
+from home_vision.modules.object_detection.methods.yolov8.yolov8_onnx import YOLOV8
+from home_vision.modules.person_detection.methods.yolox import utils as yolox_utils
+from home_vision.modules.tracking.tracker import Tracker
+from home_vision.modules.zones.zone_rules import LineConfig, ZoneConfig, ZoneRules, ZoneRulesInput
+from home_vision.utils.boxes import iou_matrix
+from home_vision.utils.crops import RoiCropper
+from home_vision.utils.heatmap import OccupancyHeatmap
+
+from .common import random_boxes, random_image, time_function
+
+CANDIDATES = (100, 1000, 5000)
+RESOLUTIONS = ((480, 640), (1080, 1920), (2160, 3840))
+YOLOX_INPUT_SHAPES = ((320, 576), (608, 1088), (800, 1440))
+
+
+def yolov8_without_session(input_height: int = 640, input_width: int = 640) -> YOLOV8:
+    """YOLOV8 detector whose pre/post-processing can run without an ONNX session"""
+    detector = YOLOV8.__new__(YOLOV8)
+    detector.input_height = input_height
+    detector.input_width = input_width
+    detector.conf_threshold = 0.5
+    detector.iou_threshold = 0.5
+    return detector
+
+
+def bench_nms(candidates: Iterable[int] = CANDIDATES) -> Dict[str, dict]:
+    """Single class NMS of YOLOX and YOLOV8"""
+    results = {}
+    for num in candidates:
+        boxes = random_boxes(num)
+        scores = np.random.default_rng(0).uniform(0.5, 1.0, num).astype(np.float32)
+        results[f'yolox.nms[n={num}]'] = {
+            'params': {'candidates': num},
+            **time_function(lambda b=boxes, s=scores: yolox_utils.nms(b, s, 0.5))
+        }
+        results[f'yolov8.nms[n={num}]'] = {
+            'params': {'candidates': num},
+            **time_function(lambda b=boxes, s=scores: yolov8_utils.nms(b, s, 0.5))
+        }
+    return results
+
+
+def bench_multiclass_nms(
+    candidates: Iterable[int] = CANDIDATES, num_classes: int = 1
+) -> Dict[str, dict]:
+    """YOLOX multiclass NMS with score thresholding"""
+    results = {}
+    for num in candidates:
+        boxes = random_boxes(num)
+        scores = np.random.default_rng(0).uniform(0, 1, (num, num_classes)).astype(np.float32)
+        results[f'yolox.multiclass_nms[n={num},classes={num_classes}]'] = {
+            'params': {'candidates': num, 'classes': num_classes},
+            **time_function(lambda b=boxes, s=scores: yolox_utils.multiclass_nms(b, s, 0.5, 0.5))
+        }
+    return results
+
+
+def bench_demo_postprocess(input_shapes: Iterable = YOLOX_INPUT_SHAPES) -> Dict[str, dict]:
+    """YOLOX grid decoding, the number of candidates follows the input shape"""
+    results = {}
+    for height, width in input_shapes:
+        num = sum((height // stride) * (width // stride) for stride in (8, 16, 32))
+        outputs = np.random.default_rng(0).uniform(0, 1, (1, num, 6)).astype(np.float32)
+        results[f'yolox.demo_postprocess[{height}x{width}]'] = {
+            'params': {'candidates': num, 'input_shape': [height, width]},
+            **time_function(
+                lambda o=outputs, h=height, w=width: yolox_utils.demo_postprocess(
+                    o.copy(), (h, w)
+                )
+            )
+        }
+    return results
+
+
+def bench_prepare_input(resolutions: Iterable = RESOLUTIONS) -> Dict[str, dict]:
+    """YOLOV8 resize, color conversion and normalization of a frame"""
+    detector = yolov8_without_session()
+    results = {}
+    for height, width in resolutions:
+        image = random_image(height, width)
+        results[f'yolov8.prepare_input[{height}x{width}]'] = {
+            'params': {'resolution': [height, width]},
+            **time_function(lambda i=image: detector.prepare_input(i))
+        }
+    return results
+
+
+def bench_rescale_boxes(candidates: Iterable[int] = CANDIDATES) -> Dict[str, dict]:
+    """YOLOV8 rescaling of boxes to the frame resolution"""
+    detector = yolov8_without_session()
+    detector.img_height, detector.img_width = 1080, 1920
+    results = {}
+    for num in candidates:
+        boxes = random_boxes(num, 640, 640)
+        results[f'yolov8.rescale_boxes[n={num}]'] = {
+            'params': {'candidates': num},
+            **time_function(lambda b=boxes: detector.rescale_boxes(b))
+        }
+    return results
+
+
+def bench_iou_matrix(candidates: Iterable[int] = (10, 100, 1000)) -> Dict[str, dict]:
+    """IoU of N tracks against N detections"""
+    results = {}
+    for num in candidates:
+        tracks, detections = random_boxes(num), random_boxes(num, seed=1)
+        results[f'iou_matrix[n={num}]'] = {
+            'params': {'candidates': num},
+            **time_function(lambda t=tracks, d=detections: iou_matrix(t, d))
+        }
+    return results
+
+
+def bench_tracker(tracks: Iterable[int] = (10, 100, 500)) -> Dict[str, dict]:
+    """Tracker update of a frame with N people already tracked, moving a pixel per frame"""
+    results = {}
+    for num in tracks:
+        boxes = random_boxes(num)
+        scores, class_ids = np.full(num, 0.9, dtype=np.float32), np.zeros(num, dtype=np.int32)
+        tracker = Tracker()
+        tracker.update(Detections(boxes, scores, class_ids))
+        frames = iter(range(1, 1000000))
+        results[f'tracker.update[n={num}]'] = {
+            'params': {'tracks': num},
+            **time_function(lambda b=boxes, s=scores, c=class_ids, t=tracker, f=frames: t.update(
+                Detections(b + next(f), s, c)
+            ))
+        }
+    return results
+
+
+def bench_roi_crops(candidates: Iterable[int] = (8, 32, 128)) -> Dict[str, dict]:
+    """Batched 256x128 crops of N people in a 1080p frame, as the input of a re-ID model"""
+    results = {}
+    image = random_image(1080, 1920)
+    cropper = RoiCropper((256, 128))
+    for num in candidates:
+        boxes = random_boxes(num)
+        results[f'roi_crops[n={num}]'] = {
+            'params': {'candidates': num},
+            **time_function(lambda b=boxes: cropper(image, b))
+        }
+    cropper.close()
+    return results
+
+
+def bench_heatmap(candidates: Iterable[int] = (10, 100)) -> Dict[str, dict]:
+    """Footprints of N people added to the heatmap of a 1080p frame, and the grid of its
+    snapshots"""
+    results = {}
+    heatmap = OccupancyHeatmap()
+    for num in candidates:
+        boxes = random_boxes(num)
+        results[f'heatmap_add[n={num}]'] = {
+            'params': {'candidates': num},
+            **time_function(lambda b=boxes: heatmap.add(b, (1080, 1920)))
+        }
+    results['heatmap_grid'] = {'params': {}, **time_function(heatmap.grid)}
+    return results
+
+
+def bench_zone_rules(tracks: Iterable[int] = (10, 100), zones: int = 48) -> Dict[str, dict]:
+    """N tracks of a 1080p frame checked against a grid of zones and lines"""
+    results = {}
+    rng = np.random.default_rng(0)
+    zone_configs = tuple(
+        ZoneConfig(name=f'zone_{index}', points=(
+            (x, y), (x + 240, y), (x + 240, y + 160), (x, y + 160)
+        ))
+        for index, (x, y) in enumerate(
+            (240 * col, 180 * row) for row in range(6) for col in range(zones // 6)
+        )
+    )
+    line_configs = tuple(
+        LineConfig(name=f'line_{index}', points=((x, 0), (x, 1080)))
+        for index, x in enumerate(range(100, 1920, 400))
+    )
+    rules = ZoneRules(zone_configs, line_configs)
+    for num in tracks:
+        boxes = random_boxes(num)
+        track_ids = np.arange(num)
+
+        def step(boxes=boxes, track_ids=track_ids):
+            moved = boxes + rng.normal(0, 20, size=(len(boxes), 1))
+            rules.process(ZoneRulesInput.create(
+                detections=Detections(moved), frame_size=(1080, 1920), track_ids=track_ids
+            ))
+        results[f'zone_rules[n={num},zones={zones}]'] = {
+            'params': {'tracks': num, 'zones': zones, 'lines': len(line_configs)},
+            **time_function(step)
+        }
+    return results
+
+
+def run() -> Dict[str, dict]:
+    """Run all post-processing benchmarks"""
+    results = {}
+    results.update(bench_nms())
+    results.update(bench_multiclass_nms())
+    results.update(bench_demo_postprocess())
+    results.update(bench_prepare_input())
+    results.update(bench_rescale_boxes())
+    results.update(bench_iou_matrix())
+    results.update(bench_tracker())
+    results.update(bench_roi_crops())
+    results.update(bench_heatmap())
+    results.update(bench_zone_rules())
+    return results
@@ -0,0 +1,114 @@
+"""Benchmark the `process` of every registered solution at several resolutions"""
+import json
+import logging
+from typing import Callable, Dict, Iterable, Optional
+
+from home_vision.common.detections import Detections, json_default
+from home_vision.common.validation import set_validation, validation_enabled
+from home_vision.solutions.solution_base import Solution
+from home_vision.utils.utils import load_solution_from_dict
+
+from .common import random_boxes, random_image, time_function
+
+RESOLUTIONS = ((480, 640), (1080, 1920))
+
+
+def tracked_people(height: int, width: int, num: int = 10) -> dict:
+    """Results of a chained tracking solution, `num` people tracked on the frame"""
+    boxes = random_boxes(num, width, height)
+    return {'bboxes': Detections(boxes), 'track_ids': list(range(num))}
+
+
+def detected_people(height: int, width: int, num: int = 10) -> dict:
+    """Results of a chained detection solution, `num` people detected on the frame"""
+    return {'bboxes': Detections(random_boxes(num, width, height))}
+
+
+# results of the solution they are chained to, by chained solution
+CHAINED_INPUTS: Dict[str, Callable[[int, int], dict]] = {
+    'room_projection_solution': tracked_people,
+    'heatmap_solution': detected_people,
+    'zone_analytics_solution': tracked_people,
+}
+# configs of the solutions whose default config does nothing, e.g. zones to count people in
+CONFIGS: Dict[str, dict] = {
+    'zone_analytics_solution': {'zone_rules': {
+        'zones': [
+            {'name': f'zone_{row}_{col}', 'points': [
+                [col * 160, row * 120], [(col + 1) * 160, row * 120],
+                [(col + 1) * 160, (row + 1) * 120], [col * 160, (row + 1) * 120]
+            ]}
+            for row in range(4) for col in range(4)
+        ],
+        'lines': [{'name': 'door', 'points': [[320, 0], [320, 480]]}],
+    }},
+}
+
+
+def bench_solution(
+    solution_name: str, resolutions: Iterable = RESOLUTIONS, config: Optional[dict] = None,
+    inputs: Optional[Callable[[int, int], dict]] = None, min_time: float = 0.5
+) -> Dict[str, dict]:
+    """Time one solution with its default config, skipped when it can't be loaded
+    (e.g. its models are not downloaded). `inputs` gives the fields of its input besides the
+    image at a `(height, width)`, e.g. the results of the solution it is chained to"""
+    try:
+        solution = load_solution_from_dict(solution_name, config or {})
+    except Exception as exc: #pylint: disable=broad-except
+        logging.warning('skip %s: %s', solution_name, exc)
+        return {solution_name: {'skipped': str(exc)}}
+    results = {}
+    for height, width in resolutions:
+        image = random_image(height, width)
+        fields = inputs(height, width) if inputs is not None else {}
+        # solutions draw on their input image, feed a fresh copy every call
+        results[f'{solution_name}[{height}x{width}]'] = {
+            'params': {'resolution': [height, width]},
+            **time_function(
+                lambda i=image, f=fields: solution.process(
+                    solution.input_types.create(image=i.copy(), **f)
+                ),
+                min_time=min_time
+            )
+        }
+    results[f'{solution_name}.profile'] = {'profile': solution.profile()}
+    return results
+
+
+def bench_validation(
+    solution_name: str = 'raw_stream_solution', resolutions: Iterable = RESOLUTIONS
+) -> Dict[str, dict]:
+    """Per-frame cost of a solution in the server loop (input, process, results dict and json)
+    with and without validation"""
+    solution = load_solution_from_dict(solution_name, {})
+    validate = validation_enabled()
+
+    def serve_frame(image):
+        res = solution.process(solution.input_types.create(image=image))
+        return json.dumps(res.asdict(exclude={'image'}), default=json_default)
+
+    results = {}
+    try:
+        for enabled in (True, False):
+            set_validation(enabled)
+            for height, width in resolutions:
+                image = random_image(height, width)
+                results[f'{solution_name}.serve[{height}x{width},validate={enabled}]'] = {
+                    'params': {'resolution': [height, width], 'validate': enabled},
+                    **time_function(lambda i=image: serve_frame(i))
+                }
+    finally:
+        set_validation(validate)
+    return results
+
+
+def run(resolutions: Iterable = RESOLUTIONS, min_time: float = 0.5) -> Dict[str, dict]:
+    """Run every registered solution"""
+    results = {}
+    for solution_name in sorted(Solution.list_available()):
+        results.update(bench_solution(
+            solution_name, resolutions, CONFIGS.get(solution_name),
+            CHAINED_INPUTS.get(solution_name), min_time
+        ))
+    results.update(bench_validation(resolutions=resolutions))
+    return results
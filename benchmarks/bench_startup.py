@@ -0,0 +1,125 @@
+"""Benchmark the import time of the entry points, each measured in a fresh interpreter
+
+    python -m benchmarks.bench_startup --repeat 3 --top 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from home_vision.modules.module_base import Module
+from home_vision.solutions.solution_base import Solution
+
+from .common import summarize
+
+# heavy dependencies reported when an entry point imports them
+HEAVY_MODULES = ('cv2', 'onnxruntime', 'aiortc', 'av', 'aiohttp', 'jinja2', 'fastapi')
+# imported by the interpreter or the measuring code, not by the entry points
+_HARNESS_IMPORTS = ('site', 'encodings', 'json', 'sys', 'time')
+
+_CHILD = '''
+import json, sys, time
+time_s = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - time_s
+from home_vision.common.registrable import Registrable
+print(json.dumps({{
+    'seconds': elapsed,
+    'heavy_modules': [name for name in {heavy} if name in sys.modules],
+    'lazy_imports': Registrable.import_times(),
+}}))
+'''
+
+
+def entry_points() -> Dict[str, str]:
+    """Code run by each entry point up to the moment it can start working"""
+    entries = {
+        'solution_manager': (
+            "import solution_manager.sm\n"
+            "from home_vision.solutions.solution_base import Solution\n"
+            "for name in Solution.list_available():\n"
+            "    Solution.by_name(name).config_type()"
+        ),
+    }
+    for solution_name in sorted(Solution.list_available()):
+        # what demo/stream_solution.py imports before loading the solution
+        entries[f'stream_solution[{solution_name}]'] = (
+            "from home_vision.modules.module_base import Module\n"
+            "from home_vision.solutions.solution_base import Solution\n"
+            "Module.by_name('rtc_server')\n"
+            f"Solution.by_name('{solution_name}')"
+        )
+    for module_name in sorted(set(Module.list_available()) - set(Solution.list_available())):
+        entries[f'module[{module_name}]'] = (
+            "from home_vision.modules.module_base import Module\n"
+            f"Module.by_name('{module_name}')"
+        )
+    return entries
+
+
+def parse_importtime(stderr: str, top: int) -> List[Tuple[str, float]]:
+    """Slowest top-level imports from `python -X importtime`, in milliseconds"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  ') and name.strip() not in _HARNESS_IMPORTS:
+            imports.append((name.strip(), int(cumulative) / 1000))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return imports[:top]
+
+
+def measure(code: str, top: int = 5) -> dict:
+    """Run an entry point in a fresh interpreter"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         _CHILD.format(code=code, heavy=repr(HEAVY_MODULES))],
+        capture_output=True, text=True, check=True
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['top_imports'] = parse_importtime(proc.stderr, top)
+    return result
+
+
+def run(repeat: int = 3, top: int = 5) -> Dict[str, dict]:
+    """Startup time of every entry point, the heavy modules it imports and its slowest imports"""
+    results = {}
+    for name, code in entry_points().items():
+        runs = [measure(code, top) for _ in range(repeat)]
+        results[f'startup.{name}'] = {
+            'params': {'entry_point': name},
+            **summarize([entry_run['seconds'] * 1000 for entry_run in runs]),
+            'heavy_modules': runs[-1]['heavy_modules'],
+            'lazy_imports': runs[-1]['lazy_imports'],
+            'top_imports': runs[-1]['top_imports'],
+        }
+    return results
+
+
+def print_report(results: Dict[str, dict]):
+    """Print the startup report"""
+    print(f"{'entry point':<60}{'median ms':>12}  heavy modules")
+    for name, result in results.items():
+        print(f"{name:<60}{result['median_ms']:>12.1f}  {', '.join(result['heavy_modules'])}")
+        for module, cumulative_ms in result['top_imports']:
+            print(f"    {module:<56}{cumulative_ms:>12.1f}")
+
+
+def main():
+    """Startup report entry point"""
+    parser = argparse.ArgumentParser(description='Home Vision -- Startup report')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per entry')
+    parser.add_argument('--top', type=int, default=5, help='slowest imports to show')
+    parser.add_argument('--output', type=str, default=None, help='json file to write')
+    args = parser.parse_args()
+    results = run(args.repeat, args.top)
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(results, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Timing helpers shared by the benchmark suites"""
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+
+def time_function(
+    func: Callable[[], Any],
+    min_time: float = 0.2,
+    min_repeat: int = 5,
+    max_repeat: int = 1000,
+    warmup: int = 2
+) -> Dict[str, float]:
+    """Time a function until it ran for `min_time` seconds and at least `min_repeat` times
+
+    Args:
+        func (Callable[[], Any]): function to time, called without arguments
+        min_time (float, optional): minimum total seconds of timed calls. Defaults to 0.2.
+        min_repeat (int, optional): minimum number of timed calls. Defaults to 5.
+        max_repeat (int, optional): maximum number of timed calls. Defaults to 1000.
+        warmup (int, optional): untimed calls before timing. Defaults to 2.
+
+    Returns:
+        Dict[str, float]: repeat count and min, median, mean and p95 latency in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+    latencies = []
+    total = 0.0
+    while (total < min_time or len(latencies) < min_repeat) and len(latencies) < max_repeat:
+        time_s = time.perf_counter()
+        func()
+        latency = time.perf_counter() - time_s
+        latencies.append(latency * 1000)
+        total += latency
+    return summarize(latencies)
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Repeat count and min, median, mean and p95 of latencies in milliseconds"""
+    latencies = sorted(latencies)
+    return {
+        'repeat': len(latencies),
+        'min_ms': latencies[0],
+        'median_ms': statistics.median(latencies),
+        'mean_ms': statistics.fmean(latencies),
+        'p95_ms': latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+    }
+
+
+def random_boxes(
+    num: int, width: int = 1920, height: int = 1080, seed: int = 0
+) -> np.ndarray:
+    """Random xyxy boxes inside a frame, clustered so that NMS has overlaps to suppress"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform((0, 0), (width, height), size=(max(num // 8, 1), 2))
+    xy = centers[rng.integers(0, len(centers), num)] + rng.normal(0, 10, size=(num, 2))
+    wh = rng.uniform(20, 300, size=(num, 2))
+    return np.concatenate([xy - wh / 2, xy + wh / 2], axis=1).astype(np.float32)
+
+
+def random_image(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """Random BGR uint8 frame"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
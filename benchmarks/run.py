@@ -0,0 +1,168 @@
+"""Run HomeVision benchmarks and compare runs
+
+    python -m benchmarks.run run --suite postprocess solutions --output results.json
+    python -m benchmarks.run run --synthetic --synthetic_cost 4 --output results.json
+    python -m benchmarks.run compare base.json results.json --threshold 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+from home_vision.modules.onnx_session import MODEL_DIR_ENV, get_model_dir
+from home_vision.utils.synthetic_models import generate_models
+
+from . import bench_postprocess, bench_solutions, bench_startup
+
+SUITES = {
+    'postprocess': bench_postprocess.run,
+    'solutions': bench_solutions.run,
+    'startup': bench_startup.run,
+}
+
+
+def git_commit() -> str:
+    """Current git commit of the repo, empty when not in a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_suites(suites: List[str], synthetic_cost: int = 0) -> dict:
+    """Run the benchmark suites and collect the results with host metadata,
+    `synthetic_cost` is the cost of the synthetic models used, 0 for real models"""
+    results = {}
+    for suite in suites:
+        logging.info('running %s benchmarks', suite)
+        results.update(SUITES[suite]())
+    return {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime()),
+            'commit': git_commit(),
+            'host': platform.node(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'suites': suites,
+            'model_dir': get_model_dir(),
+            'synthetic_cost': synthetic_cost,
+        },
+        'results': results,
+    }
+
+
+def compare(base: dict, new: dict, threshold: float) -> Dict[str, dict]:
+    """Compare the median latency of the benchmarks present in both runs
+
+    Args:
+        base (dict): baseline run
+        new (dict): new run
+        threshold (float): relative slowdown above which a benchmark is a regression
+
+    Returns:
+        Dict[str, dict]: base and new median, ratio and whether it regressed, by benchmark
+    """
+    comparison = {}
+    for name, new_result in new['results'].items():
+        base_result = base['results'].get(name, {})
+        if 'median_ms' not in new_result or 'median_ms' not in base_result:
+            continue
+        ratio = new_result['median_ms'] / base_result['median_ms']
+        comparison[name] = {
+            'base_ms': base_result['median_ms'],
+            'new_ms': new_result['median_ms'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        }
+    return comparison
+
+
+def print_results(results: Dict[str, dict]):
+    """Print timed results as a table"""
+    print(f"{'benchmark':<60}{'median ms':>12}{'p95 ms':>12}{'repeat':>8}")
+    for name, result in results.items():
+        if 'skipped' in result:
+            print(f"{name:<60}{'skipped':>12}")
+        elif 'median_ms' in result:
+            print(
+                f"{name:<60}{result['median_ms']:>12.3f}{result['p95_ms']:>12.3f}"
+                f"{result['repeat']:>8}"
+            )
+
+
+def print_comparison(comparison: Dict[str, dict]):
+    """Print a comparison as a table, regressions are marked with `!`"""
+    print(f"{'benchmark':<60}{'base ms':>12}{'new ms':>12}{'ratio':>8}")
+    for name, result in comparison.items():
+        mark = ' !' if result['regression'] else ''
+        print(
+            f"{name:<60}{result['base_ms']:>12.3f}{result['new_ms']:>12.3f}"
+            f"{result['ratio']:>8.2f}{mark}"
+        )
+
+
+def main(argv: List[str] = None) -> int:
+    """Benchmark runner entry point, returns the process exit code"""
+    parser = argparse.ArgumentParser(description='Home Vision -- Benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='run benchmark suites')
+    run_parser.add_argument(
+        '--suite', nargs='+', default=list(SUITES), choices=list(SUITES), help='suites to run'
+    )
+    run_parser.add_argument('--output', type=str, default=None, help='json file to write')
+    run_parser.add_argument('--model_dir', type=str, default=None, help='model directory')
+    run_parser.add_argument(
+        '--synthetic', action='store_true',
+        help='benchmark synthetic models, generated in `--model_dir` or a temporary directory'
+    )
+    run_parser.add_argument(
+        '--synthetic_cost', type=int, default=1, help='convolutions of the synthetic models'
+    )
+    compare_parser = commands.add_parser('compare', help='compare two benchmark runs')
+    compare_parser.add_argument('base', type=str, help='baseline json results')
+    compare_parser.add_argument('new', type=str, help='new json results')
+    compare_parser.add_argument(
+        '--threshold', type=float, default=0.1, help='relative slowdown counted as regression'
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'run':
+        if args.synthetic:
+            args.model_dir = args.model_dir or tempfile.mkdtemp(prefix='home_vision_models_')
+            generate_models(args.model_dir, cost=args.synthetic_cost, overwrite=True)
+        if args.model_dir:
+            os.environ[MODEL_DIR_ENV] = args.model_dir
+        run = run_suites(args.suite, args.synthetic_cost if args.synthetic else 0)
+        print_results(run['results'])
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as output_file:
+                json.dump(run, output_file, indent=2)
+        return 0
+
+    with open(args.base, 'r', encoding='utf-8') as base_file:
+        base = json.load(base_file)
+    with open(args.new, 'r', encoding='utf-8') as new_file:
+        new = json.load(new_file)
+    comparison = compare(base, new, args.threshold)
+    print_comparison(comparison)
+    regressions = [name for name, result in comparison.items() if result['regression']]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}: {regressions}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
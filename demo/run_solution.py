@@ -19,7 +19,11 @@ def main(
     stream_h: int = 5000,
     display: bool = True,
     save_raw: bool = False,
-    save_processed: bool = False
+    save_processed: bool = False,
+    decode_threads: int = 0,
+    skip_non_keyframes: bool = False,
+    decode_width: int = None,
+    decode_height: int = None
 ):
     """Run Home Vision Solution using cv2.VideoCapture
 
@@ -36,6 +40,11 @@ def main(
         display (bool, optional): if display the processed frames. Defaults to True.
         save_raw (bool, optional): save the raw video from camer_src. Defaults to False.
         save_processed (bool, optional): save the processed video as .avi file. Defaults to False.
+        decode_threads (int, optional): video decoding threads, 0 lets FFmpeg decide.
+        Defaults to 0.
+        skip_non_keyframes (bool, optional): decode the keyframes only. Defaults to False.
+        decode_width (int, optional): maximum width of the decoded frames. Defaults to None.
+        decode_height (int, optional): maximum height of the decoded frames. Defaults to None.
     """
     solution_config = load_solution_config_from_file(solution_name, solution_config_path)
     # change capture module config
@@ -45,6 +54,10 @@ def main(
         'threading': threading,
         'stream_w': stream_w,
         'stream_h': stream_h,
+        'decode_threads': decode_threads,
+        'skip_non_keyframes': skip_non_keyframes,
+        'decode_width': decode_width,
+        'decode_height': decode_height,
     }
     cap_config_type = Module.by_name('capture').config_type
     cap_config = cap_config_type(**cap_dict)
@@ -69,6 +82,12 @@ if __name__ == "__main__":
     parser.add_argument('--stream_fps', default=15, type=int, help='threaded streaming fps')
     parser.add_argument('--stream_w', default=5000, type=int, help='stream width')
     parser.add_argument('--stream_h', default=5000, type=int, help='stream height')
+    parser.add_argument('--decode_threads', default=0, type=int, help='video decoding threads')
+    parser.add_argument(
+        '--skip_non_keyframes', default=False, type=str2bool, help='decode the keyframes only'
+    )
+    parser.add_argument('--decode_width', default=None, type=int, help='max decoded width')
+    parser.add_argument('--decode_height', default=None, type=int, help='max decoded height')
     parser.add_argument('--verbose', default=True, type=str2bool, help='show debug logging')
     args = parser.parse_args()
     if args.verbose:
@@ -86,5 +105,9 @@ if __name__ == "__main__":
         args.stream_h,
         args.display,
         args.save_raw,
-        args.save_processed
+        args.save_processed,
+        args.decode_threads,
+        args.skip_non_keyframes,
+        args.decode_width,
+        args.decode_height
     )
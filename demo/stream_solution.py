@@ -2,6 +2,7 @@
 import argparse
 import logging
 
+from home_vision.common.validation import set_validation
 from home_vision.modules.module_base import Module
 from home_vision.solutions.solution_base import Solution
 from home_vision.utils.utils import load_solution_config_from_str, str2bool
@@ -16,7 +17,19 @@ def main(
     src: str,
     port: int,
     codec: bool=False,
-    buffered: bool=False
+    buffered: bool=False,
+    decode_threads: int=0,
+    skip_non_keyframes: bool=False,
+    decode_width: int=None,
+    decode_height: int=None,
+    output_width: int=None,
+    output_height: int=None,
+    bitrate: int=1000000,
+    publish_socket: str=None,
+    record_events: str=None,
+    event_dir: str='data/events',
+    store_dir: str=None,
+    camera: str=None
 ):
     """Run HomeVision Solution through webrtc server
 
@@ -27,6 +40,23 @@ def main(
         port (int): port where the webrtc server running
         codec (bool, optional): re-stream compressed video. Defaults to False.
         buffered (bool, optional): buffered video streaming. Defaults to False.
+        decode_threads (int, optional): video decoding threads, 0 lets FFmpeg decide.
+        Defaults to 0.
+        skip_non_keyframes (bool, optional): decode the keyframes only. Defaults to False.
+        decode_width (int, optional): maximum width of the decoded frames. Defaults to None.
+        decode_height (int, optional): maximum height of the decoded frames. Defaults to None.
+        output_width (int, optional): maximum width of the restreamed frames. Defaults to None.
+        output_height (int, optional): maximum height of the restreamed frames.
+        Defaults to None.
+        bitrate (int, optional): H264 bitrate in bps at the full output size.
+        Defaults to 1000000.
+        publish_socket (str, optional): unix socket where the results are published to the
+        solutions chained on this host. Defaults to None.
+        record_events (str, optional): solution output whose detections fire an event clip.
+        Defaults to None.
+        event_dir (str, optional): directory of the event clips. Defaults to 'data/events'.
+        store_dir (str, optional): directory of the detection store. Defaults to None.
+        camera (str, optional): camera name of the stored detections. Defaults to None.
     """
     solution_config = load_solution_config_from_str(solution_name, solution_config_str)
 
@@ -35,6 +65,18 @@ def main(
         'port': port,
         'codec': codec,
         'buffered': buffered,
+        'decode_threads': decode_threads,
+        'skip_non_keyframes': skip_non_keyframes,
+        'decode_width': decode_width,
+        'decode_height': decode_height,
+        'output_width': output_width,
+        'output_height': output_height,
+        'bitrate': bitrate,
+        'publish_socket': publish_socket,
+        'record_events': record_events,
+        'event_dir': event_dir,
+        'store_dir': store_dir,
+        'camera': camera,
     }
     rtc_config_type = Module.by_name('rtc_server').config_type
     rtc_config = rtc_config_type(**rtc_dict)
@@ -54,8 +96,35 @@ if __name__ == "__main__":
     parser.add_argument('--port', default=5556, type=int, help='server running port')
     parser.add_argument('--codec', default=False, type=str2bool, help='compressed codec stream')
     parser.add_argument('--buffered', default=False, type=str2bool, help='buffer stream')
+    parser.add_argument('--decode_threads', default=0, type=int, help='video decoding threads')
+    parser.add_argument(
+        '--skip_non_keyframes', default=False, type=str2bool, help='decode the keyframes only'
+    )
+    parser.add_argument('--decode_width', default=None, type=int, help='max decoded width')
+    parser.add_argument('--decode_height', default=None, type=int, help='max decoded height')
+    parser.add_argument('--output_width', default=None, type=int, help='max restreamed width')
+    parser.add_argument('--output_height', default=None, type=int, help='max restreamed height')
+    parser.add_argument('--bitrate', default=1000000, type=int, help='H264 bitrate in bps')
+    parser.add_argument(
+        '--publish_socket', default=None, type=str,
+        help='unix socket publishing the results to chained solutions'
+    )
+    parser.add_argument(
+        '--record_events', default=None, type=str,
+        help='solution output whose detections fire an event clip, e.g. bboxes'
+    )
+    parser.add_argument('--event_dir', default='data/events', type=str, help='event clips dir')
+    parser.add_argument(
+        '--store_dir', default=None, type=str, help='detection store dir, None to not store'
+    )
+    parser.add_argument('--camera', default=None, type=str, help='camera name of the detections')
     parser.add_argument('--verbose', default=False, type=str2bool, help='show debug logging')
+    parser.add_argument(
+        '--validate', default=False, type=str2bool,
+        help='validate every frame\'s inputs and outputs, for debugging'
+    )
     args = parser.parse_args()
+    set_validation(args.validate)
 
     if args.verbose:
         logging.basicConfig(level=logging.DEBUG)
@@ -69,5 +138,17 @@ if __name__ == "__main__":
         args.src,
         args.port,
         args.codec,
-        args.buffered
+        args.buffered,
+        args.decode_threads,
+        args.skip_non_keyframes,
+        args.decode_width,
+        args.decode_height,
+        args.output_width,
+        args.output_height,
+        args.bitrate,
+        args.publish_socket,
+        args.record_events,
+        args.event_dir,
+        args.store_dir,
+        args.camera
     )
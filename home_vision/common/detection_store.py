@@ -0,0 +1,319 @@
+"""Store of the detections of the solutions in SQLite, partitioned by camera and day, indexed
+by time, class and an R-tree of the boxes so that time range and region queries only read the
+matching rows"""
+import datetime
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from home_vision.common.detections import Detections
+
+_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS detections (
+        id INTEGER PRIMARY KEY, ts REAL NOT NULL, frame INTEGER, output TEXT,
+        class_id INTEGER, score REAL, xmin REAL, ymin REAL, xmax REAL, ymax REAL
+    )''',
+    'CREATE INDEX IF NOT EXISTS detections_ts ON detections (ts)',
+    'CREATE INDEX IF NOT EXISTS detections_class_ts ON detections (class_id, ts)',
+)
+_RTREE = 'CREATE VIRTUAL TABLE IF NOT EXISTS boxes USING rtree (id, xmin, xmax, ymin, ymax)'
+_COLUMNS = ('ts', 'frame', 'output', 'class_id', 'score', 'xmin', 'ymin', 'xmax', 'ymax')
+
+
+def camera_key(camera: str) -> str:
+    """Directory name of a camera, e.g. of a camera source url"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', camera).strip('_') or 'camera'
+
+
+def day_of(timestamp: float) -> str:
+    """UTC day of a timestamp, the partition of its detections"""
+    return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+
+def days_between(start: float, end: float) -> List[str]:
+    """UTC days of the partitions a time range spans"""
+    first = datetime.datetime.utcfromtimestamp(start).date()
+    last = datetime.datetime.utcfromtimestamp(end).date()
+    return [
+        (first + datetime.timedelta(days=offset)).isoformat()
+        for offset in range((last - first).days + 1)
+    ]
+
+
+class DetectionStore:
+    """Detections of the cameras in one SQLite file per camera and day under `root`. `add`
+    only queues the detections of a frame, a writer thread inserts them in batches, one
+    transaction per partition. Queries open the partitions read only, from any thread or
+    process, while the writer keeps inserting.
+
+    Args:
+        root (str): directory of the partitions
+        batch_size (int, optional): rows inserted per transaction at most. Defaults to 1000.
+        flush_interval (float, optional): seconds the writer waits to fill a batch.
+            Defaults to 1.0.
+    """
+    def __init__(self, root: str, batch_size: int = 1000, flush_interval: float = 1.0):
+        self.root = root
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows: queue.Queue = queue.Queue()
+        self.writer = None
+        self.written = 0
+
+    def partition_path(self, camera: str, day: str) -> str:
+        """Path of the partition of a camera's detections on a day"""
+        return os.path.join(self.root, camera_key(camera), f'{day}.sqlite')
+
+    def add(
+        self,
+        camera: str,
+        detections: Detections,
+        timestamp: Optional[float] = None,
+        frame: Optional[int] = None,
+        output: Optional[str] = None
+    ):
+        """Queue the detections of a frame, the writer thread is started on first use
+
+        Args:
+            camera (str): camera name or source
+            detections (Detections): detections of the frame
+            timestamp (Optional[float], optional): unix time of the frame. Defaults to now.
+            frame (Optional[int], optional): frame count. Defaults to None.
+            output (Optional[str], optional): solution output of the detections.
+                Defaults to None.
+        """
+        if len(detections) == 0:
+            return
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write, daemon=True)
+            self.writer.start()
+        timestamp = time.time() if timestamp is None else timestamp
+        boxes = detections.xyxy.tolist()
+        rows = [
+            (timestamp, frame, output, class_id, score, *box)
+            for class_id, score, box in zip(
+                detections.class_ids.tolist(), detections.scores.tolist(), boxes
+            )
+        ]
+        self.rows.put((self.partition_path(camera, day_of(timestamp)), rows))
+
+    @staticmethod
+    def _connect(path: str) -> Tuple[sqlite3.Connection, bool]:
+        """Open a partition for writing, creating its tables, and tell if it has an R-tree"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # transactions are begun explicitly, see `_insert`
+        conn = sqlite3.connect(path, isolation_level=None)
+        # readers don't block the writer and the other way around
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        try:
+            conn.execute(_RTREE)
+            rtree = True
+        except sqlite3.OperationalError:
+            logging.warning('SQLite has no R-tree, region queries scan the time range')
+            rtree = False
+        return conn, rtree
+
+    def _write(self):
+        """Insert the queued rows in batches, until `close`"""
+        connections: Dict[str, Tuple[sqlite3.Connection, bool]] = {}
+        last_used: Dict[str, float] = {}
+        running = True
+        while running:
+            batches: Dict[str, List[tuple]] = {}
+            flushed: List[threading.Event] = []
+            count = 0
+            deadline = time.monotonic() + self.flush_interval
+            while count < self.batch_size and not flushed:
+                try:
+                    item = self.rows.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    flushed.append(item)
+                    continue
+                path, rows = item
+                batches.setdefault(path, []).extend(rows)
+                count += len(rows)
+            for path, rows in batches.items():
+                try:
+                    self._insert(connections, path, rows)
+                except sqlite3.Error:
+                    logging.exception('failed to store %s detections in %s', len(rows), path)
+            for event in flushed:
+                event.set()
+            # close the partitions no longer written, e.g. of the previous days
+            now = time.monotonic()
+            last_used.update((path, now) for path in batches)
+            for path in [path for path, used in last_used.items() if now - used > 60]:
+                del last_used[path]
+                if path in connections:
+                    connections.pop(path)[0].close()
+        for conn, _ in connections.values():
+            conn.close()
+
+    def _insert(
+        self,
+        connections: Dict[str, Tuple[sqlite3.Connection, bool]],
+        path: str,
+        rows: List[tuple]
+    ):
+        """Insert rows in a partition in one transaction"""
+        if path not in connections:
+            connections[path] = self._connect(path)
+        conn, rtree = connections[path]
+        # take the write lock first: another solution on the camera may write the partition
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.execute('SELECT COALESCE(MAX(id), 0) FROM detections')
+            first_id = cursor.fetchone()[0] + 1
+            conn.executemany(
+                f'INSERT INTO detections (id, {", ".join(_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * (len(_COLUMNS) + 1))})',
+                [(first_id + index, *row) for index, row in enumerate(rows)]
+            )
+            if rtree:
+                conn.executemany(
+                    'INSERT INTO boxes VALUES (?, ?, ?, ?, ?)',
+                    [
+                        (first_id + index, row[5], row[7], row[6], row[8])
+                        for index, row in enumerate(rows)
+                    ]
+                )
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        self.written += len(rows)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until the detections queued so far are written
+
+        Returns:
+            bool: False if they were not written within timeout
+        """
+        if self.writer is None:
+            return True
+        event = threading.Event()
+        self.rows.put(event)
+        return event.wait(timeout)
+
+    def close(self):
+        """Write the queued detections and stop the writer thread"""
+        if self.writer is not None:
+            self.rows.put(None)
+            self.writer.join()
+            self.writer = None
+
+    def cameras(self) -> List[str]:
+        """Cameras with stored detections"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def query(
+        self,
+        camera: str,
+        start: float,
+        end: float,
+        class_ids: Optional[Sequence[int]] = None,
+        region: Optional[Sequence[float]] = None,
+        min_score: Optional[float] = None,
+        limit: Optional[int] = 1000
+    ) -> List[Dict[str, Any]]:
+        """Detections of a camera in a time range, oldest first
+
+        Args:
+            camera (str): camera name or source
+            start (float): unix time of the start of the range
+            end (float): unix time of the end of the range
+            class_ids (Optional[Sequence[int]], optional): classes to return.
+                Defaults to None, every class.
+            region (Optional[Sequence[float]], optional): `[xmin, ymin, xmax, ymax]` area the
+                boxes intersect. Defaults to None, anywhere.
+            min_score (Optional[float], optional): minimum score. Defaults to None.
+            limit (Optional[int], optional): maximum number of detections. Defaults to 1000.
+
+        Returns:
+            List[Dict[str, Any]]: detections with their `ts`, `frame`, `output`, `class_id`,
+                `score` and `box`
+        """
+        results: List[Dict[str, Any]] = []
+        for day in days_between(start, end):
+            remaining = None if limit is None else limit - len(results)
+            if remaining is not None and remaining <= 0:
+                break
+            path = self.partition_path(camera, day)
+            if os.path.exists(path):
+                results.extend(self._query_partition(
+                    path, start, end, class_ids, region, min_score, remaining
+                ))
+        return results
+
+    @staticmethod
+    def _query_partition(
+        path: str,
+        start: float,
+        end: float,
+        class_ids: Optional[Sequence[int]],
+        region: Optional[Sequence[float]],
+        min_score: Optional[float],
+        limit: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        """Matching detections of a partition"""
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            rtree = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'boxes'"
+            ).fetchone() is not None
+            clauses = ['d.ts >= ?', 'd.ts <= ?']
+            params: List[Any] = [start, end]
+            source = 'detections d'
+            if class_ids is not None:
+                clauses.append(f'd.class_id IN ({", ".join("?" * len(class_ids))})')
+                params.extend(class_ids)
+            if min_score is not None:
+                clauses.append('d.score >= ?')
+                params.append(min_score)
+            if region is not None:
+                xmin, ymin, xmax, ymax = region
+                prefix = 'b' if rtree else 'd'
+                if rtree:
+                    # the R-tree drives the join, rather than a scan of the time range
+                    source = 'boxes b CROSS JOIN detections d ON d.id = b.id'
+                clauses.extend([
+                    f'{prefix}.xmax >= ?', f'{prefix}.xmin <= ?',
+                    f'{prefix}.ymax >= ?', f'{prefix}.ymin <= ?'
+                ])
+                params.extend([xmin, xmax, ymin, ymax])
+            sql = (
+                f'SELECT d.ts, d.frame, d.output, d.class_id, d.score, '
+                f'd.xmin, d.ymin, d.xmax, d.ymax FROM {source} '
+                f'WHERE {" AND ".join(clauses)} ORDER BY d.ts'
+            )
+            if limit is not None:
+                sql += ' LIMIT ?'
+                params.append(limit)
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return [
+            {
+                'ts': ts, 'frame': frame, 'output': output, 'class_id': class_id,
+                'score': score, 'box': [xmin, ymin, xmax, ymax]
+            }
+            for ts, frame, output, class_id, score, xmin, ymin, xmax, ymax in rows
+        ]
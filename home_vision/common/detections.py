@@ -0,0 +1,106 @@
+"""Detections container that keeps boxes, scores and class ids as NumPy arrays"""
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+
+class Detections:
+    """Struct of arrays of N detections: `xyxy` float32 (N, 4), `scores` float32 (N,) and
+    `class_ids` int32 (N,). Solutions pass it around as is, it is turned into lists only when
+    serialized to json, as a list of int `[xmin, ymin, xmax, ymax]` boxes.
+
+    Args:
+        xyxy (np.ndarray): boxes, (N, 4)
+        scores (Optional[np.ndarray], optional): scores, (N,). Defaults to ones.
+        class_ids (Optional[np.ndarray], optional): class ids, (N,). Defaults to zeros.
+    """
+    __slots__ = ('xyxy', 'scores', 'class_ids')
+
+    def __init__(
+        self,
+        xyxy: np.ndarray,
+        scores: Optional[np.ndarray] = None,
+        class_ids: Optional[np.ndarray] = None
+    ):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        num = len(self.xyxy)
+        self.scores = (
+            np.ones(num, dtype=np.float32) if scores is None
+            else np.asarray(scores, dtype=np.float32).reshape(num)
+        )
+        self.class_ids = (
+            np.zeros(num, dtype=np.int32) if class_ids is None
+            else np.asarray(class_ids, dtype=np.int32).reshape(num)
+        )
+
+    @classmethod
+    def empty(cls) -> Detections:
+        """No detection"""
+        return cls(np.empty((0, 4), dtype=np.float32))
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """Boxes rounded down to int32 pixels, (N, 4)"""
+        return self.xyxy.astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.xyxy)
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> Detections:
+        """Subset of the detections by index, slice, indices or boolean mask"""
+        index = np.atleast_1d(index) if isinstance(index, (int, np.integer)) else index
+        return Detections(self.xyxy[index], self.scores[index], self.class_ids[index])
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return iter(self.boxes)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Detections):
+            return (
+                np.array_equal(self.xyxy, other.xyxy)
+                and np.array_equal(self.scores, other.scores)
+                and np.array_equal(self.class_ids, other.class_ids)
+            )
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == [list(box) for box in other]
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'Detections({len(self)})'
+
+    def tolist(self) -> list:
+        """Json form: list of int `[xmin, ymin, xmax, ymax]` boxes"""
+        return self.boxes.tolist()
+
+    @classmethod
+    def from_list(cls, boxes: Sequence[Sequence[float]]) -> Detections:
+        """Detections from a list of xyxy boxes, e.g. results read back from json"""
+        if len(boxes) == 0:
+            return cls.empty()
+        return cls(np.asarray(boxes, dtype=np.float32))
+
+    @classmethod
+    def __get_validators__(cls) -> Iterator[Callable]:
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value: Any) -> Detections:
+        """Pydantic validator, accepts detections or a list of xyxy boxes"""
+        if isinstance(value, Detections):
+            return value
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return cls.from_list(value)
+        raise TypeError(f'detections must be Detections or a list of boxes, got {type(value)}')
+
+
+def json_default(obj: Any) -> Any:
+    """`default` of `json.dumps` for the NumPy based results of the solutions"""
+    if isinstance(obj, Detections):
+        return obj.tolist()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
@@ -34,3 +34,6 @@ class MethodNotExistError(HomeVisionError):
 
         msg += "Avaiable methods are: " + str(available_methods)
         super().__init__(msg)
+
+class GraphError(HomeVisionError):
+    """Raised when a solution graph is not a valid DAG or its modules are wired wrongly"""
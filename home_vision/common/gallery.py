@@ -0,0 +1,260 @@
+"""Gallery of the appearance embeddings of the tracked people, to give the same identity to a
+person across tracks and cameras: the embeddings are the rows of one contiguous float32
+matrix, and the new tracks are compared to all of them with a single matrix product"""
+import json
+import logging
+import queue
+import threading
+import time
+import urllib.request
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    """L2 normalized float32 rows, so that cosine similarities are dot products"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+class EmbeddingGallery:
+    """Embeddings of the tracks of the cameras with their identities. A new track takes the
+    identity of the most similar embedding above `threshold`, a track already in the gallery
+    keeps its identity and updates its embedding
+
+    Args:
+        threshold (float, optional): minimum cosine similarity of the same person.
+            Defaults to 0.6.
+        ttl (float, optional): seconds the embedding of a track not updated is kept.
+            Defaults to 600.
+        active_seconds (float, optional): seconds since its last update during which a track
+            is on its camera and can't be matched by another track of the camera.
+            Defaults to 2.
+        momentum (float, optional): weight of the previous embedding of a track when it is
+            updated. Defaults to 0.8.
+        max_size (int, optional): embeddings kept at most, the oldest are dropped.
+            Defaults to 10000.
+    """
+    def __init__(
+        self,
+        threshold: float = 0.6,
+        ttl: float = 600.0,
+        active_seconds: float = 2.0,
+        momentum: float = 0.8,
+        max_size: int = 10000
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.active_seconds = active_seconds
+        self.momentum = momentum
+        self.max_size = max_size
+        self.size = 0
+        # rows of the gallery, the first `size` are used
+        self.embeddings = np.empty((0, 0), dtype=np.float32)
+        self.identities = np.empty(0, dtype=np.int64)
+        self.updated = np.empty(0, dtype=np.float64)
+        # (camera, session, track id) of each row
+        self.keys: List[Tuple[str, str, int]] = []
+        self.rows: Dict[Tuple[str, str, int], int] = {}
+        self.next_identity = 1
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reserve(self, num: int, dim: int):
+        """Grow the rows to `num`, doubling so that they are rarely reallocated"""
+        if self.embeddings.shape[1] != dim and self.size:
+            raise ValueError(
+                f'embeddings of size {dim}, the gallery has {self.embeddings.shape[1]}'
+            )
+        if num <= len(self.embeddings) and self.embeddings.shape[1] == dim:
+            return
+        capacity = max(num, 2 * len(self.embeddings), 64)
+        embeddings = np.empty((capacity, dim), dtype=np.float32)
+        if self.size:
+            embeddings[:self.size] = self.embeddings[:self.size]
+        self.embeddings = embeddings
+        self.identities = np.resize(self.identities, capacity)
+        self.updated = np.resize(self.updated, capacity)
+
+    def _keep(self, keep: np.ndarray):
+        """Keep the rows of a boolean mask, moved to the front in order"""
+        kept = np.nonzero(keep)[0]
+        num = len(kept)
+        self.embeddings[:num] = self.embeddings[kept]
+        self.identities[:num] = self.identities[kept]
+        self.updated[:num] = self.updated[kept]
+        self.keys = [self.keys[row] for row in kept.tolist()]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.size = num
+
+    def _expire(self, now: float, incoming: int):
+        """Drop the expired rows, and the oldest ones beyond `max_size`"""
+        if self.size == 0:
+            return
+        updated = self.updated[:self.size]
+        keep = updated >= now - self.ttl
+        excess = keep.sum() + incoming - self.max_size
+        if excess > 0:
+            keep[np.argsort(updated)[:excess]] = False
+        if not keep.all():
+            self._keep(keep)
+
+    def _match(self, camera: str, embeddings: np.ndarray, now: float) -> np.ndarray:
+        """Identities of new tracks, the most similar ones first, -1 if none matches"""
+        identities = np.full(len(embeddings), -1, dtype=np.int64)
+        if self.size == 0:
+            return identities
+        similarity = embeddings @ self.embeddings[:self.size].T
+        # the tracks on the camera now are other people
+        active = np.array([key[0] == camera for key in self.keys]) & (
+            self.updated[:self.size] >= now - self.active_seconds
+        )
+        similarity[:, active] = -np.inf
+        gallery_identities = self.identities[:self.size]
+        for query in np.argsort(-similarity.max(axis=1)).tolist():
+            row = int(similarity[query].argmax())
+            if similarity[query, row] < self.threshold:
+                continue
+            identities[query] = gallery_identities[row]
+            # one track per identity
+            similarity[:, gallery_identities == identities[query]] = -np.inf
+        return identities
+
+    def identify(
+        self,
+        camera: str,
+        track_ids: Sequence[int],
+        embeddings: np.ndarray,
+        timestamp: Optional[float] = None,
+        session: str = ''
+    ) -> np.ndarray:
+        """Identities of tracks of a camera, from their new embeddings
+
+        Args:
+            camera (str): camera of the tracks
+            track_ids (Sequence[int]): track ids on the camera
+            embeddings (np.ndarray): (N, D) embeddings of the tracks
+            timestamp (Optional[float], optional): unix time of the embeddings.
+                Defaults to now.
+            session (str, optional): run of the solution tracking the camera, its track ids
+                start again when it restarts and are other people. Defaults to ''.
+
+        Returns:
+            np.ndarray: (N,) identities of the tracks
+        """
+        now = time.time() if timestamp is None else timestamp
+        track_ids = [int(track_id) for track_id in track_ids]
+        if not track_ids:
+            return np.empty(0, dtype=np.int64)
+        embeddings = normalize(np.reshape(embeddings, (len(track_ids), -1)))
+        with self.lock:
+            self._expire(now, len(track_ids))
+            self._reserve(self.size + len(track_ids), embeddings.shape[1])
+            rows = np.array(
+                [self.rows.get((camera, session, track_id), -1) for track_id in track_ids],
+                dtype=np.int64
+            )
+            known = rows >= 0
+            identities = np.empty(len(track_ids), dtype=np.int64)
+            identities[known] = self.identities[rows[known]]
+            new = np.nonzero(~known)[0]
+            identities[new] = self._match(camera, embeddings[new], now)
+            for index in new[identities[new] < 0].tolist():
+                identities[index] = self.next_identity
+                self.next_identity += 1
+
+            if known.any():
+                updated = rows[known]
+                self.embeddings[updated] = normalize(
+                    self.momentum * self.embeddings[updated]
+                    + (1 - self.momentum) * embeddings[known]
+                )
+                self.updated[updated] = now
+            added = slice(self.size, self.size + len(new))
+            self.embeddings[added] = embeddings[new]
+            self.identities[added] = identities[new]
+            self.updated[added] = now
+            for index in new.tolist():
+                key = (camera, session, track_ids[index])
+                self.rows[key] = len(self.keys)
+                self.keys.append(key)
+            self.size += len(new)
+        return identities
+
+    def stats(self) -> Dict[str, int]:
+        """Embeddings, cameras and identities in the gallery"""
+        with self.lock:
+            return {
+                'embeddings': self.size,
+                'cameras': len({key[0] for key in self.keys}),
+                'identities': len(np.unique(self.identities[:self.size])),
+            }
+
+
+class GalleryClient:
+    """Identify the tracks of a camera in the gallery of the SolutionManager: the embeddings
+    are posted by a background thread and the identities it answers are collected with
+    `results` on the following frames, the frames never wait for the manager
+
+    Args:
+        url (str): url of the gallery of the manager, e.g. `http://127.0.0.1:5555/api/reid`
+        camera (str): name of the camera
+        timeout (float, optional): seconds to wait for the manager. Defaults to 2.0.
+    """
+    def __init__(self, url: str, camera: str, timeout: float = 2.0):
+        self.url = url
+        self.camera = camera
+        # the track ids of this run are not the ones of the previous runs on the camera
+        self.session = uuid.uuid4().hex
+        self.timeout = timeout
+        self.identities: Dict[int, int] = {}
+        self.lock = threading.Lock()
+        self.requests: queue.Queue = queue.Queue(maxsize=16)
+        self.sender = threading.Thread(target=self._send, daemon=True)
+        self.sender.start()
+
+    def submit(self, track_ids: Sequence[int], embeddings: np.ndarray):
+        """Queue the new embeddings of tracks, dropped if the manager is behind"""
+        try:
+            self.requests.put_nowait((list(track_ids), np.asarray(embeddings).tolist()))
+        except queue.Full:
+            logging.warning('gallery %s is behind, embeddings dropped', self.url)
+
+    def _send(self):
+        """Post the queued embeddings until `close`"""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            track_ids, embeddings = request
+            body = json.dumps({
+                'camera': self.camera, 'session': self.session, 'track_ids': track_ids,
+                'embeddings': embeddings
+            }).encode()
+            http_request = urllib.request.Request(
+                self.url, body, {'Content-Type': 'application/json'}
+            )
+            try:
+                with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+                    identities = json.loads(response.read())['identities']
+            except (OSError, ValueError, KeyError) as exc:
+                logging.warning('gallery %s failed: %s', self.url, exc)
+                continue
+            with self.lock:
+                self.identities.update(zip(track_ids, identities))
+
+    def results(self) -> Dict[int, int]:
+        """Identities of the tracks answered since the last call"""
+        with self.lock:
+            identities, self.identities = self.identities, {}
+        return identities
+
+    def close(self):
+        """Stop the background thread"""
+        self.requests.put(None)
+        self.sender.join(self.timeout)
@@ -0,0 +1,131 @@
+"""Latency histograms and profiling hooks for HomeVision modules"""
+import logging
+import math
+from typing import Any, Dict, List, Tuple
+
+
+class LatencyHistogram:
+    """Latency histogram with logarithmic buckets, reports count and p50/p95/p99.
+
+    Recording is lock-free: a module records from the thread that processes it, readers take
+    a snapshot of the counts and may miss the records happening while they read.
+
+    Args:
+        min_latency (float): lower bound of the buckets in seconds
+        max_latency (float): upper bound of the buckets in seconds
+        buckets_per_octave (int): resolution, each bucket is 2**(1/buckets_per_octave) wide
+    """
+    def __init__(
+        self,
+        min_latency: float = 1e-5,
+        max_latency: float = 100.0,
+        buckets_per_octave: int = 8
+    ):
+        self.min_latency = min_latency
+        self.scale = buckets_per_octave / math.log(2)
+        self.num_buckets = int(math.log(max_latency / min_latency) * self.scale) + 2
+        self.counts = [0] * self.num_buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bucket(self, latency: float) -> int:
+        """Index of the bucket of a latency"""
+        if latency <= self.min_latency:
+            return 0
+        return min(int(math.log(latency / self.min_latency) * self.scale) + 1, self.num_buckets - 1)
+
+    def _upper_bound(self, bucket: int) -> float:
+        """Upper latency bound of a bucket"""
+        return self.min_latency * math.exp(bucket / self.scale)
+
+    def record(self, latency: float):
+        """Record a latency in seconds"""
+        self.counts[self._bucket(latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    @staticmethod
+    def _rank_bucket(counts: List[int], rank: float) -> int:
+        """First bucket whose cumulative count reaches the rank"""
+        seen = 0
+        for bucket, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return bucket
+        return len(counts) - 1
+
+    def percentiles(self, quantiles: Tuple[float, ...] = (0.5, 0.95, 0.99)) -> List[float]:
+        """Latencies in seconds at the quantiles, estimated by the buckets' upper bounds"""
+        counts = list(self.counts)
+        total = sum(counts)
+        if total == 0:
+            return [0.0] * len(quantiles)
+        return [
+            min(self._upper_bound(self._rank_bucket(counts, quantile * total)), self.max)
+            for quantile in quantiles
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean, p50, p95, p99 and max latency in milliseconds"""
+        p50, p95, p99 = self.percentiles((0.5, 0.95, 0.99))
+        count = self.count
+        return {
+            'count': count,
+            'mean_ms': self.total / count * 1000 if count else 0.0,
+            'p50_ms': p50 * 1000,
+            'p95_ms': p95 * 1000,
+            'p99_ms': p99 * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+    def reset(self):
+        """Clear all records"""
+        self.counts = [0] * self.num_buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class ProfilingHook:
+    """Base class of profilers and tracers subscribing to modules' process calls,
+    register an instance with `add_hook`"""
+    def on_process_start(self, module, inputs): #pylint: disable=unused-argument
+        """Called before a module processes its inputs"""
+        return None
+
+    def on_process_end(self, module, inputs, outputs, latency: float): #pylint: disable=unused-argument
+        """Called after a module processed its inputs, latency is in seconds"""
+        return None
+
+    def on_phase(self, module, phase: str, latency: float): #pylint: disable=unused-argument
+        """Called after a timed phase inside a module, e.g. `inference` or `nms`"""
+        return None
+
+
+class LoggingHook(ProfilingHook):
+    """Log every module's process latency at debug level"""
+    def on_process_end(self, module, inputs, outputs, latency: float):
+        logging.debug("%s: %.2f ms", module.module_name, latency * 1000)
+
+
+# hooks are replaced, never mutated, so modules can iterate them without a lock
+_HOOKS: Tuple[ProfilingHook, ...] = (LoggingHook(),)
+
+
+def add_hook(hook: ProfilingHook):
+    """Subscribe a hook to all modules' process calls"""
+    global _HOOKS #pylint: disable=global-statement
+    _HOOKS = _HOOKS + (hook,)
+
+
+def remove_hook(hook: ProfilingHook):
+    """Unsubscribe a hook"""
+    global _HOOKS #pylint: disable=global-statement
+    _HOOKS = tuple(registered for registered in _HOOKS if registered is not hook)
+
+
+def get_hooks() -> Tuple[ProfilingHook, ...]:
+    """All subscribed hooks"""
+    return _HOOKS
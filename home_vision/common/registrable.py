@@ -2,8 +2,10 @@
 # This module is largely inspired by the AllenNLP library
 # See github.com/allenai/allennlp/blob/master/allennlp/common/registrable.py
 
+import importlib
+import time
 from collections import defaultdict
-from typing import Callable, List, Type, TypeVar
+from typing import Callable, Dict, List, Type, TypeVar
 from future.utils import iteritems
 
 from .exceptions import AlreadyRegisteredError, NotRegisteredError
@@ -22,13 +24,16 @@ class Registrable:
 
     Note that if you use this class to implement a new ``Registrable``
     abstract class, you must ensure that all subclasses of the abstract class
-    are loaded when the module is loaded, because the subclasses register
-    themselves in their respective files. You can achieve this by having the
-    abstract class and all subclasses in the __init__.py of the module in
-    which they reside (as this causes any import of either the abstract class
-    or a subclass to load all other subclasses and the abstract class).
+    are loaded or declared when the module is loaded, because the subclasses
+    register themselves in their respective files. Declare them in the
+    __init__.py of the module in which they reside with
+    ``BaseClass.register_lazy(name, module_path)``: the subclass' module is
+    only imported on the first ``by_name(name)``, so that an entry point
+    doesn't pay the imports of the subclasses it doesn't use.
     """
     _registry = defaultdict(dict)
+    _lazy_registry = defaultdict(dict)
+    _import_times: Dict[str, float] = {}
 
     @classmethod
     def register(cls: Type[T], name: str, override: bool=False):
@@ -58,6 +63,33 @@ class Registrable:
 
         return add_subclass_to_registry
 
+    @classmethod
+    def register_lazy(cls, name: str, module_path: str):
+        """Declare a subclass registered with ``@BaseClass.register(name)`` in the module
+        ``module_path``, which is imported on the first ``by_name(name)``
+
+        Args:
+            name (str): name use to identify the registered subclass
+            module_path (str): absolute import path of the module of the subclass
+        """
+        Registrable._lazy_registry[cls][name] = module_path
+
+    @classmethod
+    def _import_lazy(cls, name: str) -> bool:
+        """Import the module of a lazily declared subclass, return whether it was declared"""
+        module_path = Registrable._lazy_registry[cls].get(name)
+        if module_path is None:
+            return False
+        time_s = time.perf_counter()
+        importlib.import_module(module_path)
+        Registrable._import_times.setdefault(module_path, time.perf_counter() - time_s)
+        return True
+
+    @classmethod
+    def import_times(cls) -> Dict[str, float]:
+        """Seconds spent importing each lazily registered module, by module path"""
+        return dict(Registrable._import_times)
+
     @classmethod
     def registered_name(cls, registered_class: Type[T]) -> str:
         """Get name of the registered class
@@ -71,6 +103,12 @@ class Registrable:
         Returns:
             str: name of the registered class
         """
+        for name, subclass in iteritems(Registrable._registry[cls]):
+            if subclass == registered_class:
+                return name
+        for name in list(Registrable._lazy_registry[cls]):
+            if name not in Registrable._registry[cls]:
+                cls._import_lazy(name)
         for name, subclass in iteritems(Registrable._registry[cls]):
             if subclass == registered_class:
                 return name
@@ -89,11 +127,17 @@ class Registrable:
         Returns:
             Callable[..., T]: registered class
         """
+        if name not in Registrable._registry[cls]:
+            cls._import_lazy(name)
         if name not in Registrable._registry[cls]:
             raise NotRegisteredError(cls, name=name)
         return Registrable._registry[cls][name]
 
     @classmethod
     def list_available(cls) -> List[str]:
-        """List all registered sub-classes under a registerable class"""
-        return list(Registrable._registry[cls].keys())
+        """List all registered or lazily declared sub-classes under a registerable class,
+        without importing them"""
+        registered = Registrable._registry[cls]
+        return list(registered.keys()) + [
+            name for name in Registrable._lazy_registry[cls] if name not in registered
+        ]
@@ -0,0 +1,23 @@
+"""Switch between validated (debug) and fast (production) per-frame inputs and outputs
+
+With validation, module inputs and outputs are validated pydantic models and `Module.process`
+checks their types. Without it they are built with `construct()`: the wiring of the modules is
+checked once when a graph is built, then per-frame data is trusted.
+"""
+import os
+
+VALIDATE_ENV = 'HOME_VISION_VALIDATE'
+
+_VALIDATE = os.environ.get(VALIDATE_ENV, '1').lower() not in ('0', 'false', 'no')
+
+
+def validation_enabled() -> bool:
+    """Whether per-frame inputs and outputs are validated"""
+    return _VALIDATE
+
+
+def set_validation(enabled: bool):
+    """Enable (debug) or disable (production) per-frame validation, defaults to the
+    `HOME_VISION_VALIDATE` environment variable, enabled when unset"""
+    global _VALIDATE #pylint: disable=global-statement
+    _VALIDATE = enabled
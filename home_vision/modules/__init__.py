@@ -1,5 +1,37 @@
-"""Import all HomeVision modules"""
-from .capture.capture import Capture
-from .rtc_server.server import RTCServer
-from .person_detection.person_detector import PersonDetector
-from .object_detection.object_detector import ObjectDetector
+"""Declare all HomeVision modules, they are imported on first use"""
+import importlib
+
+from .module_base import Module
+
+MODULES = {
+    'capture': 'home_vision.modules.capture.capture',
+    'rtc_server': 'home_vision.modules.rtc_server.server',
+    'person_detector': 'home_vision.modules.person_detection.person_detector',
+    'object_detector': 'home_vision.modules.object_detection.object_detector',
+    'event_recorder': 'home_vision.modules.recorder.event_recorder',
+    'tracker': 'home_vision.modules.tracking.tracker',
+    'action_recognizer': 'home_vision.modules.action_recognition.action_recognizer',
+    'reid_embedder': 'home_vision.modules.reid.reid_embedder',
+    'zone_rules': 'home_vision.modules.zones.zone_rules',
+}
+_EXPORTS = {
+    'Capture': MODULES['capture'],
+    'RTCServer': MODULES['rtc_server'],
+    'PersonDetector': MODULES['person_detector'],
+    'ObjectDetector': MODULES['object_detector'],
+    'EventRecorder': MODULES['event_recorder'],
+    'Tracker': MODULES['tracker'],
+    'ActionRecognizer': MODULES['action_recognizer'],
+    'ReIDEmbedder': MODULES['reid_embedder'],
+    'ZoneRules': MODULES['zone_rules'],
+}
+
+for module_name, module_path in MODULES.items():
+    Module.register_lazy(module_name, module_path)
+
+
+def __getattr__(name: str):
+    """Import the module classes on first access"""
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,218 @@
+"""Action recognition of the tracked people: the person patches of each track are kept in a
+ring buffer, slots of preallocated arrays, and the clips of all the tracks due are classified
+in a single batched ONNX inference every `stride` frames, so that the cost of recognition grows
+with the batch rather than with one inference per person and frame"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import BaseConfig, Module, ModuleInput, ModuleOutput
+from home_vision.modules.onnx_session import load_session, resolve_model_path
+from home_vision.utils.crops import RoiCropper
+
+if TYPE_CHECKING:
+    import onnxruntime
+
+ACTIONS = ('stand', 'sit', 'walk', 'lie', 'fall')
+
+
+class ActionRecognizerConfig(BaseConfig):
+    """Config for Action Recognizer
+
+    Attributes:
+        gpu (bool): use gpu or cpu to inference
+        model_type (str): type of model will be used, no `tiny` model is released: the
+            synthetic models have a random-weight stand-in to run the pipeline, replace it with
+            a trained model exported with the same input and output
+        model_dir (str): directory of the models, defaults to `HOME_VISION_MODEL_DIR` or `models/`
+        warmup_runs (int): dummy inferences run when the model is loaded
+        use_tuning (bool): use the session settings autotuned for this host, if any
+        tuning_dir (str): directory of the tuned settings, defaults to
+            `HOME_VISION_TUNING_DIR` or `tuning/` in the model directory
+        actions (Tuple[str, ...]): names of the model's classes
+        clip_length (int): frames of a clip
+        patch_size (Tuple[int, int]): height and width of the person patches
+        stride (int): frames between two inferences
+        max_tracks (int): tracks with a clip buffer, the tracks beyond are not recognized
+        max_age (int): frames a clip buffer is kept for a track not seen
+        score_threshold (float): minimum score of a reported action
+        top_k (int): actions reported per person at most
+    """
+    gpu: Optional[bool] = True
+    model_type: Optional[str] = 'tiny'
+    model_dir: Optional[str] = None
+    warmup_runs: Optional[int] = 2
+    use_tuning: Optional[bool] = True
+    tuning_dir: Optional[str] = None
+    actions: Optional[Tuple[str, ...]] = ACTIONS
+    clip_length: Optional[int] = 8
+    patch_size: Optional[Tuple[int, int]] = (112, 112)
+    stride: Optional[int] = 8
+    max_tracks: Optional[int] = 32
+    max_age: Optional[int] = 30
+    score_threshold: Optional[float] = 0.3
+    top_k: Optional[int] = 2
+
+class ActionRecognizerInput(ModuleInput):
+    """Action Recognizer Input"""
+    image: np.ndarray
+    tracks: Detections
+    track_ids: np.ndarray
+
+class ActionRecognizerOutput(ModuleOutput):
+    """Action Recognizer Output, the actions of each track and their scores, best first"""
+    actions: List[List[str]]
+    action_scores: List[List[float]]
+
+
+@Module.register('action_recognizer')
+class ActionRecognizer(Module[ActionRecognizerInput, ActionRecognizerOutput,
+                              ActionRecognizerConfig]):
+    """Recognize the actions of the tracked people from clips of their patches"""
+    input_types: Type[ActionRecognizerInput] = ActionRecognizerInput
+    output_types: Type[ActionRecognizerOutput] = ActionRecognizerOutput
+    config_type: Type[ActionRecognizerConfig] = ActionRecognizerConfig
+    module_name = 'Action Recognizer'
+
+    def __init__(
+        self,
+        session: onnxruntime.InferenceSession,
+        actions: Tuple[str, ...] = ACTIONS,
+        clip_length: int = 8,
+        patch_size: Tuple[int, int] = (112, 112),
+        stride: int = 8,
+        max_tracks: int = 32,
+        max_age: int = 30,
+        score_threshold: float = 0.3,
+        top_k: int = 2
+    ):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.actions = tuple(actions)
+        self.clip_length = clip_length
+        self.patch_size = tuple(patch_size)
+        self.stride = stride
+        self.max_tracks = max_tracks
+        self.max_age = max_age
+        self.score_threshold = score_threshold
+        self.top_k = top_k
+        self.cropper = RoiCropper(self.patch_size)
+        height, width = self.patch_size
+        # one slot per track: its BGR patches, written in turn, and its latest scores
+        self.clips = np.zeros((max_tracks, clip_length, height, width, 3), dtype=np.uint8)
+        self.filled = np.zeros(max_tracks, dtype=np.int64)
+        self.last_seen = np.zeros(max_tracks, dtype=np.int64)
+        self.scores = np.zeros((max_tracks, len(self.actions)), dtype=np.float32)
+        self.recognized = np.zeros(max_tracks, dtype=bool)
+        self.batch = np.empty((max_tracks, 3, clip_length, height, width), dtype=np.float32)
+        self.slots: Dict[int, int] = {}
+        self.free: List[int] = list(range(max_tracks - 1, -1, -1))
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: ActionRecognizerConfig) -> ActionRecognizer:
+        logging.info('loading Action Recognizer from config: %s', config)
+        model_path = resolve_model_path(
+            f"action_recognition/action_{config.model_type}.onnx", config.model_dir
+        )
+        session, timings = load_session(
+            model_path, config.gpu, config.warmup_runs, config.use_tuning, config.tuning_dir,
+            config.model_dir
+        )
+        clip_length = session.get_inputs()[0].shape[2]
+        if isinstance(clip_length, int) and clip_length != config.clip_length:
+            raise ValueError(
+                f'{model_path} classifies clips of {clip_length} frames, '
+                f'not clip_length {config.clip_length}'
+            )
+        recognizer = cls(
+            session, config.actions, config.clip_length, config.patch_size, config.stride,
+            config.max_tracks, config.max_age, config.score_threshold, config.top_k
+        )
+        recognizer.startup_timings.update(timings)
+        return recognizer
+
+    def assign_slots(self, track_ids: np.ndarray) -> np.ndarray:
+        """Slots of the tracks, new tracks take a free slot, -1 when there is none left"""
+        slots = np.full(len(track_ids), -1, dtype=np.int64)
+        for index, track_id in enumerate(track_ids.tolist()):
+            slot = self.slots.get(track_id)
+            if slot is None and self.free:
+                slot = self.slots[track_id] = self.free.pop()
+            if slot is not None:
+                slots[index] = slot
+        return slots
+
+    def release_slots(self):
+        """Free the slots of the tracks not seen for `max_age` frames"""
+        for track_id, slot in list(self.slots.items()):
+            if self.cnt - self.last_seen[slot] > self.max_age:
+                del self.slots[track_id]
+                self.filled[slot] = 0
+                self.recognized[slot] = False
+                self.free.append(slot)
+
+    def write_patches(self, image: np.ndarray, boxes: np.ndarray, slots: np.ndarray):
+        """Write the patch of each box in the next frame of its slot's clip"""
+        crops = self.cropper.crop(image, boxes)
+        written = (slots >= 0) & (crops.scales[:, 0] > 0)
+        slots = slots[written]
+        self.clips[slots, self.filled[slots] % self.clip_length] = crops.patches[written]
+        self.filled[slots] += 1
+        self.last_seen[slots] = self.cnt
+
+    def recognize(self, slots: np.ndarray) -> np.ndarray:
+        """Scores of the clips of the slots, in one batched inference
+
+        Args:
+            slots (np.ndarray): slots with a full clip
+
+        Returns:
+            np.ndarray: (N, actions) scores
+        """
+        with self.timer('preprocess'):
+            # frames of each clip oldest first, the next one to write is the oldest
+            order = (self.filled[slots, None] + np.arange(self.clip_length)) % self.clip_length
+            clips = self.clips[slots[:, None], order]
+            batch = self.batch[:len(slots)]
+            # (N, T, H, W, BGR) to (N, RGB, T, H, W), normalized like the crops
+            np.multiply(
+                clips.transpose(0, 4, 1, 2, 3)[:, ::-1], self.cropper.scale[:, None], out=batch
+            )
+            batch -= self.cropper.offset[:, None]
+        with self.timer('inference'):
+            return self.session.run(None, {self.input_name: batch})[0]
+
+    def _process(self, inputs: ActionRecognizerInput) -> ActionRecognizerOutput:
+        """Buffer the patches of the tracks and recognize the actions of the due ones"""
+        self.cnt += 1
+        track_ids = np.asarray(inputs.track_ids, dtype=np.int64)
+        with self.timer('crop'):
+            self.release_slots()
+            slots = self.assign_slots(track_ids)
+            self.write_patches(inputs.image, inputs.tracks.xyxy, slots)
+        if self.cnt % self.stride == 0:
+            present = slots[slots >= 0]
+            due = present[
+                (self.filled[present] >= self.clip_length)
+                & (self.last_seen[present] == self.cnt)
+            ]
+            if len(due):
+                self.scores[due] = self.recognize(due)
+                self.recognized[due] = True
+
+        actions, action_scores = [], []
+        for slot in slots.tolist():
+            if slot < 0 or not self.recognized[slot]:
+                actions.append([])
+                action_scores.append([])
+                continue
+            scores = self.scores[slot]
+            best = np.argsort(-scores)[:self.top_k]
+            best = best[scores[best] >= self.score_threshold]
+            actions.append([self.actions[index] for index in best.tolist()])
+            action_scores.append(np.round(scores[best], 2).tolist())
+        return ActionRecognizerOutput.create(actions=actions, action_scores=action_scores)
@@ -2,14 +2,17 @@
 from __future__ import annotations
 
 import copy
+import json
 import logging
 import os
 import time
 from typing import Optional
 
 import cv2
+from home_vision.common.detections import json_default
 from home_vision.modules.module_base import BaseConfig, Module
 from home_vision.solutions.solution_base import SolutionConfig, SolutionInput
+from home_vision.utils.media import fit_size, open_capture, resize_bgr
 from home_vision.utils.utils import load_solution
 
 from .cam_loader import CamLoader
@@ -24,12 +27,21 @@ class CaptureConfig(BaseConfig):
         stream_fps (int): desired output fps
         stream_w (int): stream width should be larger than frame width
         stream_h (int): stream height should be larger than frame height
+        decode_threads (int): video decoding threads, 0 lets FFmpeg decide
+        skip_non_keyframes (bool): decode the keyframes only, for video files and streams
+        decode_width (int): downscale the frames to this maximum width, e.g. the detector's
+            input width, cameras are asked for it instead of `stream_w`
+        decode_height (int): downscale the frames to this maximum height
     """
     source: str
     threading: Optional[bool] = False
     stream_fps: Optional[int] = 20
     stream_w: Optional[int] = 5000
     stream_h: Optional[int] = 5000
+    decode_threads: Optional[int] = 0
+    skip_non_keyframes: Optional[bool] = False
+    decode_width: Optional[int] = None
+    decode_height: Optional[int] = None
 
 @Module.register('capture')
 class Capture(Module):
@@ -44,16 +56,25 @@ class Capture(Module):
         threading: bool,
         stream_w: int,
         stream_h: int,
-        stream_fps: int
+        stream_fps: int,
+        decode_threads: int = 0,
+        skip_non_keyframes: bool = False,
+        decode_width: Optional[int] = None,
+        decode_height: Optional[int] = None
     ):
         if source.isdigit():
             cap_source = int(source)
         else:
             cap_source = source
 
-        cap = cv2.VideoCapture(cap_source)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, stream_w)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, stream_h)
+        cap = open_capture(
+            cap_source, decode_threads, skip_non_keyframes, decode_width, decode_height
+        )
+        if decode_width is None and decode_height is None:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, stream_w)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, stream_h)
+        self.decode_width = decode_width
+        self.decode_height = decode_height
         if threading:
             self.cap = CamLoader(cap, stream_fps=stream_fps).start()
         else:
@@ -66,7 +87,8 @@ class Capture(Module):
     @classmethod
     def from_config(cls, config: CaptureConfig) -> Capture:
         return cls(config.source, config.threading, config.stream_w, \
-            config.stream_h, config.stream_fps)
+            config.stream_h, config.stream_fps, config.decode_threads, \
+            config.skip_non_keyframes, config.decode_width, config.decode_height)
 
     def _process(self, **kwargs):
         pass
@@ -85,17 +107,19 @@ class Capture(Module):
             solution_name (str): name of HomeVision solution
             solution_config (SolutionConfig): config of HomeVision solution
             display (bool, optional): display processed video. Defaults to True.
-            save_raw (bool, optional): save raw video from source. Defaults to False.
+            save_raw (bool, optional): save raw video from source, at the size the source is
+                read rather than the decode size. Defaults to False.
             save_processed (bool, optional): save processed video. Defaults to False.
         """
         self.solution = load_solution(solution_name, solution_config)
-        stream_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        stream_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        raw_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        raw_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        stream_w, stream_h = fit_size(raw_w, raw_h, self.decode_width, self.decode_height)
         fourcc = cv2.VideoWriter_fourcc(*'XVID')
         timestamp = time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime())
         if save_raw:
             raw_out = cv2.VideoWriter(
-                f'data/videos/{solution_name}_{timestamp}.avi', fourcc, 20.0, (stream_w,stream_h)
+                f'data/videos/{solution_name}_{timestamp}.avi', fourcc, 20.0, (raw_w,raw_h)
             )
         if save_processed:
             if not os.path.exists('results'):
@@ -111,12 +135,13 @@ class Capture(Module):
             with open("sample.txt", "a+", encoding="utf-8") as outfile:
                 frame_s = time.perf_counter()
                 success, frame = self.cap.read()
-                self.frame = copy.deepcopy(frame)
-                if save_raw:
-                    raw_out.write(self.frame)
-
                 if not success:
                     break
+                if save_raw:
+                    raw_out.write(frame)
+                self.frame = resize_bgr(
+                    copy.deepcopy(frame), self.decode_width, self.decode_height
+                )
 
                 key = cv2.waitKey(1)
                 if key == ord('q') or key == ord('Q'):
@@ -124,11 +149,11 @@ class Capture(Module):
                 self.frame_cnt += 1
                 logging.debug('Frame Cnt: %s/%s', self.frame_cnt, total_frame_cnt)
                 process_s = time.perf_counter()
-                res = self.solution.process(SolutionInput(image=self.frame))
+                res = self.solution.process(SolutionInput.create(image=self.frame))
                 process_e = time.perf_counter()
 
                 self.frame = res.image
-                outfile.write(res.json(exclude={'image'})+'\n')
+                outfile.write(json.dumps(res.asdict(exclude={'image'}), default=json_default)+'\n')
                 self.solution.draw_note(self.frame, self.fps, self.frame_cnt)
 
                 if save_processed:
@@ -147,5 +172,6 @@ class Capture(Module):
                     (frame_e - frame_s) * 1000
                 )
 
+        logging.info("Module latency breakdown:\n%s", self.solution.profile_report())
         self.cap.release()
         cv2.destroyAllWindows()
@@ -1,16 +1,36 @@
 """Base class for HomeVision modules"""
 from __future__ import annotations
-import logging
 import time
 
 from abc import abstractmethod
-from typing import Any, Generic, Type, TypeVar
+from contextlib import contextmanager
+from typing import AbstractSet, Any, Dict, Generic, Iterator, Type, TypeVar
 from pydantic import BaseModel #pylint: disable=no-name-in-module
 
 from home_vision.common.configurable import Configurable
+from home_vision.common.detections import Detections
+from home_vision.common.profiling import LatencyHistogram, get_hooks
 from home_vision.common.registrable import Registrable
+from home_vision.common.validation import validation_enabled
 
-class ModuleInput(BaseModel):
+ModelT = TypeVar('ModelT', bound='FrameModel')
+
+class FrameModel(BaseModel):
+    """Base of the per-frame module inputs and outputs"""
+    @classmethod
+    def create(cls: Type[ModelT], **data: Any) -> ModelT:
+        """Build a per-frame instance, validated only when validation is enabled"""
+        if validation_enabled():
+            return cls(**data)
+        return cls.construct(**data)
+
+    def asdict(self, exclude: AbstractSet[str] = frozenset()) -> Dict[str, Any]:
+        """Fields as a dict, a shallow copy of the fields when validation is disabled"""
+        if validation_enabled():
+            return self.dict(exclude=exclude)
+        return {key: value for key, value in self.__dict__.items() if key not in exclude}
+
+class ModuleInput(FrameModel):
     """Base Module Input Types"""
     class Config:
         """Pydantic model config"""
@@ -18,13 +38,14 @@ class ModuleInput(BaseModel):
         extra='forbid'
         arbitrary_types_allowed = True
 
-class ModuleOutput(BaseModel):
+class ModuleOutput(FrameModel):
     """Base Output Types"""
     class Config:
         """Pydantic model config"""
         frozen=True
         extra='forbid'
         arbitrary_types_allowed = True
+        json_encoders = {Detections: Detections.tolist}
 
 InputT = TypeVar('InputT', bound='ModuleInput')
 OutputT = TypeVar('OutputT', bound='ModuleOutput')
@@ -54,18 +75,115 @@ class Module(Configurable, Generic[InputT, OutputT, ConfigT]):
 
     def process(self, inputs: InputT) -> OutputT:
         """HomeVision module's process function"""
+        hooks = get_hooks()
+        for hook in hooks:
+            hook.on_process_start(self, inputs)
         time_s = time.perf_counter()
-        assert isinstance(inputs, self.input_types), \
-            f"{self.module_name}'s input is type {type(input)}; \
-            doesn't match {self.input_types}"
+        validate = validation_enabled()
+        if validate:
+            assert isinstance(inputs, self.input_types), \
+                f"{self.module_name}'s input is type {type(inputs)}; \
+                doesn't match {self.input_types}"
         outputs = self._process(inputs=inputs)
-        assert isinstance(outputs, self.output_types), \
-            f"{self.module_name}'s outputs is type {type(outputs)}; \
-            doesn't match {self.output_types}"
-        time_e = time.perf_counter()
-        logging.debug("%s: %.2f ms", self.module_name, (time_e - time_s) * 1000)
+        if validate:
+            assert isinstance(outputs, self.output_types), \
+                f"{self.module_name}'s outputs is type {type(outputs)}; \
+                doesn't match {self.output_types}"
+        latency = time.perf_counter() - time_s
+        process_latencies = self.latencies['process']
+        if process_latencies.count == 0:
+            self.startup_timings.setdefault('first_frame', latency)
+        process_latencies.record(latency)
+        for hook in hooks:
+            hook.on_process_end(self, inputs, outputs, latency)
         return outputs
 
+    @property
+    def latencies(self) -> Dict[str, LatencyHistogram]:
+        """Latency histograms of the module by phase, `process` covers the whole process call"""
+        latencies = self.__dict__.get('_latencies')
+        if latencies is None:
+            latencies = self.__dict__['_latencies'] = {'process': LatencyHistogram()}
+        return latencies
+
+    @property
+    def startup_timings(self) -> Dict[str, float]:
+        """Seconds spent in the startup phases of the module, e.g. `session` and `warmup` of a
+        model, `load` of a solution and `first_frame`, the latency of the first process call"""
+        timings = self.__dict__.get('_startup_timings')
+        if timings is None:
+            timings = self.__dict__['_startup_timings'] = {}
+        return timings
+
+    def startup_profile(self, prefix: str = '') -> Dict[str, Dict[str, Any]]:
+        """Startup timings of this module and all its submodules, with the time spent
+        importing the module on its first lookup by name
+
+        Args:
+            prefix (str): path of this module inside its parent
+
+        Returns:
+            Dict[str, Dict[str, Any]]: `{path: {'module': name, 'timings_ms': {phase: ms}}}`
+        """
+        path = prefix or self.module_name
+        timings = dict(self.startup_timings)
+        import_time = Registrable.import_times().get(type(self).__module__)
+        if import_time is not None:
+            timings = {'import': import_time, **timings}
+        profile = {
+            path: {
+                'module': self.module_name,
+                'timings_ms': {phase: seconds * 1000 for phase, seconds in timings.items()}
+            }
+        }
+        for name, module in self.submodules().items():
+            profile.update(module.startup_profile(f'{path}.{name}'))
+        return profile
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """Record the latency of a phase inside the module, e.g. `inference` or `nms`"""
+        time_s = time.perf_counter()
+        yield
+        latency = time.perf_counter() - time_s
+        latencies = self.latencies
+        if phase not in latencies:
+            latencies[phase] = LatencyHistogram()
+        latencies[phase].record(latency)
+        for hook in get_hooks():
+            hook.on_phase(self, phase, latency)
+
+    def submodules(self) -> Dict[str, Module]:
+        """Modules used by this module, by attribute name"""
+        return {name: value for name, value in vars(self).items() if isinstance(value, Module)}
+
+    def profile(self, prefix: str = '') -> Dict[str, Dict[str, Any]]:
+        """Latency breakdown of this module and all its submodules
+
+        Args:
+            prefix (str): path of this module inside its parent
+
+        Returns:
+            Dict[str, Dict[str, Any]]: `{path: {'module': name, 'phases': {phase: summary}}}`
+        """
+        path = prefix or self.module_name
+        profile = {
+            path: {
+                'module': self.module_name,
+                'phases': {phase: hist.summary() for phase, hist in list(self.latencies.items())}
+            }
+        }
+        for name, module in self.submodules().items():
+            profile.update(module.profile(f'{path}.{name}'))
+        return profile
+
+    def reset_profile(self):
+        """Clear the latency histograms of this module and all its submodules"""
+        for hist in list(self.latencies.values()):
+            hist.reset()
+        for module in self.submodules().values():
+            module.reset_profile()
+
     @abstractmethod
     def _process(self, inputs: InputT) -> OutputT:
         """HomeVision module's process function"""
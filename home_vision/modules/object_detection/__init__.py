@@ -1,2 +1,7 @@
-"""Import all object detection methods"""
-from .methods.yolov8.yolov8_onnx import YOLOV8
+"""Declare all object detection methods, they are imported on first use"""
+from .object_detector import ObjectDetector, ObjectDetectorConfig
+
+for registrable in (ObjectDetector, ObjectDetectorConfig):
+    registrable.register_lazy(
+        'YOLOV8', 'home_vision.modules.object_detection.methods.yolov8.yolov8_onnx'
+    )
@@ -2,22 +2,23 @@
 # https://github.com/WongKinYiu/yolov7
 from __future__ import annotations
 
-import os
 import time
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 import cv2
 import numpy as np
-import onnxruntime
 
+from home_vision.common.detections import Detections
 from home_vision.modules.module_base import BaseConfig
+from home_vision.modules.onnx_session import load_session, resolve_model_path
 from home_vision.modules.object_detection.methods.yolov8.utils import (
     nms, xywh2xyxy)
 from home_vision.modules.object_detection.object_detector import (
     ObjectDetector, ObjectDetectorConfig, ObjectDetectorInput,
     ObjectDetectorOutput)
 
-ROOT = os.path.dirname(os.path.abspath(__file__))
+if TYPE_CHECKING:
+    import onnxruntime
 
 @ObjectDetectorConfig.register('YOLOV8')
 class YOLOV8Config(BaseConfig):
@@ -27,10 +28,19 @@ class YOLOV8Config(BaseConfig):
         gpu (bool): use gpu or cpu to inference
         conf_threshold (float): confidence threshold of detection
         nms_threshold (float): non maximum supression threshold of detection
+        model_dir (str): directory of the models, defaults to `HOME_VISION_MODEL_DIR` or `models/`
+        warmup_runs (int): dummy inferences run when the model is loaded
+        use_tuning (bool): use the session settings autotuned for this host, if any
+        tuning_dir (str): directory of the tuned settings, defaults to
+            `HOME_VISION_TUNING_DIR` or `tuning/` in the model directory
     """
     gpu: bool
     conf_threshold: Optional[float] = 0.5
     nms_threshold: Optional[float] = 0.5
+    model_dir: Optional[str] = None
+    warmup_runs: Optional[int] = 2
+    use_tuning: Optional[bool] = True
+    tuning_dir: Optional[str] = None
 
 @ObjectDetector.register('YOLOV8')
 class YOLOV8(ObjectDetector):
@@ -60,16 +70,14 @@ class YOLOV8(ObjectDetector):
 
     @classmethod
     def from_config(cls, config: YOLOV8Config) -> YOLOV8:
-        model_path = "/home/yue/job/homevision/models/object_detection/yolov8n.onnx"
-        if config.gpu:
-            session = onnxruntime.InferenceSession(
-                model_path, providers=['CUDAExecutionProvider']
-            )
-        else:
-            session = onnxruntime.InferenceSession(
-                model_path, providers=['CPUExecutionProvider']
-            )
-        return cls(session, config.conf_threshold, config.nms_threshold)
+        model_path = resolve_model_path("object_detection/yolov8n.onnx", config.model_dir)
+        session, timings = load_session(
+            model_path, config.gpu, config.warmup_runs, config.use_tuning, config.tuning_dir,
+            config.model_dir
+        )
+        detector = cls(session, config.conf_threshold, config.nms_threshold)
+        detector.startup_timings.update(timings)
+        return detector
 
 
     def prepare_input(self, image):
@@ -104,7 +112,7 @@ class YOLOV8(ObjectDetector):
         scores = scores[scores > self.conf_threshold]
 
         if len(scores) == 0:
-            return np.array([]), np.array([]), []
+            return Detections.empty(), []
 
         # Get the class with the highest confidence
         class_ids = np.argmax(predictions[:, 4:], axis=1)
@@ -113,11 +121,12 @@ class YOLOV8(ObjectDetector):
         boxes = self.extract_boxes(predictions)
 
         # Apply non-maxima suppression to suppress weak, overlapping bounding boxes
-        indices = nms(boxes, scores, self.iou_threshold)
+        with self.timer('nms'):
+            indices = nms(boxes, scores, self.iou_threshold)
         class_ids = class_ids[indices]
         class_names = [self.classes[class_id] for class_id in class_ids]
 
-        return boxes[indices], scores[indices], class_names
+        return Detections(boxes[indices], scores[indices], class_ids), class_names
 
     def extract_boxes(self, predictions):
         # Extract boxes from predictions
@@ -153,12 +162,15 @@ class YOLOV8(ObjectDetector):
 
     def _process(self, inputs: ObjectDetectorInput) -> ObjectDetectorOutput:
         image = inputs.image
-        input_tensor = self.prepare_input(image)
+        with self.timer('preprocess'):
+            input_tensor = self.prepare_input(image)
 
         # Perform inference on the image
-        outputs = self.inference(input_tensor)
+        with self.timer('inference'):
+            outputs = self.inference(input_tensor)
 
-        self.boxes, self.scores, self.class_names = self.process_output(outputs)
-        output = ObjectDetectorOutput(bbox=self.boxes.tolist(), scores=self.scores.tolist(), class_names=self.class_names)
+        with self.timer('postprocess'):
+            detections, class_names = self.process_output(outputs)
+        output = ObjectDetectorOutput.create(detections=detections, class_names=class_names)
 
         return output
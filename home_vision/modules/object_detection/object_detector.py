@@ -5,6 +5,7 @@ import logging
 from typing import List, Any, Literal, Type
 import numpy as np
 
+from home_vision.common.detections import Detections
 from home_vision.modules.module_base import Module, ModuleConfig, ModuleInput, ModuleOutput
 
 
@@ -19,8 +20,7 @@ class ObjectDetectorInput(ModuleInput):
 
 class ObjectDetectorOutput(ModuleOutput):
     """Object Detector Output"""
-    bbox: List[List[int]]
-    scores: List[float]
+    detections: Detections
     class_names: List[str]
 
 
@@ -0,0 +1,160 @@
+"""Autotune the ONNX Runtime session settings of the detector models on this host
+
+Every setting of a grid of thread counts and execution modes is benchmarked with
+`--concurrency` sessions running at once, like solutions sharing the host. The settings with
+the lowest median latency are persisted for (model, host) and picked up by `from_config`.
+
+    python -m home_vision.modules.onnx_autotune --concurrency 2
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from home_vision.modules.onnx_session import (SessionSettings, create_session,
+                                              resolve_model_path, save_tuned_settings,
+                                              warmup_session)
+
+DEFAULT_MODELS = ('object_detection/yolov8n.onnx', 'person_detection/yolox_tiny.onnx')
+
+
+def settings_grid(cpu_count: Optional[int] = None) -> List[SessionSettings]:
+    """ONNX Runtime's default plus power of two intra-op threads up to the core count, in
+    sequential and parallel execution mode"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    threads = [0]
+    num = 1
+    while num < cpu_count:
+        threads.append(num)
+        num *= 2
+    threads.append(cpu_count)
+    grid = []
+    for intra_op_num_threads in sorted(set(threads)):
+        grid.append(SessionSettings(intra_op_num_threads=intra_op_num_threads))
+        grid.append(SessionSettings(
+            intra_op_num_threads=intra_op_num_threads, execution_mode='parallel'
+        ))
+    return grid
+
+
+def benchmark_settings(
+    model_path: str, gpu: bool, settings: SessionSettings, concurrency: int = 1, runs: int = 20
+) -> Dict[str, float]:
+    """Latency of a model with the settings while `concurrency` sessions run at once
+
+    Args:
+        model_path (str): path to the model file
+        gpu (bool): use gpu or cpu to inference
+        settings (SessionSettings): session settings
+        concurrency (int, optional): sessions running at once. Defaults to 1.
+        runs (int, optional): timed inferences per session. Defaults to 20.
+
+    Returns:
+        Dict[str, float]: median and p95 latency in ms and total inferences per second
+    """
+    sessions = [create_session(model_path, gpu, settings) for _ in range(concurrency)]
+    for session in sessions:
+        warmup_session(session, 2)
+    model_input = sessions[0].get_inputs()[0]
+    blob = np.random.default_rng(0).random(
+        [dim if isinstance(dim, int) else 1 for dim in model_input.shape], dtype=np.float32
+    )
+
+    def run_session(session) -> List[float]:
+        latencies = []
+        for _ in range(runs):
+            time_s = time.perf_counter()
+            session.run(None, {model_input.name: blob})
+            latencies.append((time.perf_counter() - time_s) * 1000)
+        return latencies
+
+    time_s = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(
+            latency for session_latencies in pool.map(run_session, sessions)
+            for latency in session_latencies
+        )
+    elapsed = time.perf_counter() - time_s
+    return {
+        'median_ms': statistics.median(latencies),
+        'p95_ms': latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        'throughput_fps': len(latencies) / elapsed,
+    }
+
+
+def autotune(
+    model_path: str,
+    gpu: bool = False,
+    concurrency: int = 1,
+    runs: int = 20,
+    grid: Optional[List[SessionSettings]] = None
+) -> Tuple[SessionSettings, List[Tuple[SessionSettings, Dict[str, float]]]]:
+    """Benchmark a model across a grid of session settings
+
+    Args:
+        model_path (str): path to the model file
+        gpu (bool, optional): use gpu or cpu to inference. Defaults to False.
+        concurrency (int, optional): sessions running at once. Defaults to 1.
+        runs (int, optional): timed inferences per session. Defaults to 20.
+        grid (Optional[List[SessionSettings]], optional): settings to try.
+            Defaults to `settings_grid()`.
+
+    Returns:
+        Tuple[SessionSettings, List[Tuple[SessionSettings, Dict[str, float]]]]: settings with
+            the lowest median latency and the benchmark of every setting
+    """
+    results = [
+        (settings, benchmark_settings(model_path, gpu, settings, concurrency, runs))
+        for settings in (grid or settings_grid())
+    ]
+    best, _ = min(results, key=lambda result: result[1]['median_ms'])
+    return best, results
+
+
+def main():
+    """Autotune entry point"""
+    parser = argparse.ArgumentParser(description='Home Vision -- ONNX session autotune')
+    parser.add_argument(
+        '--models', nargs='+', default=list(DEFAULT_MODELS),
+        help='models to tune, relative to the model directory'
+    )
+    parser.add_argument('--model_dir', type=str, default=None, help='model directory')
+    parser.add_argument(
+        '--tuning_dir', type=str, default=None,
+        help='tuning directory, set the same `tuning_dir` in the detector configs'
+    )
+    parser.add_argument('--gpu', action='store_true', help='tune the gpu sessions')
+    parser.add_argument(
+        '--concurrency', type=int, default=1, help='solutions expected to share the host'
+    )
+    parser.add_argument('--runs', type=int, default=20, help='timed inferences per session')
+    parser.add_argument('--dry_run', action='store_true', help='do not persist the results')
+    args = parser.parse_args()
+
+    for model in args.models:
+        model_path = resolve_model_path(model, args.model_dir)
+        best, results = autotune(model_path, args.gpu, args.concurrency, args.runs)
+        print(model)
+        print(f"    {'intra':>6}{'mode':>12}{'median ms':>12}{'p95 ms':>10}{'fps':>10}")
+        for settings, stats in results:
+            mark = ' *' if settings == best else ''
+            print(
+                f"    {settings.intra_op_num_threads:>6}{settings.execution_mode:>12}"
+                f"{stats['median_ms']:>12.2f}{stats['p95_ms']:>10.2f}"
+                f"{stats['throughput_fps']:>10.1f}{mark}"
+            )
+        if not args.dry_run:
+            stats = dict(results)[best]
+            path = save_tuned_settings(
+                model_path, best, {**stats, 'concurrency': args.concurrency}, args.tuning_dir,
+                args.model_dir, args.gpu
+            )
+            print(f'    saved to {path}')
+
+
+if __name__ == "__main__":
+    main()
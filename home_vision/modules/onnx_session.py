@@ -0,0 +1,218 @@
+"""ONNX Runtime helpers shared by HomeVision modules"""
+import hashlib
+import json
+import logging
+import os
+import platform
+import time
+from typing import TYPE_CHECKING, Any, Dict, Literal, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel #pylint: disable=no-name-in-module
+
+if TYPE_CHECKING:
+    import onnxruntime
+
+MODEL_DIR_ENV = 'HOME_VISION_MODEL_DIR'
+TUNING_DIR_ENV = 'HOME_VISION_TUNING_DIR'
+DEFAULT_MODEL_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'models')
+)
+
+
+class SessionSettings(BaseModel):
+    """ONNX Runtime session settings, 0 threads lets ONNX Runtime decide
+
+    Attributes:
+        intra_op_num_threads (int): threads used inside an operator
+        inter_op_num_threads (int): threads used across operators in parallel execution mode
+        execution_mode (str): `sequential` or `parallel` execution of the graph's operators
+    """
+    intra_op_num_threads: int = 0
+    inter_op_num_threads: int = 0
+    execution_mode: Literal['sequential', 'parallel'] = 'sequential'
+
+    class Config:
+        """Pydantic model config"""
+        frozen=True
+        extra='forbid'
+
+
+def get_model_dir(model_dir: Optional[str] = None) -> str:
+    """Directory of the models: `model_dir` if given, else the `HOME_VISION_MODEL_DIR`
+    environment variable, else `models/` at the root of the repo"""
+    return model_dir or os.environ.get(MODEL_DIR_ENV) or DEFAULT_MODEL_DIR
+
+
+def resolve_model_path(relative_path: str, model_dir: Optional[str] = None) -> str:
+    """Path of a model inside the model directory
+
+    Args:
+        relative_path (str): path of the model relative to the model directory,
+            e.g. `person_detection/yolox_tiny.onnx`
+        model_dir (Optional[str], optional): model directory. Defaults to `get_model_dir()`.
+
+    Returns:
+        str: path to the model file
+    """
+    return os.path.join(get_model_dir(model_dir), relative_path)
+
+
+def create_session(
+    model_path: str, gpu: bool, settings: Optional[SessionSettings] = None
+) -> 'onnxruntime.InferenceSession':
+    """Create an ONNX Runtime session on gpu or cpu, onnxruntime is imported here so that
+    the configs of the detectors can be loaded without it"""
+    import onnxruntime #pylint: disable=import-outside-toplevel
+    providers = ['CUDAExecutionProvider'] if gpu else ['CPUExecutionProvider']
+    settings = settings or SessionSettings()
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = settings.intra_op_num_threads
+    options.inter_op_num_threads = settings.inter_op_num_threads
+    options.execution_mode = (
+        onnxruntime.ExecutionMode.ORT_PARALLEL if settings.execution_mode == 'parallel'
+        else onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    )
+    return onnxruntime.InferenceSession(model_path, sess_options=options, providers=providers)
+
+
+def get_tuning_dir(tuning_dir: Optional[str] = None, model_dir: Optional[str] = None) -> str:
+    """Directory of the tuned session settings: `tuning_dir` if given, else the
+    `HOME_VISION_TUNING_DIR` environment variable, else `tuning/` in the model directory"""
+    return tuning_dir or os.environ.get(TUNING_DIR_ENV) or os.path.join(
+        get_model_dir(model_dir), 'tuning'
+    )
+
+
+def get_tuning_path(
+    tuning_dir: Optional[str] = None, host: Optional[str] = None, model_dir: Optional[str] = None
+) -> str:
+    """File of the tuned session settings of a host: `<tuning_dir>/<host>.json`, see
+    `get_tuning_dir` for the tuning directory"""
+    return os.path.join(
+        get_tuning_dir(tuning_dir, model_dir), f'{host or platform.node() or "localhost"}.json'
+    )
+
+
+def model_digest(model_path: str) -> str:
+    """sha1 of a model file, tuned settings are dropped when the model changes"""
+    digest = hashlib.sha1()
+    with open(model_path, 'rb') as model_file:
+        for chunk in iter(lambda: model_file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tuning_key(model_path: str, gpu: bool) -> str:
+    """Key of the tuned profile of a model on gpu or cpu, e.g. `yolox_tiny.onnx[cpu]`: the
+    best settings of a CUDA session are not those of a cpu one"""
+    return f"{os.path.basename(model_path)}[{'gpu' if gpu else 'cpu'}]"
+
+
+def load_tuning(
+    tuning_dir: Optional[str] = None, host: Optional[str] = None, model_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """Tuned profiles of a host by `tuning_key`, empty if it was never tuned"""
+    path = get_tuning_path(tuning_dir, host, model_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as tuning_file:
+        return json.load(tuning_file)
+
+
+def save_tuned_settings(
+    model_path: str,
+    settings: SessionSettings,
+    stats: Dict[str, Any],
+    tuning_dir: Optional[str] = None,
+    model_dir: Optional[str] = None,
+    gpu: bool = False
+) -> str:
+    """Persist the best session settings of a model on this host, on gpu or cpu
+
+    Args:
+        model_path (str): path to the model file
+        settings (SessionSettings): best settings
+        stats (Dict[str, Any]): benchmark of the settings, e.g. median latency and concurrency
+        tuning_dir (Optional[str], optional): tuning directory. Defaults to `get_tuning_dir()`.
+        model_dir (Optional[str], optional): model directory whose `tuning/` is the default
+            tuning directory. Defaults to `get_model_dir()`.
+        gpu (bool, optional): the settings were tuned on gpu. Defaults to False.
+
+    Returns:
+        str: path of the tuning file
+    """
+    path = get_tuning_path(tuning_dir, model_dir=model_dir)
+    tuning = load_tuning(tuning_dir, model_dir=model_dir)
+    tuning[tuning_key(model_path, gpu)] = {
+        'settings': settings.dict(),
+        'model_sha1': model_digest(model_path),
+        'tuned_at': time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime()),
+        **stats,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as tuning_file:
+        json.dump(tuning, tuning_file, indent=2)
+    return path
+
+
+def load_tuned_settings(
+    model_path: str,
+    tuning_dir: Optional[str] = None,
+    model_dir: Optional[str] = None,
+    gpu: bool = False
+) -> Optional[SessionSettings]:
+    """Tuned session settings of a model on this host on gpu or cpu, None if it was not tuned
+    there since the model last changed"""
+    profile = load_tuning(tuning_dir, model_dir=model_dir).get(tuning_key(model_path, gpu))
+    if profile is None or profile.get('model_sha1') != model_digest(model_path):
+        return None
+    return SessionSettings(**profile['settings'])
+
+
+def warmup_session(session: 'onnxruntime.InferenceSession', runs: int):
+    """Run dummy inferences at the model's input shape so that ONNX Runtime allocates its
+    arenas and picks its kernels before the first real frame"""
+    inputs = {
+        model_input.name: np.zeros(
+            [dim if isinstance(dim, int) else 1 for dim in model_input.shape], dtype=np.float32
+        )
+        for model_input in session.get_inputs()
+    }
+    for _ in range(runs):
+        session.run(None, inputs)
+
+
+def load_session(
+    model_path: str,
+    gpu: bool,
+    warmup_runs: int,
+    use_tuning: bool = True,
+    tuning_dir: Optional[str] = None,
+    model_dir: Optional[str] = None
+) -> Tuple['onnxruntime.InferenceSession', Dict[str, float]]:
+    """Create and warm up an ONNX Runtime session
+
+    Args:
+        model_path (str): path to the model file
+        gpu (bool): use gpu or cpu to inference
+        warmup_runs (int): number of dummy inferences
+        use_tuning (bool, optional): use the settings tuned for this host by
+            `python -m home_vision.modules.onnx_autotune`, if any. Defaults to True.
+        tuning_dir (Optional[str], optional): tuning directory. Defaults to `get_tuning_dir()`.
+        model_dir (Optional[str], optional): model directory whose `tuning/` is the default
+            tuning directory. Defaults to `get_model_dir()`.
+
+    Returns:
+        Tuple[onnxruntime.InferenceSession, Dict[str, float]]: session and seconds spent
+            creating it (`session`) and warming it up (`warmup`)
+    """
+    time_s = time.perf_counter()
+    settings = load_tuned_settings(model_path, tuning_dir, model_dir, gpu) if use_tuning \
+        else None
+    if settings is not None:
+        logging.info('%s uses tuned session settings: %s', os.path.basename(model_path), settings)
+    session = create_session(model_path, gpu, settings)
+    session_e = time.perf_counter()
+    warmup_session(session, warmup_runs)
+    return session, {'session': session_e - time_s, 'warmup': time.perf_counter() - session_e}
@@ -1,2 +1,5 @@
-"""Import all person detection methods"""
-from .methods.yolox.yolox import YOLOX
+"""Declare all person detection methods, they are imported on first use"""
+from .person_detector import PersonDetector, PersonDetectorConfig
+
+for registrable in (PersonDetector, PersonDetectorConfig):
+    registrable.register_lazy('YOLOX', 'home_vision.modules.person_detection.methods.yolox.yolox')
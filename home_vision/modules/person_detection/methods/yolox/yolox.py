@@ -2,21 +2,20 @@
 # https://github.com/ifzhang/ByteTrack
 from __future__ import annotations
 
-import logging
-import os
-import time
-from typing import Literal, Optional
+from typing import TYPE_CHECKING, Optional
 
 import cv2
 import numpy as np
-import onnxruntime
+from home_vision.common.detections import Detections
 from home_vision.modules.module_base import BaseConfig
+from home_vision.modules.onnx_session import load_session, resolve_model_path
 from home_vision.modules.person_detection.methods.yolox.utils import (
     demo_postprocess, multiclass_nms)
 from home_vision.modules.person_detection.person_detector import (
     PersonDetector, PersonDetectorConfig, PersonDetectorInput, PersonDetectorOutput)
 
-ROOT = os.path.dirname(os.path.abspath(__file__))
+if TYPE_CHECKING:
+    import onnxruntime
 
 @PersonDetectorConfig.register('YOLOX')
 class YOLOXConfig(BaseConfig):
@@ -27,11 +26,20 @@ class YOLOXConfig(BaseConfig):
         model_type (str): type of model will be used
         conf_threshold (float): confidence threshold for detection
         nms_threshold (float): non-maximum supression threshold for detection
+        model_dir (str): directory of the models, defaults to `HOME_VISION_MODEL_DIR` or `models/`
+        warmup_runs (int): dummy inferences run when the model is loaded
+        use_tuning (bool): use the session settings autotuned for this host, if any
+        tuning_dir (str): directory of the tuned settings, defaults to
+            `HOME_VISION_TUNING_DIR` or `tuning/` in the model directory
     """
     gpu: bool
     model_type: Optional[str] = 'tiny'
     conf_threshold: Optional[float] = 0.5
     nms_threshold: Optional[float] = 0.5
+    model_dir: Optional[str] = None
+    warmup_runs: Optional[int] = 2
+    use_tuning: Optional[bool] = True
+    tuning_dir: Optional[str] = None
 
 @PersonDetector.register('YOLOX')
 class YOLOX(PersonDetector):
@@ -58,47 +66,48 @@ class YOLOX(PersonDetector):
 
     @classmethod
     def from_config(cls, config: YOLOXConfig) -> YOLOX:
-        model_path = ROOT + ("/../../../../../models/"
-        f"person_detection/yolox_{config.model_type}.onnx")
-        if config.gpu:
-            session = onnxruntime.InferenceSession(model_path, providers=['CUDAExecutionProvider'])
-        else:
-            session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
-        return cls(session, config.model_type, config.conf_threshold, config.nms_threshold)
+        model_path = resolve_model_path(
+            f"person_detection/yolox_{config.model_type}.onnx", config.model_dir
+        )
+        session, timings = load_session(
+            model_path, config.gpu, config.warmup_runs, config.use_tuning, config.tuning_dir,
+            config.model_dir
+        )
+        detector = cls(session, config.model_type, config.conf_threshold, config.nms_threshold)
+        detector.startup_timings.update(timings)
+        return detector
 
     def _process(self, inputs: PersonDetectorInput) -> PersonDetectorOutput:
         image = inputs.image
-        blob = cv2.dnn.blobFromImage( #pylint: disable=no-member
-            image, (1.0 / 255)/0.225, (self.input_shape[1], self.input_shape[0]),
-            self.rgb_means, swapRB=True
-        )
+        with self.timer('preprocess'):
+            blob = cv2.dnn.blobFromImage( #pylint: disable=no-member
+                image, (1.0 / 255)/0.225, (self.input_shape[1], self.input_shape[0]),
+                self.rgb_means, swapRB=True
+            )
         ratio_w = self.input_shape[1] / image.shape[1]
         ratio_h = self.input_shape[0] / image.shape[0]
         ort_inputs = {self.session.get_inputs()[0].name: blob}
-        time_s = time.perf_counter()
-        output = self.session.run(None, ort_inputs)
-        time_e = time.perf_counter()
-        logging.debug("-yolox forward time: %s", time_e - time_s)
-        predictions = demo_postprocess(output[0], self.input_shape, p6=False)[0]
-        boxes = predictions[:, :4]
-        scores = predictions[:, 4:5] * predictions[:, 5:]
+        with self.timer('inference'):
+            output = self.session.run(None, ort_inputs)
+        with self.timer('postprocess'):
+            predictions = demo_postprocess(output[0], self.input_shape, p6=False)[0]
+            boxes = predictions[:, :4]
+            scores = predictions[:, 4:5] * predictions[:, 5:]
 
-        boxes_xyxy = np.ones_like(boxes)
-        boxes_xyxy[:, 0] = (boxes[:, 0] - boxes[:, 2]/2.) / ratio_w
-        boxes_xyxy[:, 1] = (boxes[:, 1] - boxes[:, 3]/2.) / ratio_h
-        boxes_xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2]/2.) / ratio_w
-        boxes_xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3]/2.) / ratio_h
-        dets = multiclass_nms(
-            boxes_xyxy, scores, nms_thr=self.nms_threshold, score_thr=self.conf_threshold
-        )
+            boxes_xyxy = np.ones_like(boxes)
+            boxes_xyxy[:, 0] = (boxes[:, 0] - boxes[:, 2]/2.) / ratio_w
+            boxes_xyxy[:, 1] = (boxes[:, 1] - boxes[:, 3]/2.) / ratio_h
+            boxes_xyxy[:, 2] = (boxes[:, 0] + boxes[:, 2]/2.) / ratio_w
+            boxes_xyxy[:, 3] = (boxes[:, 1] + boxes[:, 3]/2.) / ratio_h
+        with self.timer('nms'):
+            dets = multiclass_nms(
+                boxes_xyxy, scores, nms_thr=self.nms_threshold, score_thr=self.conf_threshold
+            )
 
         if dets is not None:
-            dets = dets[:, :-1]
-            scores = dets[:, 4].tolist()
-            bboxes = dets[:, :4].astype(int).tolist()
+            detections = Detections(dets[:, :4], dets[:, 4], dets[:, 5])
         else:
-            scores = []
-            bboxes = []
+            detections = Detections.empty()
 
-        detector_output = PersonDetectorOutput(bbox=bboxes, scores=scores)
+        detector_output = PersonDetectorOutput.create(detections=detections)
         return detector_output
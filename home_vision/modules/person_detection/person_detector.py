@@ -2,9 +2,10 @@
 from __future__ import annotations
 
 import logging
-from typing import List, Any, Literal, Type
+from typing import Any, Literal, Type
 import numpy as np
 
+from home_vision.common.detections import Detections
 from home_vision.modules.module_base import Module, ModuleConfig, ModuleInput, ModuleOutput
 
 
@@ -19,8 +20,7 @@ class PersonDetectorInput(ModuleInput):
 
 class PersonDetectorOutput(ModuleOutput):
     """Person Detector Output"""
-    bbox: List[List[int]]
-    scores: List[float]
+    detections: Detections
 
 
 @Module.register('person_detector')
@@ -0,0 +1,380 @@
+"""Event recorder: the encoded packets of the source are kept in memory for the last seconds,
+and a clip with pre and post roll is written only when an event fires, stream copied to
+fragmented MP4 rather than encoding and writing every frame to disk. The packets are tapped
+from the player that decodes the source for the solution, or read by the recorder itself"""
+from __future__ import annotations
+
+import collections
+import logging
+import os
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, NamedTuple, Optional, Type
+
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import BaseConfig, Module, ModuleInput, ModuleOutput
+from home_vision.utils.media import tap_player
+
+if TYPE_CHECKING:
+    import av
+    from aiortc.contrib.media import MediaPlayer
+
+# fragments written at every keyframe with the index up front: a clip cut short by a crash
+# or a power loss stays playable up to its last fragment
+MP4_OPTIONS = {'movflags': 'frag_keyframe+empty_moov+default_base_moof'}
+
+
+class BufferedPacket(NamedTuple):
+    """Encoded packet copied out of the demuxer, with its arrival time"""
+    time: float
+    data: bytes
+    pts: Optional[int]
+    dts: Optional[int]
+    keyframe: bool
+
+
+class PacketRingBuffer:
+    """Encoded packets of the last `seconds`, by group of pictures so that the buffer always
+    starts at a keyframe and a clip can be decoded from its first packet
+
+    Args:
+        seconds (float): seconds of packets to keep, up to one more group of pictures is kept
+    """
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.gops: Deque[List[BufferedPacket]] = collections.deque()
+        self.size = 0
+
+    def push(self, packet: BufferedPacket):
+        """Add a packet, packets before the first keyframe can't be decoded and are dropped"""
+        if packet.keyframe:
+            self.gops.append([])
+        elif not self.gops:
+            return
+        self.gops[-1].append(packet)
+        self.size += len(packet.data)
+        # drop the oldest group once the next one alone covers the window
+        while len(self.gops) > 1 and self.gops[1][0].time <= packet.time - self.seconds:
+            self.size -= sum(len(old.data) for old in self.gops.popleft())
+
+    def packets(self) -> List[BufferedPacket]:
+        """Buffered packets, oldest first"""
+        return [packet for gop in self.gops for packet in gop]
+
+    def duration(self) -> float:
+        """Seconds between the oldest and newest packets"""
+        if not self.gops:
+            return 0.0
+        return self.gops[-1][-1].time - self.gops[0][0].time
+
+
+class EventRecorderConfig(BaseConfig):
+    """Config for Event Recorder
+
+    Attributes:
+        source (str): video file or stream url whose packets are recorded
+        output_dir (str): directory of the clips
+        pre_roll (float): seconds recorded before an event
+        post_roll (float): seconds recorded after the last event of a clip
+        min_score (float): minimum score of the detections that fire an event
+        min_detections (int): detections above `min_score` that fire an event
+        loop (bool): repeat a video file, like the player of the RTC server
+        timeout (float): seconds to wait for the source to open and to send packets, when the
+            recorder reads the source itself
+    """
+    source: str
+    output_dir: Optional[str] = 'data/events'
+    pre_roll: Optional[float] = 5.0
+    post_roll: Optional[float] = 5.0
+    min_score: Optional[float] = 0.0
+    min_detections: Optional[int] = 1
+    loop: Optional[bool] = False
+    timeout: Optional[float] = 10.0
+
+class EventRecorderInput(ModuleInput):
+    """Event Recorder Input"""
+    detections: Detections
+
+class EventRecorderOutput(ModuleOutput):
+    """Event Recorder Output"""
+    recording: bool
+
+
+@Module.register('event_recorder')
+class EventRecorder(Module[EventRecorderInput, EventRecorderOutput, EventRecorderConfig]):
+    """Record clips of the source around the events: the packets the player of the source
+    demuxes, or those of a reader thread when there is no player, go to a ring buffer of
+    encoded packets, an event copies the buffer and the packets of the following `post_roll`
+    seconds to a writer thread, which muxes them without re-encoding"""
+    input_types: Type[EventRecorderInput] = EventRecorderInput
+    output_types: Type[EventRecorderOutput] = EventRecorderOutput
+    config_type: Type[EventRecorderConfig] = EventRecorderConfig
+    module_name = 'Event Recorder'
+
+    def __init__(
+        self,
+        source: str,
+        output_dir: str = 'data/events',
+        pre_roll: float = 5.0,
+        post_roll: float = 5.0,
+        min_score: float = 0.0,
+        min_detections: int = 1,
+        loop: bool = False,
+        timeout: float = 10.0
+    ):
+        self.source = source
+        self.output_dir = output_dir
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.min_score = min_score
+        self.min_detections = min_detections
+        self.loop = loop
+        self.timeout = timeout
+        # a video file is timed by its timestamps, a stream by the arrival of its packets
+        self.realtime = os.path.isfile(source)
+        self.buffer = PacketRingBuffer(pre_roll)
+        self.lock = threading.Lock()
+        self.writes: queue.Queue = queue.Queue()
+        self.stream = None
+        self.time_base = None
+        self.clock: Optional[float] = None
+        self.offset = 0
+        self.last_pts = 0
+        self.last_dts: Optional[int] = None
+        self.clip: Optional[str] = None
+        self.clip_end = 0.0
+        self.clips: List[str] = []
+        self.stopped = threading.Event()
+        self.reader = None
+        self.writer = None
+
+    @classmethod
+    def from_config(cls, config: EventRecorderConfig) -> EventRecorder:
+        logging.info('loading Event Recorder from config: %s', config)
+        return cls(
+            config.source, config.output_dir, config.pre_roll, config.post_roll,
+            config.min_score, config.min_detections, config.loop, config.timeout
+        )
+
+    def start(self) -> EventRecorder:
+        """Start reading the source and writing the clips in background, when no player
+        decodes the source
+
+        Raises:
+            av.FFmpegError: the source can't be opened within `timeout`
+        """
+        import av #pylint: disable=import-outside-toplevel
+        container = av.open(self.source, timeout=self.timeout)
+        self.use_stream(container.streams.video[0])
+        self.reader = threading.Thread(target=self._read, args=(container,), daemon=True)
+        self.reader.start()
+        self.start_writer()
+        logging.info('Event recorder buffering %.1f s of %s', self.pre_roll, self.source)
+        return self
+
+    def attach(self, player: MediaPlayer) -> EventRecorder:
+        """Buffer the packets the player demuxes, the source is read once and the clips follow
+        the player. A new player of the source replaces the previous one and its buffer.
+
+        Args:
+            player (MediaPlayer): player of the source, not started yet
+
+        Raises:
+            RuntimeError: the packets of the player can't be tapped
+        """
+        self.finish()
+        tap = tap_player(player, self._tapped)
+        with self.lock:
+            self.buffer = PacketRingBuffer(self.pre_roll)
+            self.use_stream(tap.stream)
+        self.start_writer()
+        logging.info(
+            'Event recorder buffering %.1f s of the player of %s', self.pre_roll, self.source
+        )
+        return self
+
+    def use_stream(self, stream: av.video.stream.VideoStream):
+        """Record the packets of a new video stream, timed from its first packet"""
+        self.stream = stream
+        self.time_base = stream.time_base
+        self.clock = None
+        self.offset = 0
+        self.last_pts = 0
+        self.last_dts = None
+
+    def start_writer(self):
+        """Start the writer thread of the clips, once"""
+        self.stopped.clear()
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._write, daemon=True)
+            self.writer.start()
+
+    def _read(self, container: av.container.InputContainer):
+        """Demux the source into the ring buffer, pacing a video file to its frame rate"""
+        try:
+            while not self.stopped.is_set():
+                for packet in container.demux(self.stream):
+                    if self.stopped.is_set():
+                        return
+                    if packet.size != 0:
+                        self.demuxed(packet, pace=True)
+                if not self.loop:
+                    return
+                container.seek(0)
+        except Exception: #pylint: disable=broad-except
+            logging.exception('Event recorder failed to read %s', self.source)
+        finally:
+            container.close()
+            self.finish()
+
+    def _tapped(self, packet: av.Packet):
+        """Buffer a packet of the player, from the player's worker thread"""
+        if self.stopped.is_set():
+            return
+        try:
+            self.demuxed(packet)
+        except Exception: #pylint: disable=broad-except
+            logging.exception('Event recorder failed to buffer a packet of %s', self.source)
+
+    def demuxed(self, packet: av.Packet, pace: bool = False):
+        """Buffer a demuxed packet, the timestamps of a looped file are shifted past its
+        previous pass
+
+        Args:
+            packet (av.Packet): packet of the recorded stream
+            pace (bool, optional): wait for the time of a video file's packet. Defaults to False.
+        """
+        if packet.dts is not None:
+            if self.last_dts is not None and packet.dts < self.last_dts:
+                self.offset = self.last_pts
+            self.last_dts = packet.dts
+        pts = None if packet.pts is None else packet.pts + self.offset
+        dts = None if packet.dts is None else packet.dts + self.offset
+        arrival = time.monotonic()
+        if pts is not None:
+            self.last_pts = max(self.last_pts, pts + (packet.duration or 0))
+            if self.realtime:
+                seconds = float(pts * self.time_base)
+                if self.clock is None:
+                    self.clock = arrival - seconds
+                arrival = self.clock + seconds
+                delay = arrival - time.monotonic()
+                if pace and delay > 0:
+                    time.sleep(delay)
+        self.push(BufferedPacket(arrival, bytes(packet), pts, dts, packet.is_keyframe))
+
+    def push(self, packet: BufferedPacket):
+        """Buffer a packet and add it to the clip being recorded"""
+        with self.lock:
+            self.buffer.push(packet)
+            if self.clip is None:
+                return
+            if packet.time > self.clip_end:
+                self.writes.put((self.clip, None))
+                self.clip = None
+                return
+            self.writes.put((self.clip, packet))
+
+    def trigger(self, reason: str = 'event') -> str:
+        """Fire an event: start a clip with the buffered packets, or extend the post roll of
+        the clip being recorded
+
+        Args:
+            reason (str, optional): prefix of the clip's file name. Defaults to 'event'.
+
+        Returns:
+            str: path of the clip
+        """
+        with self.lock:
+            self.clip_end = time.monotonic() + self.post_roll
+            if self.clip is None:
+                timestamp = time.strftime("%Y-%m-%d-%H-%M-%S", time.localtime())
+                self.clip = os.path.join(self.output_dir, f'{reason}_{timestamp}.mp4')
+                logging.info('Event recorder started %s', self.clip)
+                for packet in self.buffer.packets():
+                    self.writes.put((self.clip, packet))
+            return self.clip
+
+    def finish(self):
+        """Close the clip being recorded, whatever its post roll"""
+        with self.lock:
+            if self.clip is not None:
+                self.writes.put((self.clip, None))
+                self.clip = None
+
+    def _write(self):
+        """Mux the packets of the clips to fragmented MP4, copying the source stream"""
+        import av #pylint: disable=import-outside-toplevel
+        outputs: Dict[str, Any] = {}
+        while True:
+            path, packet = self.writes.get()
+            if path is None:
+                break
+            try:
+                if packet is None:
+                    if path in outputs:
+                        outputs.pop(path)[0].close()
+                        self.clips.append(path)
+                        logging.info('Event recorder saved %s', path)
+                    continue
+                if path not in outputs:
+                    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                    output = av.open(path, 'w', format='mp4', options=MP4_OPTIONS)
+                    if hasattr(output, 'add_stream_from_template'):
+                        out_stream = output.add_stream_from_template(self.stream)
+                    else:
+                        out_stream = output.add_stream(template=self.stream)
+                    # the clip starts at 0
+                    base = packet.dts if packet.dts is not None else packet.pts or 0
+                    outputs[path] = (output, out_stream, base)
+                output, out_stream, base = outputs[path]
+                av_packet = av.Packet(packet.data)
+                av_packet.pts = None if packet.pts is None else packet.pts - base
+                av_packet.dts = None if packet.dts is None else packet.dts - base
+                av_packet.time_base = self.time_base
+                av_packet.is_keyframe = packet.keyframe
+                av_packet.stream = out_stream
+                output.mux(av_packet)
+            except Exception: #pylint: disable=broad-except
+                logging.exception('Event recorder failed to write %s', path)
+        for output, _, _ in outputs.values():
+            output.close()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop reading the source and wait for the clips to be written
+
+        Args:
+            timeout (Optional[float], optional): seconds to wait for each of the reader and
+                writer threads. Defaults to None, no limit.
+        """
+        self.stopped.set()
+        if self.reader is not None:
+            self.reader.join(timeout)
+        self.finish()
+        if self.writer is not None:
+            self.writes.put((None, None))
+            self.writer.join(timeout)
+        for thread in (self.reader, self.writer):
+            if thread is not None and thread.is_alive():
+                logging.warning('Event recorder thread %s still running', thread.name)
+        self.reader = None
+        self.writer = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffered seconds and bytes, the clip being recorded and the saved clips"""
+        with self.lock:
+            return {
+                'buffered_seconds': self.buffer.duration(),
+                'buffered_bytes': self.buffer.size,
+                'recording': self.clip,
+                'clips': list(self.clips),
+            }
+
+    def _process(self, inputs: EventRecorderInput) -> EventRecorderOutput:
+        """Fire an event when enough detections are above the minimum score"""
+        detections = inputs.detections
+        if (detections.scores >= self.min_score).sum() >= self.min_detections:
+            self.trigger('detection')
+        return EventRecorderOutput.create(recording=self.clip is not None)
+
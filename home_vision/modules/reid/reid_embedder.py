@@ -0,0 +1,163 @@
+"""Appearance embeddings of the tracked people for re-identification. The embedding of a track
+is cached and only computed again when its box changed significantly or the cache is stale,
+the tracks due are embedded in one batched inference: the cost follows the arrival of new
+tracks and their movements rather than the frame rate"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Type
+
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.common.gallery import normalize
+from home_vision.modules.module_base import BaseConfig, Module, ModuleInput, ModuleOutput
+from home_vision.modules.onnx_session import load_session, resolve_model_path
+from home_vision.utils.boxes import paired_iou
+from home_vision.utils.crops import RoiCropper
+
+if TYPE_CHECKING:
+    import onnxruntime
+
+
+class ReIDEmbedderConfig(BaseConfig):
+    """Config for ReID Embedder
+
+    Attributes:
+        gpu (bool): use gpu or cpu to inference
+        model_type (str): type of model will be used
+        model_dir (str): directory of the models, defaults to `HOME_VISION_MODEL_DIR` or `models/`
+        warmup_runs (int): dummy inferences run when the model is loaded
+        use_tuning (bool): use the session settings autotuned for this host, if any
+        tuning_dir (str): directory of the tuned settings, defaults to
+            `HOME_VISION_TUNING_DIR` or `tuning/` in the model directory
+        input_size (Tuple[int, int]): height and width of the person patches
+        min_iou (float): IoU of a track's box with its box when last embedded below which the
+            track is embedded again
+        max_staleness (int): frames after which the embedding of a track is computed again
+        max_age (int): frames the embedding of a track not seen is kept
+    """
+    gpu: Optional[bool] = True
+    model_type: Optional[str] = 'tiny'
+    model_dir: Optional[str] = None
+    warmup_runs: Optional[int] = 2
+    use_tuning: Optional[bool] = True
+    tuning_dir: Optional[str] = None
+    input_size: Optional[Tuple[int, int]] = (256, 128)
+    min_iou: Optional[float] = 0.7
+    max_staleness: Optional[int] = 150
+    max_age: Optional[int] = 30
+
+class ReIDEmbedderInput(ModuleInput):
+    """ReID Embedder Input"""
+    image: np.ndarray
+    tracks: Detections
+    track_ids: np.ndarray
+
+class ReIDEmbedderOutput(ModuleOutput):
+    """ReID Embedder Output, the L2 normalized embeddings of the tracks and whether they were
+    computed on this frame"""
+    embeddings: np.ndarray
+    updated: np.ndarray
+
+
+@Module.register('reid_embedder')
+class ReIDEmbedder(Module[ReIDEmbedderInput, ReIDEmbedderOutput, ReIDEmbedderConfig]):
+    """Embed the appearance of the tracked people, with a cache of the embeddings per track"""
+    input_types: Type[ReIDEmbedderInput] = ReIDEmbedderInput
+    output_types: Type[ReIDEmbedderOutput] = ReIDEmbedderOutput
+    config_type: Type[ReIDEmbedderConfig] = ReIDEmbedderConfig
+    module_name = 'ReID Embedder'
+
+    def __init__(
+        self,
+        session: onnxruntime.InferenceSession,
+        input_size: Tuple[int, int] = (256, 128),
+        min_iou: float = 0.7,
+        max_staleness: int = 150,
+        max_age: int = 30
+    ):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.cropper = RoiCropper(input_size)
+        self.min_iou = min_iou
+        self.max_staleness = max_staleness
+        self.max_age = max_age
+        self.embedding_size = session.get_outputs()[0].shape[1]
+        # cache, one row per track
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.embeddings = np.empty((0, self.embedding_size), dtype=np.float32)
+        self.embedded_at = np.empty(0, dtype=np.int64)
+        self.last_seen = np.empty(0, dtype=np.int64)
+        self.rows: Dict[int, int] = {}
+        self.embedded = 0
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: ReIDEmbedderConfig) -> ReIDEmbedder:
+        logging.info('loading ReID Embedder from config: %s', config)
+        model_path = resolve_model_path(f"reid/reid_{config.model_type}.onnx", config.model_dir)
+        session, timings = load_session(
+            model_path, config.gpu, config.warmup_runs, config.use_tuning, config.tuning_dir,
+            config.model_dir
+        )
+        embedder = cls(
+            session, config.input_size, config.min_iou, config.max_staleness, config.max_age
+        )
+        embedder.startup_timings.update(timings)
+        return embedder
+
+    def embed(self, image: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+        """L2 normalized embeddings of the people in boxes, in one batched inference"""
+        with self.timer('preprocess'):
+            crops = self.cropper(image, boxes)
+        with self.timer('inference'):
+            embeddings = self.session.run(None, {self.input_name: crops.patches})[0]
+        self.embedded += len(boxes)
+        return normalize(embeddings)
+
+    def _drop(self, keep: np.ndarray):
+        """Keep the cached tracks of a boolean mask"""
+        self.track_ids = self.track_ids[keep]
+        self.boxes = self.boxes[keep]
+        self.embeddings = self.embeddings[keep]
+        self.embedded_at = self.embedded_at[keep]
+        self.last_seen = self.last_seen[keep]
+        self.rows = {track_id: row for row, track_id in enumerate(self.track_ids.tolist())}
+
+    def _process(self, inputs: ReIDEmbedderInput) -> ReIDEmbedderOutput:
+        """Embeddings of the tracks, computed again for the new, moved and stale ones"""
+        self.cnt += 1
+        boxes = inputs.tracks.xyxy
+        track_ids = np.asarray(inputs.track_ids, dtype=np.int64)
+        rows = np.array(
+            [self.rows.get(track_id, -1) for track_id in track_ids.tolist()], dtype=np.int64
+        )
+        known = rows >= 0
+        due = ~known
+        due[known] = (
+            (paired_iou(boxes[known], self.boxes[rows[known]]) < self.min_iou)
+            | (self.cnt - self.embedded_at[rows[known]] >= self.max_staleness)
+        )
+        if due.any():
+            embeddings = self.embed(inputs.image, boxes[due])
+            refreshed = due & known
+            self.embeddings[rows[refreshed]] = embeddings[known[due]]
+            self.boxes[rows[refreshed]] = boxes[refreshed]
+            self.embedded_at[rows[refreshed]] = self.cnt
+            new = ~known
+            rows[new] = np.arange(len(self.track_ids), len(self.track_ids) + new.sum())
+            self.track_ids = np.concatenate([self.track_ids, track_ids[new]])
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.embeddings = np.concatenate([self.embeddings, embeddings[~known[due]]])
+            self.embedded_at = np.concatenate(
+                [self.embedded_at, np.full(new.sum(), self.cnt, dtype=np.int64)]
+            )
+            self.last_seen = np.concatenate([self.last_seen, np.zeros(new.sum(), dtype=np.int64)])
+            self.rows.update(zip(track_ids[new].tolist(), rows[new].tolist()))
+        self.last_seen[rows] = self.cnt
+        outputs = ReIDEmbedderOutput.create(embeddings=self.embeddings[rows], updated=due)
+        stale = self.cnt - self.last_seen > self.max_age
+        if stale.any():
+            self._drop(~stale)
+        return outputs
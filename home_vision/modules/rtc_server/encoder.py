@@ -0,0 +1,161 @@
+"""H264 encoder of the restreamed video with configurable bitrate, preset and keyframe interval,
+which downscales the video of a peer when its bandwidth estimate drops"""
+import fractions
+from typing import Iterator, Tuple
+
+import aiortc
+import av
+from aiortc.codecs.h264 import MAX_FRAME_RATE, H264Encoder
+from aiortc.rtcrtpsender import RTCRtpSender
+from pydantic import BaseModel #pylint: disable=no-name-in-module
+
+from home_vision.utils.media import fit_size
+
+# output scales tried in order when the peer's bandwidth estimate drops
+SCALES = (1.0, 0.75, 0.5, 0.375, 0.25)
+# aiortc has no public way to set the encoder of a sender, the private attribute and encoder
+# methods relied on are those of the aiortc pinned in requirements.txt
+SENDER_ENCODER = '_RTCRtpSender__encoder'
+H264_METHODS = ('_encode_frame', '_split_bitstream')
+
+
+class EncoderSettings(BaseModel):
+    """Settings of the H264 encoder of a peer
+
+    Attributes:
+        bitrate (int): bitrate in bps at the full output size, before any bandwidth estimate
+        min_bitrate (int): lowest bitrate in bps whatever the bandwidth estimate
+        max_bitrate (int): highest bitrate in bps whatever the bandwidth estimate
+        preset (str): x264 preset, faster presets use less cpu for a lower quality
+        keyframe_interval (int): frames between keyframes
+        adaptive_downscale (bool): downscale the video when the bandwidth estimate of the peer
+            is below `bitrate`, rather than only lowering the quality
+    """
+    bitrate: int = 1000000
+    min_bitrate: int = 200000
+    max_bitrate: int = 3000000
+    preset: str = 'veryfast'
+    keyframe_interval: int = 60
+    adaptive_downscale: bool = True
+
+    class Config:
+        """Pydantic model config"""
+        frozen=True
+        extra='forbid'
+
+
+def scale_for_bitrate(target_bitrate: int, bitrate: int) -> float:
+    """Largest output scale whose pixel count fits the target bitrate, given the bitrate the
+    full size video needs: the bitrate grows about linearly with the number of pixels"""
+    for scale in SCALES:
+        if scale * scale * bitrate <= target_bitrate * 1.1:
+            return scale
+    return SCALES[-1]
+
+
+class AdaptiveH264Encoder(H264Encoder):
+    """aiortc's H264 encoder with the settings of the RTC server, the frames are downscaled by
+    the conversion to yuv420p of the encoder, so a downscaled peer costs no extra pass
+
+    Args:
+        settings (EncoderSettings): encoder settings
+    """
+    def __init__(self, settings: EncoderSettings):
+        super().__init__()
+        self.settings = settings
+        self.scale = 1.0
+        self._target_bitrate = settings.bitrate
+
+    @property
+    def target_bitrate(self) -> int:
+        """Target bitrate in bps, set by the sender from the peer's bandwidth estimate"""
+        return self._target_bitrate
+
+    @target_bitrate.setter
+    def target_bitrate(self, bitrate: int):
+        self._target_bitrate = max(
+            self.settings.min_bitrate, min(bitrate, self.settings.max_bitrate)
+        )
+        if self.settings.adaptive_downscale:
+            self.scale = scale_for_bitrate(self._target_bitrate, self.settings.bitrate)
+
+    def output_size(self, frame: av.VideoFrame) -> Tuple[int, int]:
+        """Encoded size of a frame at the current scale"""
+        if self.scale == 1.0:
+            return frame.width, frame.height
+        return fit_size(
+            frame.width, frame.height, int(frame.width * self.scale),
+            int(frame.height * self.scale)
+        )
+
+    def _encode_frame(self, frame: av.VideoFrame, force_keyframe: bool) -> Iterator[bytes]:
+        width, height = self.output_size(frame)
+        if self.codec and (
+            width != self.codec.width
+            or height != self.codec.height
+            # only adjust the bitrate if it changes by over 10%
+            or abs(self.target_bitrate - self.codec.bit_rate) / self.codec.bit_rate > 0.1
+        ):
+            self.buffer_data = b""
+            self.buffer_pts = None
+            self.codec = None
+
+        frame.pict_type = (
+            av.video.frame.PictureType.I if force_keyframe else av.video.frame.PictureType.NONE
+        )
+
+        if self.codec is None:
+            self.codec = av.CodecContext.create("libx264", "w")
+            self.codec.width = width
+            self.codec.height = height
+            self.codec.bit_rate = self.target_bitrate
+            self.codec.pix_fmt = "yuv420p"
+            self.codec.framerate = fractions.Fraction(MAX_FRAME_RATE, 1)
+            self.codec.time_base = fractions.Fraction(1, MAX_FRAME_RATE)
+            self.codec.gop_size = self.settings.keyframe_interval
+            self.codec.options = {
+                "profile": "baseline",
+                "level": "31",
+                "tune": "zerolatency",
+                "preset": self.settings.preset,
+            }
+
+        data_to_send = b"".join(bytes(package) for package in self.codec.encode(frame))
+        if data_to_send:
+            yield from self._split_bitstream(data_to_send)
+
+    def stats(self) -> dict:
+        """Current bitrate and output size of the peer"""
+        return {
+            'target_bitrate': self.target_bitrate,
+            'scale': self.scale,
+            'size': [self.codec.width, self.codec.height] if self.codec else None,
+        }
+
+
+def install_encoder(sender: RTCRtpSender, settings: EncoderSettings) -> AdaptiveH264Encoder:
+    """Make a sender encode with an `AdaptiveH264Encoder` rather than aiortc's default one,
+    the sender only creates its encoder before the first frame when none is set
+
+    Args:
+        sender (RTCRtpSender): sender of a peer, negotiated to H264
+        settings (EncoderSettings): encoder settings
+
+    Returns:
+        AdaptiveH264Encoder: encoder of the peer
+
+    Raises:
+        RuntimeError: if the installed aiortc doesn't have the private sender attribute or
+            H264 encoder methods relied on
+    """
+    missing = [name for name in H264_METHODS if not hasattr(H264Encoder, name)]
+    if not hasattr(sender, SENDER_ENCODER):
+        missing.append(SENDER_ENCODER)
+    if missing:
+        raise RuntimeError(
+            f'aiortc {aiortc.__version__} has no {", ".join(missing)}, install the aiortc '
+            'version of requirements.txt'
+        )
+    encoder = AdaptiveH264Encoder(settings)
+    setattr(sender, SENDER_ENCODER, encoder)
+    return encoder
@@ -0,0 +1,178 @@
+"""Chain solutions running on the same host over a unix socket: the processed frames are sent
+raw with their results, with no encoding, decoding or SDP negotiation as over WebRTC"""
+import asyncio
+import fractions
+import json
+import logging
+import os
+import struct
+from typing import Awaitable, Callable, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+SCHEME = 'unix://'
+# pts (-1 when unknown), time base numerator and denominator, frame count, image height,
+# width and channels, length of the json results
+_HEADER = struct.Struct('!qIIIHHHI')
+
+
+class LocalFrame(NamedTuple):
+    """Timing of a frame received from a local publisher, the image is in the results"""
+    pts: Optional[int]
+    time_base: Optional[fractions.Fraction]
+
+
+def socket_path(source: str) -> str:
+    """Path of the unix socket of a `unix://<path>` source"""
+    return source[len(SCHEME):]
+
+
+class LocalPublisher:
+    """Publish the processed frames and results of a solution to the solutions subscribed on a
+    unix socket. A subscriber that does not keep up drops frames rather than slowing the
+    solution down.
+
+    Args:
+        path (str): path of the unix socket
+        max_buffered_frames (int, optional): frames buffered per subscriber before dropping.
+            Defaults to 2.
+    """
+    def __init__(self, path: str, max_buffered_frames: int = 2):
+        self.path = path
+        self.max_buffered_frames = max_buffered_frames
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self.server = None
+        self.on_subscribe = None
+        self.dropped = 0
+
+    async def start(self, on_subscribe: Callable[[], Awaitable[None]]):
+        """Listen on the socket, `on_subscribe` is awaited when a subscriber connects, before
+        it receives frames"""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.on_subscribe = on_subscribe
+        self.server = await asyncio.start_unix_server(self._on_connection, self.path)
+        logging.info('publishing results on %s%s', SCHEME, self.path)
+
+    async def _on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve a subscriber until it disconnects"""
+        try:
+            await self.on_subscribe()
+        except Exception: #pylint: disable=broad-except
+            logging.exception('failed to start publishing to a local subscriber')
+            writer.close()
+            return
+        self.subscribers.add(writer)
+        logging.info('local subscriber connected, %s subscribers', len(self.subscribers))
+        try:
+            await reader.read()
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+            logging.info('local subscriber left, %s subscribers', len(self.subscribers))
+
+    def publish(
+        self,
+        image: np.ndarray,
+        results: str,
+        pts: Optional[int],
+        time_base: Optional[fractions.Fraction],
+        frame_cnt: int
+    ):
+        """Send a processed frame and its json results to every subscriber
+
+        Args:
+            image (np.ndarray): processed BGR image
+            results (str): json results of the frame
+            pts (Optional[int]): presentation timestamp of the frame
+            time_base (Optional[fractions.Fraction]): time base of the pts
+            frame_cnt (int): frame count of the solution
+        """
+        if not self.subscribers:
+            return
+        image = np.ascontiguousarray(image)
+        encoded = results.encode('utf-8')
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        header = _HEADER.pack(
+            -1 if pts is None else pts,
+            time_base.numerator if time_base else 0,
+            time_base.denominator if time_base else 0,
+            frame_cnt, height, width, channels, len(encoded)
+        )
+        frame_bytes = image.nbytes + len(encoded) + _HEADER.size
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffered_frames * frame_bytes:
+                self.dropped += 1
+                continue
+            writer.write(header)
+            writer.write(encoded)
+            writer.write(image.reshape(-1).data)
+
+    async def close(self):
+        """Disconnect the subscribers and remove the socket"""
+        for writer in self.subscribers:
+            writer.close()
+        self.subscribers.clear()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class LocalListener:
+    """A `MediaTrack` like subscriber of a solution published on a unix socket, it receives
+    the raw processed frames and their results
+
+    Args:
+        path (str): path of the unix socket
+        connect_timeout (float, optional): seconds to wait for the publisher's socket.
+            Defaults to 30.
+    """
+    def __init__(self, path: str, connect_timeout: float = 30.0):
+        self.path = path
+        self.connect_timeout = connect_timeout
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Connect to the publisher, waiting for its socket to be created"""
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.connect_timeout
+        while True:
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                if loop.time() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+    async def recv(self) -> Tuple[dict, LocalFrame]:
+        """Receive the next processed frame and its results from the publisher"""
+        if self.reader is None:
+            await self.connect()
+        pts, num, den, _, height, width, channels, results_len = _HEADER.unpack(
+            await self.reader.readexactly(_HEADER.size)
+        )
+        outputs = json.loads(await self.reader.readexactly(results_len))
+        data = await self.reader.readexactly(height * width * channels)
+        # the solutions draw on the image, keep it writable
+        outputs['image'] = np.frombuffer(bytearray(data), dtype=np.uint8).reshape(
+            (height, width, channels) if channels > 1 else (height, width)
+        )
+        return outputs, LocalFrame(
+            None if pts < 0 else pts, fractions.Fraction(num, den) if den else None
+        )
+
+    def stop(self):
+        """Disconnect from the publisher"""
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = None
+            self.writer = None
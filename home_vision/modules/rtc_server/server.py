@@ -17,14 +17,24 @@ import aiohttp_jinja2
 import jinja2
 from aiohttp import web
 from aiortc import MediaStreamTrack, RTCPeerConnection, RTCSessionDescription
-from aiortc.contrib.media import MediaBlackhole, MediaPlayer, MediaRelay
+from aiortc.contrib.media import MediaBlackhole, MediaRelay
 from aiortc.rtcrtpsender import RTCRtpSender
 from av import VideoFrame
+from home_vision.common.detection_store import DetectionStore
+from home_vision.common.detections import Detections, json_default
 from home_vision.modules.module_base import BaseConfig, Module
+from home_vision.modules.recorder.event_recorder import EventRecorder, EventRecorderInput
 from home_vision.solutions.solution_base import Solution, SolutionConfig
+from home_vision.utils.media import frame_to_bgr, open_player, resize_bgr
 from home_vision.utils.utils import load_solution
 
+from .encoder import EncoderSettings, install_encoder
+from .local import SCHEME, LocalListener, LocalPublisher, socket_path
+from .sync import SYNC_REQUEST, ResultBuffer, SyncTrack, rtp_pts
+
 ROOT = os.path.dirname(__file__)
+# seconds the shutdown waits for each thread of the event recorder
+EVENT_RECORDER_STOP_TIMEOUT = 5.0
 
 class VideoTransformTrack(MediaStreamTrack):
     """
@@ -34,21 +44,56 @@ class VideoTransformTrack(MediaStreamTrack):
 
     kind = "video"
 
-    def __init__(self, track: MediaStreamTrack, track_type: str, solution: Solution):
+    def __init__(
+        self,
+        track: MediaStreamTrack,
+        track_type: str,
+        solution: Solution,
+        decode_size: Tuple[Optional[int], Optional[int]] = (None, None),
+        output_size: Tuple[Optional[int], Optional[int]] = (None, None),
+        publisher: Optional[LocalPublisher] = None,
+        event_recorder: Optional[EventRecorder] = None,
+        record_field: Optional[str] = None,
+        store: Optional[DetectionStore] = None,
+        camera: Optional[str] = None
+    ):
         """Initialize the VideoTransformTrack that re-stream the HomeVision processed video
 
         Args:
             track (MediaStreamTrack): input media track
-            track_type (str): type of track, could be `video`, `stream`, `rtc`
+            track_type (str): type of track, could be `video`, `stream`, `rtc`, `local`
             solution (Solution): HomeVision Solution
+            decode_size (Tuple[Optional[int], Optional[int]], optional): maximum width and
+                height the decoded frames are downscaled to. Defaults to (None, None).
+            output_size (Tuple[Optional[int], Optional[int]], optional): maximum width and
+                height of the restreamed frames. Defaults to (None, None).
+            publisher (Optional[LocalPublisher], optional): publisher of the processed frames
+                and results to the solutions chained on this host. Defaults to None.
+            event_recorder (Optional[EventRecorder], optional): recorder of the clips around the
+                events. Defaults to None.
+            record_field (Optional[str], optional): solution output whose detections fire
+                the events. Defaults to None.
+            store (Optional[DetectionStore], optional): store of the detections of the
+                solution. Defaults to None.
+            camera (Optional[str], optional): camera of the detections in the store.
+                Defaults to None.
         """
         super().__init__()
         self.track = track
         self.track_type = track_type
+        self.decode_size = decode_size
+        self.output_size = output_size
+        self.publisher = publisher
+        self.event_recorder = event_recorder
+        self.record_field = record_field
+        self.store = store
+        self.camera = camera
         self.frame_cnt = 0
         self.fps = 0
         self.channels = set()
         self.solution = solution
+        # results of a chained solution also carry its frame's pts and count
+        self.input_fields = set(solution.input_types.__fields__)
         self.pool = concurrent.futures.ThreadPoolExecutor()
 
     async def recv(self) -> VideoFrame:
@@ -58,37 +103,53 @@ class VideoTransformTrack(MediaStreamTrack):
 
         # gather solution inputs
         kwargs = {}
-        if self.track_type == "rtc":
-            kwargs, frame = await self.track.recv()
+        if self.track_type in ("rtc", "local"):
+            outputs, frame = await self.track.recv()
+            kwargs = {key: value for key, value in outputs.items() if key in self.input_fields}
         else:
             frame = await self.track.recv()
-            kwargs["image"] = frame.to_ndarray(format="bgr24")
+            kwargs["image"] = frame_to_bgr(frame, *self.decode_size)
         self.frame_cnt += 1
         frame_e = time.perf_counter()
-        # res.json(exclude={'image'})
-        solution_input = self.solution.input_types(**kwargs)
+        solution_input = self.solution.input_types.create(**kwargs)
         # solution process inputs
         process_s = time.perf_counter()
         res = await loop.run_in_executor(
             self.pool, functools.partial(self.solution.process, solution_input)
         )
         res_image = res.image
-        res = res.dict(exclude={'image'})
-        if self.track_type != "rtc":
+        res = res.asdict(exclude={'image'})
+        if self.track_type not in ("rtc", "local"):
             self.solution.draw_note(res_image, self.fps, self.frame_cnt)
             res['frame_cnt'] = self.frame_cnt
+        # tag the results with their frame for the chained solutions to match them
+        res['pts'] = rtp_pts(frame)
+        if self.event_recorder is not None and self.record_field in res:
+            self.event_recorder.process(
+                EventRecorderInput.create(detections=res[self.record_field])
+            )
+        if self.store is not None:
+            for key, value in res.items():
+                if isinstance(value, Detections):
+                    self.store.add(self.camera, value, frame=self.frame_cnt, output=key)
         process_e = time.perf_counter()
 
-        # send processed outputs to peers' datachannels
-        if len(self.channels) != 0:
+        # send processed outputs to peers' datachannels and to the local subscribers
+        publish = self.publisher is not None and len(self.publisher.subscribers) != 0
+        if len(self.channels) != 0 or publish:
+            message = json.dumps(res, default=json_default)
             for channel in self.channels:
-                channel.send(
-                    json.dumps(res)
+                channel.send(message)
+            if publish:
+                self.publisher.publish(
+                    res_image, message, frame.pts, frame.time_base, self.frame_cnt
                 )
         channel_e = time.perf_counter()
 
         # rebuild a VideoFrame, preserving timing information
-        new_frame = VideoFrame.from_ndarray(res_image, format="bgr24")
+        new_frame = VideoFrame.from_ndarray(
+            resize_bgr(res_image, *self.output_size), format="bgr24"
+        )
         new_frame.pts = frame.pts
         new_frame.time_base = frame.time_base
         frame_e = time.perf_counter()
@@ -104,19 +165,27 @@ class VideoTransformTrack(MediaStreamTrack):
 
 class RTCListener:
     """A `MediaTrack` like RTC peer that connects to a webrtc server that is running HomeVision
-    solution, it will receive the frame from track and processed results from datachannel"""
-    def __init__(self, url: str):
+    solution, it will receive the frame from track and processed results from datachannel.
+    Each frame is paired with the result of the same source frame, by pts: a frame whose result
+    does not arrive within `max_wait` seconds is dropped rather than paired with another's."""
+    def __init__(self, url: str, max_wait: float = 0.1, connect_timeout: float = 30.0):
         """Initialize the RTC listener
         Args:
             url (str): url of the webrtc server that HomeVision solution is running
+            max_wait (float, optional): seconds a frame waits for its result. Defaults to 0.1.
+            connect_timeout (float, optional): seconds to wait for the track and datachannel.
+                Defaults to 30.
         """
         self.url = url
+        self.max_wait = max_wait
+        self.connect_timeout = connect_timeout
         self.pc = None #pylint: disable=invalid-name
-        self.data = None
         self.track = None
+        self.buffer = ResultBuffer()
+        self.result_event = asyncio.Event()
 
     async def run_offer(self, url: str):
-        """Connect to RTC server
+        """Connect to RTC server, until its track is received and the datachannel is open
 
         Args:
             url (str): url of the webrtc server that HomeVision solution is running
@@ -125,11 +194,14 @@ class RTCListener:
         self.pc = RTCPeerConnection()
         self.pc.addTransceiver('video', 'recvonly')
         channel = self.pc.createDataChannel("chat")
+        track_ready = asyncio.Event()
+        channel_open = asyncio.Event()
 
         @self.pc.on("track")
         def on_track(track):
             """Receive processed media track from connected solution"""
             self.track = track
+            track_ready.set()
 
         @self.pc.on("iceconnectionstatechange")
         def on_iceconnectionstatechange():
@@ -137,14 +209,21 @@ class RTCListener:
             logging.info("RTC listener connection state %s", self.pc.iceConnectionState)
 
         @channel.on("open")
-        async def on_open():
-            """Peer connection datachannel open"""
+        def on_open():
+            """Peer connection datachannel open, ask for the pts of the first frame"""
             logging.info("RTC listener datachannel opened!")
+            channel.send(SYNC_REQUEST)
+            channel_open.set()
 
         @channel.on("message")
-        async def on_message(message):
+        def on_message(message):
             """Receive processed results from connected solution's datachannel"""
-            self.data = json.loads(message)
+            result = json.loads(message)
+            if 'sync' in result:
+                self.buffer.lock(result['sync'])
+            else:
+                self.buffer.add(result)
+            self.result_event.set()
 
         # webrtc connection
         await self.pc.setLocalDescription(await self.pc.createOffer())
@@ -160,21 +239,43 @@ class RTCListener:
                 sdp=answer["sdp"], type=answer["type"]
             )
         )
+        await asyncio.wait_for(
+            asyncio.gather(track_ready.wait(), channel_open.wait()), self.connect_timeout
+        )
 
+    async def _result(self, frame_pts: int) -> Optional[dict]:
+        """Result of a frame, waiting up to `max_wait` for it to arrive"""
+        result = self.buffer.match(frame_pts)
+        if result is not None:
+            self.buffer.wait.record(0.0)
+            return result
+        loop = asyncio.get_event_loop()
+        wait_s = loop.time()
+        deadline = wait_s + self.max_wait
+        while result is None and loop.time() < deadline:
+            self.result_event.clear()
+            try:
+                await asyncio.wait_for(self.result_event.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                pass
+            result = self.buffer.match(frame_pts)
+        if result is not None:
+            self.buffer.wait.record(loop.time() - wait_s)
+        return result
 
     async def recv(self) -> Tuple[dict, VideoFrame]:
         """re-stream the processed results from connected HomeVision Solution"""
         # start peer connection if not already
         if self.pc is None:
             await self.run_offer(self.url)
-            await asyncio.sleep(5)
-        # re-stream processed result from datachannel
-        if self.data:
-            outputs = self.data
-        else:
-            outputs = {}
-        # re-stream the frame
-        frame = await self.track.recv()
+        while True:
+            frame = await self.track.recv()
+            result = await self._result(frame.pts)
+            if result is not None:
+                break
+            self.buffer.miss(frame.pts)
+        # the buffered result is only used once, add the frame to a copy of it
+        outputs = dict(result)
         outputs['image'] = frame.to_ndarray(format="bgr24")
         return outputs, frame
 
@@ -188,12 +289,57 @@ class RTCConfig(BaseConfig):
         port (int): port number that RTC server will run
         buffered (bool): whether to streaming the buffered video
         codec (bool): whether to streaming the compressed video
+        decode_threads (int): video decoding threads, 0 lets FFmpeg decide
+        skip_non_keyframes (bool): decode the keyframes only
+        decode_width (int): downscale the decoded frames to this maximum width, e.g. the
+            detector's input width, in the same pass as the conversion to BGR
+        decode_height (int): downscale the decoded frames to this maximum height
+        output_width (int): downscale the restreamed frames to this maximum width
+        output_height (int): downscale the restreamed frames to this maximum height
+        bitrate (int): H264 bitrate in bps of the restreamed video at its full output size
+        min_bitrate (int): lowest H264 bitrate in bps whatever a peer's bandwidth estimate
+        max_bitrate (int): highest H264 bitrate in bps whatever a peer's bandwidth estimate
+        preset (str): x264 preset of the restreamed video
+        keyframe_interval (int): frames between H264 keyframes
+        adaptive_downscale (bool): downscale the video of a peer whose bandwidth estimate is
+            below `bitrate`, with `codec`
+        publish_socket (str): unix socket path where the processed frames and results are
+            published to the solutions chained on this host, they use `unix://<path>` as source
+        record_events (str): solution output whose detections fire an event, e.g. `bboxes`,
+            the last `pre_roll` seconds of the packets the server's player demuxes are kept in
+            memory and a clip is written to `event_dir` around each event, while the solution
+            runs. Video file and stream sources only
+        event_dir (str): directory of the event clips
+        pre_roll (float): seconds recorded before an event
+        post_roll (float): seconds recorded after the last event of a clip
+        store_dir (str): directory of the detection store, the detections of the solution
+            are stored by camera and day
+        camera (str): camera name of the detections in the store, defaults to the source
     """
     source: str
     host: Optional[str] = "0.0.0.0"
     port: Optional[int] = 5555
     buffered: Optional[bool] = False
     codec: Optional[bool] = False
+    decode_threads: Optional[int] = 0
+    skip_non_keyframes: Optional[bool] = False
+    decode_width: Optional[int] = None
+    decode_height: Optional[int] = None
+    output_width: Optional[int] = None
+    output_height: Optional[int] = None
+    bitrate: Optional[int] = 1000000
+    min_bitrate: Optional[int] = 200000
+    max_bitrate: Optional[int] = 3000000
+    preset: Optional[str] = 'veryfast'
+    keyframe_interval: Optional[int] = 60
+    adaptive_downscale: Optional[bool] = True
+    publish_socket: Optional[str] = None
+    record_events: Optional[str] = None
+    event_dir: Optional[str] = 'data/events'
+    pre_roll: Optional[float] = 5.0
+    post_roll: Optional[float] = 5.0
+    store_dir: Optional[str] = None
+    camera: Optional[str] = None
 
 @Module.register('rtc_server')
 class RTCServer(Module):
@@ -201,7 +347,25 @@ class RTCServer(Module):
     config_type = RTCConfig
     module_name = "webrtc_server"
 
-    def __init__(self, source: str, host: str, port: int, buffered: bool, codec: bool):
+    def __init__(
+        self,
+        source: str,
+        host: str,
+        port: int,
+        buffered: bool,
+        codec: bool,
+        decode_threads: int = 0,
+        skip_non_keyframes: bool = False,
+        decode_width: Optional[int] = None,
+        decode_height: Optional[int] = None,
+        output_size: Tuple[Optional[int], Optional[int]] = (None, None),
+        encoder_settings: Optional[EncoderSettings] = None,
+        publish_socket: Optional[str] = None,
+        event_recorder: Optional[EventRecorder] = None,
+        record_field: Optional[str] = None,
+        store: Optional[DetectionStore] = None,
+        camera: Optional[str] = None
+    ):
         self.host = host
         self.port = port
         self.source = source
@@ -209,6 +373,18 @@ class RTCServer(Module):
         self.solution_config = None
         self.buffered = buffered
         self.codec = codec
+        self.decode_threads = decode_threads
+        self.skip_non_keyframes = skip_non_keyframes
+        self.decode_size = (decode_width, decode_height)
+        self.output_size = output_size
+        self.encoder_settings = encoder_settings or EncoderSettings()
+        self.encoders = {}
+        self.publisher = LocalPublisher(publish_socket) if publish_socket else None
+        self.local_track = None
+        self.event_recorder = event_recorder
+        self.record_field = record_field
+        self.store = store
+        self.camera = camera or source
         self.pcs = set()
         self.player = None
         self.video = None
@@ -217,12 +393,41 @@ class RTCServer(Module):
         self.media_track = None
         self.recorder = MediaBlackhole()
         self.solution = None
+        self.state = 'starting'
+        self.warmup_task = None
+        self.created = time.perf_counter()
+        self.ready_seconds = None
 
 
     @classmethod
     def from_config(cls, config: RTCConfig) -> RTCServer:
         logging.info('loading RTC server from config: %s', config)
-        return cls(config.source, config.host, config.port, config.buffered, config.codec)
+        return cls(
+            config.source, config.host, config.port, config.buffered, config.codec,
+            config.decode_threads, config.skip_non_keyframes, config.decode_width,
+            config.decode_height, (config.output_width, config.output_height),
+            EncoderSettings(
+                bitrate=config.bitrate, min_bitrate=config.min_bitrate,
+                max_bitrate=config.max_bitrate, preset=config.preset,
+                keyframe_interval=config.keyframe_interval,
+                adaptive_downscale=config.adaptive_downscale
+            ),
+            config.publish_socket, cls.create_recorder(config), config.record_events,
+            DetectionStore(config.store_dir) if config.store_dir else None, config.camera
+        )
+
+    @staticmethod
+    def create_recorder(config: RTCConfig) -> Optional[EventRecorder]:
+        """Event recorder of the source, the chained sources have no packets to record"""
+        if config.record_events is None:
+            return None
+        if config.source.startswith(('http', SCHEME)):
+            logging.warning('events of chained source %s are not recorded', config.source)
+            return None
+        return EventRecorder(
+            config.source, config.event_dir, config.pre_roll, config.post_roll,
+            loop=not config.source.startswith(('rtsp://', 'rtmp://'))
+        )
 
     def create_tracks(self) -> MediaStreamTrack:
         """Create the track that re-stream HomeVision Solution results"""
@@ -230,8 +435,17 @@ class RTCServer(Module):
             # video streams
             if self.source.startswith('rtsp://') or self.source.startswith('rtmp://'):
                 self.track_type = 'stream'
-                self.player = MediaPlayer(self.source)
+                self.player = open_player(
+                    self.source, threads=self.decode_threads,
+                    skip_non_keyframes=self.skip_non_keyframes
+                )
+                self.attach_recorder()
                 self.media_track = MediaRelay().subscribe(self.player.video, buffered=self.buffered)
+            # socket where a HomeVision Solution on this host publishes its results
+            elif self.source.startswith(SCHEME):
+                self.track_type = 'local'
+                self.player = None
+                self.media_track = LocalListener(socket_path(self.source))
             # url that runs HomeVision Solution WebRTC server
             elif self.source.startswith('http'):
                 self.track_type = 'rtc'
@@ -240,19 +454,39 @@ class RTCServer(Module):
             # local video files
             else:
                 self.track_type = 'video'
-                self.player = MediaPlayer(self.source, loop=True)
+                self.player = open_player(
+                    self.source, loop=True, threads=self.decode_threads,
+                    skip_non_keyframes=self.skip_non_keyframes
+                )
+                self.attach_recorder()
                 self.media_track = MediaRelay().subscribe(self.player.video, buffered=self.buffered)
         # load HomeVision Solution
         if self.solution is None:
             self.solution = load_solution(self.solution_name, self.solution_config)
         # create the transform track that process input frames using HomeVision Solution
         if self.video is None:
-            self.video = VideoTransformTrack(self.media_track, self.track_type, self.solution)
+            self.video = VideoTransformTrack(
+                self.media_track, self.track_type, self.solution, self.decode_size,
+                self.output_size, self.publisher, self.event_recorder,
+                self.record_field, self.store, self.camera
+            )
         # relay for output stream
         if self.relay is None:
             self.relay = MediaRelay()
         return self.relay.subscribe(self.video, False)
 
+    def attach_recorder(self):
+        """Record the events from the packets of the new player, recording is disabled when
+        they can't be tapped"""
+        if self.event_recorder is None:
+            return
+        try:
+            self.event_recorder.attach(self.player)
+        except Exception: #pylint: disable=broad-except
+            logging.exception('events of %s are not recorded', self.source)
+            self.event_recorder.stop(EVENT_RECORDER_STOP_TIMEOUT)
+            self.event_recorder = None
+
     def force_codec(self, pc: RTCPeerConnection, sender: RTCRtpSender, forced_codec: str): #pylint: disable=invalid-name
         """Compress send MediaTrack
 
@@ -281,6 +515,59 @@ class RTCServer(Module):
         response.headers['Content-Language'] = 'ru'
         return response
 
+    async def status(self, request): #pylint: disable=unused-argument
+        """Report the solution's readiness, `warming` until the solution is loaded, and its
+        startup timings once loaded"""
+        status = {'solution_name': self.solution_name, 'state': self.state}
+        if self.solution is not None:
+            status['ready_seconds'] = self.ready_seconds
+            status['startup'] = self.solution.startup_profile()
+        status['peers'] = [encoder.stats() for encoder in self.encoders.values()]
+        if isinstance(self.media_track, RTCListener):
+            status['listener'] = self.media_track.buffer.metrics()
+        if self.event_recorder is not None:
+            status['events'] = self.event_recorder.stats()
+        return web.json_response(status)
+
+    async def profile(self, request):
+        """Dump the solution's per-module latency breakdown, `?format=text` for a table"""
+        if self.solution is None:
+            return web.json_response({})
+        if request.query.get('format') == 'text':
+            return web.Response(text=self.solution.profile_report())
+        return web.json_response(self.solution.profile())
+
+    async def warmup(self):
+        """Load the HomeVision solution in background so that the server reports
+        ready only once the models are loaded"""
+        self.state = 'warming'
+        loop = asyncio.get_event_loop()
+        try:
+            self.solution = await loop.run_in_executor(
+                None, load_solution, self.solution_name, self.solution_config
+            )
+        except Exception: #pylint: disable=broad-except
+            logging.exception('failed to load solution %s', self.solution_name)
+            self.state = 'failed'
+            return
+        self.ready_seconds = time.perf_counter() - self.created
+        self.state = 'ready'
+
+    async def on_startup(self, app): #pylint: disable=unused-argument
+        """Start loading the HomeVision solution once the server is up"""
+        self.warmup_task = asyncio.ensure_future(self.warmup())
+        if self.publisher is not None:
+            await self.publisher.start(self.start_local)
+
+    async def start_local(self):
+        """Run the solution for the local subscribers, even when no peer is connected"""
+        if self.warmup_task is not None:
+            await self.warmup_task
+        if self.local_track is None:
+            self.local_track = self.create_tracks()
+            self.recorder.addTrack(self.local_track)
+            await self.recorder.start()
+
     async def javascript(self, request): #pylint: disable=unused-argument
         """Add javascript RTC client resource"""
         with open(os.path.join(ROOT, "client.js"), "r", encoding="utf-8") as js_file:
@@ -296,16 +583,23 @@ class RTCServer(Module):
         pc = RTCPeerConnection() #pylint: disable=invalid-name
         offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
         self.pcs.add(pc)
+        # wait for the solution still loading in background
+        if self.warmup_task is not None:
+            await self.warmup_task
 
         @pc.on("iceconnectionstatechange")
         async def on_iceconnectionstatechange():
             """RTC Peer connection change"""
             logging.info("RTC server ICE connection state is %s", pc.iceConnectionState)
+            # the peer's encoder is gone once its connection failed or was closed
+            if pc.iceConnectionState in ("failed", "closed"):
+                self.encoders.pop(pc, None)
             # clean up when connection ends
             if pc.iceConnectionState == "failed":
                 await pc.close()
                 self.pcs.discard(pc)
-                if len(self.pcs) == 0:
+                local = self.publisher is not None and len(self.publisher.subscribers) != 0
+                if len(self.pcs) == 0 and not local:
                     if self.video is not None:
                         self.video.stop()
                     if self.player is not None:
@@ -315,6 +609,7 @@ class RTCServer(Module):
                     self.player = None
                     self.relay = None
                     self.track_type = None
+                    self.local_track = None
                     self.recorder.stop()
                     self.recorder = MediaBlackhole()
         # get HomeVision solution re-stream track
@@ -323,9 +618,11 @@ class RTCServer(Module):
         # mediablackhole recorder use to start streaming
         self.recorder.addTrack(video)
 
-        # send transformed video track
+        # send transformed video track, which answers the peer's sync requests
+        sync_track = None
         if use_track:
-            video_sender = pc.addTrack(video)
+            sync_track = SyncTrack(video)
+            video_sender = pc.addTrack(sync_track)
 
         @pc.on("datachannel")
         def on_datachannel(channel):
@@ -337,9 +634,15 @@ class RTCServer(Module):
             def on_close():
                 self.video.channels.remove(channel)
 
-        # compress stream
+            @channel.on("message")
+            def on_message(message):
+                if message == SYNC_REQUEST and sync_track is not None:
+                    sync_track.request_sync(channel)
+
+        # compress stream, with an encoder per peer that adapts to its bandwidth
         if self.codec and use_track:
             self.force_codec(pc, video_sender, "video/H264")
+            self.encoders[pc] = install_encoder(video_sender, self.encoder_settings)
 
         # complete peer connection
         await pc.setRemoteDescription(offer)
@@ -360,13 +663,29 @@ class RTCServer(Module):
         coros = [pc.close() for pc in self.pcs]
         await asyncio.gather(*coros)
         self.pcs.clear()
+        self.encoders.clear()
         if self.video is not None:
             self.video.pool.shutdown()
             self.video.stop()
+        if self.solution is not None:
+            self.solution.close()
+        # the clips being recorded are closed before the player closes the source
+        if self.event_recorder is not None:
+            await asyncio.get_event_loop().run_in_executor(
+                None, self.event_recorder.stop, EVENT_RECORDER_STOP_TIMEOUT
+            )
         if self.player is not None:
             self.player.video.stop()
+        if isinstance(self.media_track, LocalListener):
+            self.media_track.stop()
+        if self.publisher is not None:
+            await self.publisher.close()
         if self.recorder is not None:
             await self.recorder.stop()
+        if self.store is not None:
+            self.store.close()
+        if self.warmup_task is not None:
+            self.warmup_task.cancel()
 
 
     def _process(self, **kwargs):
@@ -391,8 +710,11 @@ class RTCServer(Module):
             loader=jinja2.FileSystemLoader(
                 os.path.join(ROOT, 'templates')
         ))
+        app.on_startup.append(self.on_startup)
         app.on_shutdown.append(self.on_shutdown)
         app.router.add_get("/", self.index)
+        app.router.add_get("/status", self.status)
+        app.router.add_get("/profile", self.profile)
         app.router.add_get("/client.js", self.javascript)
         resource = cors.add(app.router.add_resource("/offer"))
         cors.add(resource.add_route("POST", self.offer),
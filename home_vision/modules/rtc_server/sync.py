@@ -0,0 +1,147 @@
+"""Pair the video frames received from a HomeVision RTC server with the results received on
+its datachannel, both tagged with the pts of the source frame"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiortc import MediaStreamTrack, RTCDataChannel
+from aiortc.mediastreams import VIDEO_TIME_BASE, convert_timebase
+from av import VideoFrame
+from home_vision.common.profiling import LatencyHistogram
+
+# datachannel message of a listener asking for the pts of the first frame sent to it
+SYNC_REQUEST = 'sync'
+
+
+def rtp_pts(frame: VideoFrame) -> Optional[int]:
+    """pts of a frame on the 90 kHz clock of the RTP timestamps"""
+    if frame.pts is None or frame.time_base is None:
+        return None
+    return convert_timebase(frame.pts, frame.time_base, VIDEO_TIME_BASE)
+
+
+class SyncTrack(MediaStreamTrack):
+    """Video track of a peer that answers the peer's sync requests with the pts of the first
+    frame sent to it: the peer receives frames with pts relative to that frame
+
+    Args:
+        track (MediaStreamTrack): restreamed video track
+    """
+    kind = "video"
+
+    def __init__(self, track: MediaStreamTrack):
+        super().__init__()
+        self.track = track
+        self.first_pts = None
+        self.requests: List[RTCDataChannel] = []
+
+    def request_sync(self, channel: RTCDataChannel):
+        """Answer a sync request on the channel once the first frame is sent"""
+        self.requests.append(channel)
+        self._answer()
+
+    def _answer(self):
+        if self.first_pts is None:
+            return
+        for channel in self.requests:
+            if channel.readyState == 'open':
+                channel.send(json.dumps({'sync': self.first_pts}))
+        self.requests = []
+
+    async def recv(self) -> VideoFrame:
+        frame = await self.track.recv()
+        if self.first_pts is None:
+            self.first_pts = rtp_pts(frame)
+            self._answer()
+        return frame
+
+    def stop(self):
+        super().stop()
+        self.track.stop()
+
+
+class ResultBuffer:
+    """Jitter buffer of the results of a WebRTC connection, keyed by their `pts` on the 90 kHz
+    RTP clock.
+
+    A received frame's pts is its RTP timestamp relative to the first received packet, i.e.
+    the source pts shifted by the pts of the first frame sent, which the server sends on
+    request (`lock`). Without it, or when `relock_after` frames in a row find no result, the
+    shift is guessed from the latest result, the results being sent before their frame.
+
+    Args:
+        size (int, optional): results kept waiting for their frame. Defaults to 64.
+        relock_after (int, optional): consecutive unmatched frames before locking the shift
+            again. Defaults to 3.
+    """
+    def __init__(self, size: int = 64, relock_after: int = 3):
+        self.size = size
+        self.relock_after = relock_after
+        self.results: 'OrderedDict[int, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self.offset: Optional[int] = None
+        self.misses = 0
+        self.matched = 0
+        self.mismatched = 0
+        self.stale = 0
+        self.skew = LatencyHistogram()
+        self.wait = LatencyHistogram()
+
+    def add(self, result: Dict[str, Any]):
+        """Buffer a result received on the datachannel, results without pts are dropped"""
+        pts = result.get('pts')
+        if pts is None:
+            return
+        self.results[pts] = (result, time.perf_counter())
+        while len(self.results) > self.size:
+            self.results.popitem(last=False)
+            self.stale += 1
+
+    def lock(self, offset: int):
+        """Shift between the pts of the received frames and of their results"""
+        self.offset = offset
+        self.misses = 0
+        logging.info('RTC listener locked results on frames with offset %s', offset)
+
+    def match(self, frame_pts: int) -> Optional[Dict[str, Any]]:
+        """Result of a received frame, None if it has not arrived (yet)"""
+        if self.offset is None:
+            return None
+        key = frame_pts + self.offset
+        entry = self.results.pop(key, None)
+        if entry is None:
+            return None
+        # results of older frames won't match any more, their frames were dropped
+        while self.results and next(iter(self.results)) < key:
+            self.results.popitem(last=False)
+            self.stale += 1
+        result, arrived = entry
+        self.skew.record(time.perf_counter() - arrived)
+        self.matched += 1
+        self.misses = 0
+        return result
+
+    def miss(self, frame_pts: int):
+        """Record a frame dropped because its result did not arrive in time"""
+        self.mismatched += 1
+        self.misses += 1
+        logging.debug('RTC listener found no result for frame pts %s', frame_pts)
+        if self.misses >= self.relock_after and self.results:
+            logging.warning(
+                'RTC listener found no result for %s frames in a row, locking again',
+                self.misses
+            )
+            self.lock(next(reversed(self.results)) - frame_pts)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Matched and mismatched frames, stale results, and latencies: `skew` from a result's
+        arrival to its frame's, `wait` of the frames for their result"""
+        return {
+            'matched': self.matched,
+            'mismatched': self.mismatched,
+            'stale_results': self.stale,
+            'buffered_results': len(self.results),
+            'skew': self.skew.summary(),
+            'wait': self.wait.summary(),
+        }
@@ -0,0 +1,119 @@
+"""Constant velocity Kalman filter of boxes, run on all the tracks at once: the state of N tracks
+is a (N, 8) mean `[cx, cy, aspect, height, vcx, vcy, vaspect, vheight]`, the measurements are
+(N, 4) `[cx, cy, aspect, height]` boxes.
+
+The motion and the noises of each coordinate are independent of the others, so the (8, 8)
+covariance of a track is made of a (2, 2) block per coordinate, its position and velocity:
+the covariances are kept as (N, 4, 2, 2) blocks and the filter is element-wise arithmetic on
+them, rather than batched (8, 8) matrix products and solves."""
+from typing import Tuple
+
+import numpy as np
+
+NDIM = 4
+# the position and velocity noise scale with the height of the box
+STD_WEIGHT_POSITION = 1.0 / 20
+STD_WEIGHT_VELOCITY = 1.0 / 160
+
+
+def xyxy_to_xyah(boxes: np.ndarray) -> np.ndarray:
+    """(N, 4) `[xmin, ymin, xmax, ymax]` boxes to `[cx, cy, aspect, height]`"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    width = boxes[:, 2] - boxes[:, 0]
+    height = boxes[:, 3] - boxes[:, 1]
+    return np.stack([
+        boxes[:, 0] + width / 2, boxes[:, 1] + height / 2,
+        width / np.maximum(height, 1e-6), height
+    ], axis=1)
+
+
+def xyah_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    """(N, 4+) `[cx, cy, aspect, height, ...]` states to `[xmin, ymin, xmax, ymax]` boxes"""
+    width = boxes[:, 2] * boxes[:, 3]
+    half_width, half_height = width / 2, boxes[:, 3] / 2
+    return np.stack([
+        boxes[:, 0] - half_width, boxes[:, 1] - half_height,
+        boxes[:, 0] + half_width, boxes[:, 1] + half_height
+    ], axis=1)
+
+
+def _blocks(std_position: np.ndarray, std_velocity: np.ndarray) -> np.ndarray:
+    """(N, 4) standard deviations of the positions and velocities to (N, 4, 2, 2) diagonal
+    covariance blocks"""
+    covariance = np.zeros(std_position.shape + (2, 2))
+    covariance[..., 0, 0] = std_position * std_position
+    covariance[..., 1, 1] = std_velocity * std_velocity
+    return covariance
+
+
+def full_covariance(covariance: np.ndarray) -> np.ndarray:
+    """(N, 4, 2, 2) covariance blocks to (N, 8, 8) covariances of the states"""
+    full = np.zeros((len(covariance), 2 * NDIM, 2 * NDIM))
+    index = np.arange(NDIM)
+    for row in range(2):
+        for col in range(2):
+            full[:, row * NDIM + index, col * NDIM + index] = covariance[:, :, row, col]
+    return full
+
+
+def _std(height: np.ndarray, position: float, velocity: float) -> Tuple[np.ndarray, np.ndarray]:
+    """(N, 4) process noise of the positions and velocities, scaled by the box heights"""
+    ones = np.ones_like(height)
+    std_position = np.stack([
+        position * STD_WEIGHT_POSITION * height, position * STD_WEIGHT_POSITION * height,
+        1e-2 * ones, position * STD_WEIGHT_POSITION * height
+    ], axis=1)
+    std_velocity = np.stack([
+        velocity * STD_WEIGHT_VELOCITY * height, velocity * STD_WEIGHT_VELOCITY * height,
+        1e-5 * ones, velocity * STD_WEIGHT_VELOCITY * height
+    ], axis=1)
+    return std_position, std_velocity
+
+
+def initiate(measurements: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """State of new tracks, at rest, from their first `[cx, cy, aspect, height]` box"""
+    mean = np.concatenate([measurements, np.zeros((len(measurements), NDIM))], axis=1)
+    return mean, _blocks(*_std(measurements[:, 3], 2, 10))
+
+
+def predict(mean: np.ndarray, covariance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """States of the tracks one frame later"""
+    noise = _blocks(*_std(mean[:, 3], 1, 1))
+    mean = mean.copy()
+    mean[:, :NDIM] += mean[:, NDIM:]
+    # F P F^T with F = [[1, 1], [0, 1]] per coordinate
+    var_position = covariance[..., 0, 0]
+    cov_velocity = covariance[..., 0, 1]
+    var_velocity = covariance[..., 1, 1]
+    predicted = np.empty_like(covariance)
+    predicted[..., 0, 0] = var_position + 2 * cov_velocity + var_velocity
+    predicted[..., 0, 1] = predicted[..., 1, 0] = cov_velocity + var_velocity
+    predicted[..., 1, 1] = var_velocity
+    return mean, predicted + noise
+
+
+def project(mean: np.ndarray, covariance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """States of the tracks in measurement space, with the measurement noise: (N, 4) means and
+    (N, 4) variances, the measurement covariances being diagonal"""
+    height = mean[:, 3]
+    std = np.stack([
+        STD_WEIGHT_POSITION * height, STD_WEIGHT_POSITION * height,
+        np.full(len(mean), 1e-1), STD_WEIGHT_POSITION * height
+    ], axis=1)
+    return mean[:, :NDIM], covariance[..., 0, 0] + std * std
+
+
+def update(
+    mean: np.ndarray, covariance: np.ndarray, measurements: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """States of the tracks corrected by their matched `[cx, cy, aspect, height]` boxes"""
+    projected_mean, projected_variance = project(mean, covariance)
+    # gain = P H^T S^-1, a (2,) vector per coordinate
+    gain = covariance[..., :, 0] / projected_variance[..., None]
+    innovation = measurements - projected_mean
+    mean = mean + np.concatenate([gain[..., 0] * innovation, gain[..., 1] * innovation], axis=1)
+    # P - K S K^T
+    covariance = covariance - (
+        gain[..., :, None] * gain[..., None, :] * projected_variance[..., None, None]
+    )
+    return mean, covariance
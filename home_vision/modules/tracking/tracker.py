@@ -0,0 +1,230 @@
+"""Multi-object tracker in the ByteTrack style: the tracks are matched to the confident
+detections first, then the tracks left to the low score ones, which are often the occluded
+people, by the IoU of their Kalman filter predictions. The tracks are stored as arrays, one
+row per track, so a frame costs a few NumPy calls whatever the number of tracks."""
+from __future__ import annotations
+
+import logging
+from typing import Optional, Tuple, Type
+
+import numpy as np
+
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import BaseConfig, Module, ModuleInput, ModuleOutput
+from home_vision.utils.boxes import iou_matrix
+
+from . import kalman
+
+
+def match_greedy(similarity: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Match the rows and columns of a similarity matrix, best pairs first, only pairs above
+    `threshold`. The pairs that are each other's best are matched at once, which gives the
+    same matches as going through the pairs one by one in decreasing similarity.
+
+    Args:
+        similarity (np.ndarray): (N, M) similarity, e.g. IoU of tracks and detections
+        threshold (float): minimum similarity of a match
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: matched row and column indices
+    """
+    similarity = np.where(similarity >= threshold, similarity, -np.inf)
+    rows_matched, cols_matched = [], []
+    while similarity.size and np.isfinite(similarity).any():
+        best_cols = similarity.argmax(axis=1)
+        best_rows = similarity.argmax(axis=0)
+        rows = np.nonzero(
+            (best_rows[best_cols] == np.arange(len(similarity)))
+            & np.isfinite(similarity.max(axis=1))
+        )[0]
+        cols = best_cols[rows]
+        rows_matched.append(rows)
+        cols_matched.append(cols)
+        similarity[rows, :] = -np.inf
+        similarity[:, cols] = -np.inf
+    if not rows_matched:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows_matched), np.concatenate(cols_matched)
+
+
+class TrackerConfig(BaseConfig):
+    """Config for Tracker
+
+    Attributes:
+        high_threshold (float): score of the confident detections, matched first and
+            starting new tracks
+        low_threshold (float): minimum score of the detections matched to the tracks left
+        min_iou (float): minimum IoU of a track and a confident detection to match
+        min_iou_low (float): minimum IoU of a track and a low score detection to match
+        min_hits (int): matched frames before a new track is reported
+        max_age (int): frames a track is kept without a match, e.g. through an occlusion
+    """
+    high_threshold: Optional[float] = 0.5
+    low_threshold: Optional[float] = 0.1
+    min_iou: Optional[float] = 0.2
+    min_iou_low: Optional[float] = 0.5
+    min_hits: Optional[int] = 3
+    max_age: Optional[int] = 30
+
+class TrackerInput(ModuleInput):
+    """Tracker Input"""
+    detections: Detections
+
+class TrackerOutput(ModuleOutput):
+    """Tracker Output, the boxes of the tracks matched in the frame and their ids"""
+    tracks: Detections
+    track_ids: np.ndarray
+
+
+@Module.register('tracker')
+class Tracker(Module[TrackerInput, TrackerOutput, TrackerConfig]):
+    """Track the detections across frames with batched Kalman filters and IoU matching"""
+    input_types: Type[TrackerInput] = TrackerInput
+    output_types: Type[TrackerOutput] = TrackerOutput
+    config_type: Type[TrackerConfig] = TrackerConfig
+    module_name = 'Tracker'
+
+    def __init__(
+        self,
+        high_threshold: float = 0.5,
+        low_threshold: float = 0.1,
+        min_iou: float = 0.2,
+        min_iou_low: float = 0.5,
+        min_hits: int = 3,
+        max_age: int = 30
+    ):
+        self.high_threshold = high_threshold
+        self.low_threshold = low_threshold
+        self.min_iou = min_iou
+        self.min_iou_low = min_iou_low
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.frame_cnt = 0
+        self.next_id = 1
+        # one row per track
+        self.ids = np.empty(0, dtype=np.int64)
+        self.mean = np.empty((0, 8))
+        self.covariance = np.empty((0, 4, 2, 2))
+        self.scores = np.empty(0, dtype=np.float32)
+        self.class_ids = np.empty(0, dtype=np.int32)
+        self.hits = np.empty(0, dtype=np.int32)
+        self.misses = np.empty(0, dtype=np.int32)
+        self.confirmed = np.empty(0, dtype=bool)
+
+    @classmethod
+    def from_config(cls, config: TrackerConfig) -> Tracker:
+        logging.info('loading Tracker from config: %s', config)
+        return cls(
+            config.high_threshold, config.low_threshold, config.min_iou, config.min_iou_low,
+            config.min_hits, config.max_age
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def boxes(self) -> np.ndarray:
+        """`[xmin, ymin, xmax, ymax]` boxes of the tracks' current states, (N, 4)"""
+        return kalman.xyah_to_xyxy(self.mean)
+
+    def _select(self, keep: np.ndarray):
+        """Keep the tracks of a boolean mask or indices"""
+        self.ids = self.ids[keep]
+        self.mean = self.mean[keep]
+        self.covariance = self.covariance[keep]
+        self.scores = self.scores[keep]
+        self.class_ids = self.class_ids[keep]
+        self.hits = self.hits[keep]
+        self.misses = self.misses[keep]
+        self.confirmed = self.confirmed[keep]
+
+    def _update(self, tracks: np.ndarray, detections: Detections, indices: np.ndarray):
+        """Correct the matched tracks with their detections"""
+        if len(tracks) == 0:
+            return
+        self.mean[tracks], self.covariance[tracks] = kalman.update(
+            self.mean[tracks], self.covariance[tracks],
+            kalman.xyxy_to_xyah(detections.xyxy[indices])
+        )
+        self.scores[tracks] = detections.scores[indices]
+        self.class_ids[tracks] = detections.class_ids[indices]
+        self.hits[tracks] += 1
+        self.misses[tracks] = 0
+
+    def _add(self, detections: Detections):
+        """Start tracks from unmatched confident detections"""
+        num = len(detections)
+        if num == 0:
+            return
+        mean, covariance = kalman.initiate(kalman.xyxy_to_xyah(detections.xyxy))
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + num)])
+        self.next_id += num
+        self.mean = np.concatenate([self.mean, mean])
+        self.covariance = np.concatenate([self.covariance, covariance])
+        self.scores = np.concatenate([self.scores, detections.scores])
+        self.class_ids = np.concatenate([self.class_ids, detections.class_ids])
+        self.hits = np.concatenate([self.hits, np.ones(num, dtype=np.int32)])
+        self.misses = np.concatenate([self.misses, np.zeros(num, dtype=np.int32)])
+        # the tracks of the first frames are reported at once
+        self.confirmed = np.concatenate([
+            self.confirmed, np.full(num, self.min_hits <= 1 or self.frame_cnt <= self.min_hits)
+        ])
+
+    def update(self, detections: Detections) -> Tuple[Detections, np.ndarray]:
+        """Track the detections of a frame
+
+        Args:
+            detections (Detections): detections of the frame
+
+        Returns:
+            Tuple[Detections, np.ndarray]: boxes of the confirmed tracks matched in the frame,
+                with their scores and class ids, and their track ids
+        """
+        self.frame_cnt += 1
+        if len(self):
+            self.mean, self.covariance = kalman.predict(self.mean, self.covariance)
+        high = np.nonzero(detections.scores >= self.high_threshold)[0]
+        low = np.nonzero(
+            (detections.scores >= self.low_threshold) & (detections.scores < self.high_threshold)
+        )[0]
+
+        # confident detections against every track
+        track_boxes = self.boxes()
+        tracks, matched = match_greedy(
+            iou_matrix(track_boxes, detections.xyxy[high]), self.min_iou
+        )
+        self._update(tracks, detections, high[matched])
+        unmatched_high = np.ones(len(high), dtype=bool)
+        unmatched_high[matched] = False
+        matched_tracks = np.zeros(len(self), dtype=bool)
+        matched_tracks[tracks] = True
+
+        # low score detections against the confirmed tracks left
+        left = np.nonzero(self.confirmed & ~matched_tracks)[0]
+        if len(left) and len(low):
+            low_tracks, low_matched = match_greedy(
+                iou_matrix(track_boxes[left], detections.xyxy[low]), self.min_iou_low
+            )
+            self._update(left[low_tracks], detections, low[low_matched])
+            matched_tracks[left[low_tracks]] = True
+
+        # unmatched tracks age, the tentative ones are dropped at once
+        self.misses[~matched_tracks] += 1
+        self.confirmed |= self.hits >= self.min_hits
+        self._select((matched_tracks | self.confirmed) & (self.misses <= self.max_age))
+        self._add(detections[high[unmatched_high]])
+
+        active = np.nonzero((self.misses == 0) & self.confirmed)[0]
+        return (
+            Detections(self.boxes()[active], self.scores[active], self.class_ids[active]),
+            self.ids[active]
+        )
+
+    def reset(self):
+        """Drop all the tracks"""
+        self._select(np.zeros(len(self), dtype=bool))
+        self.frame_cnt = 0
+
+    def _process(self, inputs: TrackerInput) -> TrackerOutput:
+        """Track the detections of a frame"""
+        tracks, track_ids = self.update(inputs.detections)
+        return TrackerOutput.create(tracks=tracks, track_ids=track_ids)
@@ -0,0 +1,247 @@
+"""Zone and line crossing rules, e.g. the people entering the kitchen or going through the
+front door. The zones are rasterized once into masks of a downscaled grid and the lines into
+their equations, so that a frame checks all the people against all the rules with a gather in
+the masks and a product with the equations, whatever the number of zones."""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import cv2
+import numpy as np
+
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import BaseConfig, Module, ModuleInput, ModuleOutput
+from home_vision.utils.homography import foot_points
+
+ANCHORS = ('bottom', 'center')
+
+
+class ZoneConfig(BaseConfig):
+    """A polygon of the frame
+
+    Attributes:
+        name (str): name of the zone in the events
+        points (Tuple[Tuple[float, float], ...]): 3 or more `[x, y]` pixels of the polygon
+    """
+    name: str
+    points: Tuple[Tuple[float, float], ...]
+
+class LineConfig(BaseConfig):
+    """A segment of the frame, crossed `in` towards its right seen from its first point to its
+    second one on the frame, and `out` towards its left
+
+    Attributes:
+        name (str): name of the line in the events
+        points (Tuple[Tuple[float, float], Tuple[float, float]]): `[x, y]` pixels of its ends
+    """
+    name: str
+    points: Tuple[Tuple[float, float], Tuple[float, float]]
+
+class ZoneRulesConfig(BaseConfig):
+    """Config for Zone Rules
+
+    Attributes:
+        zones (Tuple[ZoneConfig, ...]): zones whose people are counted, entering and exiting
+        lines (Tuple[LineConfig, ...]): lines whose crossings are counted
+        anchor (str): point of a box that is in a zone or crosses a line, `bottom` center
+            where people stand or `center`
+        cell_size (int): pixels of the frame per cell side of the zone masks
+        max_age (int): frames a track not seen is kept, after which it exits its zones
+    """
+    zones: Optional[Tuple[ZoneConfig, ...]] = ()
+    lines: Optional[Tuple[LineConfig, ...]] = ()
+    anchor: Optional[str] = 'bottom'
+    cell_size: Optional[int] = 4
+    max_age: Optional[int] = 30
+
+class ZoneRulesInput(ModuleInput):
+    """Zone Rules Input, the people of a frame of `(height, width)` and their track ids if
+    tracked, only the tracked people enter, exit and cross"""
+    detections: Detections
+    frame_size: Tuple[int, int]
+    track_ids: Optional[np.ndarray] = None
+
+class ZoneRulesOutput(ModuleOutput):
+    """Zone Rules Output, the people in each zone and the events of the frame, each with its
+    `rule`, `type` (`enter`, `exit` or `cross`), `track_id` and `direction` of a crossing"""
+    zone_counts: List[int]
+    events: List[Dict[str, Any]]
+    event_indices: np.ndarray
+
+
+@Module.register('zone_rules')
+class ZoneRules(Module[ZoneRulesInput, ZoneRulesOutput, ZoneRulesConfig]):
+    """Check the people of the frames against zones and lines"""
+    input_types: Type[ZoneRulesInput] = ZoneRulesInput
+    output_types: Type[ZoneRulesOutput] = ZoneRulesOutput
+    config_type: Type[ZoneRulesConfig] = ZoneRulesConfig
+    module_name = 'Zone Rules'
+
+    def __init__(
+        self,
+        zones: Tuple[ZoneConfig, ...] = (),
+        lines: Tuple[LineConfig, ...] = (),
+        anchor: str = 'bottom',
+        cell_size: int = 4,
+        max_age: int = 30
+    ):
+        if anchor not in ANCHORS:
+            raise ValueError(f'anchor {anchor} not in {ANCHORS}')
+        names = [zone.name for zone in zones] + [line.name for line in lines]
+        if len(set(names)) != len(names):
+            raise ValueError(f'the zones and lines need different names, got {names}')
+        for zone in zones:
+            if len(zone.points) < 3:
+                raise ValueError(f'zone {zone.name} needs 3 or more points')
+        self.zone_names = [zone.name for zone in zones]
+        self.line_names = [line.name for line in lines]
+        self.polygons = [np.array(zone.points, dtype=np.float64) for zone in zones]
+        self.segments = np.array(
+            [line.points for line in lines], dtype=np.float64
+        ).reshape(-1, 2, 2)
+        # a * x + b * y + c of each line, positive on its right on the frame
+        start, end = self.segments[:, 0], self.segments[:, 1]
+        direction = end - start
+        self.equations = np.stack([
+            -direction[:, 1], direction[:, 0],
+            direction[:, 1] * start[:, 0] - direction[:, 0] * start[:, 1]
+        ], axis=1)
+        self.anchor = anchor
+        self.cell_size = cell_size
+        self.max_age = max_age
+        self.frame_size: Optional[Tuple[int, int]] = None
+        self.masks = np.zeros((len(zones), 0, 0), dtype=bool)
+        # tracks, one row per track: last anchor, zones it is in and last frame seen
+        self.track_ids = np.empty(0, dtype=np.int64)
+        self.points = np.empty((0, 2), dtype=np.float64)
+        self.inside = np.zeros((0, len(zones)), dtype=bool)
+        self.last_seen = np.empty(0, dtype=np.int64)
+        self.rows: Dict[int, int] = {}
+        self.totals: Dict[str, int] = {}
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: ZoneRulesConfig) -> ZoneRules:
+        logging.info('loading Zone Rules from config: %s', config)
+        return cls(config.zones, config.lines, config.anchor, config.cell_size, config.max_age)
+
+    def rasterize(self, frame_size: Tuple[int, int]):
+        """Masks of the zones on the grid of frames of `(height, width)`"""
+        height, width = frame_size
+        self.frame_size = (height, width)
+        rows, cols = -(-height // self.cell_size), -(-width // self.cell_size)
+        masks = np.zeros((len(self.polygons), rows, cols), dtype=np.uint8)
+        for mask, polygon in zip(masks, self.polygons):
+            # the cells whose center is in the polygon
+            cells = np.round(polygon / self.cell_size - 0.5).astype(np.int32)
+            cv2.fillPoly(mask, [cells], 1)
+        self.masks = masks.astype(bool)
+
+    def anchors(self, boxes: np.ndarray) -> np.ndarray:
+        """(N, 2) points of the boxes checked against the rules"""
+        if self.anchor == 'center':
+            return (boxes[:, :2] + boxes[:, 2:]) / 2
+        return foot_points(boxes)
+
+    def zones_of(self, points: np.ndarray) -> np.ndarray:
+        """(N, zones) whether each point is in each zone"""
+        cells = np.floor(points / self.cell_size).astype(np.int64)
+        rows, cols = self.masks.shape[1:]
+        valid = (cells[:, 0] >= 0) & (cells[:, 0] < cols) & (cells[:, 1] >= 0) \
+            & (cells[:, 1] < rows)
+        cells = cells[valid]
+        inside = np.zeros((len(points), len(self.masks)), dtype=bool)
+        inside[valid] = self.masks[:, cells[:, 1], cells[:, 0]].T
+        return inside
+
+    def crossings(self, previous: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """(N, lines) crossings of each line by the moves from `previous` to `points`, 1 `in`,
+        -1 `out` and 0 none"""
+        equations = self.equations
+        before = previous @ equations[:, :2].T + equations[:, 2] >= 0
+        after = points @ equations[:, :2].T + equations[:, 2] >= 0
+        # the ends of the line are on either side of the move
+        move = points - previous
+        ends = self.segments - previous[:, None, None]
+        sides = move[:, None, None, 0] * ends[..., 1] - move[:, None, None, 1] * ends[..., 0]
+        within = sides[..., 0] * sides[..., 1] <= 0
+        return np.where(before != after, np.where(after, 1, -1), 0) * within
+
+    def _event(self, events: List[Dict[str, Any]], rule: str, event: str, track_id: int,
+               **kwargs):
+        """Append an event and count it in the totals of its rule"""
+        events.append({'rule': rule, 'type': event, 'track_id': track_id, **kwargs})
+        key = f"{rule}:{kwargs.get('direction', event)}"
+        self.totals[key] = self.totals.get(key, 0) + 1
+
+    def _process(self, inputs: ZoneRulesInput) -> ZoneRulesOutput:
+        """Counts the people in each zone, and the tracks entering, exiting and crossing"""
+        self.cnt += 1
+        if self.frame_size != tuple(inputs.frame_size):
+            with self.timer('rasterize'):
+                self.rasterize(inputs.frame_size)
+        points = self.anchors(inputs.detections.xyxy.astype(np.float64))
+        with self.timer('zones'):
+            inside = self.zones_of(points)
+        zone_counts = inside.sum(axis=0).tolist()
+        if inputs.track_ids is None:
+            return ZoneRulesOutput.create(
+                zone_counts=zone_counts, events=[], event_indices=np.empty(0, dtype=np.int64)
+            )
+
+        track_ids = np.asarray(inputs.track_ids, dtype=np.int64)
+        rows = np.array(
+            [self.rows.get(track_id, -1) for track_id in track_ids.tolist()], dtype=np.int64
+        )
+        known = rows >= 0
+        with self.timer('rules'):
+            # a track first seen in a zone, e.g. at startup, was already there
+            was_inside = inside.copy()
+            was_inside[known] = self.inside[rows[known]]
+            crossings = np.zeros((len(points), len(self.line_names)), dtype=np.int64)
+            crossings[known] = self.crossings(self.points[rows[known]], points[known])
+
+        events: List[Dict[str, Any]] = []
+        event_indices = []
+        for index, zone in zip(*np.nonzero(inside & ~was_inside)):
+            self._event(events, self.zone_names[zone], 'enter', int(track_ids[index]))
+            event_indices.append(index)
+        for index, zone in zip(*np.nonzero(was_inside & ~inside)):
+            self._event(events, self.zone_names[zone], 'exit', int(track_ids[index]))
+            event_indices.append(index)
+        for index, line in zip(*np.nonzero(crossings)):
+            direction = 'in' if crossings[index, line] > 0 else 'out'
+            self._event(
+                events, self.line_names[line], 'cross', int(track_ids[index]), direction=direction
+            )
+            event_indices.append(index)
+
+        # update the tracks, add the new ones and drop the ones gone
+        self.points[rows[known]] = points[known]
+        self.inside[rows[known]] = inside[known]
+        new = ~known
+        rows[new] = np.arange(len(self.track_ids), len(self.track_ids) + new.sum())
+        self.track_ids = np.concatenate([self.track_ids, track_ids[new]])
+        self.points = np.concatenate([self.points, points[new]])
+        self.inside = np.concatenate([self.inside, inside[new]])
+        self.last_seen = np.concatenate([self.last_seen, np.zeros(new.sum(), dtype=np.int64)])
+        self.rows.update(zip(track_ids[new].tolist(), rows[new].tolist()))
+        self.last_seen[rows] = self.cnt
+        gone = self.cnt - self.last_seen > self.max_age
+        if gone.any():
+            for row, zone in zip(*np.nonzero(self.inside & gone[:, None])):
+                self._event(events, self.zone_names[zone], 'exit', int(self.track_ids[row]))
+            self._drop(~gone)
+        return ZoneRulesOutput.create(
+            zone_counts=zone_counts, events=events,
+            event_indices=np.unique(np.array(event_indices, dtype=np.int64))
+        )
+
+    def _drop(self, keep: np.ndarray):
+        """Keep the tracks of a boolean mask"""
+        self.track_ids = self.track_ids[keep]
+        self.points = self.points[keep]
+        self.inside = self.inside[keep]
+        self.last_seen = self.last_seen[keep]
+        self.rows = {track_id: row for row, track_id in enumerate(self.track_ids.tolist())}
@@ -1,6 +1,43 @@
-"""Import all HomeVision Solutions"""
+"""Declare all HomeVision Solutions, they are imported on first use"""
+import importlib
+
 from home_vision.modules.module_base import Module
-from .person_detection import PersonDetectionSolution
-from .object_detection import ObjectDetectionSolution
-from .raw_stream_solution import RawStreamSolution
-from .raw_datachannel_solution import RawDatachannelSolution
\ No newline at end of file
+from .solution_base import Solution
+
+SOLUTIONS = {
+    'person_detection_solution': 'home_vision.solutions.person_detection',
+    'person_tracking_solution': 'home_vision.solutions.person_tracking',
+    'room_projection_solution': 'home_vision.solutions.room_projection',
+    'action_recognition_solution': 'home_vision.solutions.action_recognition',
+    'reid_solution': 'home_vision.solutions.reid',
+    'heatmap_solution': 'home_vision.solutions.heatmap',
+    'zone_analytics_solution': 'home_vision.solutions.zone_analytics',
+    'object_detection_solution': 'home_vision.solutions.object_detection',
+    'raw_stream_solution': 'home_vision.solutions.raw_stream_solution',
+    'raw_datachannel_solution': 'home_vision.solutions.raw_datachannel_solution',
+    'graph_solution': 'home_vision.solutions.solution_graph',
+}
+_EXPORTS = {
+    'PersonDetectionSolution': SOLUTIONS['person_detection_solution'],
+    'PersonTrackingSolution': SOLUTIONS['person_tracking_solution'],
+    'RoomProjectionSolution': SOLUTIONS['room_projection_solution'],
+    'ActionRecognitionSolution': SOLUTIONS['action_recognition_solution'],
+    'ReIDSolution': SOLUTIONS['reid_solution'],
+    'HeatmapSolution': SOLUTIONS['heatmap_solution'],
+    'ZoneAnalyticsSolution': SOLUTIONS['zone_analytics_solution'],
+    'ObjectDetectionSolution': SOLUTIONS['object_detection_solution'],
+    'RawStreamSolution': SOLUTIONS['raw_stream_solution'],
+    'RawDatachannelSolution': SOLUTIONS['raw_datachannel_solution'],
+    'GraphSolution': SOLUTIONS['graph_solution'],
+}
+
+for solution_name, module_path in SOLUTIONS.items():
+    Solution.register_lazy(solution_name, module_path)
+    Module.register_lazy(solution_name, module_path)
+
+
+def __getattr__(name: str):
+    """Import the solution classes on first access"""
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
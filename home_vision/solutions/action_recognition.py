@@ -0,0 +1,96 @@
+"""HomeVision Action Recognition Solution"""
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.modules.action_recognition.action_recognizer import (ActionRecognizer,
+    ActionRecognizerConfig, ActionRecognizerInput)
+from home_vision.modules.module_base import Module, ModuleOutput
+from home_vision.modules.person_detection.person_detector import \
+    (PersonDetector,
+    PersonDetectorInput,
+    PersonDetectorConfig)
+from home_vision.modules.tracking.tracker import Tracker, TrackerConfig, TrackerInput
+from home_vision.utils.visualization import draw_actions
+
+from .solution_base import Solution, SolutionConfig, SolutionInput
+
+class ActionRecognitionSolutionConfig(SolutionConfig):
+    """Config for Action Recognition Solution
+
+    Attributes:
+        person_detector (PersonDetectorConfig): Person Detector module config
+        tracker (TrackerConfig): Tracker module config
+        action_recognizer (ActionRecognizerConfig): Action Recognizer module config
+    """
+    person_detector: PersonDetectorConfig = PersonDetectorConfig(
+        method='YOLOX', config={"gpu": True}
+    )
+    tracker: TrackerConfig = TrackerConfig()
+    action_recognizer: ActionRecognizerConfig = ActionRecognizerConfig()
+
+class ActionRecognitionSolutionOutput(ModuleOutput):
+    """Action Recognition Solution Output"""
+    bboxes: Detections
+    track_ids: np.ndarray
+    actions: List[List[str]]
+    action_scores: List[List[float]]
+    image: np.ndarray
+
+@Solution.register('action_recognition_solution')
+@Module.register('action_recognition_solution')
+class ActionRecognitionSolution(
+    Solution[SolutionInput, ActionRecognitionSolutionOutput, ActionRecognitionSolutionConfig]
+):
+    """HomeVision Solution that recognizes the actions of the people in a frame, e.g. falls"""
+    input_types: SolutionInput = SolutionInput
+    output_types: ActionRecognitionSolutionOutput = ActionRecognitionSolutionOutput
+    config_type: ActionRecognitionSolutionConfig = ActionRecognitionSolutionConfig
+    solution_name = "Action Recognition Solution"
+    module_name = solution_name
+
+    def __init__(
+        self, person_detector: PersonDetector, tracker: Tracker,
+        action_recognizer: ActionRecognizer
+    ):
+        self.person_detector = person_detector
+        self.tracker = tracker
+        self.action_recognizer = action_recognizer
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: ActionRecognitionSolutionConfig) -> ActionRecognitionSolution:
+        person_detector_cls: PersonDetector = Module.by_name('person_detector')
+        person_detector = person_detector_cls.from_config(config.person_detector)
+        tracker_cls: Tracker = Module.by_name('tracker')
+        tracker = tracker_cls.from_config(config.tracker)
+        action_recognizer_cls: ActionRecognizer = Module.by_name('action_recognizer')
+        action_recognizer = action_recognizer_cls.from_config(config.action_recognizer)
+        return cls(person_detector, tracker, action_recognizer)
+
+    def _process(self, inputs: SolutionInput) -> ActionRecognitionSolutionOutput:
+        """Detects and tracks all people in a frame and recognizes their actions"""
+        self.cnt += 1
+        image = inputs.image
+        raw_image = image.copy()
+        person_detector_output = self.person_detector.process(
+            PersonDetectorInput.create(image=raw_image)
+        )
+        tracker_output = self.tracker.process(
+            TrackerInput.create(detections=person_detector_output.detections)
+        )
+        action_output = self.action_recognizer.process(ActionRecognizerInput.create(
+            image=raw_image, tracks=tracker_output.tracks, track_ids=tracker_output.track_ids
+        ))
+        with self.timer('draw'):
+            image = draw_actions(
+                image, action_output.actions, action_output.action_scores,
+                tracker_output.tracks.boxes.tolist()
+            )
+        return ActionRecognitionSolutionOutput.create(
+            bboxes=tracker_output.tracks, track_ids=tracker_output.track_ids,
+            actions=action_output.actions, action_scores=action_output.action_scores,
+            image=image
+        )
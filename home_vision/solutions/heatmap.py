@@ -0,0 +1,126 @@
+"""HomeVision Heatmap Solution"""
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+import cv2
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import Module, ModuleOutput
+from home_vision.utils.heatmap import OccupancyHeatmap, colorize
+
+from .person_detection import PersonDetectionSolutionConfig
+from .solution_base import Solution, SolutionConfig, SolutionInput
+
+class HeatmapSolutionConfig(SolutionConfig):
+    """Config for Heatmap Solution
+
+    Attributes:
+        cell_size (int): pixels of the frame per cell side of the heatmap
+        half_life (float): frames after which the time spent in a cell counts for half
+        foot_ratio (float): bottom part of the height of a person's box that is their
+            footprint, 1 for the whole box
+        snapshot_interval (int): frames between two snapshots of the heatmap sent with the
+            results and drawn on the frames
+        checkpoint (str): `.npz` file the heatmap is saved to and restored from, set by the
+            SolutionManager, not saved when None
+        checkpoint_interval (int): frames between two checkpoints
+        opacity (float): opacity of the hottest cell over the frames
+        codec (bool): whether to stream the compressed video
+        detection_solution (PersonDetectionSolutionConfig): config of the person detection
+            solution the heatmap is chained to
+    """
+    cell_size: Optional[int] = 16
+    half_life: Optional[float] = 9000
+    foot_ratio: Optional[float] = 0.2
+    snapshot_interval: Optional[int] = 30
+    checkpoint: Optional[str] = None
+    checkpoint_interval: Optional[int] = 1800
+    opacity: Optional[float] = 0.6
+    codec: Optional[bool] = False
+    detection_solution: PersonDetectionSolutionConfig = PersonDetectionSolutionConfig()
+
+class HeatmapSolutionInput(SolutionInput):
+    """Heatmap Solution Input, the results of the chained detection solution"""
+    bboxes: Optional[Detections] = None
+
+class HeatmapSolutionOutput(ModuleOutput):
+    """Heatmap Solution Output, on the snapshot frames the heatmap as uint8 cells scaled to
+    its hottest cell, whose decayed frames occupied are `heatmap_peak`"""
+    heatmap: Optional[np.ndarray] = None
+    heatmap_peak: Optional[float] = None
+    image: np.ndarray
+
+@Solution.register('heatmap_solution')
+@Module.register('heatmap_solution')
+class HeatmapSolution(
+    Solution[HeatmapSolutionInput, HeatmapSolutionOutput, HeatmapSolutionConfig]
+):
+    """HomeVision Solution that accumulates where the people spend time in a heatmap. The
+    frames only add the footprints of their people, the heatmap is computed and colorized
+    on the snapshot frames"""
+    input_types: HeatmapSolutionInput = HeatmapSolutionInput
+    output_types: HeatmapSolutionOutput = HeatmapSolutionOutput
+    config_type: HeatmapSolutionConfig = HeatmapSolutionConfig
+    solution_name = "Heatmap Solution"
+    module_name = solution_name
+
+    def __init__(
+        self,
+        heatmap: OccupancyHeatmap,
+        snapshot_interval: int = 30,
+        checkpoint: Optional[str] = None,
+        checkpoint_interval: int = 1800,
+        opacity: float = 0.6
+    ):
+        self.heatmap = heatmap
+        self.snapshot_interval = snapshot_interval
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.opacity = opacity
+        # colors premultiplied by their opacity and transparency of the frame, per pixel
+        self.overlay: Optional[np.ndarray] = None
+        self.transparency: Optional[np.ndarray] = None
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: HeatmapSolutionConfig) -> HeatmapSolution:
+        heatmap = OccupancyHeatmap(config.cell_size, config.half_life, config.foot_ratio)
+        if config.checkpoint is not None and heatmap.load(config.checkpoint):
+            logging.info('heatmap restored from %s', config.checkpoint)
+        return cls(
+            heatmap, config.snapshot_interval, config.checkpoint, config.checkpoint_interval,
+            config.opacity
+        )
+
+    def close(self):
+        """Save the heatmap accumulated since the last checkpoint"""
+        if self.checkpoint is not None:
+            self.heatmap.save(self.checkpoint)
+
+    def _process(self, inputs: HeatmapSolutionInput) -> HeatmapSolutionOutput:
+        """Adds the people of a frame to the heatmap and draws its latest snapshot"""
+        self.cnt += 1
+        image = inputs.image
+        detections = Detections.empty() if inputs.bboxes is None else \
+            Detections.validate(inputs.bboxes)
+        frame_size = image.shape[:2]
+        with self.timer('accumulate'):
+            self.heatmap.add(detections.xyxy, frame_size)
+        heatmap, peak, grid = None, None, None
+        if self.cnt % self.snapshot_interval == 0 or self.overlay is None \
+                or self.overlay.shape[:2] != frame_size:
+            with self.timer('snapshot'):
+                grid = self.heatmap.grid()
+                peak = float(grid.max()) if grid.size else 0.0
+                heatmap = np.zeros(grid.shape, dtype=np.uint8) if peak <= 0 else \
+                    np.round(grid * (255 / peak)).astype(np.uint8)
+                self.overlay, self.transparency = colorize(grid, frame_size, self.opacity)
+        if self.checkpoint is not None and self.cnt % self.checkpoint_interval == 0:
+            with self.timer('checkpoint'):
+                self.heatmap.save(self.checkpoint, grid)
+        with self.timer('draw'):
+            cv2.multiply(image, self.transparency, dst=image, scale=1 / 255)
+            cv2.add(image, self.overlay, dst=image)
+        return HeatmapSolutionOutput.create(heatmap=heatmap, heatmap_peak=peak, image=image)
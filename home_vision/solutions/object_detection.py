@@ -3,13 +3,14 @@ from __future__ import annotations
 
 from typing import List
 
-import cv2
 import numpy as np
+from home_vision.common.detections import Detections
 from home_vision.modules.module_base import Module, ModuleOutput
 from home_vision.modules.object_detection.object_detector import \
     (ObjectDetector,
     ObjectDetectorInput,
     ObjectDetectorConfig)
+from home_vision.utils.visualization import draw_detections
 
 from .solution_base import Solution, SolutionConfig, SolutionInput
 
@@ -26,7 +27,7 @@ class ObjectDetectionSolutionConfig(SolutionConfig):
 class ObjectDetectionSolutionOutput(ModuleOutput):
     """Object Detection Solution Output"""
     class_names: List[str]
-    bboxes: List[List[int]]
+    bboxes: Detections
     image: np.ndarray
 
 @Solution.register('object_detection_solution')
@@ -58,18 +59,15 @@ class ObjectDetectionSolution(
         self.cnt += 1
         image = inputs.image
         raw_image = image.copy()
-        object_detector_output = self.object_detector.process(ObjectDetectorInput(image=raw_image))
-        object_bbox = object_detector_output.bbox
-        object_scores = object_detector_output.scores
+        object_detector_output = self.object_detector.process(
+            ObjectDetectorInput.create(image=raw_image)
+        )
+        detections = object_detector_output.detections
         class_names = object_detector_output.class_names
 
-        for k, bbox in enumerate(object_bbox):
-            bbox = list(map(int, bbox))
-            xmin, ymin, xmax, ymax = bbox
-            cv2.rectangle(image, (xmin, ymin), (xmax, ymax), (0, 0, 255), thickness=2)
-            cv2.putText(
-                image,class_names[k]+'_'+str(object_scores[k]),(xmin, ymin - 2),
-                cv2.FONT_HERSHEY_SIMPLEX,0.75,[255, 0, 0],thickness=2
-            )
-        outputs = ObjectDetectionSolutionOutput(bboxes=object_bbox, image=image, class_names=class_names)
+        with self.timer('draw'):
+            draw_detections(image, detections, class_names)
+        outputs = ObjectDetectionSolutionOutput.create(
+            bboxes=detections, image=image, class_names=class_names
+        )
         return outputs
@@ -1,15 +1,14 @@
 """HomeVision Person Detection Solution"""
 from __future__ import annotations
 
-from typing import List
-
-import cv2
 import numpy as np
+from home_vision.common.detections import Detections
 from home_vision.modules.module_base import Module, ModuleOutput
 from home_vision.modules.person_detection.person_detector import \
     (PersonDetector,
     PersonDetectorInput,
     PersonDetectorConfig)
+from home_vision.utils.visualization import draw_detections
 
 from .solution_base import Solution, SolutionConfig, SolutionInput
 
@@ -25,7 +24,7 @@ class PersonDetectionSolutionConfig(SolutionConfig):
 
 class PersonDetectionSolutionOutput(ModuleOutput):
     """Person Detection Solution Output"""
-    bboxes: List[List[int]]
+    bboxes: Detections
     image: np.ndarray
 
 @Solution.register('person_detection_solution')
@@ -57,19 +56,11 @@ class PersonDetectionSolution(
         self.cnt += 1
         image = inputs.image
         raw_image = image.copy()
-        person_detector_output = self.person_detector.process(PersonDetectorInput(image=raw_image))
-        person_bbox = person_detector_output.bbox
-        person_scores = person_detector_output.scores
-        if len(person_bbox) == 0:
-            outputs = PersonDetectionSolutionOutput(image=raw_image, bboxes=[])
-            return outputs
-        for k, bbox in enumerate(person_bbox):
-            bbox = list(map(int, bbox))
-            xmin, ymin, xmax, ymax = bbox
-            cv2.rectangle(image, (xmin, ymin), (xmax, ymax), (0, 0, 255), thickness=2)
-            cv2.putText(
-                image,str(person_scores[k]),(xmin, ymin - 2),
-                cv2.FONT_HERSHEY_SIMPLEX,0.75,[255, 0, 0],thickness=2
-            )
-        outputs = PersonDetectionSolutionOutput(bboxes=person_bbox, image=image)
+        person_detector_output = self.person_detector.process(
+            PersonDetectorInput.create(image=raw_image)
+        )
+        detections = person_detector_output.detections
+        with self.timer('draw'):
+            draw_detections(image, detections)
+        outputs = PersonDetectionSolutionOutput.create(bboxes=detections, image=image)
         return outputs
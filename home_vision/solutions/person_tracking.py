@@ -0,0 +1,74 @@
+"""HomeVision Person Tracking Solution"""
+from __future__ import annotations
+
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import Module, ModuleOutput
+from home_vision.modules.person_detection.person_detector import \
+    (PersonDetector,
+    PersonDetectorInput,
+    PersonDetectorConfig)
+from home_vision.modules.tracking.tracker import Tracker, TrackerConfig, TrackerInput
+from home_vision.utils.visualization import draw_tracks
+
+from .solution_base import Solution, SolutionConfig, SolutionInput
+
+class PersonTrackingSolutionConfig(SolutionConfig):
+    """Config for Person Tracking Solution
+
+    Attributes:
+        person_detector (PersonDetectorConfig): Person Detector module config
+        tracker (TrackerConfig): Tracker module config
+    """
+    person_detector: PersonDetectorConfig = PersonDetectorConfig(
+        method='YOLOX', config={"gpu": True}
+    )
+    tracker: TrackerConfig = TrackerConfig()
+
+class PersonTrackingSolutionOutput(ModuleOutput):
+    """Person Tracking Solution Output"""
+    bboxes: Detections
+    track_ids: np.ndarray
+    image: np.ndarray
+
+@Solution.register('person_tracking_solution')
+@Module.register('person_tracking_solution')
+class PersonTrackingSolution(
+    Solution[SolutionInput, PersonTrackingSolutionOutput, PersonTrackingSolutionConfig]
+):
+    """HomeVision Solution that detects people in a frame and follows them across frames"""
+    input_types: SolutionInput = SolutionInput
+    output_types: PersonTrackingSolutionOutput = PersonTrackingSolutionOutput
+    config_type: PersonTrackingSolutionConfig = PersonTrackingSolutionConfig
+    solution_name = "Person Tracking Solution"
+    module_name = solution_name
+
+    def __init__(self, person_detector: PersonDetector, tracker: Tracker):
+        self.person_detector = person_detector
+        self.tracker = tracker
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: PersonTrackingSolutionConfig) -> PersonTrackingSolution:
+        person_detector_cls: PersonDetector = Module.by_name('person_detector')
+        person_detector = person_detector_cls.from_config(config.person_detector)
+        tracker_cls: Tracker = Module.by_name('tracker')
+        tracker = tracker_cls.from_config(config.tracker)
+        return cls(person_detector, tracker)
+
+    def _process(self, inputs: SolutionInput) -> PersonTrackingSolutionOutput:
+        """Detects all people in a frame and matches them to their tracks"""
+        self.cnt += 1
+        image = inputs.image
+        raw_image = image.copy()
+        person_detector_output = self.person_detector.process(
+            PersonDetectorInput.create(image=raw_image)
+        )
+        tracker_output = self.tracker.process(
+            TrackerInput.create(detections=person_detector_output.detections)
+        )
+        with self.timer('draw'):
+            draw_tracks(image, tracker_output.tracks, tracker_output.track_ids)
+        return PersonTrackingSolutionOutput.create(
+            bboxes=tracker_output.tracks, track_ids=tracker_output.track_ids, image=image
+        )
@@ -60,5 +60,5 @@ class RawDatachannelSolution(Solution[SolutionInput, Dict, RawDatachannelSolutio
         frame_cnt = (self.cnt % len(self.messages))
         msg = json.loads(self.messages[frame_cnt - 1])
         outputs_dict = {**msg, 'image': inputs.image}
-        outputs = self.output_types(**outputs_dict)
+        outputs = self.output_types.create(**outputs_dict)
         return outputs
@@ -41,5 +41,5 @@ class RawStreamSolution(Solution[SolutionInput, RawStreamSolutionOutput, RawStre
 
     def _process(self, inputs: SolutionInput) -> RawStreamSolutionOutput:
         self.cnt += 1
-        outputs = RawStreamSolutionOutput(image=inputs.image)
+        outputs = RawStreamSolutionOutput.create(image=inputs.image)
         return outputs
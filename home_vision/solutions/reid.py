@@ -0,0 +1,130 @@
+"""HomeVision Re-Identification Solution"""
+from __future__ import annotations
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.common.gallery import EmbeddingGallery, GalleryClient
+from home_vision.modules.module_base import Module, ModuleOutput
+from home_vision.modules.person_detection.person_detector import \
+    (PersonDetector,
+    PersonDetectorInput,
+    PersonDetectorConfig)
+from home_vision.modules.reid.reid_embedder import (ReIDEmbedder, ReIDEmbedderConfig,
+    ReIDEmbedderInput)
+from home_vision.modules.tracking.tracker import Tracker, TrackerConfig, TrackerInput
+from home_vision.utils.visualization import draw_tracks
+
+from .solution_base import Solution, SolutionConfig, SolutionInput
+
+class ReIDSolutionConfig(SolutionConfig):
+    """Config for Re-Identification Solution
+
+    Attributes:
+        person_detector (PersonDetectorConfig): Person Detector module config
+        tracker (TrackerConfig): Tracker module config
+        reid_embedder (ReIDEmbedderConfig): ReID Embedder module config
+        gallery_url (Optional[str]): gallery of the SolutionManager shared by its cameras, set
+            by the manager, a gallery of this camera only when None
+        camera (Optional[str]): name of the camera in the gallery, set by the manager
+        threshold (float): minimum cosine similarity of the same person in the gallery of this
+            camera
+    """
+    person_detector: PersonDetectorConfig = PersonDetectorConfig(
+        method='YOLOX', config={"gpu": True}
+    )
+    tracker: TrackerConfig = TrackerConfig()
+    reid_embedder: ReIDEmbedderConfig = ReIDEmbedderConfig()
+    gallery_url: Optional[str] = None
+    camera: Optional[str] = 'camera'
+    threshold: Optional[float] = 0.6
+
+class ReIDSolutionOutput(ModuleOutput):
+    """Re-Identification Solution Output, the identity of each track, -1 while unknown"""
+    bboxes: Detections
+    track_ids: np.ndarray
+    identities: np.ndarray
+    image: np.ndarray
+
+@Solution.register('reid_solution')
+@Module.register('reid_solution')
+class ReIDSolution(Solution[SolutionInput, ReIDSolutionOutput, ReIDSolutionConfig]):
+    """HomeVision Solution that gives the same identity to a person across tracks and cameras"""
+    input_types: SolutionInput = SolutionInput
+    output_types: ReIDSolutionOutput = ReIDSolutionOutput
+    config_type: ReIDSolutionConfig = ReIDSolutionConfig
+    solution_name = "Re-Identification Solution"
+    module_name = solution_name
+
+    def __init__(
+        self, person_detector: PersonDetector, tracker: Tracker, reid_embedder: ReIDEmbedder,
+        gallery: Union[EmbeddingGallery, GalleryClient], camera: str = 'camera'
+    ):
+        self.person_detector = person_detector
+        self.tracker = tracker
+        self.reid_embedder = reid_embedder
+        self.gallery = gallery
+        self.camera = camera
+        self.identities: Dict[int, int] = {}
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: ReIDSolutionConfig) -> ReIDSolution:
+        person_detector_cls: PersonDetector = Module.by_name('person_detector')
+        person_detector = person_detector_cls.from_config(config.person_detector)
+        tracker_cls: Tracker = Module.by_name('tracker')
+        tracker = tracker_cls.from_config(config.tracker)
+        reid_embedder_cls: ReIDEmbedder = Module.by_name('reid_embedder')
+        reid_embedder = reid_embedder_cls.from_config(config.reid_embedder)
+        if config.gallery_url is None:
+            gallery = EmbeddingGallery(config.threshold)
+        else:
+            gallery = GalleryClient(config.gallery_url, config.camera)
+        return cls(person_detector, tracker, reid_embedder, gallery, config.camera)
+
+    def identify(self, track_ids: np.ndarray, embeddings: np.ndarray):
+        """Send the new embeddings of tracks to the gallery and collect their identities"""
+        if isinstance(self.gallery, GalleryClient):
+            if len(track_ids):
+                self.gallery.submit(track_ids.tolist(), embeddings)
+            self.identities.update(self.gallery.results())
+        elif len(track_ids):
+            identities = self.gallery.identify(self.camera, track_ids, embeddings)
+            self.identities.update(zip(track_ids.tolist(), identities.tolist()))
+        if len(self.identities) > len(self.reid_embedder.rows):
+            # forget the tracks the embedder dropped
+            self.identities = {
+                track_id: identity for track_id, identity in self.identities.items()
+                if track_id in self.reid_embedder.rows
+            }
+
+    def _process(self, inputs: SolutionInput) -> ReIDSolutionOutput:
+        """Detects and tracks all people in a frame and identifies the new and moved tracks"""
+        self.cnt += 1
+        image = inputs.image
+        raw_image = image.copy()
+        person_detector_output = self.person_detector.process(
+            PersonDetectorInput.create(image=raw_image)
+        )
+        tracker_output = self.tracker.process(
+            TrackerInput.create(detections=person_detector_output.detections)
+        )
+        track_ids = np.asarray(tracker_output.track_ids, dtype=np.int64)
+        reid_output = self.reid_embedder.process(ReIDEmbedderInput.create(
+            image=raw_image, tracks=tracker_output.tracks, track_ids=track_ids
+        ))
+        with self.timer('gallery'):
+            self.identify(
+                track_ids[reid_output.updated], reid_output.embeddings[reid_output.updated]
+            )
+        identities = np.array(
+            [self.identities.get(track_id, -1) for track_id in track_ids.tolist()],
+            dtype=np.int64
+        )
+        with self.timer('draw'):
+            draw_tracks(image, tracker_output.tracks, identities)
+        return ReIDSolutionOutput.create(
+            bboxes=tracker_output.tracks, track_ids=track_ids, identities=identities,
+            image=image
+        )
@@ -0,0 +1,143 @@
+"""HomeVision Room Projection Solution"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import Module, ModuleOutput
+from home_vision.utils.homography import FloorHomography, foot_points
+from home_vision.utils.visualization import create_unique_color_uchar
+
+from .person_tracking import PersonTrackingSolutionConfig
+from .solution_base import Solution, SolutionConfig, SolutionInput
+
+class RoomProjectionSolutionConfig(SolutionConfig):
+    """Config for Room Projection Solution
+
+    Attributes:
+        camera_points (Tuple[Tuple[float, float], ...]): 4 or more pixels of the camera on
+            the floor, e.g. the corners of a rug
+        floor_points (Tuple[Tuple[float, float], ...]): the same points on the floor plan
+        plan_size (Tuple[int, int]): width and height of the floor plan
+        floor_plan (str): image of the floor plan, the bird's-eye view of the camera's floor
+            if not set
+        refresh_interval (int): frames after which the floor plan is rendered again and the
+            trails cleared, 0 to never
+        codec (bool): whether to stream the compressed video
+        tracking_solution (PersonTrackingSolutionConfig): config of the person tracking
+            solution the room projection is chained to
+    """
+    camera_points: Optional[Tuple[Tuple[float, float], ...]] = (
+        (480, 540), (1440, 540), (1920, 1080), (0, 1080)
+    )
+    floor_points: Optional[Tuple[Tuple[float, float], ...]] = (
+        (0, 0), (600, 0), (600, 400), (0, 400)
+    )
+    plan_size: Optional[Tuple[int, int]] = (600, 400)
+    floor_plan: Optional[str] = None
+    refresh_interval: Optional[int] = 300
+    codec: Optional[bool] = False
+    tracking_solution: PersonTrackingSolutionConfig = PersonTrackingSolutionConfig()
+
+class RoomProjectionSolutionInput(SolutionInput):
+    """Room Projection Solution Input, the results of the chained tracking solution"""
+    bboxes: Optional[Detections] = None
+    track_ids: Optional[List[int]] = None
+
+class RoomProjectionSolutionOutput(ModuleOutput):
+    """Room Projection Solution Output"""
+    floor_positions: np.ndarray
+    track_ids: np.ndarray
+    image: np.ndarray
+
+@Solution.register('room_projection_solution')
+@Module.register('room_projection_solution')
+class RoomProjectionSolution(
+    Solution[RoomProjectionSolutionInput, RoomProjectionSolutionOutput,
+             RoomProjectionSolutionConfig]
+):
+    """HomeVision Solution that projects the tracked people on the floor plan of the room.
+    The floor plan and the trails of the people are kept in a canvas that each frame only
+    draws its new trail segments on"""
+    input_types: RoomProjectionSolutionInput = RoomProjectionSolutionInput
+    output_types: RoomProjectionSolutionOutput = RoomProjectionSolutionOutput
+    config_type: RoomProjectionSolutionConfig = RoomProjectionSolutionConfig
+    solution_name = "Room Projection Solution"
+    module_name = solution_name
+
+    def __init__(
+        self,
+        homography: FloorHomography,
+        floor_plan: Optional[np.ndarray] = None,
+        refresh_interval: int = 300
+    ):
+        self.homography = homography
+        self.floor_plan = floor_plan
+        self.refresh_interval = refresh_interval
+        self.canvas: Optional[np.ndarray] = None
+        self.rendered_at = 0
+        self.last_points: Dict[int, Tuple[int, int]] = {}
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: RoomProjectionSolutionConfig) -> RoomProjectionSolution:
+        homography = FloorHomography(config.camera_points, config.floor_points, config.plan_size)
+        floor_plan = None
+        if config.floor_plan is not None:
+            floor_plan = cv2.imread(config.floor_plan)
+            if floor_plan is None:
+                raise FileNotFoundError(f'cannot read the floor plan {config.floor_plan}')
+            floor_plan = cv2.resize(floor_plan, tuple(config.plan_size))
+        return cls(homography, floor_plan, config.refresh_interval)
+
+    def render_background(self, image: np.ndarray):
+        """Render the floor plan, or the bird's-eye view of the frame, and clear the trails"""
+        if self.floor_plan is not None:
+            self.canvas = self.floor_plan.copy()
+        else:
+            self.canvas = self.homography.warp(image)
+        self.rendered_at = self.cnt
+        self.last_points.clear()
+
+    def draw_trails(self, positions: np.ndarray, track_ids: np.ndarray):
+        """Extend the trail of each track on the canvas from its previous position"""
+        points = np.round(positions).astype(int).tolist()
+        for track_id, point in zip(track_ids.tolist(), points):
+            point = tuple(point)
+            previous = self.last_points.get(track_id)
+            if previous is not None and previous != point:
+                cv2.line(self.canvas, previous, point, create_unique_color_uchar(track_id), 2)
+            self.last_points[track_id] = point
+
+    def _process(self, inputs: RoomProjectionSolutionInput) -> RoomProjectionSolutionOutput:
+        """Projects the tracked people of a frame on the floor plan"""
+        self.cnt += 1
+        detections = Detections.empty() if inputs.bboxes is None else \
+            Detections.validate(inputs.bboxes)
+        if inputs.track_ids is None:
+            track_ids = np.full(len(detections), -1, dtype=np.int64)
+        else:
+            track_ids = np.asarray(inputs.track_ids, dtype=np.int64)
+        with self.timer('project'):
+            positions = self.homography.to_floor(foot_points(detections.xyxy))
+        with self.timer('draw'):
+            if self.canvas is None or (
+                self.refresh_interval and self.cnt - self.rendered_at >= self.refresh_interval
+            ):
+                self.render_background(inputs.image)
+            tracked = track_ids >= 0
+            self.draw_trails(positions[tracked], track_ids[tracked])
+            image = self.canvas.copy()
+            for track_id, (x, y) in zip(track_ids.tolist(), np.round(positions).astype(int)):
+                color = create_unique_color_uchar(max(track_id, 0))
+                cv2.circle(image, (int(x), int(y)), 6, color, -1)
+                if track_id >= 0:
+                    cv2.putText(
+                        image, str(track_id), (int(x) + 8, int(y) - 8), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.6, color, 2
+                    )
+        return RoomProjectionSolutionOutput.create(
+            floor_positions=positions, track_ids=track_ids, image=image
+        )
@@ -39,6 +39,26 @@ class Solution(Module[InputT, OutputT, ConfigT]):
     def from_config(cls, config: ConfigT) -> Solution:
         pass
 
+    def close(self):
+        """Release the solution once its server stops, e.g. save its state"""
+
+    def profile_report(self) -> str:
+        """Per-module latency breakdown as a text table, slowest phases first"""
+        rows = [
+            (path, phase, summary)
+            for path, entry in self.profile().items()
+            for phase, summary in entry['phases'].items()
+            if summary['count']
+        ]
+        rows.sort(key=lambda row: row[2]['mean_ms'] * row[2]['count'], reverse=True)
+        lines = [f"{'module':<60}{'phase':<14}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}"]
+        for path, phase, summary in rows:
+            lines.append(
+                f"{path:<60}{phase:<14}{summary['count']:>8}{summary['p50_ms']:>10.2f}"
+                f"{summary['p95_ms']:>10.2f}{summary['p99_ms']:>10.2f}"
+            )
+        return '\n'.join(lines)
+
     def draw_note(
         self, img_rd: np.ndarray, fps: float, frame_cnt: int
     ) -> None:
@@ -0,0 +1,297 @@
+"""HomeVision Solution Graph which composes modules as a DAG
+e.g. graph = input -> person_detector -\
+                   \-> object_detector --> outputs
+independent branches of the graph run in parallel on a thread pool, each node as soon as the
+nodes it depends on are done
+"""
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+from pydantic import (BaseModel, Field, create_model, #pylint: disable=no-name-in-module
+                      root_validator)
+from home_vision.common.exceptions import GraphError
+from home_vision.modules.module_base import Module, ModuleOutput
+
+from .solution_base import Solution, SolutionConfig, SolutionInput
+
+GRAPH_INPUT = 'input'
+
+
+def parse_ref(ref: str) -> Tuple[str, str]:
+    """Split a `<node>.<field>` reference"""
+    node, sep, field = ref.partition('.')
+    if not sep or not node or not field:
+        raise GraphError(f"'{ref}' is not a valid reference, expected '<node>.<field>'")
+    return node, field
+
+
+class GraphNodeConfig(BaseModel):
+    """Config for a node of a solution graph
+
+    Attributes:
+        name (str): unique name of the node, referenced by other nodes' inputs
+        module (str): registered module name, e.g. `person_detector`
+        config (Any): config of the module, parsed with the module's config type
+        inputs (Dict[str, str]): map of the module's input fields to `<node>.<field>`,
+            the solution input is referenced as `input.<field>`
+    """
+    name: str
+    module: str
+    config: Any = Field(default_factory=dict)
+    inputs: Dict[str, str]
+
+    class Config:
+        """Pydantic model config"""
+        frozen=True
+        extra='forbid'
+
+    @root_validator(pre=True)
+    def parse_module_config(cls, values): #pylint: disable=no-self-argument
+        """Parse the node config with the registered module's config type"""
+        config_type = Module.by_name(values['module']).config_type
+        config = values.get('config', {})
+        if not isinstance(config, config_type):
+            values['config'] = config_type(**config)
+        return values
+
+
+class SolutionGraphConfig(SolutionConfig):
+    """Config for Solution Graph
+
+    Attributes:
+        nodes (List[GraphNodeConfig]): modules of the graph
+        outputs (Dict[str, str]): map of solution output fields to `<node>.<field>`
+        max_workers (int): number of threads that run parallel branches
+    """
+    nodes: List[GraphNodeConfig] = [
+        GraphNodeConfig(
+            name='person', module='person_detector',
+            config={'method': 'YOLOX', 'config': {'gpu': True}},
+            inputs={'image': 'input.image'}
+        ),
+        GraphNodeConfig(
+            name='object', module='object_detector',
+            config={'method': 'YOLOV8', 'config': {'gpu': True}},
+            inputs={'image': 'input.image'}
+        ),
+    ]
+    outputs: Dict[str, str] = {
+        'person_bboxes': 'person.detections',
+        'object_bboxes': 'object.detections',
+        'class_names': 'object.class_names',
+    }
+    max_workers: Optional[int] = None
+
+    def __hash__(self):
+        return hash(self.json())
+
+
+class SolutionGraph:
+    """Executor of a DAG of modules. Every node is started as soon as the nodes it depends on
+    are done, so that a fast branch doesn't wait for a slow one, and every node output is
+    computed once per frame and shared by all its consumers.
+
+    Args:
+        nodes (Dict[str, Module]): modules by node name
+        inputs (Dict[str, Dict[str, str]]): inputs of each node, `{field: '<node>.<field>'}`
+        input_types (Type[BaseModel]): type of the graph input
+        max_workers (int): number of threads that run parallel branches
+    """
+    def __init__(
+        self,
+        nodes: Dict[str, Module],
+        inputs: Dict[str, Dict[str, str]],
+        input_types: Type[BaseModel] = SolutionInput,
+        max_workers: Optional[int] = None
+    ):
+        if GRAPH_INPUT in nodes:
+            raise GraphError(f"'{GRAPH_INPUT}' is reserved for the graph input")
+        self.nodes = nodes
+        self.input_types = input_types
+        self.inputs = {
+            name: {field: parse_ref(ref) for field, ref in node_inputs.items()}
+            for name, node_inputs in inputs.items()
+        }
+        self.depends: Dict[str, set] = {}
+        self.levels = self._sort()
+        self._check_wiring()
+        # nodes to start once a node is done
+        self.consumers: Dict[str, List[str]] = {name: [] for name in self.nodes}
+        for name, deps in self.depends.items():
+            for dep in deps:
+                self.consumers[dep].append(name)
+        width = max(len(level) for level in self.levels) if self.levels else 1
+        # nodes of different levels may run at once, e.g. a fast branch past a slow one
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or len(self.nodes), thread_name_prefix='solution_graph'
+        ) if width > 1 else None
+
+    @classmethod
+    def from_config(
+        cls,
+        node_configs: List[GraphNodeConfig],
+        input_types: Type[BaseModel] = SolutionInput,
+        max_workers: Optional[int] = None
+    ) -> SolutionGraph:
+        """Load every node's module from config and build the graph"""
+        nodes = {}
+        for node_config in node_configs:
+            if node_config.name in nodes:
+                raise GraphError(f"node '{node_config.name}' is defined twice")
+            nodes[node_config.name] = Module.by_name(node_config.module).from_config(
+                node_config.config
+            )
+        inputs = {node_config.name: node_config.inputs for node_config in node_configs}
+        return cls(nodes, inputs, input_types, max_workers)
+
+    def output_type(self, ref: str) -> Any:
+        """Type of the field referenced by `<node>.<field>`"""
+        node, field = parse_ref(ref)
+        if node == GRAPH_INPUT:
+            fields = self.input_types.__fields__
+        elif node in self.nodes:
+            fields = self.nodes[node].output_types.__fields__
+        else:
+            raise GraphError(f"node '{node}' doesn't exist")
+        if field not in fields:
+            raise GraphError(f"'{node}' has no output '{field}'")
+        return fields[field].outer_type_
+
+    def _sort(self) -> List[List[str]]:
+        """Group nodes into levels so that each node only depends on previous levels, the
+        nodes of a chain have a level each"""
+        depends = self.depends
+        for name in self.nodes:
+            if name not in self.inputs:
+                raise GraphError(f"inputs of node '{name}' are not defined")
+            depends[name] = {
+                node for node, _ in self.inputs[name].values() if node != GRAPH_INPUT
+            }
+        levels = []
+        done = set()
+        while len(done) < len(self.nodes):
+            level = [
+                name for name, deps in depends.items() if name not in done and deps <= done
+            ]
+            if not level:
+                pending = sorted(set(self.nodes) - done)
+                raise GraphError(f"nodes {pending} have a cycle or an unknown dependency")
+            levels.append(level)
+            done.update(level)
+        return levels
+
+    def _check_wiring(self):
+        """Validate once that every node input refers to an existing output field"""
+        for name, node_inputs in self.inputs.items():
+            input_fields = self.nodes[name].input_types.__fields__
+            for field, (node, ref_field) in node_inputs.items():
+                if field not in input_fields:
+                    raise GraphError(f"'{name}' has no input '{field}'")
+                self.output_type(f'{node}.{ref_field}')
+            missing = [
+                field for field, model_field in input_fields.items()
+                if model_field.required and field not in node_inputs
+            ]
+            if missing:
+                raise GraphError(f"inputs {missing} of '{name}' are not connected")
+
+    def _run_node(self, name: str, results: Dict[str, BaseModel]) -> ModuleOutput:
+        """Gather a node's inputs from the frame results and process them"""
+        module = self.nodes[name]
+        kwargs = {
+            field: getattr(results[node], ref_field)
+            for field, (node, ref_field) in self.inputs[name].items()
+        }
+        return module.process(module.input_types.create(**kwargs))
+
+    def run(self, inputs: BaseModel) -> Dict[str, BaseModel]:
+        """Run all nodes on one frame
+
+        Args:
+            inputs (BaseModel): graph input
+
+        Returns:
+            Dict[str, BaseModel]: output of every node of this frame, by node name
+        """
+        results = {GRAPH_INPUT: inputs}
+        if self.pool is None:
+            for level in self.levels:
+                for name in level:
+                    results[name] = self._run_node(name, results)
+            return results
+        # dependencies not done yet of each node, a node is submitted when it has none left
+        pending = {name: len(deps) for name, deps in self.depends.items()}
+        futures: Dict[Future, str] = {
+            self.pool.submit(self._run_node, name, results): name
+            for name in self.levels[0]
+        }
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures.pop(future)
+                results[name] = future.result()
+                for consumer in self.consumers[name]:
+                    pending[consumer] -= 1
+                    if pending[consumer] == 0:
+                        futures[self.pool.submit(self._run_node, consumer, results)] = consumer
+        return results
+
+    def close(self):
+        """Stop the threads of the parallel branches"""
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def resolve(self, results: Dict[str, BaseModel], ref: str) -> Any:
+        """Get the field referenced by `<node>.<field>` from the frame results"""
+        node, field = parse_ref(ref)
+        return getattr(results[node], field)
+
+
+class SolutionGraphOutput(ModuleOutput):
+    """Solution Graph Output, extended with the configured output fields"""
+    image: np.ndarray
+
+
+@Solution.register('graph_solution')
+@Module.register('graph_solution')
+class GraphSolution(Solution[SolutionInput, SolutionGraphOutput, SolutionGraphConfig]):
+    """HomeVision Solution that runs a declarative graph of modules"""
+    input_types: Type[SolutionInput] = SolutionInput
+    output_types: Type[SolutionGraphOutput] = SolutionGraphOutput
+    config_type: Type[SolutionGraphConfig] = SolutionGraphConfig
+    solution_name = "Graph Solution"
+    module_name = solution_name
+
+    def __init__(self, graph: SolutionGraph, outputs: Dict[str, str]):
+        self.graph = graph
+        self.outputs = outputs
+        self.cnt = 0
+        fields = {
+            field: (Optional[self.graph.output_type(ref)], None)
+            for field, ref in outputs.items()
+        }
+        self.output_types: Type[SolutionGraphOutput] = create_model(
+            "NewSolutionGraphOutput", __base__=SolutionGraphOutput, **fields
+        )
+
+    def submodules(self) -> Dict[str, Module]:
+        return dict(self.graph.nodes)
+
+    @classmethod
+    def from_config(cls, config: SolutionGraphConfig) -> GraphSolution:
+        graph = SolutionGraph.from_config(config.nodes, cls.input_types, config.max_workers)
+        return cls(graph, config.outputs)
+
+    def close(self):
+        """Stop the threads of the graph"""
+        self.graph.close()
+
+    def _process(self, inputs: SolutionInput) -> SolutionGraphOutput:
+        """Run the graph on a frame and collect the configured outputs"""
+        self.cnt += 1
+        results = self.graph.run(inputs)
+        outputs = {field: self.graph.resolve(results, ref) for field, ref in self.outputs.items()}
+        return self.output_types.create(image=inputs.image, **outputs)
@@ -0,0 +1,108 @@
+"""HomeVision Zone Analytics Solution"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+from home_vision.common.detections import Detections
+from home_vision.modules.module_base import Module, ModuleOutput
+from home_vision.modules.zones.zone_rules import ZoneRules, ZoneRulesConfig, ZoneRulesInput
+from home_vision.utils.visualization import draw_tracks
+
+from .person_tracking import PersonTrackingSolutionConfig
+from .solution_base import Solution, SolutionConfig, SolutionInput
+
+class ZoneAnalyticsSolutionConfig(SolutionConfig):
+    """Config for Zone Analytics Solution
+
+    Attributes:
+        zone_rules (ZoneRulesConfig): Zone Rules module config, the zones and lines
+        codec (bool): whether to stream the compressed video
+        tracking_solution (PersonTrackingSolutionConfig): config of the person tracking
+            solution the zone analytics is chained to
+    """
+    zone_rules: ZoneRulesConfig = ZoneRulesConfig()
+    codec: Optional[bool] = False
+    tracking_solution: PersonTrackingSolutionConfig = PersonTrackingSolutionConfig()
+
+class ZoneAnalyticsSolutionInput(SolutionInput):
+    """Zone Analytics Solution Input, the results of the chained tracking solution"""
+    bboxes: Optional[Detections] = None
+    track_ids: Optional[List[int]] = None
+
+class ZoneAnalyticsSolutionOutput(ModuleOutput):
+    """Zone Analytics Solution Output, the people in each zone, the events of the frame with
+    the boxes of their people and the events counted per rule since the start"""
+    zone_counts: List[int]
+    events: List[Dict[str, Any]]
+    event_bboxes: Detections
+    totals: Dict[str, int]
+    image: np.ndarray
+
+@Solution.register('zone_analytics_solution')
+@Module.register('zone_analytics_solution')
+class ZoneAnalyticsSolution(
+    Solution[ZoneAnalyticsSolutionInput, ZoneAnalyticsSolutionOutput,
+             ZoneAnalyticsSolutionConfig]
+):
+    """HomeVision Solution that counts the tracked people in zones, entering and exiting them
+    and crossing lines"""
+    input_types: ZoneAnalyticsSolutionInput = ZoneAnalyticsSolutionInput
+    output_types: ZoneAnalyticsSolutionOutput = ZoneAnalyticsSolutionOutput
+    config_type: ZoneAnalyticsSolutionConfig = ZoneAnalyticsSolutionConfig
+    solution_name = "Zone Analytics Solution"
+    module_name = solution_name
+
+    def __init__(self, zone_rules: ZoneRules):
+        self.zone_rules = zone_rules
+        self.polygons = [np.round(polygon).astype(np.int32) for polygon in zone_rules.polygons]
+        self.segments = np.round(zone_rules.segments).astype(int).tolist()
+        self.cnt = 0
+
+    @classmethod
+    def from_config(cls, config: ZoneAnalyticsSolutionConfig) -> ZoneAnalyticsSolution:
+        zone_rules_cls: ZoneRules = Module.by_name('zone_rules')
+        zone_rules = zone_rules_cls.from_config(config.zone_rules)
+        return cls(zone_rules)
+
+    def draw(self, image: np.ndarray, zone_counts: List[int]):
+        """Draw the zones, green when empty and red when occupied, and the lines with their
+        counts"""
+        totals = self.zone_rules.totals
+        for polygon, name, count in zip(self.polygons, self.zone_rules.zone_names, zone_counts):
+            color = (0, 0, 255) if count else (0, 255, 0)
+            cv2.polylines(image, [polygon], True, color, 2)
+            x, y = polygon[0]
+            cv2.putText(
+                image, f'{name}: {count}', (int(x), int(y) - 8), cv2.FONT_HERSHEY_SIMPLEX,
+                0.8, color, 2
+            )
+        for (start, end), name in zip(self.segments, self.zone_rules.line_names):
+            cv2.line(image, tuple(start), tuple(end), (0, 255, 255), 2)
+            label = f"{name}: {totals.get(f'{name}:in', 0)} in {totals.get(f'{name}:out', 0)} out"
+            cv2.putText(
+                image, label, (start[0], start[1] - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                (0, 255, 255), 2
+            )
+
+    def _process(self, inputs: ZoneAnalyticsSolutionInput) -> ZoneAnalyticsSolutionOutput:
+        """Checks the tracked people of a frame against the zones and lines"""
+        self.cnt += 1
+        image = inputs.image
+        detections = Detections.empty() if inputs.bboxes is None else \
+            Detections.validate(inputs.bboxes)
+        track_ids = None if inputs.track_ids is None else \
+            np.asarray(inputs.track_ids, dtype=np.int64)
+        rules_output = self.zone_rules.process(ZoneRulesInput.create(
+            detections=detections, frame_size=image.shape[:2], track_ids=track_ids
+        ))
+        with self.timer('draw'):
+            if track_ids is not None:
+                draw_tracks(image, detections, track_ids)
+            self.draw(image, rules_output.zone_counts)
+        return ZoneAnalyticsSolutionOutput.create(
+            zone_counts=rules_output.zone_counts, events=rules_output.events,
+            event_bboxes=detections[rules_output.event_indices],
+            totals=dict(self.zone_rules.totals), image=image
+        )
@@ -0,0 +1,104 @@
+"""Pairwise overlap of bounding boxes: the N x M matrices of a set of tracks or zones against
+the detections of a frame, computed by broadcasting rather than one pair at a time"""
+import numpy as np
+
+
+def as_boxes(boxes) -> np.ndarray:
+    """`[xmin, ymin, xmax, ymax]` boxes as a float64 (N, 4) array, from an array, a list of
+    boxes or a single box"""
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def box_area(boxes) -> np.ndarray:
+    """Areas of (N, 4) boxes, 0 for degenerate boxes"""
+    boxes = as_boxes(boxes)
+    return (
+        np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    )
+
+
+def intersection_matrix(boxes1, boxes2) -> np.ndarray:
+    """Intersection areas of (N, 4) and (M, 4) boxes, (N, M)"""
+    boxes1 = as_boxes(boxes1)[:, None, :]
+    boxes2 = as_boxes(boxes2)[None, :, :]
+    width = np.minimum(boxes1[..., 2], boxes2[..., 2]) - np.maximum(boxes1[..., 0], boxes2[..., 0])
+    height = np.minimum(boxes1[..., 3], boxes2[..., 3]) - np.maximum(boxes1[..., 1], boxes2[..., 1])
+    return np.clip(width, 0, None) * np.clip(height, 0, None)
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise division, 0 where the denominator is 0"""
+    return np.divide(
+        numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0
+    )
+
+
+def iou_matrix(boxes1, boxes2) -> np.ndarray:
+    """Intersection over Union of every pair of boxes
+
+    Args:
+        boxes1: (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+        boxes2: (M, 4) `[xmin, ymin, xmax, ymax]` boxes
+
+    Returns:
+        np.ndarray: (N, M) IoU, in [0, 1]
+    """
+    intersection = intersection_matrix(boxes1, boxes2)
+    union = box_area(boxes1)[:, None] + box_area(boxes2)[None, :] - intersection
+    return _divide(intersection, union)
+
+
+def ioa_matrix(boxes1, boxes2) -> np.ndarray:
+    """Intersection over Area of every pair of boxes, the area of the smaller box of the pair,
+    1 when a box is inside the other
+
+    Args:
+        boxes1: (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+        boxes2: (M, 4) `[xmin, ymin, xmax, ymax]` boxes
+
+    Returns:
+        np.ndarray: (N, M) IoA, in [0, 1]
+    """
+    intersection = intersection_matrix(boxes1, boxes2)
+    area = np.minimum(box_area(boxes1)[:, None], box_area(boxes2)[None, :])
+    return _divide(intersection, area)
+
+
+def giou_matrix(boxes1, boxes2) -> np.ndarray:
+    """Generalized Intersection over Union of every pair of boxes: the IoU minus the part of
+    their enclosing box that neither covers, so that disjoint boxes still rank by distance
+
+    Args:
+        boxes1: (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+        boxes2: (M, 4) `[xmin, ymin, xmax, ymax]` boxes
+
+    Returns:
+        np.ndarray: (N, M) GIoU, in [-1, 1]
+    """
+    intersection = intersection_matrix(boxes1, boxes2)
+    union = box_area(boxes1)[:, None] + box_area(boxes2)[None, :] - intersection
+    boxes1 = as_boxes(boxes1)[:, None, :]
+    boxes2 = as_boxes(boxes2)[None, :, :]
+    enclosing = (
+        (np.maximum(boxes1[..., 2], boxes2[..., 2]) - np.minimum(boxes1[..., 0], boxes2[..., 0]))
+        * (np.maximum(boxes1[..., 3], boxes2[..., 3]) - np.minimum(boxes1[..., 1], boxes2[..., 1]))
+    )
+    return _divide(intersection, union) - _divide(enclosing - union, enclosing)
+
+
+def paired_iou(boxes1, boxes2) -> np.ndarray:
+    """Intersection over Union of the boxes of two (N, 4) arrays, row by row, e.g. of the
+    tracks and their boxes on the previous frame
+
+    Args:
+        boxes1: (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+        boxes2: (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+
+    Returns:
+        np.ndarray: (N,) IoU, in [0, 1]
+    """
+    boxes1, boxes2 = as_boxes(boxes1), as_boxes(boxes2)
+    width = np.minimum(boxes1[:, 2], boxes2[:, 2]) - np.maximum(boxes1[:, 0], boxes2[:, 0])
+    height = np.minimum(boxes1[:, 3], boxes2[:, 3]) - np.maximum(boxes1[:, 1], boxes2[:, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    return _divide(intersection, box_area(boxes1) + box_area(boxes2) - intersection)
@@ -0,0 +1,148 @@
+"""Batched crops of the boxes of a frame for the second stage models (attributes, re-ID,
+action): every crop is resized into one reusable buffer, the normalization is a single
+operation over the whole batch and the resizes run on a thread pool for large batches"""
+import concurrent.futures
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class Crops(NamedTuple):
+    """Crops of N boxes
+
+    Attributes:
+        patches (np.ndarray): (N, H, W, 3) uint8 BGR patches or (N, 3, H, W) float32
+            normalized RGB ones
+        boxes (np.ndarray): (N, 4) int `[xmin, ymin, xmax, ymax]` pixels cropped, the boxes
+            clipped to the frame
+        scales (np.ndarray): (N, 2) patch pixels per frame pixel along x and y, 0 for the
+            boxes outside the frame, whose patches are black
+    """
+    patches: np.ndarray
+    boxes: np.ndarray
+    scales: np.ndarray
+
+    def to_image(self, points: np.ndarray) -> np.ndarray:
+        """(N, K, 2) patch points, e.g. keypoints, to frame pixels"""
+        scales = np.where(self.scales > 0, self.scales, 1)
+        return self.boxes[:, None, :2] + np.asarray(points) / scales[:, None, :]
+
+
+class RoiCropper:
+    """Crop, resize and normalize the boxes of a frame into reused buffers. The returned
+    patches are views of the buffers, valid until the next call
+
+    Args:
+        size (Tuple[int, int]): height and width of the patches
+        mean (Sequence[float], optional): RGB mean of the normalization, in [0, 1].
+            Defaults to the ImageNet mean.
+        std (Sequence[float], optional): RGB standard deviation of the normalization.
+            Defaults to the ImageNet standard deviation.
+        workers (int, optional): threads resizing the crops. Defaults to 4.
+        parallel_threshold (int, optional): crops from which the resizes are split across
+            the threads. Defaults to 32.
+    """
+    def __init__(
+        self,
+        size: Tuple[int, int],
+        mean: Sequence[float] = IMAGENET_MEAN,
+        std: Sequence[float] = IMAGENET_STD,
+        workers: int = 4,
+        parallel_threshold: int = 32
+    ):
+        self.size = tuple(size)
+        std = np.asarray(std, dtype=np.float32)
+        # (x / 255 - mean) / std as one multiply and subtract, per RGB channel
+        self.scale = (1 / (255 * std))[:, None, None]
+        self.offset = (np.asarray(mean, dtype=np.float32) / std)[:, None, None]
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self.pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self.staging = np.empty((0, *self.size, 3), dtype=np.uint8)
+        self.buffer = np.empty((0, 3, *self.size), dtype=np.float32)
+
+    def _reserve(self, num: int):
+        """Grow the buffers to `num` crops, doubling so that they are rarely reallocated"""
+        if num > len(self.staging):
+            capacity = max(num, 2 * len(self.staging))
+            self.staging = np.empty((capacity, *self.size, 3), dtype=np.uint8)
+            self.buffer = np.empty((capacity, 3, *self.size), dtype=np.float32)
+
+    def _resize(self, image: np.ndarray, boxes: List[List[int]], indices: range):
+        """Resize the crops of some of the boxes into the staging buffer"""
+        height, width = self.size
+        for index in indices:
+            xmin, ymin, xmax, ymax = boxes[index]
+            if xmax <= xmin or ymax <= ymin:
+                self.staging[index] = 0
+                continue
+            cv2.resize(
+                image[ymin:ymax, xmin:xmax], (width, height), dst=self.staging[index],
+                interpolation=cv2.INTER_LINEAR
+            )
+
+    def crop(self, image: np.ndarray, boxes: np.ndarray) -> Crops:
+        """Resized BGR crops of the boxes
+
+        Args:
+            image (np.ndarray): BGR frame
+            boxes (np.ndarray): (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+
+        Returns:
+            Crops: (N, H, W, 3) uint8 patches with their boxes and scales
+        """
+        boxes = np.round(np.asarray(boxes, dtype=np.float64).reshape(-1, 4)).astype(np.int64)
+        frame_height, frame_width = image.shape[:2]
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, frame_width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, frame_height)
+        sizes = (boxes[:, 2:] - boxes[:, :2]).astype(np.float64)
+        scales = np.divide(
+            np.array(self.size[::-1], dtype=np.float64), sizes, out=np.zeros_like(sizes),
+            where=(sizes > 0).all(axis=1, keepdims=True)
+        )
+        num = len(boxes)
+        self._reserve(num)
+        box_list = boxes.tolist()
+        if num >= self.parallel_threshold and self.workers > 1:
+            if self.pool is None:
+                self.pool = concurrent.futures.ThreadPoolExecutor(self.workers)
+            # cv2.resize releases the GIL, the chunks run in parallel
+            chunk = -(-num // self.workers)
+            futures = [
+                self.pool.submit(
+                    self._resize, image, box_list, range(start, min(start + chunk, num))
+                )
+                for start in range(0, num, chunk)
+            ]
+            for future in futures:
+                future.result()
+        else:
+            self._resize(image, box_list, range(num))
+        return Crops(self.staging[:num], boxes, scales)
+
+    def __call__(self, image: np.ndarray, boxes: np.ndarray) -> Crops:
+        """Resized and normalized RGB crops of the boxes, the input batch of a model
+
+        Args:
+            image (np.ndarray): BGR frame
+            boxes (np.ndarray): (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+
+        Returns:
+            Crops: (N, 3, H, W) float32 patches with their boxes and scales
+        """
+        crops = self.crop(image, boxes)
+        batch = self.buffer[:len(crops.boxes)]
+        # (N, H, W, BGR) to (N, RGB, H, W)
+        np.multiply(crops.patches.transpose(0, 3, 1, 2)[:, ::-1], self.scale, out=batch)
+        batch -= self.offset
+        return Crops(batch, crops.boxes, crops.scales)
+
+    def close(self):
+        """Stop the resize threads"""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
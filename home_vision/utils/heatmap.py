@@ -0,0 +1,161 @@
+"""Occupancy heatmap of a camera, accumulated frame by frame with exponential decay. The grid
+is kept as its 2D difference array: a footprint only adds its 4 corners and the decay is a
+growing weight of the new footprints, so that a frame costs O(boxes) and the grid, a double
+cumulative sum, O(grid) whatever the history"""
+import os
+import tempfile
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class OccupancyHeatmap:
+    """Decayed time spent by the people in each cell of a downscaled grid of the frame
+
+    Args:
+        cell_size (int, optional): pixels of the frame per cell side. Defaults to 16.
+        half_life (float, optional): frames after which an occupancy counts for half.
+            Defaults to 9000.
+        foot_ratio (float, optional): bottom part of the height of a box that is its
+            footprint, 1 for the whole box. Defaults to 0.2.
+    """
+    def __init__(self, cell_size: int = 16, half_life: float = 9000, foot_ratio: float = 0.2):
+        self.cell_size = cell_size
+        self.decay = 0.5 ** (1 / half_life)
+        self.foot_ratio = foot_ratio
+        self.frame_size: Optional[Tuple[int, int]] = None
+        # the grid is the double cumulative sum of `diff` divided by `weight`
+        self.diff = np.zeros((0, 0), dtype=np.float32)
+        self.weight = 1.0
+        self.frames = 0
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Rows and columns of the grid"""
+        return self.diff.shape[0] - 1, self.diff.shape[1] - 1
+
+    def reset(self, frame_size: Tuple[int, int]):
+        """Clear the grid of frames of `(height, width)`"""
+        height, width = frame_size
+        self.frame_size = (height, width)
+        self.diff = np.zeros(
+            (-(-height // self.cell_size) + 1, -(-width // self.cell_size) + 1), dtype=np.float32
+        )
+        self.weight = 1.0
+        self.frames = 0
+
+    def cells(self, boxes: np.ndarray) -> np.ndarray:
+        """(N, 4) `[col0, row0, col1, row1]` cells covered by the footprints of the boxes, at
+        least one cell per box inside the frame"""
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        footprints = boxes.copy()
+        footprints[:, 1] = boxes[:, 3] - self.foot_ratio * (boxes[:, 3] - boxes[:, 1])
+        rows, cols = self.shape
+        cells = np.empty((len(boxes), 4), dtype=np.int64)
+        cells[:, :2] = np.floor(footprints[:, :2] / self.cell_size)
+        cells[:, 2:] = np.maximum(np.ceil(footprints[:, 2:] / self.cell_size), cells[:, :2] + 1)
+        cells[:, [0, 2]] = np.clip(cells[:, [0, 2]], 0, cols)
+        cells[:, [1, 3]] = np.clip(cells[:, [1, 3]], 0, rows)
+        return cells
+
+    def add(self, boxes: np.ndarray, frame_size: Tuple[int, int]):
+        """Decay the grid by one frame and add the footprints of the boxes of the frame
+
+        Args:
+            boxes (np.ndarray): (N, 4) `[xmin, ymin, xmax, ymax]` boxes
+            frame_size (Tuple[int, int]): `(height, width)` of the frame
+        """
+        if self.frame_size != tuple(frame_size):
+            self.reset(frame_size)
+        self.frames += 1
+        # decaying the grid is weighting the new footprints more, rescaled before overflowing
+        self.weight /= self.decay
+        if self.weight > 1e6:
+            self.diff /= self.weight
+            self.weight = 1.0
+        cells = self.cells(boxes)
+        cells = cells[(cells[:, 2] > cells[:, 0]) & (cells[:, 3] > cells[:, 1])]
+        if len(cells) == 0:
+            return
+        col0, row0, col1, row1 = cells.T
+        weight = np.float32(self.weight)
+        np.add.at(self.diff, (row0, col0), weight)
+        np.add.at(self.diff, (row0, col1), -weight)
+        np.add.at(self.diff, (row1, col0), -weight)
+        np.add.at(self.diff, (row1, col1), weight)
+
+    def grid(self) -> np.ndarray:
+        """(rows, cols) float32 decayed frames each cell was occupied"""
+        grid = np.cumsum(np.cumsum(self.diff[:-1, :-1], axis=0, dtype=np.float64), axis=1)
+        grid /= self.weight
+        # the rounding errors of the differences must not turn empty cells negative
+        return np.maximum(grid, 0, out=grid).astype(np.float32)
+
+    def load_grid(self, grid: np.ndarray, frame_size: Tuple[int, int]):
+        """Continue from a grid, e.g. of a checkpoint"""
+        self.reset(frame_size)
+        grid = np.asarray(grid, dtype=np.float32)
+        if grid.shape != self.shape:
+            raise ValueError(f'grid of {grid.shape} cells, the frames have {self.shape}')
+        self.diff[:-1, :-1] += grid
+        self.diff[1:, :-1] -= grid
+        self.diff[:-1, 1:] -= grid
+        self.diff[1:, 1:] += grid
+
+    def save(self, path: str, grid: Optional[np.ndarray] = None):
+        """Write the grid to a `.npz` checkpoint, replaced atomically
+
+        Args:
+            path (str): path of the checkpoint
+            grid (Optional[np.ndarray], optional): grid already computed. Defaults to None.
+        """
+        if self.frame_size is None:
+            return
+        grid = self.grid() if grid is None else grid
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=directory, suffix='.npz', delete=False) as file:
+            np.savez(
+                file, grid=grid, frame_size=np.array(self.frame_size),
+                cell_size=self.cell_size, frames=self.frames
+            )
+        os.replace(file.name, path)
+
+    def load(self, path: str) -> bool:
+        """Continue from a checkpoint of the same frame size and cell size
+
+        Returns:
+            bool: False if the checkpoint doesn't exist or doesn't match
+        """
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as checkpoint:
+            if int(checkpoint['cell_size']) != self.cell_size:
+                return False
+            self.load_grid(checkpoint['grid'], tuple(checkpoint['frame_size'].tolist()))
+            self.frames = int(checkpoint['frames'])
+        return True
+
+
+def colorize(grid: np.ndarray, frame_size: Tuple[int, int],
+             opacity: float = 0.6) -> Tuple[np.ndarray, np.ndarray]:
+    """Color and transparency of a heatmap over frames, the hottest cell at `opacity`
+
+    Args:
+        grid (np.ndarray): (rows, cols) heatmap
+        frame_size (Tuple[int, int]): `(height, width)` of the frames
+        opacity (float, optional): opacity of the hottest cell. Defaults to 0.6.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: BGR colors premultiplied by their opacity and the
+        transparency of the frame, both (height, width, 3) uint8
+    """
+    height, width = frame_size
+    peak = grid.max() if grid.size else 0
+    heat = np.zeros_like(grid, dtype=np.uint8) if peak <= 0 else \
+        (grid * (255 / peak)).astype(np.uint8)
+    heat = cv2.resize(heat, (width, height), interpolation=cv2.INTER_LINEAR)
+    alpha = cv2.cvtColor((heat * opacity).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+    colors = cv2.multiply(cv2.applyColorMap(heat, cv2.COLORMAP_JET), alpha, scale=1 / 255)
+    return colors, cv2.subtract(np.full_like(alpha, 255), alpha)
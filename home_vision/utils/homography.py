@@ -0,0 +1,78 @@
+"""Homography between a camera and the floor plan of its room, computed once from the
+calibration points with its inverse and the remap tables of the bird's-eye view, so that a
+frame only costs a `cv2.perspectiveTransform` of its points or a `cv2.remap` of its image"""
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+class FloorHomography:
+    """Projection of camera pixels on the floor plan of a room
+
+    Args:
+        camera_points (Sequence[Sequence[float]]): 4 or more `[x, y]` pixels of the camera on
+            the floor
+        floor_points (Sequence[Sequence[float]]): the same points on the floor plan
+        plan_size (Tuple[int, int]): `(width, height)` of the floor plan
+    """
+    def __init__(
+        self,
+        camera_points: Sequence[Sequence[float]],
+        floor_points: Sequence[Sequence[float]],
+        plan_size: Tuple[int, int]
+    ):
+        camera_points = np.asarray(camera_points, dtype=np.float64).reshape(-1, 2)
+        floor_points = np.asarray(floor_points, dtype=np.float64).reshape(-1, 2)
+        if len(camera_points) < 4 or len(camera_points) != len(floor_points):
+            raise ValueError(
+                'the homography needs the same 4 or more points on the camera and the floor, '
+                f'got {len(camera_points)} and {len(floor_points)}'
+            )
+        matrix, _ = cv2.findHomography(camera_points, floor_points)
+        if matrix is None:
+            raise ValueError('the calibration points give no homography, are 3 of them aligned?')
+        self.matrix: np.ndarray = matrix
+        self.inverse: np.ndarray = np.linalg.inv(matrix)
+        self.plan_size = tuple(plan_size)
+        self._maps: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @staticmethod
+    def _transform(points: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        """(N, 2) points through a homography, in one call"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return np.empty((0, 2))
+        return cv2.perspectiveTransform(points, matrix).reshape(-1, 2)
+
+    def to_floor(self, points: np.ndarray) -> np.ndarray:
+        """(N, 2) camera pixels to floor plan points"""
+        return self._transform(points, self.matrix)
+
+    def to_image(self, points: np.ndarray) -> np.ndarray:
+        """(N, 2) floor plan points to camera pixels"""
+        return self._transform(points, self.inverse)
+
+    def maps(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Remap tables of the bird's-eye view: the camera pixel of every floor plan pixel,
+        computed on first use in the fixed point format `cv2.remap` is fastest with"""
+        if self._maps is None:
+            width, height = self.plan_size
+            grid_x, grid_y = np.meshgrid(
+                np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32)
+            )
+            grid = np.stack([grid_x, grid_y], axis=-1).reshape(-1, 1, 2)
+            pixels = cv2.perspectiveTransform(grid, self.inverse).reshape(height, width, 2)
+            self._maps = cv2.convertMaps(pixels, None, cv2.CV_16SC2)
+        return self._maps
+
+    def warp(self, image: np.ndarray) -> np.ndarray:
+        """Bird's-eye view of the floor in a camera image, floor plan sized"""
+        map1, map2 = self.maps()
+        return cv2.remap(image, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+
+
+def foot_points(boxes: np.ndarray) -> np.ndarray:
+    """(N, 2) bottom centers of (N, 4) `[xmin, ymin, xmax, ymax]` boxes, where people stand"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1)
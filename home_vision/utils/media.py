@@ -0,0 +1,275 @@
+"""Decoding options of the video sources: codec threads, keyframe only decoding and
+downscaling to the inference resolution as part of the pixel format conversion"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+if TYPE_CHECKING:
+    import av
+    from aiortc.contrib.media import MediaPlayer
+
+
+def fit_size(
+    width: int, height: int, max_width: Optional[int] = None, max_height: Optional[int] = None
+) -> Tuple[int, int]:
+    """Largest size with the aspect ratio of the frame that fits in `max_width` x `max_height`,
+    frames are only downscaled and keep even sizes for the video encoders
+
+    Args:
+        width (int): frame width
+        height (int): frame height
+        max_width (Optional[int], optional): maximum width. Defaults to None, no limit.
+        max_height (Optional[int], optional): maximum height. Defaults to None, no limit.
+
+    Returns:
+        Tuple[int, int]: width and height
+    """
+    scale = min(
+        max_width / width if max_width else 1.0,
+        max_height / height if max_height else 1.0,
+        1.0
+    )
+    if scale == 1.0:
+        return width, height
+    return max(int(width * scale) // 2 * 2, 2), max(int(height * scale) // 2 * 2, 2)
+
+
+def configure_decoder(
+    stream: av.video.stream.VideoStream, threads: int = 0, skip_non_keyframes: bool = False
+):
+    """Set the decoding options of a PyAV video stream before its first packet is decoded
+
+    Args:
+        stream (av.video.stream.VideoStream): video stream
+        threads (int, optional): decoding threads, 0 lets FFmpeg decide. Defaults to 0.
+        skip_non_keyframes (bool, optional): decode the keyframes only. Defaults to False.
+    """
+    codec_context = stream.codec_context
+    codec_context.thread_type = 'AUTO'
+    codec_context.thread_count = threads
+    if skip_non_keyframes:
+        codec_context.skip_frame = 'NONKEY'
+
+
+def open_player(
+    source: str, loop: bool = False, threads: int = 0, skip_non_keyframes: bool = False
+) -> MediaPlayer:
+    """`MediaPlayer` with the decoding options set on its video stream
+
+    Args:
+        source (str): video file or stream url
+        loop (bool, optional): repeat a video file. Defaults to False.
+        threads (int, optional): decoding threads, 0 lets FFmpeg decide. Defaults to 0.
+        skip_non_keyframes (bool, optional): decode the keyframes only. Defaults to False.
+
+    Returns:
+        MediaPlayer: player, it decodes in its worker thread once its track is received
+    """
+    from aiortc.contrib.media import MediaPlayer #pylint: disable=import-outside-toplevel
+    player = MediaPlayer(source, loop=loop)
+    container = player_container(player)
+    if container is None:
+        logging.warning(
+            'the MediaPlayer of this aiortc version has no container, %s is decoded with the '
+            'default options', source
+        )
+        return player
+    for stream in container.streams.video[:1]:
+        configure_decoder(stream, threads, skip_non_keyframes)
+    return player
+
+
+def player_container(player: MediaPlayer) -> Optional[av.container.InputContainer]:
+    """PyAV container of a `MediaPlayer`, its streams are only decoded once the player started.
+    The player doesn't expose it, so this is None if its private attribute is gone"""
+    import av #pylint: disable=import-outside-toplevel,redefined-outer-name
+    container = getattr(player, '_MediaPlayer__container', None)
+    if isinstance(container, PacketTap):
+        container = container.container
+    return container if isinstance(container, av.container.InputContainer) else None
+
+
+class PacketTap:
+    """Container of a `MediaPlayer` that hands the packets of its video stream to a callback as
+    the player demuxes them, so that the encoded packets are read from the player's session
+    rather than by opening the source a second time
+
+    Args:
+        container (av.container.InputContainer): container of the player
+        callback (Callable[[av.Packet], None]): called with each packet of the video stream,
+            from the player's worker thread
+    """
+    def __init__(
+        self, container: av.container.InputContainer, callback: Callable[[av.Packet], None]
+    ):
+        self.container = container
+        self.callback = callback
+        self.stream = container.streams.video[0]
+
+    def decode(self, *args, **kwargs) -> Iterator[av.frame.Frame]:
+        """`InputContainer.decode`, the player's worker decodes its frames with it"""
+        for packet in self.container.demux(*args, **kwargs):
+            if packet.size and packet.stream.index == self.stream.index:
+                self.callback(packet)
+            yield from packet.decode()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.container, name)
+
+
+def tap_player(player: MediaPlayer, callback: Callable[[av.Packet], None]) -> PacketTap:
+    """Hand the packets of the player's video stream to `callback`, before the player started
+
+    Args:
+        player (MediaPlayer): player that is not started yet
+        callback (Callable[[av.Packet], None]): called with each packet of the video stream,
+            from the player's worker thread
+
+    Raises:
+        RuntimeError: the player has no video stream or its container is out of reach
+
+    Returns:
+        PacketTap: the container the player now demuxes from
+    """
+    container = player_container(player)
+    if container is None or not container.streams.video:
+        raise RuntimeError('the packets of this MediaPlayer can not be tapped')
+    tap = PacketTap(container, callback)
+    setattr(player, '_MediaPlayer__container', tap)
+    return tap
+
+
+def frame_to_bgr(
+    frame: av.VideoFrame, max_width: Optional[int] = None, max_height: Optional[int] = None
+) -> np.ndarray:
+    """Convert a decoded frame to a BGR image, downscaled to fit `max_width` x `max_height` by
+    the same swscale pass as the pixel format conversion
+
+    Args:
+        frame (av.VideoFrame): decoded frame
+        max_width (Optional[int], optional): maximum width. Defaults to None, no limit.
+        max_height (Optional[int], optional): maximum height. Defaults to None, no limit.
+
+    Returns:
+        np.ndarray: BGR image
+    """
+    width, height = fit_size(frame.width, frame.height, max_width, max_height)
+    if (width, height) == (frame.width, frame.height):
+        return frame.to_ndarray(format='bgr24')
+    return frame.to_ndarray(format='bgr24', width=width, height=height, interpolation='AREA')
+
+
+def resize_bgr(
+    image: np.ndarray, max_width: Optional[int] = None, max_height: Optional[int] = None
+) -> np.ndarray:
+    """Downscale a BGR image to fit `max_width` x `max_height`"""
+    height, width = image.shape[:2]
+    size = fit_size(width, height, max_width, max_height)
+    if size == (width, height):
+        return image
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+class AVCapture:
+    """`cv2.VideoCapture` like reader of a video file or stream decoded by PyAV, for the decoding
+    options OpenCV does not expose such as keyframe only decoding
+
+    Args:
+        source (str): video file or stream url
+        threads (int, optional): decoding threads, 0 lets FFmpeg decide. Defaults to 0.
+        skip_non_keyframes (bool, optional): decode the keyframes only. Defaults to False.
+        max_width (Optional[int], optional): maximum width of the frames. Defaults to None.
+        max_height (Optional[int], optional): maximum height of the frames. Defaults to None.
+    """
+    def __init__(
+        self,
+        source: str,
+        threads: int = 0,
+        skip_non_keyframes: bool = False,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None
+    ):
+        import av #pylint: disable=import-outside-toplevel
+        self.container = av.open(source)
+        self.decode_error = av.FFmpegError
+        self.stream = self.container.streams.video[0]
+        configure_decoder(self.stream, threads, skip_non_keyframes)
+        self.frames = self.container.decode(self.stream)
+        self.max_width = max_width
+        self.max_height = max_height
+        self.size = fit_size(
+            self.stream.codec_context.width, self.stream.codec_context.height, max_width,
+            max_height
+        )
+        self.opened = True
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Equivalent to cv2.VideoCapture.read"""
+        try:
+            frame = next(self.frames)
+        except (StopIteration, self.decode_error):
+            self.opened = False
+            return False, None
+        return True, frame_to_bgr(frame, self.max_width, self.max_height)
+
+    def get(self, prop_id: int) -> float:
+        """Equivalent to cv2.VideoCapture.get for the frame size, count and rate"""
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.size[0])
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.size[1])
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.stream.frames)
+        if prop_id == cv2.CAP_PROP_FPS:
+            return float(self.stream.average_rate or 0)
+        return 0.0
+
+    def set(self, prop_id: int, value: float) -> bool: #pylint: disable=unused-argument
+        """Equivalent to cv2.VideoCapture.set, the decoding options are set when opened"""
+        return False
+
+    def isOpened(self) -> bool: #pylint: disable=invalid-name
+        """Equivalent to cv2.VideoCapture.isOpened"""
+        return self.opened
+
+    def release(self):
+        """Equivalent to cv2.VideoCapture.release"""
+        self.opened = False
+        self.container.close()
+
+
+def open_capture(
+    source: Union[str, int],
+    threads: int = 0,
+    skip_non_keyframes: bool = False,
+    max_width: Optional[int] = None,
+    max_height: Optional[int] = None
+) -> Union[cv2.VideoCapture, AVCapture]:
+    """Open a camera index with `cv2.VideoCapture`, requesting the maximum size from the camera
+    driver, and a video file or stream with `cv2.VideoCapture` on the FFmpeg backend, or with
+    `AVCapture` for keyframe only decoding
+
+    Args:
+        source (Union[str, int]): camera index, video file or stream url
+        threads (int, optional): decoding threads, 0 lets FFmpeg decide. Defaults to 0.
+        skip_non_keyframes (bool, optional): decode the keyframes only. Defaults to False.
+        max_width (Optional[int], optional): maximum width of the frames. Defaults to None.
+        max_height (Optional[int], optional): maximum height of the frames. Defaults to None.
+
+    Returns:
+        Union[cv2.VideoCapture, AVCapture]: opened capture
+    """
+    if isinstance(source, int):
+        cap = cv2.VideoCapture(source)
+        if max_width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, max_width)
+        if max_height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, max_height)
+        return cap
+    if skip_non_keyframes:
+        return AVCapture(source, threads, skip_non_keyframes, max_width, max_height)
+    return cv2.VideoCapture(source, cv2.CAP_FFMPEG, [cv2.CAP_PROP_N_THREADS, threads])
@@ -0,0 +1,315 @@
+"""Synthetic stand-in ONNX models with the signatures of the HomeVision detectors, action
+recognizer and re-ID embedder
+
+The models have random weights, their outputs are valid shaped and ranged detector
+outputs (boxes inside the input, scores in [0, 1]) so the whole detection path runs.
+The compute cost is set with the number and width of the full resolution convolutions.
+
+    python -m home_vision.utils.synthetic_models --model_dir models --cost 2
+"""
+import argparse
+import os
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+OPSET = 13
+# oldest IR version accepted by the onnxruntime versions supported by the repo
+IR_VERSION = 8
+STRIDES = (8, 16, 32)
+# input shapes used by `YOLOX` for each model type
+YOLOX_INPUT_SHAPES = {
+    'tiny': (608, 1088),
+    's': (608, 1088),
+    'm': (800, 1440),
+    'l': (800, 1440),
+}
+# clip of the action recognizer: frames, height and width of the person patches
+ACTION_CLIP_SHAPE = (8, 112, 112)
+ACTIONS = ('stand', 'sit', 'walk', 'lie', 'fall')
+# person patches of the re-ID embedder: height and width
+REID_INPUT_SHAPE = (256, 128)
+
+
+class _GraphBuilder:
+    """Collect nodes and random initializers of a detector graph"""
+
+    def __init__(self, seed: int):
+        self.rng = np.random.default_rng(seed)
+        self.nodes: List[onnx.NodeProto] = []
+        self.initializers: List[onnx.TensorProto] = []
+
+    def constant(self, name: str, value: np.ndarray) -> str:
+        """Add an initializer, returns its name"""
+        self.initializers.append(numpy_helper.from_array(value, name))
+        return name
+
+    def node(self, op_type: str, inputs: List[str], name: str, **attrs) -> str:
+        """Add a node with a single output named after it, returns the output"""
+        self.nodes.append(helper.make_node(op_type, inputs, [name], name=name, **attrs))
+        return name
+
+    def conv(self, x: str, in_channels: int, out_channels: int, kernel: int, name: str) -> str:
+        """Add a same padded convolution with random weights and bias"""
+        weight = self.rng.normal(
+            0, 1 / np.sqrt(in_channels * kernel * kernel),
+            (out_channels, in_channels, kernel, kernel)
+        ).astype(np.float32)
+        bias = self.rng.normal(0, 0.1, out_channels).astype(np.float32)
+        return self.node(
+            'Conv',
+            [x, self.constant(f'{name}.weight', weight), self.constant(f'{name}.bias', bias)],
+            name, kernel_shape=[kernel, kernel], pads=[kernel // 2] * 4
+        )
+
+    def head(self, x: str, channels: int, out_channels: int) -> str:
+        """Pool the features at every stride, predict `out_channels` per anchor point and
+        concatenate the points: [1, out_channels, num_points]"""
+        outputs = []
+        shape = self.constant('head.shape', np.array([1, out_channels, -1], dtype=np.int64))
+        for stride in STRIDES:
+            pooled = self.node(
+                'AveragePool', [x], f'pool{stride}', kernel_shape=[stride, stride],
+                strides=[stride, stride]
+            )
+            pred = self.conv(pooled, channels, out_channels, 1, f'head{stride}')
+            outputs.append(self.node('Reshape', [pred, shape], f'flat{stride}'))
+        return self.node('Concat', outputs, 'points', axis=2)
+
+    def backbone(self, x: str, cost: int, channels: int) -> str:
+        """`cost` full resolution 3x3 convolutions"""
+        in_channels = 3
+        for layer in range(max(cost, 1)):
+            x = self.conv(x, in_channels, channels, 3, f'conv{layer}')
+            x = self.node('Relu', [x], f'relu{layer}')
+            in_channels = channels
+        return x
+
+    def model(
+        self, input_name: str, input_shape: Sequence, output_name: str,
+        output_shape: Sequence
+    ) -> onnx.ModelProto:
+        """Checked model of the collected nodes with a single float input and output"""
+        graph = helper.make_graph(
+            self.nodes, 'synthetic',
+            [helper.make_tensor_value_info(input_name, TensorProto.FLOAT, list(input_shape))],
+            [helper.make_tensor_value_info(output_name, TensorProto.FLOAT, list(output_shape))],
+            self.initializers
+        )
+        model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', OPSET)])
+        model.ir_version = IR_VERSION
+        onnx.checker.check_model(model)
+        return model
+
+
+def num_points(input_shape: Tuple[int, int]) -> int:
+    """Number of anchor points of a detector with strides 8, 16 and 32"""
+    height, width = input_shape
+    return sum((height // stride) * (width // stride) for stride in STRIDES)
+
+
+def make_yolov8_model(
+    input_shape: Tuple[int, int] = (640, 640),
+    num_classes: int = 80,
+    cost: int = 1,
+    channels: int = 8,
+    seed: int = 0
+) -> onnx.ModelProto:
+    """YOLOv8 signature: `images` [1, 3, H, W] -> `output0` [1, 4 + classes, points]
+    with xywh boxes in input pixels followed by class scores
+
+    Args:
+        input_shape (Tuple[int, int], optional): height and width. Defaults to (640, 640).
+        num_classes (int, optional): number of classes. Defaults to 80.
+        cost (int, optional): number of full resolution convolutions. Defaults to 1.
+        channels (int, optional): width of the convolutions. Defaults to 8.
+        seed (int, optional): seed of the random weights. Defaults to 0.
+
+    Returns:
+        onnx.ModelProto: synthetic model
+    """
+    height, width = input_shape
+    out_channels = 4 + num_classes
+    builder = _GraphBuilder(seed)
+    x = builder.backbone('images', cost, channels)
+    x = builder.node('Sigmoid', [builder.head(x, channels, out_channels)], 'sigmoid')
+    scale = np.ones((1, out_channels, 1), dtype=np.float32)
+    scale[0, :4, 0] = (width, height, width / 4, height / 4)
+    builder.node('Mul', [x, builder.constant('scale', scale)], 'output0')
+    return builder.model(
+        'images', (1, 3, height, width), 'output0', (1, out_channels, num_points(input_shape))
+    )
+
+
+def make_yolox_model(
+    input_shape: Tuple[int, int] = (608, 1088),
+    num_classes: int = 1,
+    cost: int = 1,
+    channels: int = 8,
+    seed: int = 0
+) -> onnx.ModelProto:
+    """YOLOX signature: `images` [1, 3, H, W] -> `output` [1, points, 5 + classes]
+    with grid xy offsets, log wh, objectness and class scores, decoded by `demo_postprocess`
+
+    Args:
+        input_shape (Tuple[int, int], optional): height and width. Defaults to (608, 1088).
+        num_classes (int, optional): number of classes. Defaults to 1.
+        cost (int, optional): number of full resolution convolutions. Defaults to 1.
+        channels (int, optional): width of the convolutions. Defaults to 8.
+        seed (int, optional): seed of the random weights. Defaults to 0.
+
+    Returns:
+        onnx.ModelProto: synthetic model
+    """
+    height, width = input_shape
+    out_channels = 5 + num_classes
+    builder = _GraphBuilder(seed)
+    x = builder.backbone('images', cost, channels)
+    # per point objectness prior so that a few dozen points pass a 0.5 threshold
+    # whatever the image, like a detector seeing a few objects
+    offset = np.zeros((1, out_channels, num_points(input_shape)), dtype=np.float32)
+    offset[0, 4] = builder.rng.normal(-3.5, 1, offset.shape[2])
+    offset[0, 5:] = 3
+    x = builder.node('Add', [builder.head(x, channels, out_channels), builder.constant(
+        'offset', offset
+    )], 'logits')
+    x = builder.node('Sigmoid', [x], 'sigmoid')
+    scale = np.ones((1, out_channels, 1), dtype=np.float32)
+    # wh = exp(log_wh) * stride, up to ~20 strides
+    scale[0, 2:4, 0] = 3
+    x = builder.node('Mul', [x, builder.constant('scale', scale)], 'scaled')
+    builder.node('Transpose', [x], 'output', perm=[0, 2, 1])
+    return builder.model(
+        'images', (1, 3, height, width), 'output', (1, num_points(input_shape), out_channels)
+    )
+
+
+def make_action_model(
+    clip_shape: Tuple[int, int, int] = ACTION_CLIP_SHAPE,
+    num_classes: int = len(ACTIONS),
+    channels: int = 8,
+    seed: int = 0
+) -> onnx.ModelProto:
+    """Action recognizer signature: `clips` [batch, 3, T, H, W] -> `scores` [batch, classes]
+    with softmax scores of the actions, the batch dimension is dynamic
+
+    Args:
+        clip_shape (Tuple[int, int, int], optional): frames, height and width of the clips.
+            Defaults to (8, 112, 112).
+        num_classes (int, optional): number of actions. Defaults to 5.
+        channels (int, optional): width of the 3D convolution. Defaults to 8.
+        seed (int, optional): seed of the random weights. Defaults to 0.
+
+    Returns:
+        onnx.ModelProto: synthetic model
+    """
+    builder = _GraphBuilder(seed)
+    weight = builder.rng.normal(0, 1 / np.sqrt(3 * 27), (channels, 3, 3, 3, 3)).astype(np.float32)
+    x = builder.node(
+        'Conv', ['clips', builder.constant('conv.weight', weight)], 'conv',
+        kernel_shape=[3, 3, 3], pads=[1] * 6, strides=[1, 2, 2]
+    )
+    x = builder.node('Relu', [x], 'relu')
+    x = builder.node('ReduceMean', [x], 'pool', axes=[2, 3, 4], keepdims=0)
+    fc_weight = builder.rng.normal(0, 1, (channels, num_classes)).astype(np.float32)
+    x = builder.node('MatMul', [x, builder.constant('fc.weight', fc_weight)], 'fc')
+    builder.node('Softmax', [x], 'scores', axis=1)
+    return builder.model(
+        'clips', ('batch', 3, *clip_shape), 'scores', ('batch', num_classes)
+    )
+
+
+def make_reid_model(
+    input_shape: Tuple[int, int] = REID_INPUT_SHAPE,
+    embedding_size: int = 128,
+    channels: int = 8,
+    seed: int = 0
+) -> onnx.ModelProto:
+    """Re-ID embedder signature: `images` [batch, 3, H, W] -> `embeddings` [batch, size],
+    a function of the appearance of the patch, the batch dimension is dynamic
+
+    Args:
+        input_shape (Tuple[int, int], optional): height and width of the patches.
+            Defaults to (256, 128).
+        embedding_size (int, optional): size of the embeddings. Defaults to 128.
+        channels (int, optional): width of the convolution. Defaults to 8.
+        seed (int, optional): seed of the random weights. Defaults to 0.
+
+    Returns:
+        onnx.ModelProto: synthetic model
+    """
+    builder = _GraphBuilder(seed)
+    x = builder.node('Relu', [builder.conv('images', 3, channels, 3, 'conv')], 'relu')
+    x = builder.node('GlobalAveragePool', [x], 'pool')
+    x = builder.node('Flatten', [x], 'flat', axis=1)
+    fc_weight = builder.rng.normal(0, 1, (channels, embedding_size)).astype(np.float32)
+    builder.node('MatMul', [x, builder.constant('fc.weight', fc_weight)], 'embeddings')
+    return builder.model(
+        'images', ('batch', 3, *input_shape), 'embeddings', ('batch', embedding_size)
+    )
+
+
+def generate_models(
+    model_dir: str,
+    cost: int = 1,
+    channels: int = 8,
+    yolox_types: Iterable[str] = ('tiny',),
+    overwrite: bool = False
+) -> List[str]:
+    """Write synthetic detector models in the layout of the model directory
+
+    Args:
+        model_dir (str): model directory
+        cost (int, optional): number of full resolution convolutions. Defaults to 1.
+        channels (int, optional): width of the convolutions. Defaults to 8.
+        yolox_types (Iterable[str], optional): YOLOX model types. Defaults to ('tiny',).
+        overwrite (bool, optional): replace existing models. Defaults to False.
+
+    Returns:
+        List[str]: paths of the models
+    """
+    models = {
+        os.path.join('object_detection', 'yolov8n.onnx'):
+            lambda: make_yolov8_model(cost=cost, channels=channels),
+        os.path.join('action_recognition', 'action_tiny.onnx'):
+            lambda: make_action_model(channels=channels),
+        os.path.join('reid', 'reid_tiny.onnx'): lambda: make_reid_model(channels=channels),
+    }
+    for model_type in yolox_types:
+        models[os.path.join('person_detection', f'yolox_{model_type}.onnx')] = (
+            lambda t=model_type: make_yolox_model(
+                YOLOX_INPUT_SHAPES[t], cost=cost, channels=channels
+            )
+        )
+    paths = []
+    for relative_path, make_model in models.items():
+        path = os.path.join(model_dir, relative_path)
+        if overwrite or not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            onnx.save(make_model(), path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    """Generate synthetic models from the command line"""
+    parser = argparse.ArgumentParser(description='Home Vision -- Synthetic models')
+    parser.add_argument('--model_dir', type=str, default='models', help='output model directory')
+    parser.add_argument('--cost', type=int, default=1, help='number of full resolution convs')
+    parser.add_argument('--channels', type=int, default=8, help='width of the convs')
+    parser.add_argument(
+        '--yolox_types', nargs='+', default=['tiny'], choices=list(YOLOX_INPUT_SHAPES),
+        help='YOLOX model types'
+    )
+    parser.add_argument('--overwrite', action='store_true', help='replace existing models')
+    args = parser.parse_args()
+    for path in generate_models(
+        args.model_dir, args.cost, args.channels, args.yolox_types, args.overwrite
+    ):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 """HomeVision utility functions"""
 import argparse
 import json
+import logging
+import time
 from collections import ChainMap
 from typing import List
 
@@ -39,7 +41,10 @@ def load_solution(solution_name: str, solution_config: SolutionConfig) -> Soluti
     solution_cls = Solution.by_name(solution_name)
     print("solution_cls:", solution_cls)
     print("solution config:", solution_config)
+    time_s = time.perf_counter()
     solution = solution_cls.from_config(solution_config)
+    solution.startup_timings['load'] = time.perf_counter() - time_s
+    logging.info('%s loaded: %s', solution_name, solution.startup_profile())
     return solution
 
 def load_solution_config(config_file: str) -> dict:
@@ -97,106 +102,85 @@ def load_solution_from_dict(
     solution_config = load_solution_config_from_dict(
         solution_name, solution_config_dict
     )
-    solution_cls = Solution.by_name(solution_name)
-    solution = solution_cls.from_config(solution_config)
-    return solution
+    return load_solution(solution_name, solution_config)
+
+def _check_box(box: List):
+    """Assert a box is `[xmin, ymin, xmax, ymax]` with a positive area"""
+    xmin, ymin, xmax, ymax = box
+    assert xmin < xmax
+    assert ymin < ymax
+
+def _area(box: List) -> float:
+    """Area of a `[xmin, ymin, xmax, ymax]` box"""
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+def _intersection(bb1: List, bb2: List) -> float:
+    """Area of the intersection of two boxes, 0 when they don't overlap"""
+    width = min(bb1[2], bb2[2]) - max(bb1[0], bb2[0])
+    height = min(bb1[3], bb2[3]) - max(bb1[1], bb2[1])
+    if width <= 0 or height <= 0:
+        return 0
+    return width * height
 
 def get_iou(bb1: List, bb2: List) -> float:
-    """Calculate the Intersection over Union (IoU) of two bounding boxes.
+    """Calculate the Intersection over Union (IoU) of two bounding boxes, see `iou_matrix` to
+    compare sets of boxes.
 
     Args:
-        bb1 (List): ['x1', 'x2', 'y1', 'y2']
+        bb1 (List): ['x1', 'y1', 'x2', 'y2']
         The (x1, y1) position is at the top left corner,
         the (x2, y2) position is at the bottom right corner
-        bb2 (List): ['x1', 'x2', 'y1', 'y2']
+        bb2 (List): ['x1', 'y1', 'x2', 'y2']
         The (x1, y1) position is at the top left corner,
         the (x2, y2) position is at the bottom right corner
 
     Returns:
         float: IoU of two bboxes
     """
-    xmin, ymin, xmax, ymax = bb1
-    bb1 = {'x1': xmin, 'y1': ymin, 'x2': xmax, 'y2': ymax}
-    xmin, ymin, xmax, ymax = bb2
-    bb2 = {'x1': xmin, 'y1': ymin, 'x2': xmax, 'y2': ymax}
-    assert bb1['x1'] < bb1['x2']
-    assert bb1['y1'] < bb1['y2']
-    assert bb2['x1'] < bb2['x2']
-    assert bb2['y1'] < bb2['y2']
-
-    # determine the coordinates of the intersection rectangle
-    x_left = max(bb1['x1'], bb2['x1'])
-    y_top = max(bb1['y1'], bb2['y1'])
-    x_right = min(bb1['x2'], bb2['x2'])
-    y_bottom = min(bb1['y2'], bb2['y2'])
-
-    if x_right < x_left or y_bottom < y_top:
-        return 0.0
-
-    # The intersection of two axis-aligned bounding boxes is always an
-    # axis-aligned bounding box
-    intersection_area = (x_right - x_left) * (y_bottom - y_top)
-
-    # compute the area of both AABBs
-    bb1_area = (bb1['x2'] - bb1['x1']) * (bb1['y2'] - bb1['y1'])
-    bb2_area = (bb2['x2'] - bb2['x1']) * (bb2['y2'] - bb2['y1'])
-
-    # compute the intersection over union by taking the intersection
-    # area and dividing it by the sum of prediction + ground-truth
-    # areas - the interesection area
-    iou = intersection_area / float(bb1_area + bb2_area - intersection_area)
-    assert iou >= 0.0
-    assert iou <= 1.0
-    return iou
+    _check_box(bb1)
+    _check_box(bb2)
+    intersection = _intersection(bb1, bb2)
+    union = _area(bb1) + _area(bb2) - intersection
+    return intersection / float(union)
 
 def get_ioa(bb1: List, bb2: List) -> float:
     """Calculate the Intersection over Area (IoA) of two bounding boxes,
-    area is the smaller bbox's area.
+    area is the smaller bbox's area, see `ioa_matrix` to compare sets of boxes.
 
     Args:
-        bb1 (List): ['x1', 'x2', 'y1', 'y2']
+        bb1 (List): ['x1', 'y1', 'x2', 'y2']
         The (x1, y1) position is at the top left corner,
         the (x2, y2) position is at the bottom right corner
-        bb2 (List): ['x1', 'x2', 'y1', 'y2']
+        bb2 (List): ['x1', 'y1', 'x2', 'y2']
         The (x1, y1) position is at the top left corner,
         the (x2, y2) position is at the bottom right corner
 
     Returns:
         float: IoA of two bboxes
     """
-    xmin, ymin, xmax, ymax = bb1
-    bb1 = {'x1': xmin, 'y1': ymin, 'x2': xmax, 'y2': ymax}
-    xmin, ymin, xmax, ymax = bb2
-    bb2 = {'x1': xmin, 'y1': ymin, 'x2': xmax, 'y2': ymax}
-    assert bb1['x1'] < bb1['x2']
-    assert bb1['y1'] < bb1['y2']
-    assert bb2['x1'] < bb2['x2']
-    assert bb2['y1'] < bb2['y2']
-
-    # determine the coordinates of the intersection rectangle
-    x_left = max(bb1['x1'], bb2['x1'])
-    y_top = max(bb1['y1'], bb2['y1'])
-    x_right = min(bb1['x2'], bb2['x2'])
-    y_bottom = min(bb1['y2'], bb2['y2'])
-
-    if x_right < x_left or y_bottom < y_top:
-        return 0.0
-
-    # The intersection of two axis-aligned bounding boxes is always an
-    # axis-aligned bounding box
-    intersection_area = (x_right - x_left) * (y_bottom - y_top)
-
-    # compute the area of both AABBs
-    bb1_area = (bb1['x2'] - bb1['x1']) * (bb1['y2'] - bb1['y1'])
-    bb2_area = (bb2['x2'] - bb2['x1']) * (bb2['y2'] - bb2['y1'])
-
-    # compute the intersection over area by taking the intersection
-    # area and dividing it by the sum of prediction + ground-truth
-    # areas - the interesection area
-    ioa = intersection_area / float(min(bb1_area, bb2_area))
-    assert ioa >= 0.0
-    assert ioa <= 1.0
-    return ioa
+    _check_box(bb1)
+    _check_box(bb2)
+    return _intersection(bb1, bb2) / float(min(_area(bb1), _area(bb2)))
+
+def get_giou(bb1: List, bb2: List) -> float:
+    """Calculate the Generalized Intersection over Union (GIoU) of two bounding boxes, see
+    `giou_matrix` to compare sets of boxes.
+
+    Args:
+        bb1 (List): ['x1', 'y1', 'x2', 'y2']
+        bb2 (List): ['x1', 'y1', 'x2', 'y2']
+
+    Returns:
+        float: GIoU of two bboxes
+    """
+    _check_box(bb1)
+    _check_box(bb2)
+    intersection = _intersection(bb1, bb2)
+    union = _area(bb1) + _area(bb2) - intersection
+    enclosing = (
+        (max(bb1[2], bb2[2]) - min(bb1[0], bb2[0])) * (max(bb1[3], bb2[3]) - min(bb1[1], bb2[1]))
+    )
+    return intersection / float(union) - (enclosing - union) / float(enclosing)
 
 
 if __name__ == "__main__":
@@ -1,10 +1,11 @@
 """HomeVision visualization utils"""
 # pylint: disable=invalid-name
 import colorsys
-from typing import List
+from typing import List, Optional
 
 import cv2
 import numpy as np
+from home_vision.common.detections import Detections
 
 
 def gaussian(
@@ -78,6 +79,29 @@ def rectangle(
                     1, (255, 255, 255), thickness)
 
 
+def draw_detections(
+    image: np.ndarray, detections: Detections, class_names: Optional[List[str]] = None
+) -> np.ndarray:
+    """Draw the boxes of the detections with their score, prefixed by the class name if given"""
+    scores = detections.scores.tolist()
+    for k, (xmin, ymin, xmax, ymax) in enumerate(detections.boxes.tolist()):
+        cv2.rectangle(image, (xmin, ymin), (xmax, ymax), (0, 0, 255), thickness=2)
+        label = f'{scores[k]:.2f}' if class_names is None else f'{class_names[k]}_{scores[k]:.2f}'
+        cv2.putText(
+            image, label, (xmin, ymin - 2), cv2.FONT_HERSHEY_SIMPLEX, 0.75, [255, 0, 0],
+            thickness=2
+        )
+    return image
+
+def draw_tracks(image: np.ndarray, tracks: Detections, track_ids: np.ndarray) -> np.ndarray:
+    """Draw the boxes of the tracks, each labelled and colored by its track id"""
+    for (xmin, ymin, xmax, ymax), track_id in zip(tracks.boxes.tolist(), track_ids.tolist()):
+        rectangle(
+            image, xmin, ymin, xmax - xmin, ymax - ymin, create_unique_color_uchar(track_id), 2,
+            label=str(track_id)
+        )
+    return image
+
 def create_unique_color_float(tag: int, hue_step: float=0.41) -> tuple:
     """Create a unique RGB color code for a given track id (tag).
     The color code is generated in HSV color space by moving along the
@@ -0,0 +1,120 @@
+"""Cached, asynchronous camera source probing"""
+import asyncio
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Optional
+
+from pydantic import BaseModel  # pylint: disable=no-name-in-module
+
+
+class CameraProbeResult(BaseModel):
+    """Result of probing a camera source
+
+    Attributes:
+        camera_src (str): the probed camera source
+        valid (bool): whether the source could be opened and has a video stream
+        width (int): width of the video stream
+        height (int): height of the video stream
+        fps (float): average frame rate of the video stream
+        error (str): reason why the source is not valid
+        probed_at (float): `time.monotonic()` timestamp of the probe
+    """
+    camera_src: str
+    valid: bool
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    error: Optional[str] = None
+    probed_at: float
+
+
+class CameraProbe:
+    """Probe camera sources on a background thread pool and cache the results with a TTL,
+    so that request validation never blocks on a RTSP handshake.
+
+    Args:
+        ttl (float): seconds a probe result stays valid
+        timeout (float): seconds to wait for a source to open
+        max_workers (int): number of concurrent probes
+    """
+    def __init__(self, ttl: float = 60.0, timeout: float = 3.0, max_workers: int = 4):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='camera_probe')
+        self._cache: Dict[str, CameraProbeResult] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = Lock()
+
+    def cached(self, camera_src: str) -> Optional[CameraProbeResult]:
+        """Return the cached probe result of a camera source if it is not expired"""
+        result = self._cache.get(camera_src)
+        if result is None or time.monotonic() - result.probed_at > self.ttl:
+            return None
+        return result
+
+    def submit(self, camera_src: str) -> Future:
+        """Schedule a probe of a camera source, reusing a cached result or a pending probe
+
+        Args:
+            camera_src (str): the camera source to probe
+
+        Returns:
+            Future: future resolving to the CameraProbeResult
+        """
+        with self._lock:
+            result = self.cached(camera_src)
+            if result is not None:
+                future = Future()
+                future.set_result(result)
+                return future
+            future = self._pending.get(camera_src)
+            if future is None:
+                future = self.pool.submit(self._probe, camera_src)
+                self._pending[camera_src] = future
+            return future
+
+    async def probe(self, camera_src: str) -> CameraProbeResult:
+        """Probe a camera source without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(camera_src))
+
+    def invalidate(self, camera_src: Optional[str] = None):
+        """Drop the cached result of a camera source, or of all sources"""
+        with self._lock:
+            if camera_src is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(camera_src, None)
+
+    def shutdown(self):
+        """Stop the probing thread pool"""
+        self.pool.shutdown(wait=False)
+
+    def _probe(self, camera_src: str) -> CameraProbeResult:
+        """Open the camera source, read its video stream info and close it"""
+        # av is only needed once a camera is probed, keep it out of the API's startup
+        import av #pylint: disable=import-outside-toplevel
+        try:
+            with av.open(camera_src, timeout=self.timeout) as container:
+                if not container.streams.video:
+                    raise ValueError('no video stream')
+                stream = container.streams.video[0]
+                rate = stream.average_rate or stream.guessed_rate
+                result = CameraProbeResult(
+                    camera_src=camera_src,
+                    valid=True,
+                    width=stream.codec_context.width,
+                    height=stream.codec_context.height,
+                    fps=float(rate) if rate else None,
+                    probed_at=time.monotonic()
+                )
+        except Exception as exc: #pylint: disable=broad-except
+            logging.info('camera source %s not valid: %s', camera_src, exc)
+            result = CameraProbeResult(
+                camera_src=camera_src, valid=False, error=str(exc), probed_at=time.monotonic()
+            )
+        with self._lock:
+            self._cache[camera_src] = result
+            self._pending.pop(camera_src, None)
+        return result
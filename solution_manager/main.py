@@ -37,4 +37,4 @@ async def shutdown_event():
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port = 5555, reload=False, log_level="debug")
+    uvicorn.run("main:app", host="0.0.0.0", port=sm.config.port, reload=False, log_level="debug")
@@ -1,6 +1,12 @@
 """Route for HomeVision API"""
-from fastapi import APIRouter, HTTPException
-from solution_manager.sm import SolutionDetail, SolutionManager
+import asyncio
+import functools
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel  # pylint: disable=no-name-in-module
+from solution_manager.sm import FINAL_STATES, ProcessDetail, SolutionDetail, SolutionManager
 
 router = APIRouter(
     prefix="/api",
@@ -10,6 +16,13 @@ router = APIRouter(
 
 sm = SolutionManager.instance() #pylint: disable=no-member
 
+class ReIDRequest(BaseModel):
+    """New appearance embeddings of the tracks of a camera"""
+    camera: str
+    track_ids: List[int]
+    embeddings: List[List[float]]
+    session: str = ''
+
 @router.get("/solutions")
 async def available_solutions() -> dict:
     """List all available solutions"""
@@ -19,15 +32,115 @@ async def available_solutions() -> dict:
 async def start_solution(solution_detail: SolutionDetail) -> str:
     """Start a subprocess running a HomeVision solution
 
+    The solution is started in background, use `/api/status/{port}` or `/api/events/{port}`
+    to wait until it's ready.
+
     Args:
         solution_detail (SolutionDetail): contain solution name, camera src and solution config
 
+    Raises:
+        HTTPException: when the camera src can not be opened
+
     Returns:
         str: the url where the requested solution is running
     """
-    url = sm.start_solution(solution_detail)
+    probe = await sm.camera_probe.probe(solution_detail.camera_src)
+    if not probe.valid:
+        raise HTTPException(
+            status_code=422, detail=f'{solution_detail.camera_src} not valid'
+        )
+    url = await sm.start_solution(solution_detail)
     return url
 
+@router.post("/start_batch")
+async def start_solutions(solution_details: List[SolutionDetail]) -> List[str]:
+    """Start several HomeVision solutions in parallel
+
+    Args:
+        solution_details (List[SolutionDetail]): solutions to start
+
+    Raises:
+        HTTPException: when any camera src can not be opened
+
+    Returns:
+        List[str]: the urls where the requested solutions are running
+    """
+    probes = await asyncio.gather(
+        *[sm.camera_probe.probe(detail.camera_src) for detail in solution_details]
+    )
+    invalid = [probe.camera_src for probe in probes if not probe.valid]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f'{invalid} not valid')
+    return await sm.start_solutions(solution_details)
+
+@router.get("/status/{port}")
+async def solution_status(port: int, wait: float = 0) -> ProcessDetail:
+    """Get the state of the solution running on port
+
+    Args:
+        port (int): port of the running solution
+        wait (float): seconds to wait for the solution to be ready or failed
+
+    Raises:
+        HTTPException: when no solution is running on port
+
+    Returns:
+        ProcessDetail: the solution's process detail and state
+    """
+    process_detail = await sm.wait_solution(port, wait)
+    if process_detail is None:
+        raise HTTPException(status_code=404, detail='solution not running!')
+    return process_detail
+
+@router.get("/startup/{port}")
+async def solution_startup(port: int) -> ProcessDetail:
+    """Get the latest startup timings of the solution running on port
+
+    Args:
+        port (int): port of the running solution
+
+    Raises:
+        HTTPException: when no solution is running on port
+
+    Returns:
+        ProcessDetail: the solution's process detail with its startup timings
+    """
+    process_detail = await sm.refresh_startup(port)
+    if process_detail is None:
+        raise HTTPException(status_code=404, detail='solution not running!')
+    return process_detail
+
+@router.get("/events/{port}")
+async def solution_events(port: int, timeout: float = 300) -> StreamingResponse:
+    """Server-sent events stream of the state of the solution running on port,
+    the stream ends once the solution is ready, failed or stopped
+
+    Args:
+        port (int): port of the running solution
+        timeout (float): seconds after which the stream is closed
+
+    Raises:
+        HTTPException: when no solution is running on port
+    """
+    if sm.get_process_detail(port) is None:
+        raise HTTPException(status_code=404, detail='solution not running!')
+
+    async def event_stream():
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while True:
+            process_detail = sm.get_process_detail(port)
+            if process_detail is None:
+                yield 'event: state\ndata: {"state": "stopped"}\n\n'
+                return
+            yield f'event: state\ndata: {process_detail.json()}\n\n'
+            remaining = deadline - loop.time()
+            if process_detail.state in FINAL_STATES or remaining <= 0:
+                return
+            await sm.wait_state_change(port, remaining)
+
+    return StreamingResponse(event_stream(), media_type='text/event-stream')
+
 @router.post("/stop")
 async def stop_solution(solution_detail: SolutionDetail) -> str:
     """Stop a subprocess that is running a HomeVision solution
@@ -48,7 +161,86 @@ async def stop_solution(solution_detail: SolutionDetail) -> str:
     msg = sm.stop_solution(solution_detail)
     return msg
 
+@router.get("/cameras")
+async def available_cameras() -> dict:
+    """List all available cameras with their cached resolution and fps"""
+    cameras = {}
+    for camera_name, camera_src in sm.available_cameras.items():
+        probe = sm.camera_probe.cached(camera_src)
+        cameras[camera_name] = {
+            'src': camera_src,
+            'probe': probe.dict(exclude={'camera_src'}) if probe is not None else None
+        }
+    return cameras
+
 @router.get("/running_solutions")
 async def running_solutions() -> set:
     """List all solutions that are currently running"""
     return set(sm.running_solutions)
+
+@router.get("/detections")
+async def detections(
+    camera: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    class_ids: Optional[List[int]] = Query(None),
+    region: Optional[List[float]] = Query(None),
+    min_score: Optional[float] = None,
+    limit: int = 1000
+) -> List[dict]:
+    """Query the stored detections of a camera
+
+    Args:
+        camera (str): camera name
+        start (Optional[float]): unix time of the start of the range, a day before `end`
+            by default
+        end (Optional[float]): unix time of the end of the range, now by default
+        class_ids (Optional[List[int]]): classes to return, every class by default
+        region (Optional[List[float]]): `xmin, ymin, xmax, ymax` area the boxes intersect
+        min_score (Optional[float]): minimum score
+        limit (int): maximum number of detections
+
+    Raises:
+        HTTPException: when the camera is unknown or the region is not 4 coordinates
+
+    Returns:
+        List[dict]: detections oldest first, with their `ts`, `class_id`, `score` and `box`
+    """
+    if camera not in sm.available_cameras:
+        raise HTTPException(status_code=404, detail=f'{camera} not found')
+    if region is not None and len(region) != 4:
+        raise HTTPException(status_code=422, detail='region is xmin, ymin, xmax, ymax')
+    return await asyncio.get_event_loop().run_in_executor(None, functools.partial(
+        sm.query_detections, camera, start, end, class_ids, region, min_score, limit
+    ))
+
+@router.post("/reid")
+async def reid(request: ReIDRequest) -> dict:
+    """Identify tracks of a camera in the re-identification gallery shared by the cameras,
+    posted by the running `reid_solution`s
+
+    Args:
+        request (ReIDRequest): camera, its track ids and their new embeddings, and the run
+            of the solution tracking the camera
+
+    Raises:
+        HTTPException: when the track ids and the embeddings don't match
+
+    Returns:
+        dict: `identities` of the tracks, in the same order
+    """
+    if len(request.track_ids) != len(request.embeddings) or \
+            len({len(embedding) for embedding in request.embeddings}) > 1:
+        raise HTTPException(status_code=422, detail='one embedding of the same size per track')
+    try:
+        identities = await asyncio.get_event_loop().run_in_executor(None, functools.partial(
+            sm.identify, request.camera, request.track_ids, request.embeddings, request.session
+        ))
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return {'identities': identities}
+
+@router.get("/reid")
+async def reid_gallery() -> dict:
+    """Embeddings, cameras and identities in the re-identification gallery"""
+    return sm.gallery.stats()
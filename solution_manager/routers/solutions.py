@@ -45,6 +45,7 @@ async def all_solutions(request: Request):
                 (k.camera_src, k.solution_name, k.config.json()):
                 v.port for k,v in sm.running_solutions.items()
             },
+            "states": {v.port: v.state.value for v in sm.running_solutions.values()},
             "ports": [detail.port for detail in sm.running_solutions.values()]
         }
     )
@@ -69,8 +70,13 @@ async def start_solution(
         return Response(
             content=str(e), status_code=422
         )
+    probe = await sm.camera_probe.probe(camera_src)
+    if not probe.valid:
+        return Response(
+            content=f'{camera_src} not valid', status_code=422
+        )
 
-    _ = sm.start_solution(solution_detail)
+    _ = await sm.start_solution(solution_detail)
     return RedirectResponse(
         url='/', status_code=status.HTTP_302_FOUND
     )
@@ -1,18 +1,32 @@
 """Manager for HomeVision Solutions"""
+import asyncio
 import os
 import json
+import logging
 import socket
+import tempfile
+import time
 from contextlib import closing
-from subprocess import Popen
-from typing import Dict, List, Optional
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence, Set
 
-import av
 import yaml
 from pydantic import BaseModel, Field, root_validator  # pylint: disable=no-name-in-module
+from home_vision.common.detection_store import DetectionStore
+from home_vision.common.gallery import EmbeddingGallery
 from home_vision.common.singleton import Singleton
+from home_vision.modules.rtc_server.local import SCHEME
 from home_vision.solutions.solution_base import Solution
+from solution_manager.camera_probe import CameraProbe
 
 
+# solutions started on the results of another one, with the field of its config
+CHAINED_SOLUTIONS = {
+    'room_projection_solution': ('person_tracking_solution', 'tracking_solution'),
+    'heatmap_solution': ('person_detection_solution', 'detection_solution'),
+    'zone_analytics_solution': ('person_tracking_solution', 'tracking_solution'),
+}
+
 
 def find_free_port() -> int:
     """Return free port on localhost"""
@@ -39,10 +53,13 @@ class SolutionDetail(BaseModel):
         if solution_name not in sm.available_solutions.keys():
             raise ValueError(f'{solution_name} not in {list(sm.available_solutions.keys())}')
 
-        try:
-            av.open(camera_src, timeout=3)
-        except Exception as exc:
-            raise ValueError(f'{camera_src} not valid') from exc
+        # never probe inside the validator, only read the cache and warm it up in background;
+        # routes that start a solution await the probe result
+        probe = sm.camera_probe.cached(camera_src)
+        if probe is None:
+            sm.camera_probe.submit(camera_src)
+        elif not probe.valid:
+            raise ValueError(f'{camera_src} not valid')
 
         config_type = Solution.by_name(solution_name).config_type
         try:
@@ -64,11 +81,28 @@ class SolutionDetail(BaseModel):
         (other.solution_name, other.camera_src, other.config)
 
 
+class SolutionState(str, Enum):
+    """Lifecycle of a solution's process"""
+    STARTING = 'starting'
+    WARMING = 'warming'
+    READY = 'ready'
+    FAILED = 'failed'
+    STOPPED = 'stopped'
+
+FINAL_STATES = (SolutionState.READY, SolutionState.FAILED, SolutionState.STOPPED)
+
 class ProcessDetail(BaseModel):
-    """Detail of a running solution's process"""
-    pid: int
+    """Detail of a running solution's process, `startup_seconds` is the time from spawn to
+    ready and `startup` the per-module startup timings reported by the solution. `socket` is
+    where the solution publishes its frames and results to the solutions chained on it"""
+    pid: Optional[int] = None
     port: int
     url: str
+    socket: Optional[str] = None
+    state: SolutionState = SolutionState.STARTING
+    error: Optional[str] = None
+    startup_seconds: Optional[float] = None
+    startup: Optional[Dict[str, Any]] = None
 
 class HomeVisionSolutionBaseConfig(BaseModel):
     """Base config for HomeVision Solution"""
@@ -92,8 +126,15 @@ class CameraSrcBaseConfig(BaseModel):
 class SolutionManagerConfig(BaseModel):
     """Config for SolutionManager"""
     host_ip: str
+    port: int = 5555
     solutions: List[HomeVisionSolutionBaseConfig]
     cameras: List[CameraSrcBaseConfig]
+    camera_probe_ttl: float = 60.0
+    camera_probe_timeout: float = 3.0
+    startup_timeout: float = 120.0
+    status_poll_interval: float = 0.5
+    stop_grace_period: float = 5.0
+    store_dir: str = 'data/detections'
 
 @Singleton
 class SolutionManager:
@@ -105,7 +146,12 @@ class SolutionManager:
     host_ip = None
     config = None
     additional_cam_cnt = 0
-    running_process: Dict[SolutionDetail, Popen] = {}
+    running_process: Dict[SolutionDetail, asyncio.subprocess.Process] = {}
+    supervisors: Dict[int, asyncio.Task] = {}
+    state_events: Dict[int, asyncio.Event] = {}
+    # upstream solution of each chained solution, and the upstreams started only for them
+    upstreams: Dict[SolutionDetail, SolutionDetail] = {}
+    chained_upstreams: Set[SolutionDetail] = set()
 
     def __init__(self, config_path: Optional[str]=None):
         default_config = (
@@ -124,6 +170,13 @@ class SolutionManager:
             config = yaml.safe_load(config_file)
             self.config = SolutionManagerConfig(**config)
             self.host_ip = self.config.host_ip
+        self.camera_probe = CameraProbe(
+            ttl=self.config.camera_probe_ttl, timeout=self.config.camera_probe_timeout
+        )
+        # the solutions write the detections, the manager only queries them
+        self.store = DetectionStore(self.config.store_dir)
+        # re-identification across the cameras of the manager
+        self.gallery = EmbeddingGallery()
 
     def load_solutions(self):
         """Load enabled solution in SolutionManager config, and its default SolutionConfig,
@@ -142,6 +195,7 @@ class SolutionManager:
         and store them in self.available_cameras"""
         for camera in self.config.cameras:
             self.available_cameras[camera.name] =camera.src
+            self.camera_probe.submit(camera.src)
 
     def add_camera(self, camera_name: str, camera_src: str) -> str:
         """Add a new camera_src to self.available_cameras
@@ -156,10 +210,13 @@ class SolutionManager:
         if camera_name in self.available_cameras:
             return f"'{camera_name}' already exist!"
         self.available_cameras[camera_name] = camera_src
+        self.camera_probe.submit(camera_src)
         return "camera successfully added!!"
 
-    def start_solution(self, solution_detail: SolutionDetail) -> str:
-        """Start a HomeVision solution subprocess by camera_src, solution_name and solution_config
+    async def start_solution(self, solution_detail: SolutionDetail) -> str:
+        """Start a HomeVision solution subprocess by camera_src, solution_name and solution_config.
+        The call returns as soon as the subprocess is spawned, its readiness is tracked in
+        background and can be waited on with `wait_solution`
 
         Args:
             solution_detail (SolutionDetail): Detail of the solution
@@ -169,6 +226,8 @@ class SolutionManager:
         """
         codec = False
         if solution_detail in self.running_solutions:
+            # requested on its own, it keeps running once its chained solutions stop
+            self.chained_upstreams.discard(solution_detail)
             return self.running_solutions[solution_detail].url
 
         solution_name = solution_detail.solution_name
@@ -179,35 +238,301 @@ class SolutionManager:
         if camera_src not in self.available_cameras.values():
             self.additional_cam_cnt += 1
             self.available_cameras[f'add_cam_{self.additional_cam_cnt}'] = camera_src
+        camera_name = next(
+            name for name, src in self.available_cameras.items() if src == camera_src
+        )
 
-        if solution_name in ['room_projection_solution']: #mapping in config
+        port = find_free_port()
+        url = f"http://{self.host_ip}:{port}"
+        # register before spawning so that concurrent requests don't start it twice
+        publish_socket = os.path.join(tempfile.gettempdir(), f'home_vision_{port}.sock')
+        process_detail = ProcessDetail(port=port, url=url, socket=publish_socket)
+        self.running_solutions[solution_detail] = process_detail
+        self.state_events[port] = asyncio.Event()
+
+        if solution_name in CHAINED_SOLUTIONS: #mapping in config
             codec = solution_detail.config.codec
+            connect_solution_name, connect_config = CHAINED_SOLUTIONS[solution_name]
             connect_solution_detail = SolutionDetail(
-                solution_name='person_tracking_solution',
+                solution_name=connect_solution_name,
                 camera_src=camera_src,
-                config=solution_config.tracking_solution
+                config=getattr(solution_config, connect_config)
+            )
+            self.upstreams[solution_detail] = connect_solution_detail
+            if connect_solution_detail not in self.running_solutions:
+                self.chained_upstreams.add(connect_solution_detail)
+                await self.start_solution(solution_detail=connect_solution_detail)
+            # chained on the same host: raw frames and results over a unix socket
+            camera_src = SCHEME + self.running_solutions[connect_solution_detail].socket
+
+        if solution_name in ['reid_solution']: #identities shared by the cameras
+            solution_config_str = json.dumps(solution_config.copy(update={
+                'gallery_url': f"http://127.0.0.1:{self.config.port}/api/reid",
+                'camera': camera_name
+            }).dict())
+        if solution_name in ['heatmap_solution'] and solution_config.checkpoint is None:
+            # the heatmap of a camera survives the restarts of its solution
+            checkpoint = os.path.join(self.config.store_dir, 'heatmaps', f'{camera_name}.npz')
+            solution_config_str = json.dumps(
+                solution_config.copy(update={'checkpoint': checkpoint}).dict()
             )
 
-            camera_src = self.start_solution(solution_detail=connect_solution_detail)
-
-        port = find_free_port()
-        url = f"http://{self.host_ip}:{port}"
         args = ['python3', 'demo/stream_solution.py', '--solution_name', solution_name, \
         '--solution_config', solution_config_str, '--port', str(port), \
-        '--src', camera_src, '--codec', str(codec)]
+        '--src', camera_src, '--codec', str(codec), '--publish_socket', publish_socket, \
+        '--store_dir', self.config.store_dir, '--camera', camera_name]
         output_file = f"data/{port}_{solution_name}.txt"
         if not os.path.exists('data'):
             os.makedirs('data')
-        with open(output_file, "w", 1, encoding="utf-8") as log:
-            process = Popen(args, stdout = log, stderr = log, text = True)
+        try:
+            with open(output_file, "w", 1, encoding="utf-8") as log:
+                process = await asyncio.create_subprocess_exec(*args, stdout=log, stderr=log)
+        except OSError as exc:
+            self._set_state(process_detail, SolutionState.FAILED, str(exc))
+            return url
 
-        process_detail = ProcessDetail(port=port, pid=process.pid, url=url)
+        process_detail.pid = process.pid
         self.running_process[solution_detail] = process
-        self.running_solutions[solution_detail] = process_detail
+        self.supervisors[port] = asyncio.ensure_future(
+            self._supervise(solution_detail, process_detail, process)
+        )
         return url
 
+    async def start_solutions(self, solution_details: List[SolutionDetail]) -> List[str]:
+        """Start several HomeVision solutions in parallel
+
+        Args:
+            solution_details (List[SolutionDetail]): Details of the solutions
+
+        Returns:
+            List[str]: urls for the started solutions, in the same order
+        """
+        return list(await asyncio.gather(
+            *[self.start_solution(solution_detail) for solution_detail in solution_details]
+        ))
+
+    def _set_state(self, process_detail: ProcessDetail, state: SolutionState,
+                   error: Optional[str] = None):
+        """Update a solution's state and wake up everyone waiting on it"""
+        if process_detail.state == state:
+            return
+        logging.info('solution on port %s is %s', process_detail.port, state.value)
+        process_detail.state = state
+        process_detail.error = error
+        event = self.state_events.get(process_detail.port)
+        if event is not None:
+            event.set()
+            self.state_events[process_detail.port] = asyncio.Event()
+
+    async def _supervise(self, solution_detail: SolutionDetail, process_detail: ProcessDetail,
+                         process: asyncio.subprocess.Process):
+        """Follow a solution subprocess through starting, warming and ready by probing its
+        RTC server, then watch it until it exits"""
+        # aiohttp is only needed once a solution starts, keep it out of the API's startup
+        import aiohttp #pylint: disable=import-outside-toplevel
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        deadline = started + self.config.startup_timeout
+        status_url = f"http://127.0.0.1:{process_detail.port}/status"
+        timeout = aiohttp.ClientTimeout(total=self.config.status_poll_interval * 2)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while process.returncode is None:
+                try:
+                    async with session.get(status_url) as resp:
+                        child_status = await resp.json()
+                    child_state = child_status['state']
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError):
+                    child_state = None
+                if child_state == 'warming':
+                    self._set_state(process_detail, SolutionState.WARMING)
+                elif child_state == 'ready':
+                    process_detail.startup_seconds = loop.time() - started
+                    process_detail.startup = child_status.get('startup')
+                    self._set_state(process_detail, SolutionState.READY)
+                    break
+                elif child_state == 'failed':
+                    self._set_state(process_detail, SolutionState.FAILED, 'solution failed to load')
+                    await self._terminate(process_detail, process)
+                    break
+                if loop.time() > deadline:
+                    self._set_state(
+                        process_detail, SolutionState.FAILED,
+                        f'not ready after {self.config.startup_timeout}s'
+                    )
+                    await self._terminate(process_detail, process)
+                    break
+                await asyncio.sleep(self.config.status_poll_interval)
+
+        returncode = await process.wait()
+        if self.running_solutions.get(solution_detail) is process_detail:
+            self._set_state(
+                process_detail, SolutionState.FAILED, f'process exited with code {returncode}'
+            )
+
+    async def _terminate(self, process_detail: ProcessDetail,
+                         process: asyncio.subprocess.Process):
+        """Stop a failed solution's subprocess so that it releases its port, camera and socket,
+        killing it if it doesn't exit within the grace period"""
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), self.config.stop_grace_period)
+        except ProcessLookupError:
+            pass
+        except asyncio.TimeoutError:
+            logging.warning(
+                'solution on port %s ignored SIGTERM, killing it', process_detail.port
+            )
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        self._remove_socket(process_detail)
+
+    @staticmethod
+    def _remove_socket(process_detail: ProcessDetail):
+        """Remove the unix socket a solution published its results on"""
+        if process_detail.socket and os.path.exists(process_detail.socket):
+            os.remove(process_detail.socket)
+
+    async def refresh_startup(self, port: int) -> Optional[ProcessDetail]:
+        """Fetch the latest startup timings of the solution running on port, they include
+        the first frame once a viewer connected
+
+        Args:
+            port (int): port of the solution
+
+        Returns:
+            Optional[ProcessDetail]: detail of the solution, None if no solution runs on port
+        """
+        import aiohttp #pylint: disable=import-outside-toplevel
+        process_detail = self.get_process_detail(port)
+        if process_detail is None or process_detail.state != SolutionState.READY:
+            return process_detail
+        timeout = aiohttp.ClientTimeout(total=self.config.status_poll_interval * 2)
+        try:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(f"http://127.0.0.1:{port}/status") as resp:
+                    process_detail.startup = (await resp.json()).get('startup')
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            logging.warning('failed to refresh startup of solution on port %s: %s', port, exc)
+        return process_detail
+
+    async def wait_solution(self, port: int, timeout: float) -> Optional[ProcessDetail]:
+        """Wait until the solution running on port is ready or failed
+
+        Args:
+            port (int): port of the solution
+            timeout (float): maximum seconds to wait
+
+        Returns:
+            Optional[ProcessDetail]: the solution's process detail, None if not running
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout
+        while True:
+            process_detail = self.get_process_detail(port)
+            if process_detail is None or process_detail.state in FINAL_STATES:
+                return process_detail
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await self.wait_state_change(port, remaining):
+                return process_detail
+
+    async def wait_state_change(self, port: int, timeout: float) -> bool:
+        """Wait for the next state change of the solution running on port
+
+        Returns:
+            bool: False if the state didn't change within timeout
+        """
+        event = self.state_events.get(port)
+        if event is None:
+            return False
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def get_process_detail(self, port: int) -> Optional[ProcessDetail]:
+        """Return the process detail of the solution running on port"""
+        for process_detail in self.running_solutions.values():
+            if process_detail.port == port:
+                return process_detail
+        return None
+
+    def _kill(self, solution_detail: SolutionDetail):
+        """Kill a solution's subprocess, stop supervising it and remove its socket"""
+        process_detail = self.running_solutions.get(solution_detail)
+        process = self.running_process.get(solution_detail)
+        if process is not None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        if process_detail is not None:
+            supervisor = self.supervisors.pop(process_detail.port, None)
+            if supervisor is not None:
+                supervisor.cancel()
+            self._set_state(process_detail, SolutionState.STOPPED)
+            self.state_events.pop(process_detail.port, None)
+            self._remove_socket(process_detail)
+
+    def query_detections(
+        self,
+        camera_name: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        class_ids: Optional[Sequence[int]] = None,
+        region: Optional[Sequence[float]] = None,
+        min_score: Optional[float] = None,
+        limit: Optional[int] = 1000
+    ) -> List[Dict[str, Any]]:
+        """Stored detections of a camera, e.g. the people near the door yesterday
+
+        Args:
+            camera_name (str): name of the camera
+            start (Optional[float], optional): unix time of the start of the range.
+                Defaults to a day before `end`.
+            end (Optional[float], optional): unix time of the end of the range.
+                Defaults to now.
+            class_ids (Optional[Sequence[int]], optional): classes to return.
+                Defaults to None, every class.
+            region (Optional[Sequence[float]], optional): `[xmin, ymin, xmax, ymax]` area the
+                boxes intersect. Defaults to None, anywhere.
+            min_score (Optional[float], optional): minimum score. Defaults to None.
+            limit (Optional[int], optional): maximum number of detections. Defaults to 1000.
+
+        Returns:
+            List[Dict[str, Any]]: detections oldest first
+        """
+        end = time.time() if end is None else end
+        start = end - 24 * 3600 if start is None else start
+        return self.store.query(camera_name, start, end, class_ids, region, min_score, limit)
+
+    def identify(
+        self, camera_name: str, track_ids: Sequence[int], embeddings: Sequence[Sequence[float]],
+        session: str = ''
+    ) -> List[int]:
+        """Identities of the tracks of a camera in the gallery shared by the cameras
+
+        Args:
+            camera_name (str): name of the camera
+            track_ids (Sequence[int]): track ids on the camera
+            embeddings (Sequence[Sequence[float]]): new appearance embeddings of the tracks
+            session (str, optional): run of the solution that tracks the camera.
+                Defaults to ''.
+
+        Returns:
+            List[int]: identities of the tracks
+        """
+        return self.gallery.identify(
+            camera_name, track_ids, embeddings, session=session
+        ).tolist()
+
     def stop_solution(self, solution_detail: SolutionDetail) -> str:
-        """Stop a running HomeVision solution by camera_src, solution_name and solution_config
+        """Stop a running HomeVision solution by camera_src, solution_name and solution_config,
+        and the upstream solution it was chained to once no other solution uses it and it was
+        not started on its own
 
         Args:
             solution_detail (SolutionDetail): Detail of the solution
@@ -217,14 +542,20 @@ class SolutionManager:
         """
         if solution_detail not in self.running_solutions:
             return "solution not running!"
-        self.running_process[solution_detail].kill()
+        self._kill(solution_detail)
         del self.running_solutions[solution_detail]
-        del self.running_process[solution_detail]
+        self.running_process.pop(solution_detail, None)
+        upstream = self.upstreams.pop(solution_detail, None)
+        if upstream in self.chained_upstreams and upstream not in self.upstreams.values():
+            self.chained_upstreams.discard(upstream)
+            self.stop_solution(upstream)
         return "solution stopped!"
 
     def stop(self):
         """Kill all running solutions"""
         for solution_detail in self.running_solutions:
-            self.running_process[solution_detail].kill()
+            self._kill(solution_detail)
         self.running_process = {}
         self.running_solutions = {}
+        self.upstreams = {}
+        self.chained_upstreams = set()
@@ -1,28 +1,48 @@
 # """global fixtures for test"""
 import asyncio
 import json
+import os
 from typing import Callable, List
 
+import pytest
 import pytest_asyncio
 from aiohttp import web
 from aiortc import RTCDataChannel, RTCPeerConnection
 from home_vision.modules.module_base import Module
+from home_vision.modules.onnx_session import MODEL_DIR_ENV
 from home_vision.modules.rtc_server.server import RTCServer
 from home_vision.solutions.solution_base import Solution, SolutionConfig
+from home_vision.utils.synthetic_models import generate_models
 
 # pylint: disable=invalid-name
 
+@pytest.fixture(scope="session", autouse=True)
+def synthetic_models(tmp_path_factory):
+    """Run the tests offline on synthetic detector models, the solution processes
+    started by the tests inherit the model directory"""
+    model_dir = str(tmp_path_factory.mktemp("models"))
+    generate_models(model_dir)
+    previous = os.environ.get(MODEL_DIR_ENV)
+    os.environ[MODEL_DIR_ENV] = model_dir
+    yield model_dir
+    if previous is None:
+        del os.environ[MODEL_DIR_ENV]
+    else:
+        os.environ[MODEL_DIR_ENV] = previous
+
 def rtc_server(
     solution_name: str,
     video_src: str,
-    solution_config: SolutionConfig=None
+    solution_config: SolutionConfig=None,
+    rtc_options: dict=None
 ) -> web.Application:
-    """Load a HomeVision webrtc server"""
+    """Load a HomeVision webrtc server, `rtc_options` overrides its default config"""
     rtc_dict = {
         'source': video_src,
         'port': 8080,
         'codec': False,
-        'buffered': True
+        'buffered': True,
+        **(rtc_options or {})
     }
     module_cls: RTCServer = Module.by_name('rtc_server')
     rtc_config = module_cls.config_type(**rtc_dict)
@@ -1,8 +1,19 @@
 """Tests for Home Vision SolutionManager HTTP API"""
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
+from home_vision.common.detection_store import DetectionStore
+from home_vision.common.detections import Detections
+from home_vision.common.gallery import EmbeddingGallery
 from solution_manager.main import app
-from solution_manager.sm import ProcessDetail, SolutionDetail, SolutionManager
+from solution_manager.sm import (ProcessDetail, SolutionDetail, SolutionManager, SolutionState,
+    find_free_port)
 
 
 @pytest.mark.pipeline
@@ -93,3 +104,209 @@ def test_api_get_running_solutions():
         response = client.get("/api/running_solutions")
     assert response.status_code == 200
     assert response.json() == []
+
+@pytest.mark.parametrize(
+    "camera_src, valid",
+    [
+        ('tests/test.mp4', True),
+        ('invalid_camera_src', False)
+    ]
+)
+def test_camera_probe_cache(camera_src, valid):
+    """Test camera probes are cached with the stream's resolution and fps"""
+    probe = SolutionManager.instance().camera_probe #pylint: disable=no-member
+    probe.invalidate(camera_src)
+    assert probe.cached(camera_src) is None
+
+    result = probe.submit(camera_src).result(timeout=10)
+    assert result.valid == valid
+    assert probe.cached(camera_src) == result
+    if valid:
+        assert result.width > 0 and result.height > 0
+        assert result.fps > 0
+    else:
+        with pytest.raises(ValueError) as exc:
+            SolutionDetail(solution_name='raw_stream_solution', camera_src=camera_src)
+        assert 'not valid' in str(exc.value)
+
+@pytest.mark.pipeline
+def test_api_get_cameras():
+    """Test API endpoint GET /api/cameras"""
+    with TestClient(app) as client:
+        response = client.get("/api/cameras")
+    assert response.status_code == 200
+    assert all('src' in camera for camera in response.json().values())
+
+@pytest.mark.pipeline
+def test_api_solution_readiness():
+    """Test a started solution goes through starting, warming and ready"""
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/start",
+            json={"solution_name": 'raw_stream_solution', "camera_src": 'tests/test.mp4'},
+        )
+        assert response.status_code == 200
+        port = int(response.json().rsplit(':', 1)[1])
+
+        response = client.get(f"/api/status/{port}", params={'wait': 60})
+        assert response.status_code == 200
+        assert response.json()['state'] == 'ready'
+        assert response.json()['startup_seconds'] > 0
+        # chained solutions subscribe to its frames and results on a unix socket
+        assert os.path.exists(response.json()['socket'])
+        assert 'load' in response.json()['startup']['Raw Stream Solution']['timings_ms']
+
+        response = client.get(f"/api/startup/{port}")
+        assert response.status_code == 200
+        assert 'Raw Stream Solution' in response.json()['startup']
+
+        response = client.get(f"/api/events/{port}")
+        assert response.status_code == 200
+        assert '"state": "ready"' in response.text
+
+        response = client.post(
+            "/api/stop",
+            json={"solution_name": 'raw_stream_solution', "camera_src": 'tests/test.mp4'},
+        )
+        assert response.status_code == 200
+        assert client.get(f"/api/status/{port}").status_code == 404
+
+@pytest.mark.parametrize('ignore_sigterm', [False, True])
+def test_supervise_startup_timeout(tmp_path, monkeypatch, ignore_sigterm):
+    """Test a solution not ready before the deadline is terminated, or killed if it ignores
+    SIGTERM, and its socket removed"""
+    sm = SolutionManager.instance() #pylint: disable=invalid-name, no-member
+    monkeypatch.setattr(sm.config, 'startup_timeout', 0.3)
+    monkeypatch.setattr(sm.config, 'status_poll_interval', 0.1)
+    monkeypatch.setattr(sm.config, 'stop_grace_period', 0.5)
+    publish_socket = tmp_path / 'solution.sock'
+    publish_socket.touch()
+    process_detail = ProcessDetail(
+        port=find_free_port(), url='http://127.0.0.1', socket=str(publish_socket)
+    )
+    solution_detail = SolutionDetail.construct(
+        solution_name='raw_stream_solution', camera_src='tests/test.mp4'
+    )
+    code = 'import signal, time\n'
+    if ignore_sigterm:
+        code += 'signal.signal(signal.SIGTERM, signal.SIG_IGN)\n'
+    code += 'print(flush=True)\ntime.sleep(60)'
+
+    async def supervise():
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-c', code, stdout=asyncio.subprocess.PIPE
+        )
+        # the signal handler is installed once the child printed
+        await process.stdout.readline()
+        await asyncio.wait_for(sm._supervise(solution_detail, process_detail, process), 10)
+        return process
+
+    process = asyncio.run(supervise())
+    assert process.returncode == (-signal.SIGKILL if ignore_sigterm else -signal.SIGTERM)
+    assert process_detail.state == SolutionState.FAILED
+    assert process_detail.error == 'not ready after 0.3s'
+    assert not publish_socket.exists()
+
+def test_stop_chained_solution(tmp_path, monkeypatch):
+    """Test a stopped solution's socket is removed, and the upstream solution it was chained
+    to stopped with its last downstream solution unless it was started on its own"""
+    sm = SolutionManager.instance() #pylint: disable=invalid-name, no-member
+    for name, value in [
+        ('running_solutions', {}), ('running_process', {}), ('supervisors', {}),
+        ('state_events', {}), ('upstreams', {}), ('chained_upstreams', set()),
+        ('available_cameras', {'door': 'tests/test.mp4'}),
+        ('available_solutions', dict.fromkeys(
+            ['person_tracking_solution', 'room_projection_solution', 'zone_analytics_solution']
+        ))
+    ]:
+        monkeypatch.setattr(sm, name, value)
+    monkeypatch.setattr(sm.config, 'store_dir', str(tmp_path))
+    monkeypatch.setattr(tempfile, 'gettempdir', lambda: str(tmp_path))
+
+    async def spawn(*args, **kwargs):
+        raise OSError('not spawned')
+    monkeypatch.setattr(asyncio, 'create_subprocess_exec', spawn)
+
+    projection = SolutionDetail(
+        solution_name='room_projection_solution', camera_src='tests/test.mp4'
+    )
+    zones = SolutionDetail(solution_name='zone_analytics_solution', camera_src='tests/test.mp4')
+    tracking = SolutionDetail(
+        solution_name='person_tracking_solution', camera_src='tests/test.mp4',
+        config=projection.config.tracking_solution.dict()
+    )
+
+    async def start_and_stop(explicit_upstream: bool):
+        await sm.start_solution(projection)
+        await sm.start_solution(zones)
+        if explicit_upstream:
+            await sm.start_solution(tracking)
+        assert set(sm.running_solutions) == {projection, zones, tracking}
+        publish_socket = sm.running_solutions[projection].socket
+        open(publish_socket, 'w', encoding='utf-8').close()
+        sm.stop_solution(projection)
+        assert not os.path.exists(publish_socket)
+        assert tracking in sm.running_solutions
+        sm.stop_solution(zones)
+        return tracking in sm.running_solutions
+
+    assert not asyncio.run(start_and_stop(False))
+    assert asyncio.run(start_and_stop(True))
+    sm.stop()
+
+
+@pytest.mark.pipeline
+def test_api_detections(tmp_path, monkeypatch):
+    """Test API endpoint GET /api/detections"""
+    sm = SolutionManager.instance() #pylint: disable=invalid-name, no-member
+    store = DetectionStore(str(tmp_path))
+    monkeypatch.setattr(sm, 'store', store)
+    with TestClient(app) as client:
+        camera = next(iter(sm.available_cameras))
+        store.add(camera, Detections(np.array([[10, 10, 50, 90], [400, 300, 450, 340]])))
+        store.flush()
+        response = client.get('/api/detections', params={'camera': camera})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        response = client.get(
+            '/api/detections', params={'camera': camera, 'region': [0, 0, 100, 100]}
+        )
+        assert [det['box'] for det in response.json()] == [[10, 10, 50, 90]]
+        response = client.get('/api/detections', params={'camera': camera, 'region': [0, 0]})
+        assert response.status_code == 422
+        response = client.get('/api/detections', params={'camera': 'not_a_camera'})
+        assert response.status_code == 404
+    store.close()
+
+@pytest.mark.pipeline
+def test_api_reid(monkeypatch):
+    """Test API endpoints POST and GET /api/reid"""
+    sm = SolutionManager.instance() #pylint: disable=invalid-name, no-member
+    monkeypatch.setattr(sm, 'gallery', EmbeddingGallery())
+    people = np.eye(2, 8).tolist()
+    with TestClient(app) as client:
+        response = client.post(
+            '/api/reid', json={'camera': 'door', 'track_ids': [1, 2], 'embeddings': people}
+        )
+        assert response.status_code == 200
+        assert response.json() == {'identities': [1, 2]}
+        response = client.post(
+            '/api/reid', json={'camera': 'hall', 'track_ids': [5], 'embeddings': people[1:]}
+        )
+        assert response.json() == {'identities': [2]}
+        response = client.post(
+            '/api/reid', json={'camera': 'hall', 'track_ids': [6, 7], 'embeddings': people[1:]}
+        )
+        assert response.status_code == 422
+        response = client.post(
+            '/api/reid', json={'camera': 'hall', 'track_ids': [6], 'embeddings': [[1, 0]]}
+        )
+        assert response.status_code == 422
+        # the same track id of a new run of the door's solution is someone else
+        response = client.post('/api/reid', json={
+            'camera': 'door', 'session': 'restarted', 'track_ids': [1],
+            'embeddings': np.eye(3, 8, k=2).tolist()[2:]
+        })
+        assert response.json() == {'identities': [3]}
+        response = client.get('/api/reid')
+        assert response.json() == {'embeddings': 4, 'cameras': 2, 'identities': 3}
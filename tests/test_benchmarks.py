@@ -0,0 +1,94 @@
+"""Smoke tests of the benchmark suites and runner on the synthetic models"""
+import functools
+import json
+
+import pytest
+from benchmarks import bench_postprocess, bench_solutions, bench_startup, run as bench_run
+from benchmarks.common import time_function
+from home_vision.solutions.solution_base import Solution
+
+
+@pytest.fixture
+def single_call(monkeypatch):
+    """Time every benchmark of the post-processing suite with a single call"""
+    monkeypatch.setattr(
+        bench_postprocess, 'time_function',
+        functools.partial(time_function, min_time=0, min_repeat=1, warmup=0)
+    )
+
+
+def test_postprocess_suite(single_call): #pylint: disable=redefined-outer-name,unused-argument
+    """Test every post-processing benchmark runs and is timed"""
+    results = bench_postprocess.run()
+    assert 'tracker.update[n=500]' in results and 'zone_rules[n=100,zones=48]' in results
+    for result in results.values():
+        assert result['repeat'] == 1 and result['median_ms'] > 0
+
+
+def test_solutions_suite():
+    """Test every registered solution runs in the solutions suite, with the inputs of the
+    solution it is chained to"""
+    results = bench_solutions.run(resolutions=((120, 160),), min_time=0)
+    for solution_name in Solution.list_available():
+        result = results[f'{solution_name}[120x160]']
+        assert result['repeat'] >= 5 and result['median_ms'] > 0
+        assert results[f'{solution_name}.profile']['profile']
+    assert 'raw_stream_solution.serve[120x160,validate=False]' in results
+
+
+def test_startup_suite(monkeypatch):
+    """Test the startup of an entry point is measured in a fresh interpreter"""
+    entry_points = bench_startup.entry_points()
+    assert 'solution_manager' in entry_points
+    monkeypatch.setattr(bench_startup, 'entry_points', lambda: {
+        'module[tracker]': entry_points['module[tracker]']
+    })
+    result = bench_startup.run(repeat=1)['startup.module[tracker]']
+    assert result['repeat'] == 1 and result['median_ms'] > 0
+    assert 'aiortc' not in result['heavy_modules']
+    assert len(result['top_imports']) <= 5
+
+
+@pytest.mark.parametrize(
+    "new_ms, regressions",
+    [
+        (10.5, []),
+        (12.0, ['nms[n=100]']),
+    ]
+)
+def test_compare(tmp_path, capsys, new_ms, regressions):
+    """Test the runs are compared on their common timed benchmarks and the runner exits with
+    an error on regressions"""
+    base = {'results': {
+        'nms[n=100]': {'median_ms': 10.0}, 'removed': {'median_ms': 1.0},
+        'solution.profile': {'profile': {}},
+    }}
+    new = {'results': {
+        'nms[n=100]': {'median_ms': new_ms}, 'added': {'median_ms': 1.0},
+        'solution.profile': {'profile': {}},
+    }}
+    comparison = bench_run.compare(base, new, threshold=0.1)
+    assert list(comparison) == ['nms[n=100]']
+    assert comparison['nms[n=100]']['ratio'] == pytest.approx(new_ms / 10)
+    assert [name for name, result in comparison.items() if result['regression']] == regressions
+
+    for name, run in (('base', base), ('new', new)):
+        with open(tmp_path / f'{name}.json', 'w', encoding='utf-8') as run_file:
+            json.dump(run, run_file)
+    exit_code = bench_run.main([
+        'compare', str(tmp_path / 'base.json'), str(tmp_path / 'new.json'), '--threshold', '0.1'
+    ])
+    assert exit_code == (1 if regressions else 0)
+    assert 'nms[n=100]' in capsys.readouterr().out
+
+
+def test_run_output(tmp_path, single_call): #pylint: disable=redefined-outer-name,unused-argument
+    """Test the runner writes the results of a suite with the metadata of the host"""
+    output = tmp_path / 'results.json'
+    assert bench_run.main(['run', '--suite', 'postprocess', '--output', str(output)]) == 0
+    with open(output, 'r', encoding='utf-8') as output_file:
+        run = json.load(output_file)
+    assert run['meta']['suites'] == ['postprocess'] and run['meta']['synthetic_cost'] == 0
+    assert 'tracker.update[n=10]' in run['results']
+    # a run compared to itself has no regression
+    assert bench_run.main(['compare', str(output), str(output)]) == 0
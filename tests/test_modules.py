@@ -0,0 +1,872 @@
+"""Test HomeVision modules and solution composition"""
+import json
+import shutil
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+import pytest
+from pydantic import ValidationError #pylint: disable=no-name-in-module
+from home_vision.common.detection_store import DetectionStore
+from home_vision.common.detections import Detections, json_default
+from home_vision.common.exceptions import GraphError
+from home_vision.common.gallery import EmbeddingGallery
+from home_vision.common.profiling import LatencyHistogram, ProfilingHook, add_hook, remove_hook
+from home_vision.common.validation import set_validation, validation_enabled
+from home_vision.modules.action_recognition.action_recognizer import (ActionRecognizer,
+    ActionRecognizerInput)
+from home_vision.modules.module_base import BaseConfig, Module, ModuleInput, ModuleOutput
+from home_vision.modules.onnx_autotune import autotune
+from home_vision.modules.person_detection import PersonDetector
+from home_vision.modules.zones.zone_rules import ZoneRules, ZoneRulesInput
+from home_vision.modules.reid.reid_embedder import ReIDEmbedder, ReIDEmbedderInput
+from home_vision.modules.recorder.event_recorder import (BufferedPacket, EventRecorder,
+                                                         EventRecorderInput, PacketRingBuffer)
+from home_vision.modules.onnx_session import (TUNING_DIR_ENV, SessionSettings, create_session,
+                                              load_tuned_settings, resolve_model_path,
+                                              save_tuned_settings)
+from home_vision.modules.tracking import kalman
+from home_vision.modules.tracking.tracker import Tracker, match_greedy
+from home_vision.solutions.solution_base import SolutionInput
+from home_vision.solutions.solution_graph import SolutionGraph, SolutionGraphConfig
+from home_vision.utils.media import (AVCapture, fit_size, open_capture, open_player,
+                                     player_container)
+from home_vision.utils.utils import load_solution_from_dict
+
+# pylint: disable=missing-class-docstring
+
+
+class SleepConfig(BaseConfig):
+    increment: Optional[float] = 1.0
+    delay: Optional[float] = 0.0
+
+class SleepInput(ModuleInput):
+    image: np.ndarray
+
+class SumInput(ModuleInput):
+    first: float
+    second: float
+
+class ValueOutput(ModuleOutput):
+    value: float
+
+@Module.register('test_sleep')
+class SleepModule(Module[SleepInput, ValueOutput, SleepConfig]):
+    """Module that sleeps then returns the image sum plus an increment"""
+    input_types = SleepInput
+    output_types = ValueOutput
+    config_type = SleepConfig
+    module_name = 'test sleep module'
+
+    def __init__(self, increment: float, delay: float):
+        self.increment = increment
+        self.delay = delay
+        self.spans = []
+
+    @classmethod
+    def from_config(cls, config: SleepConfig):
+        return cls(config.increment, config.delay)
+
+    def _process(self, inputs: SleepInput) -> ValueOutput:
+        start = time.perf_counter()
+        time.sleep(self.delay)
+        self.spans.append((start, time.perf_counter()))
+        return ValueOutput(value=float(inputs.image.sum()) + self.increment)
+
+@Module.register('test_sum')
+class SumModule(Module[SumInput, ValueOutput, SleepConfig]):
+    """Module that sums its two inputs"""
+    input_types = SumInput
+    output_types = ValueOutput
+    config_type = SleepConfig
+    module_name = 'test sum module'
+
+    def __init__(self):
+        self.spans = []
+
+    @classmethod
+    def from_config(cls, config: SleepConfig):
+        return cls()
+
+    def _process(self, inputs: SumInput) -> ValueOutput:
+        now = time.perf_counter()
+        self.spans.append((now, now))
+        return ValueOutput(value=inputs.first + inputs.second)
+
+
+def graph_config(delay: float = 0.0) -> dict:
+    """Diamond graph: two parallel branches joined by a sum"""
+    return {
+        'nodes': [
+            {'name': 'a', 'module': 'test_sleep', 'config': {'increment': 1, 'delay': delay},
+             'inputs': {'image': 'input.image'}},
+            {'name': 'b', 'module': 'test_sleep', 'config': {'increment': 2, 'delay': delay},
+             'inputs': {'image': 'input.image'}},
+            {'name': 'total', 'module': 'test_sum',
+             'inputs': {'first': 'a.value', 'second': 'b.value'}},
+        ],
+        'outputs': {'total': 'total.value', 'a': 'a.value'}
+    }
+
+
+def test_graph_solution():
+    """Test graph solution runs branches in parallel and collects outputs"""
+    solution = load_solution_from_dict('graph_solution', graph_config(delay=0.2))
+    assert solution.graph.levels == [['a', 'b'], ['total']]
+    image = np.ones((2, 2, 3), dtype=np.uint8)
+
+    outputs = solution.process(SolutionInput(image=image))
+
+    assert outputs.total == 12 + 1 + 12 + 2
+    assert outputs.a == 13
+    (a_start, a_end), = solution.graph.nodes['a'].spans
+    (b_start, b_end), = solution.graph.nodes['b'].spans
+    (total_start, _), = solution.graph.nodes['total'].spans
+    # the branches overlap and are joined once both are done
+    assert a_start < b_end and b_start < a_end
+    assert total_start >= max(a_end, b_end)
+
+    solution.close()
+    with pytest.raises(RuntimeError):
+        solution.graph.pool.submit(print)
+
+
+def test_graph_scheduling():
+    """Test a node starts once its own dependencies are done, not the whole previous level"""
+    config = graph_config()
+    config['nodes'] = [
+        {'name': 'slow', 'module': 'test_sleep', 'config': {'delay': 0.2},
+         'inputs': {'image': 'input.image'}},
+        {'name': 'fast', 'module': 'test_sleep', 'inputs': {'image': 'input.image'}},
+        {'name': 'double', 'module': 'test_sum',
+         'inputs': {'first': 'fast.value', 'second': 'fast.value'}},
+        {'name': 'total', 'module': 'test_sum',
+         'inputs': {'first': 'slow.value', 'second': 'double.value'}},
+    ]
+    config['outputs'] = {'total': 'total.value'}
+    solution = load_solution_from_dict('graph_solution', config)
+    assert solution.graph.levels == [['slow', 'fast'], ['double'], ['total']]
+
+    outputs = solution.process(SolutionInput(image=np.ones((2, 2, 3), dtype=np.uint8)))
+
+    assert outputs.total == 13 + 2 * 13
+    nodes = solution.graph.nodes
+    (_, slow_end), = nodes['slow'].spans
+    (_, fast_end), = nodes['fast'].spans
+    (double_start, double_end), = nodes['double'].spans
+    (total_start, _), = nodes['total'].spans
+    # the fast branch goes on while the slow node still runs
+    assert fast_end <= double_start < slow_end
+    assert total_start >= max(slow_end, double_end)
+
+
+@pytest.mark.parametrize(
+    "nodes, error_info",
+    [
+        ([{'name': 'a', 'module': 'test_sum', 'inputs': {'first': 'b.value', 'second': 'b.value'}},
+          {'name': 'b', 'module': 'test_sum', 'inputs': {'first': 'a.value', 'second': 'a.value'}}],
+         'cycle'),
+        ([{'name': 'a', 'module': 'test_sleep', 'inputs': {'image': 'input.missing'}}],
+         "no output 'missing'"),
+        ([{'name': 'a', 'module': 'test_sum', 'inputs': {'first': 'input.image'}}],
+         'not connected'),
+        ([{'name': 'a', 'module': 'test_sleep', 'inputs': {'wrong': 'input.image'}}],
+         "no input 'wrong'"),
+        ([{'name': 'a', 'module': 'test_sleep', 'inputs': {'image': 'image'}}],
+         'not a valid reference'),
+    ]
+)
+def test_graph_wiring_errors(nodes, error_info):
+    """Test invalid graphs are rejected when the graph is built"""
+    config = SolutionGraphConfig(nodes=nodes, outputs={})
+    with pytest.raises(GraphError) as exc:
+        SolutionGraph.from_config(config.nodes)
+    assert error_info in str(exc.value)
+
+
+def test_latency_histogram():
+    """Test histogram percentiles are within a bucket of the true value"""
+    hist = LatencyHistogram()
+    for latency in np.linspace(0.001, 0.1, 1000):
+        hist.record(latency)
+    summary = hist.summary()
+    assert summary['count'] == 1000
+    assert summary['p50_ms'] == pytest.approx(50.5, rel=0.1)
+    assert summary['p99_ms'] == pytest.approx(99, rel=0.1)
+    assert summary['max_ms'] == pytest.approx(100)
+    hist.reset()
+    assert hist.summary()['count'] == 0
+
+
+def test_module_profile_and_hooks():
+    """Test solutions report per-module latencies and hooks receive process calls"""
+    class RecordingHook(ProfilingHook):
+        def __init__(self):
+            self.calls = []
+
+        def on_process_end(self, module, inputs, outputs, latency):
+            self.calls.append(module.module_name)
+
+    hook = RecordingHook()
+    add_hook(hook)
+    try:
+        solution = load_solution_from_dict('graph_solution', graph_config())
+        solution.process(SolutionInput(image=np.ones((2, 2, 3), dtype=np.uint8)))
+    finally:
+        remove_hook(hook)
+    assert sorted(hook.calls) == sorted(
+        ['test sleep module', 'test sleep module', 'test sum module', 'Graph Solution']
+    )
+
+    profile = solution.profile()
+    assert set(profile) == {
+        'Graph Solution', 'Graph Solution.a', 'Graph Solution.b', 'Graph Solution.total'
+    }
+    assert all(entry['phases']['process']['count'] == 1 for entry in profile.values())
+    assert 'Graph Solution' in solution.profile_report()
+
+
+def test_detections():
+    """Test detections stay arrays, validate from lists and serialize as int boxes"""
+    detections = Detections(
+        np.array([[0.5, 1.5, 10.9, 20.2], [5, 5, 8, 8]]), np.array([0.9, 0.4]), np.array([3, 1])
+    )
+    assert detections.xyxy.dtype == np.float32 and detections.class_ids.dtype == np.int32
+    assert len(detections[detections.scores > 0.5]) == 1
+    assert detections[1].tolist() == [[5, 5, 8, 8]]
+    assert json.dumps({'bboxes': detections}, default=json_default) == \
+        '{"bboxes": [[0, 1, 10, 20], [5, 5, 8, 8]]}'
+
+    class DetectionsOutput(ModuleOutput):
+        bboxes: Detections
+
+    outputs = DetectionsOutput(bboxes=[[0, 1, 10, 20]])
+    assert isinstance(outputs.bboxes, Detections)
+    assert outputs.bboxes == [[0, 1, 10, 20]]
+    assert outputs.json() == '{"bboxes": [[0, 1, 10, 20]]}'
+    assert len(DetectionsOutput(bboxes=[]).bboxes) == 0
+
+
+@pytest.mark.parametrize("validate", [True, False])
+def test_validation_toggle(validate):
+    """Test per-frame models are validated only when validation is enabled, the graph
+    output is the same either way"""
+    previous = validation_enabled()
+    set_validation(validate)
+    try:
+        solution = load_solution_from_dict('graph_solution', graph_config())
+        outputs = solution.process(SolutionInput.create(image=np.ones((2, 2, 3), dtype=np.uint8)))
+        assert outputs.total == 27
+        assert outputs.asdict(exclude={'image'}) == {'total': 27, 'a': 13}
+        if validate:
+            with pytest.raises(ValidationError):
+                ValueOutput.create(value='not a number')
+            with pytest.raises(AssertionError):
+                solution.process(SumInput.create(first=1, second=2))
+        else:
+            assert ValueOutput.create(value='not a number').value == 'not a number'
+    finally:
+        set_validation(previous)
+
+
+def test_startup_timings():
+    """Test detectors warm up when loaded and solutions report their startup timings"""
+    solution = load_solution_from_dict('person_detection_solution', {})
+    profile = solution.startup_profile()
+    assert 'load' in profile['Person Detection Solution']['timings_ms']
+    detector_timings = profile['Person Detection Solution.person_detector']['timings_ms']
+    assert set(detector_timings) >= {'session', 'warmup'}
+    assert 'first_frame' not in detector_timings
+
+    solution.process(SolutionInput(image=np.zeros((480, 640, 3), dtype=np.uint8)))
+    solution.process(SolutionInput(image=np.zeros((480, 640, 3), dtype=np.uint8)))
+    first_frame = solution.startup_timings['first_frame']
+    assert solution.person_detector.startup_timings['first_frame'] > 0
+    solution.reset_profile()
+    solution.process(SolutionInput(image=np.zeros((480, 640, 3), dtype=np.uint8)))
+    assert solution.startup_timings['first_frame'] == first_frame
+
+
+@pytest.mark.parametrize(
+    "relative_path, input_shape, output_shape",
+    [
+        ("object_detection/yolov8n.onnx", [1, 3, 640, 640], [1, 84, 8400]),
+        ("person_detection/yolox_tiny.onnx", [1, 3, 608, 1088], [1, 13566, 6]),
+    ]
+)
+def test_synthetic_models(synthetic_models, relative_path, input_shape, output_shape):
+    """Test synthetic models have the signatures of the detector models"""
+    session = create_session(resolve_model_path(relative_path, synthetic_models), False)
+    assert session.get_inputs()[0].shape == input_shape
+    assert session.get_outputs()[0].shape == output_shape
+    blob = np.random.default_rng(0).random(input_shape, dtype=np.float32)
+    output = session.run(None, {session.get_inputs()[0].name: blob})[0]
+    assert list(output.shape) == output_shape
+
+
+def test_autotune(synthetic_models, tmp_path, monkeypatch):
+    """Test tuned session settings are persisted per host and used by the detectors"""
+    monkeypatch.setenv(TUNING_DIR_ENV, str(tmp_path))
+    model_path = resolve_model_path('person_detection/yolox_tiny.onnx', synthetic_models)
+    assert load_tuned_settings(model_path) is None
+    grid = [SessionSettings(intra_op_num_threads=1), SessionSettings(intra_op_num_threads=2)]
+    best, results = autotune(model_path, runs=2, grid=grid)
+    assert best in grid
+    assert len(results) == 2 and all(stats['median_ms'] > 0 for _, stats in results)
+
+    save_tuned_settings(model_path, SessionSettings(intra_op_num_threads=2), {})
+    assert load_tuned_settings(model_path) == SessionSettings(intra_op_num_threads=2)
+    # the settings tuned on gpu are kept apart and don't apply to cpu sessions
+    assert load_tuned_settings(model_path, gpu=True) is None
+    save_tuned_settings(model_path, SessionSettings(intra_op_num_threads=8), {}, gpu=True)
+    assert load_tuned_settings(model_path, gpu=True) == SessionSettings(intra_op_num_threads=8)
+    assert load_tuned_settings(model_path) == SessionSettings(intra_op_num_threads=2)
+    detector_cls = PersonDetector.by_name('YOLOX')
+    detector = detector_cls.from_config(detector_cls.config_type(gpu=False, warmup_runs=0))
+    assert detector.session.get_session_options().intra_op_num_threads == 2
+    detector = detector_cls.from_config(
+        detector_cls.config_type(gpu=False, warmup_runs=0, use_tuning=False)
+    )
+    assert detector.session.get_session_options().intra_op_num_threads == 0
+
+
+
+@pytest.mark.parametrize('config_dir', ['tuning_dir', 'model_dir'])
+def test_tuning_dir(synthetic_models, tmp_path, monkeypatch, config_dir):
+    """Test a detector finds the settings tuned in the `tuning_dir` of its config, or in
+    `tuning/` of the `model_dir` of its config"""
+    monkeypatch.delenv(TUNING_DIR_ENV, raising=False)
+    model_dir = tmp_path / 'models'
+    (model_dir / 'person_detection').mkdir(parents=True)
+    shutil.copy(
+        resolve_model_path('person_detection/yolox_tiny.onnx', synthetic_models),
+        model_dir / 'person_detection'
+    )
+    model_path = resolve_model_path('person_detection/yolox_tiny.onnx', str(model_dir))
+    tuning_dir = str(tmp_path / 'tuning') if config_dir == 'tuning_dir' else None
+    path = save_tuned_settings(
+        model_path, SessionSettings(intra_op_num_threads=3), {}, tuning_dir, str(model_dir)
+    )
+    assert path.startswith(tuning_dir or str(model_dir / 'tuning'))
+    detector_cls = PersonDetector.by_name('YOLOX')
+    detector = detector_cls.from_config(detector_cls.config_type(
+        gpu=False, warmup_runs=0, model_dir=str(model_dir), tuning_dir=tuning_dir
+    ))
+    assert detector.session.get_session_options().intra_op_num_threads == 3
+
+@pytest.mark.parametrize(
+    "size, max_size, expected",
+    [
+        ((1920, 1080), (None, None), (1920, 1080)),
+        ((1920, 1080), (1088, 608), (1080, 608)),
+        ((1920, 1080), (640, None), (640, 360)),
+        ((640, 480), (1088, 608), (640, 480)),
+        ((3840, 2160), (None, 640), (1136, 640)),
+    ]
+)
+def test_fit_size(size, max_size, expected):
+    """Test frames are downscaled to fit the decode size, keeping their aspect ratio"""
+    assert fit_size(*size, *max_size) == expected
+
+
+def test_decode_options():
+    """Test keyframe only and downscaled decoding of the video sources"""
+    cap = open_capture("tests/test.mp4", threads=1, max_width=640)
+    assert not isinstance(cap, AVCapture)
+    assert cap.read()[0]
+    cap.release()
+
+    cap = open_capture("tests/test.mp4", skip_non_keyframes=True, max_width=640)
+    assert isinstance(cap, AVCapture)
+    frames = []
+    while True:
+        success, frame = cap.read()
+        if not success:
+            break
+        frames.append(frame)
+    cap.release()
+    assert 0 < len(frames) < 109
+    assert all(frame.shape == (360, 640, 3) for frame in frames)
+    assert (cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) == (640, 360)
+
+    player = open_player("tests/test.mp4", skip_non_keyframes=True)
+    stream = player_container(player).streams.video[0]
+    assert str(stream.codec_context.skip_frame).upper().endswith('NONKEY')
+
+
+def test_open_player_fallback(monkeypatch):
+    """Test a player without the container the decoding options are set on is used as is"""
+    class Player:
+        def __init__(self, source, loop=False):
+            self.source = source
+            self.loop = loop
+
+    monkeypatch.setattr('aiortc.contrib.media.MediaPlayer', Player)
+    player = open_player("tests/test.mp4", loop=True, skip_non_keyframes=True)
+    assert isinstance(player, Player) and player.loop
+    assert player_container(player) is None
+
+
+def test_packet_ring_buffer():
+    """Test the ring buffer keeps the last seconds of packets from a keyframe on"""
+    buffer = PacketRingBuffer(1.0)
+    buffer.push(BufferedPacket(0.0, b'p', 0, 0, False))
+    assert not buffer.packets()
+    for index in range(30):
+        buffer.push(BufferedPacket(index * 0.1, b'pp', index, index, index % 10 == 0))
+    packets = buffer.packets()
+    # the group of pictures from 1.0 s alone covers the last second
+    assert packets[0].keyframe and packets[0].time == pytest.approx(1.0)
+    assert len(packets) == 20
+    assert buffer.size == 40
+    assert buffer.duration() == pytest.approx(1.9)
+
+
+def test_event_recorder(tmp_path):
+    """Test an event writes a fragmented MP4 clip of the source with pre and post roll"""
+    av = pytest.importorskip('av')
+    recorder = EventRecorder.from_config(EventRecorder.config_type(
+        source="tests/test.mp4", output_dir=str(tmp_path), pre_roll=0.5, post_roll=0.5,
+        min_score=0.5, loop=True
+    )).start()
+    time.sleep(1.0)
+    low_score = Detections(np.array([[0, 0, 10, 10]]), np.array([0.3]))
+    outputs = recorder.process(EventRecorderInput.create(detections=low_score))
+    assert not outputs.recording
+    outputs = recorder.process(EventRecorderInput.create(
+        detections=Detections(np.array([[0, 0, 10, 10]]), np.array([0.9]))
+    ))
+    assert outputs.recording
+    time.sleep(1.0)
+    recorder.stop()
+    clips = recorder.stats()['clips']
+    assert len(clips) == 1
+
+    with open(clips[0], 'rb') as clip_file:
+        assert b'moof' in clip_file.read()
+    with av.open(clips[0]) as container:
+        frames = list(container.decode(video=0))
+    # at least the pre and post roll, about 30 fps
+    assert len(frames) >= 25
+    assert frames[0].key_frame
+
+
+@pytest.mark.asyncio
+async def test_event_recorder_player(tmp_path):
+    """Test the recorder buffers the packets the player demuxes rather than reading the source"""
+    av = pytest.importorskip('av')
+    player = open_player("tests/test.mp4", loop=True)
+    recorder = EventRecorder("tests/test.mp4", str(tmp_path), pre_roll=0.5, post_roll=0.5)
+    recorder.attach(player)
+    assert recorder.reader is None
+    assert player_container(player) is not None
+    for _ in range(30):
+        await player.video.recv()
+    assert recorder.stats()['buffered_bytes'] > 0
+    recorder.trigger()
+    for _ in range(30):
+        await player.video.recv()
+    player.video.stop()
+    recorder.stop(timeout=5.0)
+    clips = recorder.stats()['clips']
+    assert len(clips) == 1
+    with av.open(clips[0]) as container:
+        frames = list(container.decode(video=0))
+    assert len(frames) >= 15
+    assert frames[0].key_frame
+
+
+def test_detection_store(tmp_path):
+    """Test detections are stored by camera and day and queried by time, class and region"""
+    store = DetectionStore(str(tmp_path), flush_interval=0.05)
+    start = 1700000000.0
+    for index in range(48):
+        # a frame every hour over two days, a person at the door and a cat elsewhere
+        store.add('rtsp://door/cam', Detections(
+            np.array([[10, 10, 50, 90], [400, 300, 450, 340]]), np.array([0.9, 0.4]),
+            np.array([0, 15])
+        ), start + index * 3600, index, 'bboxes')
+    store.add('garden', Detections.empty(), start)
+    assert store.flush()
+    assert store.cameras() == ['rtsp_door_cam']
+    assert len(list((tmp_path / 'rtsp_door_cam').glob('*.sqlite'))) >= 2
+
+    assert len(store.query('rtsp://door/cam', start, start + 47 * 3600, limit=None)) == 96
+    day = store.query('rtsp://door/cam', start + 24 * 3600, start + 47 * 3600, limit=None)
+    assert len(day) == 48 and day[0]['ts'] == start + 24 * 3600
+    people = store.query('rtsp://door/cam', start, start + 47 * 3600, class_ids=[0])
+    assert len(people) == 48 and all(det['class_id'] == 0 for det in people)
+    near_door = store.query(
+        'rtsp://door/cam', start, start + 47 * 3600, region=[0, 0, 100, 100], limit=5
+    )
+    assert len(near_door) == 5
+    assert near_door[0]['box'] == [10, 10, 50, 90] and near_door[0]['output'] == 'bboxes'
+    assert not store.query('rtsp://door/cam', start, start + 47 * 3600, min_score=0.95)
+    assert not store.query('garden', start, start + 47 * 3600)
+    store.close()
+
+
+def test_kalman_filter():
+    """Test the batched Kalman filter follows boxes moving at constant velocity"""
+    boxes = np.array([[0, 0, 20, 40], [100, 100, 160, 220]], dtype=np.float64)
+    np.testing.assert_allclose(kalman.xyah_to_xyxy(kalman.xyxy_to_xyah(boxes)), boxes)
+    mean, covariance = kalman.initiate(kalman.xyxy_to_xyah(boxes))
+    assert mean.shape == (2, 8) and covariance.shape == (2, 4, 2, 2)
+    for step in range(1, 30):
+        mean, covariance = kalman.predict(mean, covariance)
+        mean, covariance = kalman.update(
+            mean, covariance, kalman.xyxy_to_xyah(boxes + [3 * step, 0, 3 * step, 0])
+        )
+    np.testing.assert_allclose(mean[:, 4], 3, atol=0.1)
+    predicted, _ = kalman.predict(mean, covariance)
+    np.testing.assert_allclose(
+        kalman.xyah_to_xyxy(predicted), boxes + [90, 0, 90, 0], atol=1
+    )
+
+
+def test_kalman_blocks():
+    """Test the covariance blocks give the same states as the full (8, 8) filter"""
+    motion = np.eye(8)
+    motion[:4, 4:] = np.eye(4)
+    boxes = kalman.xyxy_to_xyah(np.array([[0, 0, 20, 40], [100, 100, 160, 220]]))
+    mean, covariance = kalman.initiate(boxes)
+    full_mean, full = mean.copy(), kalman.full_covariance(covariance)
+    rng = np.random.default_rng(0)
+    for _ in range(5):
+        # the process noise is the same diagonal in both filters
+        noise = kalman.full_covariance(kalman.predict(full_mean, covariance * 0)[1])
+        full_mean, full = full_mean @ motion.T, motion @ full @ motion.T + noise
+        mean, covariance = kalman.predict(mean, covariance)
+        np.testing.assert_allclose(kalman.full_covariance(covariance), full)
+
+        measurements = boxes + rng.normal(0, 1, size=boxes.shape)
+        _, variance = kalman.project(full_mean, covariance)
+        innovation_covariance = full[:, :4, :4] + np.eye(4) * (
+            variance - full[:, np.arange(4), np.arange(4)]
+        )[:, None, :]
+        gain = full[:, :, :4] @ np.linalg.inv(innovation_covariance)
+        full_mean = full_mean + np.einsum('nij,nj->ni', gain, measurements - full_mean[:, :4])
+        full = full - gain @ innovation_covariance @ gain.transpose(0, 2, 1)
+        mean, covariance = kalman.update(mean, covariance, measurements)
+        np.testing.assert_allclose(mean, full_mean)
+        np.testing.assert_allclose(kalman.full_covariance(covariance), full, atol=1e-9)
+
+
+@pytest.mark.parametrize(
+    "similarity, rows, cols",
+    [
+        ([[0.9, 0.8], [0.85, 0.4]], [0, 1], [0, 1]),
+        ([[0.9, 0.8], [0.85, 0.1]], [0], [0]),
+        ([[0.4, 0.9], [0.1, 0.5]], [0], [1]),
+        ([[0.5, 0.9, 0.0], [0.6, 0.95, 0.0]], [1, 0], [1, 0]),
+        (np.zeros((0, 3)), [], []),
+    ]
+)
+def test_match_greedy(similarity, rows, cols):
+    """Test the best pairs above the threshold are matched first"""
+    matched_rows, matched_cols = match_greedy(np.array(similarity, dtype=np.float64), 0.3)
+    assert sorted(zip(matched_rows.tolist(), matched_cols.tolist())) == sorted(zip(rows, cols))
+
+
+def test_tracker():
+    """Test track ids follow moving people through a missed frame and low score detections"""
+    tracker = Tracker(min_hits=2, max_age=3)
+    people = np.array(
+        [[0, 0, 40, 100], [200, 0, 240, 100], [400, 0, 440, 100]], dtype=np.float32
+    )
+    ids = None
+    for step in range(20):
+        boxes = people + [5 * step, 0, 5 * step, 0]
+        scores = np.array([0.9, 0.9, 0.3 if step % 4 == 2 else 0.9])
+        if step == 10:
+            # the first person is missed for a frame
+            boxes, scores = boxes[1:], scores[1:]
+        tracks, track_ids = tracker.update(Detections(boxes, scores, np.zeros(len(boxes))))
+        if step == 0:
+            ids = track_ids.tolist()
+            assert len(ids) == 3
+        elif step == 10:
+            assert track_ids.tolist() == ids[1:]
+        else:
+            assert track_ids.tolist() == ids
+            np.testing.assert_allclose(tracks.xyxy, boxes, atol=3)
+    assert len(tracker) == 3
+
+    # a new person gets a new id once seen min_hits times, the others are removed
+    for step in range(5):
+        tracks, track_ids = tracker.update(Detections(
+            np.array([[600, 0, 640, 100]]), np.array([0.8]), np.array([0])
+        ))
+        assert track_ids.tolist() == ([] if step == 0 else [4])
+    assert len(tracker) == 1
+    tracker.reset()
+    assert len(tracker) == 0
+
+
+def test_tracker_many_tracks():
+    """Test 100 people moving together keep their ids, the timing is in `bench_tracker`"""
+    rng = np.random.default_rng(0)
+    xy = rng.uniform(0, 1800, size=(100, 2))
+    boxes = np.concatenate([xy, xy + 50], axis=1)
+    tracker = Tracker()
+    for _ in range(5):
+        tracks, track_ids = tracker.update(Detections(boxes, np.full(100, 0.9), np.zeros(100)))
+    first_boxes = dict(zip(track_ids.tolist(), tracks.xyxy))
+    for step in range(1, 21):
+        tracks, track_ids = tracker.update(
+            Detections(boxes + step, np.full(100, 0.9), np.zeros(100))
+        )
+        # every person keeps its id, its box moved a pixel per frame
+        assert sorted(track_ids.tolist()) == sorted(first_boxes)
+        expected = np.array([first_boxes[track_id] for track_id in track_ids.tolist()]) + step
+        np.testing.assert_allclose(tracks.xyxy, expected, atol=1)
+    assert len(tracker) == 100
+
+
+def test_room_projection():
+    """Test tracked people are projected on the floor plan, their trails drawn incrementally"""
+    solution = load_solution_from_dict('room_projection_solution', {'refresh_interval': 3})
+    image = np.full((1080, 1920, 3), 255, dtype=np.uint8)
+    positions = []
+    for step in range(3):
+        outputs = solution.process(solution.input_types.create(
+            image=image.copy(),
+            bboxes=[[900 + 100 * step, 700, 1020 + 100 * step, 1080], [0, 0, 10, 10]],
+            track_ids=[7, 8]
+        ))
+        positions.append(outputs.floor_positions)
+        assert outputs.track_ids.tolist() == [7, 8]
+        assert outputs.image.shape == (400, 600, 3)
+        if step == 0:
+            canvas = solution.canvas
+        assert solution.canvas is canvas
+    np.testing.assert_allclose(positions[0][0], [300, 400], atol=1e-6)
+    # the trail of track 7 between its first two positions stays on the canvas
+    (x0, y0), (x1, y1) = np.round(positions[0][0]), np.round(positions[1][0])
+    assert tuple(canvas[int(y0 + y1) // 2 - 1, int(x0 + x1) // 2]) != (255, 255, 255)
+
+    outputs = solution.process(solution.input_types.create(image=image.copy()))
+    assert solution.canvas is not canvas and not solution.last_points
+    assert len(outputs.floor_positions) == 0
+
+
+def test_action_recognizer(synthetic_models):
+    """Test the clips of the tracks are buffered in turn and classified in one batch every
+    stride frames"""
+    recognizer = ActionRecognizer.from_config(ActionRecognizer.config_type(
+        gpu=False, warmup_runs=0, model_dir=synthetic_models, stride=8, max_tracks=2, max_age=2
+    ))
+    assert recognizer.session.get_inputs()[0].shape == ['batch', 3, 8, 112, 112]
+    runs = []
+    session_run = recognizer.session.run
+    recognizer.session.run = lambda *args: runs.append(args[1]['clips'].shape) or session_run(*args)
+    boxes = Detections(np.array([[0, 0, 50, 100], [100, 0, 150, 100], [200, 0, 250, 100]]))
+    for step in range(16):
+        # a uniform frame per step, to check the order of the frames in the clips
+        outputs = recognizer.process(ActionRecognizerInput.create(
+            image=np.full((200, 300, 3), 10 * step, dtype=np.uint8), tracks=boxes,
+            track_ids=np.array([1, 2, 3])
+        ))
+        if step < 7:
+            assert outputs.actions == [[], [], []]
+    assert runs == [(2, 3, 8, 112, 112)] * 2
+    # the third track has no slot, the others are recognized from their last 8 frames
+    assert outputs.actions[2] == [] and all(outputs.actions[:2])
+    assert all(action in recognizer.actions for action in outputs.actions[0])
+    assert len(outputs.actions[0]) == len(outputs.action_scores[0]) <= 2
+    red = recognizer.batch[0, 0, :, 0, 0]
+    np.testing.assert_allclose(
+        (red + 0.485 / 0.229) * 255 * 0.229, np.arange(80, 160, 10), atol=1e-3
+    )
+
+    # the slot of a track gone for max_age frames goes to a new track
+    for _ in range(3):
+        outputs = recognizer.process(ActionRecognizerInput.create(
+            image=np.zeros((200, 300, 3), dtype=np.uint8), tracks=boxes[[1, 2]],
+            track_ids=np.array([2, 3])
+        ))
+    assert set(recognizer.slots) == {2, 3}
+    assert outputs.actions[1] == []
+
+
+def test_reid_embedder(synthetic_models):
+    """Test only the new, moved and stale tracks are embedded, in one batch per frame"""
+    embedder = ReIDEmbedder.from_config(ReIDEmbedder.config_type(
+        gpu=False, warmup_runs=0, model_dir=synthetic_models, max_staleness=10, max_age=2
+    ))
+    batches = []
+    session_run = embedder.session.run
+    embedder.session.run = lambda *args: batches.append(len(args[1]['images'])) \
+        or session_run(*args)
+    image = np.random.default_rng(0).integers(0, 255, (200, 300, 3), dtype=np.uint8)
+    boxes = np.array([[0, 0, 50, 100], [100, 0, 150, 100], [200, 0, 250, 100]], dtype=float)
+
+    def step(boxes, track_ids):
+        return embedder.process(ReIDEmbedderInput.create(
+            image=image, tracks=Detections(boxes), track_ids=np.array(track_ids)
+        ))
+
+    outputs = step(boxes, [1, 2, 3])
+    assert outputs.updated.all() and outputs.embeddings.shape == (3, 128)
+    np.testing.assert_allclose(np.linalg.norm(outputs.embeddings, axis=1), 1, rtol=1e-5)
+    first = outputs.embeddings.copy()
+    # a small move keeps the cache, a large one and a new track are embedded
+    moved = boxes + [[2, 0, 2, 0], [40, 0, 40, 0], [0, 0, 0, 0]]
+    outputs = step(np.concatenate([moved, [[0, 100, 50, 200]]]), [1, 2, 3, 4])
+    assert outputs.updated.tolist() == [False, True, False, True]
+    np.testing.assert_array_equal(outputs.embeddings[[0, 2]], first[[0, 2]])
+    assert batches == [3, 2]
+    for _ in range(9):
+        outputs = step(moved[:2], [1, 2])
+    # track 1 is stale 10 frames after it was embedded, tracks 3 and 4 were dropped
+    assert batches == [3, 2, 1] and not outputs.updated[1]
+    assert set(embedder.rows) == {1, 2}
+    assert embedder.embedded == 6
+
+
+def test_embedding_gallery():
+    """Test the tracks of another camera take the identity of the most similar embedding,
+    and the tracks on the same camera stay different people"""
+    gallery = EmbeddingGallery(threshold=0.8, ttl=100, active_seconds=2)
+    people = np.eye(4, 16, dtype=np.float32)
+    identities = gallery.identify('door', [1, 2], people[:2], timestamp=0)
+    assert identities.tolist() == [1, 2]
+    # the same people seen by another camera, and a new one
+    noisy = people[[1, 0, 2]] + 0.1 * np.eye(3, 16, k=8, dtype=np.float32)
+    identities = gallery.identify('hall', [7, 8, 9], noisy, timestamp=1)
+    assert identities.tolist() == [2, 1, 3]
+    # a known track keeps its identity whatever its embedding
+    assert gallery.identify('door', [1], people[3:], timestamp=1).tolist() == [1]
+    # person 3 is on the hall now, a new hall track like them is someone else
+    assert gallery.identify('hall', [10], people[2:3], timestamp=1.5).tolist() == [4]
+    assert gallery.stats() == {'embeddings': 6, 'cameras': 2, 'identities': 4}
+    # one track per identity among new tracks, the most similar wins: the embedding of door
+    # track 1 moved towards person 4
+    identities = gallery.identify('garden', [1, 2], [people[0] + 0.3 * people[3], people[0]],
+                                  timestamp=1.5)
+    assert identities.tolist() == [1, 5]
+    # expired embeddings are dropped
+    gallery.identify('door', [3], people[3:], timestamp=105)
+    assert len(gallery) == 1
+    assert gallery.identify('door', [], np.empty((0, 16)), timestamp=105).shape == (0,)
+
+
+def test_embedding_gallery_sessions():
+    """Test a solution started again on a camera, whose track ids start again, doesn't give
+    its new people the identities of the previous run's tracks of the same ids"""
+    gallery = EmbeddingGallery(threshold=0.8, ttl=600, active_seconds=2)
+    people = np.eye(2, 16, dtype=np.float32)
+    assert gallery.identify('door', [1], people[:1], timestamp=0, session='a').tolist() == [1]
+    assert gallery.identify('door', [1], people[1:], timestamp=30, session='b').tolist() == [2]
+    # the embedding of the first person is not merged with the second one
+    np.testing.assert_allclose(gallery.embeddings[0], people[0])
+    # the first person coming back in the new run is recognized
+    assert gallery.identify('door', [2], people[:1], timestamp=31, session='b').tolist() == [1]
+
+
+def test_heatmap_solution(tmp_path):
+    """Test the people are accumulated every frame, the heatmap is sent on the snapshot frames
+    and saved on the checkpoint frames and when the solution is closed"""
+    checkpoint = str(tmp_path / 'heatmaps' / 'camera.npz')
+    solution = load_solution_from_dict('heatmap_solution', {
+        'cell_size': 20, 'snapshot_interval': 2, 'checkpoint': checkpoint,
+        'checkpoint_interval': 3
+    })
+    for step in range(4):
+        outputs = solution.process(solution.input_types.create(
+            image=np.zeros((200, 300, 3), dtype=np.uint8), bboxes=[[100, 0, 140, 200]]
+        ))
+        assert outputs.image.shape == (200, 300, 3)
+        assert (outputs.heatmap is None) == (step % 2 == 0 and step > 0)
+    assert outputs.heatmap.shape == (10, 15) and outputs.heatmap.max() == 255
+    assert outputs.heatmap_peak == pytest.approx(4, rel=1e-3)
+    # the footprint at the bottom of the box is the hottest on the frame
+    assert outputs.image[190, 120, 2] > 0 and not outputs.image[10, 120].any()
+
+    def restored_peak():
+        restored = load_solution_from_dict('heatmap_solution', {
+            'cell_size': 20, 'checkpoint': checkpoint
+        })
+        return restored.process(restored.input_types.create(
+            image=np.zeros((200, 300, 3), dtype=np.uint8)
+        )).heatmap_peak
+
+    # saved on the third frame, not a snapshot frame
+    assert restored_peak() == pytest.approx(3, rel=1e-3)
+    solution.close()
+    assert restored_peak() == pytest.approx(4, rel=1e-3)
+
+
+def test_zone_rules():
+    """Test the tracks entering, exiting and crossing are found for all the zones and lines at
+    once, the same as a polygon test per person and zone"""
+    zones = [
+        {'name': 'kitchen', 'points': [[0, 0], [200, 0], [200, 200], [0, 200]]},
+        {'name': 'sofa', 'points': [[150, 100], [300, 100], [300, 300], [150, 300]]},
+    ]
+    lines = [{'name': 'door', 'points': [[400, 0], [400, 400]]}]
+    rules = ZoneRules.from_config(ZoneRules.config_type(
+        zones=zones, lines=lines, cell_size=1, max_age=1
+    ))
+
+    def step(points, track_ids=(1, 2)):
+        boxes = np.array([[x - 10, y - 50, x + 10, y] for x, y in points], dtype=float)
+        return rules.process(ZoneRulesInput.create(
+            detections=Detections(boxes.reshape(-1, 4)), frame_size=(400, 500),
+            track_ids=None if track_ids is None else np.array(track_ids)
+        ))
+
+    # the people already in a zone when first seen don't enter it
+    outputs = step([(100, 150), (450, 50)])
+    assert outputs.zone_counts == [1, 0]
+    assert outputs.events == [] and not rules.totals
+    outputs = step([(180, 150), (350, 60)])
+    assert outputs.zone_counts == [1, 1]
+    assert [(event['rule'], event['type'], event.get('direction')) for event in outputs.events] \
+        == [('sofa', 'enter', None), ('door', 'cross', 'in')]
+    assert outputs.event_indices.tolist() == [0, 1]
+    # a move beside the line isn't a crossing, untracked people are only counted
+    outputs = step([(250, 150), (350, 450)])
+    assert [event['type'] for event in outputs.events] == ['exit']
+    assert step([(10, 10)], None).zone_counts == [1, 0]
+    # tracks gone for more than max_age frames exit their zones
+    outputs = step([], [])
+    assert outputs.events == [{'rule': 'sofa', 'type': 'exit', 'track_id': 1}]
+    assert rules.totals == {'sofa:enter': 1, 'door:in': 1, 'kitchen:exit': 1, 'sofa:exit': 1}
+    assert not rules.rows
+    # a track started again on the same person, with a new id, doesn't enter either
+    assert step([(180, 150)], [3]).events == []
+    assert step([(180, 150)], [4]).events == []
+
+    points = np.random.default_rng(0).uniform(-50, 450, size=(500, 2))
+    expected = np.array([
+        [cv2.pointPolygonTest(np.array(zone['points'], np.float32), tuple(point), True) > 0.5
+         for zone in zones] for point in points.tolist()
+    ])
+    near_edge = np.array([
+        [abs(cv2.pointPolygonTest(np.array(zone['points'], np.float32), tuple(point), True))
+         < 1.5 for zone in zones] for point in points.tolist()
+    ])
+    inside = rules.zones_of(points)
+    assert (inside == expected)[~near_edge].all()
+
+
+def test_zone_analytics_solution():
+    """Test the zone analytics reports the events of the chained tracks with their boxes"""
+    solution = load_solution_from_dict('zone_analytics_solution', {'zone_rules': {
+        'zones': [{'name': 'rug', 'points': [[0, 0], [100, 0], [100, 100], [0, 100]]}],
+        'lines': [{'name': 'door', 'points': [[200, 200], [200, 0]]}],
+    }})
+    for step in range(2):
+        outputs = solution.process(solution.input_types.create(
+            image=np.zeros((200, 300, 3), dtype=np.uint8),
+            bboxes=[[30, 20, 50, 80], [150 + 100 * step, 20, 170 + 100 * step, 80]],
+            track_ids=[1, 2]
+        ))
+    assert outputs.zone_counts == [1]
+    assert outputs.events == [{'rule': 'door', 'type': 'cross', 'track_id': 2, 'direction': 'in'}]
+    assert outputs.event_bboxes.xyxy.tolist() == [[250, 20, 270, 80]]
+    assert outputs.totals == {'door:in': 1}
+    # the occupied zone is drawn in red
+    assert outputs.image[0, 50].tolist() == [0, 0, 255]
@@ -1,9 +1,20 @@
 """Test HomeVision WebRTC server"""
+import asyncio
+import fractions
+
+import numpy as np
 import pytest
 from aiortc import (RTCConfiguration, RTCIceServer, RTCPeerConnection,
                     RTCSessionDescription)
+from av import VideoFrame
 
-from tests.conftest import (assertDataChannelOpen, assertIceCompleted,
+from home_vision.modules.rtc_server.encoder import (AdaptiveH264Encoder, EncoderSettings,
+                                                   install_encoder, scale_for_bitrate)
+from home_vision.modules.rtc_server.local import LocalListener
+from home_vision.modules.rtc_server.server import RTCListener, VideoTransformTrack
+from home_vision.modules.rtc_server.sync import ResultBuffer
+from home_vision.solutions.solution_base import Solution
+from tests.conftest import (assertDataChannelOpen, assertIceCompleted, rtc_server,
                             track_remote_tracks, track_states)
 
 
@@ -91,3 +102,209 @@ async def test_rtc_connection(rtc_client, with_track, remote_tracks):
     assert pc_states['iceConnectionState'] == ["new", "checking", "completed", "closed"]
     assert pc_states['iceGatheringState'] == ["new", "gathering", "complete"]
     assert pc_states['signalingState'] == ["stable", "have-local-offer", "stable", "closed"]
+
+
+@pytest.mark.parametrize(
+    "target_bitrate, scale",
+    [
+        (3000000, 1.0),
+        (1000000, 1.0),
+        (600000, 0.75),
+        (300000, 0.5),
+        (10000, 0.25),
+    ]
+)
+def test_scale_for_bitrate(target_bitrate, scale):
+    """Test the output scale of a peer follows its bandwidth estimate"""
+    assert scale_for_bitrate(target_bitrate, 1000000) == scale
+
+
+def test_adaptive_encoder():
+    """Test the encoder clamps the bitrate and downscales when the bandwidth estimate drops"""
+    encoder = AdaptiveH264Encoder(EncoderSettings(min_bitrate=250000, adaptive_downscale=True))
+    frame = VideoFrame.from_ndarray(np.zeros((720, 1280, 3), dtype=np.uint8), format="bgr24")
+    frame.pts, frame.time_base = 0, fractions.Fraction(1, 90000)
+    encoder.encode(frame, True)
+    assert encoder.stats()['size'] == [1280, 720]
+    encoder.target_bitrate = 100000
+    assert encoder.target_bitrate == 250000
+    encoder.encode(frame, False)
+    assert encoder.stats()['size'] == [640, 360]
+
+    encoder = AdaptiveH264Encoder(EncoderSettings(adaptive_downscale=False))
+    encoder.target_bitrate = 100000
+    encoder.encode(frame, True)
+    assert encoder.stats()['size'] == [1280, 720]
+
+
+def test_install_encoder():
+    """Test the encoder is installed on an aiortc sender, and fails loudly on a sender
+    without the private attribute it relies on"""
+    pc = RTCPeerConnection()
+    sender = pc.addTransceiver('video', direction='sendonly').sender
+    encoder = install_encoder(sender, EncoderSettings())
+    assert getattr(sender, '_RTCRtpSender__encoder') is encoder
+    asyncio.run(pc.close())
+
+    with pytest.raises(RuntimeError, match='_RTCRtpSender__encoder'):
+        install_encoder(object(), EncoderSettings())
+
+@pytest.mark.asyncio
+async def test_rtc_output_encoding(aiohttp_client):
+    """Test the restreamed video is downscaled to the output size and encoded per peer"""
+    client = await aiohttp_client(rtc_server(
+        'raw_stream_solution', "tests/test.mp4",
+        rtc_options={'codec': True, 'output_width': 320, 'keyframe_interval': 10}
+    ))
+    pc = RTCPeerConnection() #pylint: disable=invalid-name
+    tracks = []
+    pc.on("track", tracks.append)
+    pc.addTransceiver('video', 'recvonly')
+    await pc.setLocalDescription(await pc.createOffer())
+    resp = await client.post('/offer', json={
+        "sdp": pc.localDescription.sdp, "type": pc.localDescription.type, "track": True
+    })
+    answer = await resp.json()
+    assert "H264" in answer["sdp"]
+    await pc.setRemoteDescription(RTCSessionDescription(sdp=answer["sdp"], type=answer["type"]))
+    await assertIceCompleted(pc)
+
+    frame = await asyncio.wait_for(tracks[0].recv(), 30)
+    assert (frame.width, frame.height) == (320, 180)
+    status = await (await client.get('/status')).json()
+    assert status['peers'][0]['size'] == [320, 180]
+
+    # the encoder of a closed peer connection is removed
+    server = next(
+        callback.__self__ for callback in client.server.app.on_shutdown
+        if hasattr(callback, '__self__')
+    )
+    await next(iter(server.pcs)).close()
+    status = await (await client.get('/status')).json()
+    assert status['peers'] == []
+
+    await pc.close()
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_local_chaining(aiohttp_client, tmp_path):
+    """Test a solution consumes the raw frames and results published on a unix socket"""
+    path = str(tmp_path / "upstream.sock")
+    client = await aiohttp_client(rtc_server(
+        'raw_stream_solution', "tests/test.mp4", rtc_options={'publish_socket': path}
+    ))
+    listener = LocalListener(path)
+    outputs, frame = await asyncio.wait_for(listener.recv(), 30)
+    assert outputs['image'].shape == (1080, 1920, 3)
+    assert outputs['image'].flags.writeable
+    assert outputs['frame_cnt'] >= 1
+    assert frame.pts is not None and frame.time_base is not None
+
+    solution = Solution.by_name('raw_stream_solution').from_config(None)
+    track = VideoTransformTrack(listener, 'local', solution)
+    new_frame = await asyncio.wait_for(track.recv(), 30)
+    assert (new_frame.width, new_frame.height) == (1920, 1080)
+    assert new_frame.pts > frame.pts
+    track.pool.shutdown()
+    listener.stop()
+    await client.close()
+
+
+def test_result_buffer():
+    """Test results are matched to their frames by pts, whatever their arrival order"""
+    buffer = ResultBuffer(size=4, relock_after=2)
+    assert buffer.match(0) is None
+    for pts in (3000, 6000, 9000):
+        buffer.add({'pts': pts, 'frame_cnt': pts // 3000})
+    buffer.add({'frame_cnt': 0})
+    # received frames' pts start at 0 from the first frame sent, pts 3000
+    buffer.lock(3000)
+    assert buffer.match(3000)['frame_cnt'] == 2
+    assert buffer.stale == 1
+    assert buffer.match(3000) is None
+    assert buffer.match(6000)['frame_cnt'] == 3
+
+    # the source restarted, the results are matched again after `relock_after` misses
+    buffer.add({'pts': 300000, 'frame_cnt': 4})
+    buffer.add({'pts': 303000, 'frame_cnt': 5})
+    buffer.miss(9000)
+    assert buffer.offset == 3000
+    buffer.miss(12000)
+    assert buffer.offset == 303000 - 12000
+    assert buffer.match(15000) is None
+    assert buffer.match(12000)['frame_cnt'] == 5
+
+    for pts in range(6):
+        buffer.add({'pts': pts})
+    metrics = buffer.metrics()
+    assert metrics['matched'] == 3
+    assert metrics['mismatched'] == 2
+    assert metrics['buffered_results'] == 4
+    assert metrics['stale_results'] == 4
+    assert metrics['skew']['count'] == 3
+
+
+@pytest.mark.asyncio
+async def test_rtc_listener_sync(aiohttp_client):
+    """Test the listener pairs every received frame with the result of the same frame"""
+    client = await aiohttp_client(rtc_server('raw_stream_solution', "tests/test.mp4"))
+    listener = RTCListener(str(client.make_url('')).rstrip('/'), max_wait=1.0)
+    previous = None
+    for _ in range(5):
+        outputs, frame = await asyncio.wait_for(listener.recv(), 30)
+        assert outputs['pts'] == frame.pts + listener.buffer.offset
+        assert outputs['image'].shape == (frame.height, frame.width, 3)
+        if previous is not None:
+            assert outputs['frame_cnt'] > previous
+        previous = outputs['frame_cnt']
+    assert listener.buffer.metrics()['matched'] == 5
+    await listener.pc.close()
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_rtc_event_recorder(aiohttp_client, tmp_path):
+    """Test the server buffers the source's packets for the event clips"""
+    path = str(tmp_path / "upstream.sock")
+    client = await aiohttp_client(rtc_server(
+        'raw_stream_solution', "tests/test.mp4", rtc_options={
+            'record_events': 'bboxes', 'event_dir': str(tmp_path), 'pre_roll': 1.0,
+            'publish_socket': path
+        }
+    ))
+    # nothing is buffered until the solution runs
+    status = await (await client.get('/status')).json()
+    assert status['events']['buffered_bytes'] == 0
+    listener = LocalListener(path)
+    for _ in range(5):
+        await asyncio.wait_for(listener.recv(), 30)
+    status = await (await client.get('/status')).json()
+    assert status['events']['buffered_bytes'] > 0
+    assert status['events']['recording'] is None
+    listener.stop()
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_rtc_event_recorder_disabled(aiohttp_client, tmp_path, monkeypatch):
+    """Test the solution still runs when the packets of the player can't be recorded"""
+    def attach(player):
+        raise RuntimeError('the packets of this MediaPlayer can not be tapped')
+    path = str(tmp_path / "upstream.sock")
+    client = await aiohttp_client(rtc_server(
+        'raw_stream_solution', "tests/test.mp4", rtc_options={
+            'record_events': 'bboxes', 'event_dir': str(tmp_path), 'publish_socket': path
+        }
+    ))
+    server = next(
+        callback.__self__ for callback in client.server.app.on_shutdown
+        if hasattr(callback, '__self__')
+    )
+    monkeypatch.setattr(server.event_recorder, 'attach', attach)
+    listener = LocalListener(path)
+    await asyncio.wait_for(listener.recv(), 30)
+    status = await (await client.get('/status')).json()
+    assert 'events' not in status
+    listener.stop()
+    await client.close()
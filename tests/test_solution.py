@@ -1,4 +1,7 @@
 """Test HomeVision solutions loading and configs"""
+import subprocess
+import sys
+
 import pytest
 from home_vision.solutions.solution_base import Solution
 
@@ -25,6 +28,18 @@ from home_vision.utils.utils import load_solution_config_from_file, load_solutio
         ('raw_stream_solution', {}, ''),
         ('object_detection_solution', {}, ''),
         ('person_detection_solution', {}, ''),
+        ('person_tracking_solution', {}, ''),
+        ('room_projection_solution', {}, ''),
+        ('action_recognition_solution', {}, ''),
+        ('reid_solution', {}, ''),
+        ('heatmap_solution', {}, ''),
+        ('zone_analytics_solution', {}, ''),
+        (
+            'zone_analytics_solution',
+            {'zone_rules': {'zones': [{'name': 'rug', 'points': [[0, 0], [10, 0]]}]}},
+            '3 or more points'
+        ),
+        ('room_projection_solution', {'floor_plan': 'not_exist.png'}, 'floor plan'),
         ('raw_datachannel_solution', {}, '')
     ]
 )
@@ -62,3 +77,23 @@ def test_available_solution():
     available_solutions = Solution.list_available()
     intersect_solutions = set(need_solutions).intersection(set(available_solutions))
     assert intersect_solutions == set(need_solutions)
+
+
+@pytest.mark.pipeline
+def test_lazy_imports():
+    """Test solution configs are available without importing the runtime dependencies,
+    which are imported on first use"""
+    code = (
+        "import sys\n"
+        "import solution_manager.sm\n"
+        "from home_vision.modules.module_base import Module\n"
+        "from home_vision.solutions.solution_base import Solution\n"
+        "assert 'raw_stream_solution' in Solution.list_available()\n"
+        "for name in Solution.list_available():\n"
+        "    Solution.by_name(name).config_type()\n"
+        "assert not {'onnxruntime', 'aiortc', 'av'} & set(sys.modules), sys.modules.keys()\n"
+        "Module.by_name('rtc_server')\n"
+        "assert 'aiortc' in sys.modules\n"
+        "assert Module.registered_name(Module.by_name('capture')) == 'capture'"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
@@ -0,0 +1,189 @@
+"""Test HomeVision utility functions"""
+import cv2
+import numpy as np
+import pytest
+from home_vision.common.detections import Detections
+from home_vision.utils.boxes import (box_area, giou_matrix, ioa_matrix, iou_matrix,
+    paired_iou)
+from home_vision.utils.crops import IMAGENET_MEAN, IMAGENET_STD, RoiCropper
+from home_vision.utils.heatmap import OccupancyHeatmap, colorize
+from home_vision.utils.homography import FloorHomography, foot_points
+from home_vision.utils.utils import get_giou, get_ioa, get_iou
+
+
+def reference_overlaps(bb1, bb2):
+    """IoU, IoA and GIoU of two boxes computed one coordinate at a time"""
+    width = max(min(bb1[2], bb2[2]) - max(bb1[0], bb2[0]), 0)
+    height = max(min(bb1[3], bb2[3]) - max(bb1[1], bb2[1]), 0)
+    intersection = width * height
+    area1 = (bb1[2] - bb1[0]) * (bb1[3] - bb1[1])
+    area2 = (bb2[2] - bb2[0]) * (bb2[3] - bb2[1])
+    union = area1 + area2 - intersection
+    enclosing = (
+        (max(bb1[2], bb2[2]) - min(bb1[0], bb2[0])) * (max(bb1[3], bb2[3]) - min(bb1[1], bb2[1]))
+    )
+    iou = intersection / union
+    return iou, intersection / min(area1, area2), iou - (enclosing - union) / enclosing
+
+
+@pytest.mark.parametrize(
+    "bb1, bb2, iou, ioa, giou",
+    [
+        ([0, 0, 10, 10], [0, 0, 10, 10], 1.0, 1.0, 1.0),
+        ([0, 0, 10, 10], [5, 0, 15, 10], 50 / 150, 0.5, 50 / 150),
+        ([0, 0, 10, 10], [2, 2, 4, 4], 0.04, 1.0, 0.04),
+        ([0, 0, 10, 10], [10, 0, 20, 10], 0.0, 0.0, 0.0),
+        ([0, 0, 10, 10], [20, 0, 30, 10], 0.0, 0.0, -1 / 3),
+    ]
+)
+def test_box_overlaps(bb1, bb2, iou, ioa, giou):
+    """Test the scalar overlaps of two boxes and their matrices agree"""
+    assert get_iou(bb1, bb2) == pytest.approx(iou)
+    assert get_ioa(bb1, bb2) == pytest.approx(ioa)
+    assert get_giou(bb1, bb2) == pytest.approx(giou)
+    assert iou_matrix([bb1], [bb2])[0, 0] == pytest.approx(iou)
+    assert ioa_matrix([bb1], [bb2])[0, 0] == pytest.approx(ioa)
+    assert giou_matrix([bb1], [bb2])[0, 0] == pytest.approx(giou)
+
+
+def test_overlap_matrices():
+    """Test the matrices of N against M boxes match the overlaps computed pair by pair"""
+    rng = np.random.default_rng(0)
+    xy1 = rng.uniform(0, 100, (7, 2))
+    xy2 = rng.uniform(0, 100, (5, 2))
+    boxes1 = np.hstack([xy1, xy1 + rng.uniform(1, 50, (7, 2))])
+    boxes2 = np.hstack([xy2, xy2 + rng.uniform(1, 50, (5, 2))])
+    expected = np.array([[reference_overlaps(bb1, bb2) for bb2 in boxes2] for bb1 in boxes1])
+    for index, matrix in enumerate((iou_matrix, ioa_matrix, giou_matrix)):
+        result = matrix(boxes1, boxes2)
+        assert result.shape == (7, 5)
+        np.testing.assert_allclose(result, expected[..., index])
+    # the detections' float32 boxes are accepted as is
+    detections = Detections(boxes1)
+    np.testing.assert_allclose(
+        iou_matrix(detections.xyxy, boxes2), iou_matrix(boxes1, boxes2), rtol=1e-5
+    )
+
+
+def test_overlap_matrices_edge_cases():
+    """Test empty sets and degenerate boxes"""
+    boxes = np.array([[0, 0, 10, 10]])
+    assert iou_matrix(np.empty((0, 4)), boxes).shape == (0, 1)
+    assert giou_matrix(boxes, np.empty((0, 4))).shape == (1, 0)
+    degenerate = np.array([[5, 5, 5, 5]])
+    assert box_area(degenerate)[0] == 0
+    assert iou_matrix(degenerate, degenerate)[0, 0] == 0
+    assert ioa_matrix(boxes, degenerate)[0, 0] == 0
+    with pytest.raises(AssertionError):
+        get_iou([10, 0, 0, 10], [0, 0, 10, 10])
+
+
+def test_paired_iou():
+    """Test the IoU of the boxes of each row is the diagonal of the IoU matrix"""
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(0, 100, size=(2, 20, 2, 2))
+    boxes1, boxes2 = (np.concatenate([c.min(axis=1), c.max(axis=1)], axis=1) for c in corners)
+    np.testing.assert_allclose(
+        paired_iou(boxes1, boxes2), np.diag(iou_matrix(boxes1, boxes2)), rtol=1e-6
+    )
+    assert paired_iou(np.empty((0, 4)), np.empty((0, 4))).shape == (0,)
+
+
+def test_floor_homography():
+    """Test camera pixels project on the floor plan and back, and the cached remap tables
+    give the bird's-eye view of warpPerspective"""
+    homography = FloorHomography(
+        [[480, 540], [1440, 540], [1920, 1080], [0, 1080]],
+        [[0, 0], [600, 0], [600, 400], [0, 400]],
+        (600, 400)
+    )
+    np.testing.assert_allclose(
+        homography.to_floor([[960, 1080], [480, 540]]), [[300, 400], [0, 0]], atol=1e-6
+    )
+    points = np.random.default_rng(0).uniform(0, 600, size=(100, 2))
+    np.testing.assert_allclose(homography.to_floor(homography.to_image(points)), points)
+    assert homography.to_floor(np.empty((0, 2))).shape == (0, 2)
+    np.testing.assert_allclose(
+        foot_points(np.array([[10, 20, 30, 80]])), [[20, 80]]
+    )
+
+    image = cv2.resize(
+        np.random.default_rng(0).integers(0, 256, (27, 48, 3), dtype=np.uint8), (1920, 1080)
+    )
+    expected = cv2.warpPerspective(image, homography.matrix, (600, 400))
+    warped = homography.warp(image)
+    assert warped.shape == (400, 600, 3)
+    assert homography.maps() is homography.maps()
+    assert np.abs(warped.astype(int) - expected).mean() < 2
+
+    with pytest.raises(ValueError, match='4 or more'):
+        FloorHomography([[0, 0], [1, 0], [1, 1]], [[0, 0], [1, 0], [1, 1]], (10, 10))
+
+
+@pytest.mark.parametrize("parallel_threshold", [1, 100])
+def test_roi_cropper(parallel_threshold):
+    """Test the crops of the boxes are resized and normalized into reused buffers, serially
+    or on the thread pool"""
+    image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    boxes = np.array([
+        [10, 20, 110, 220], [600, 400, 700, 500], [-50, -50, 5, 5], [700, 10, 800, 20],
+        *[[x, 100, x + 40, 180] for x in range(0, 400, 50)]
+    ], dtype=np.float32)
+    cropper = RoiCropper((64, 32), parallel_threshold=parallel_threshold)
+    crops = cropper(image, boxes)
+    assert crops.patches.shape == (len(boxes), 3, 64, 32)
+    assert crops.patches.dtype == np.float32
+    assert crops.boxes[:4].tolist() == [
+        [10, 20, 110, 220], [600, 400, 640, 480], [0, 0, 5, 5], [640, 10, 640, 20]
+    ]
+    np.testing.assert_allclose(crops.scales[0], [0.32, 0.32])
+    assert crops.scales[3].tolist() == [0, 0]
+    for index, (xmin, ymin, xmax, ymax) in enumerate(crops.boxes.tolist()):
+        if index == 3:
+            continue
+        patch = cv2.resize(image[ymin:ymax, xmin:xmax], (32, 64))[..., ::-1] / 255
+        expected = ((patch - IMAGENET_MEAN) / IMAGENET_STD).transpose(2, 0, 1)
+        np.testing.assert_allclose(crops.patches[index], expected, atol=1e-4)
+    np.testing.assert_allclose(
+        crops.to_image(np.array([[[0, 0], [16, 32]]] * len(boxes)))[0], [[10, 20], [60, 120]]
+    )
+
+    # the buffers are reused while they are large enough
+    buffer = cropper.buffer
+    assert len(cropper(image, boxes[:3]).patches) == 3
+    assert cropper.buffer is buffer
+    assert len(cropper(image, np.tile(boxes, (3, 1))).patches) == 3 * len(boxes)
+    assert len(cropper(image, np.empty((0, 4))).patches) == 0
+    cropper.close()
+
+
+def test_occupancy_heatmap(tmp_path):
+    """Test the heatmap kept as decayed differences is the decayed sum of the footprints of
+    every frame, and survives a checkpoint"""
+    heatmap = OccupancyHeatmap(cell_size=10, half_life=5, foot_ratio=0.5)
+    rng = np.random.default_rng(0)
+    reference = np.zeros((12, 16))
+    # 40 half-lives, the weights of the footprints are rescaled every 20 frames
+    for _ in range(200):
+        corners = rng.uniform(-20, 180, size=(rng.integers(0, 4), 2, 2))
+        boxes = np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+        heatmap.add(boxes, (115, 160))
+        # decay every cell, then add the footprints one at a time
+        reference *= 0.5 ** (1 / 5)
+        for col0, row0, col1, row1 in heatmap.cells(boxes).tolist():
+            reference[row0:row1, col0:col1] += 1
+    np.testing.assert_allclose(heatmap.grid(), reference, atol=1e-4)
+    # the bottom half of a box covers at least one cell, the boxes outside the frame none
+    assert heatmap.cells([[12, 0, 13, 40]]).tolist() == [[1, 2, 2, 4]]
+    assert heatmap.cells([[-50, -50, -10, -10]]).tolist() == [[0, 0, 0, 0]]
+
+    heatmap.save(str(tmp_path / 'heatmap.npz'))
+    restored = OccupancyHeatmap(cell_size=10, half_life=5, foot_ratio=0.5)
+    assert restored.load(str(tmp_path / 'heatmap.npz'))
+    np.testing.assert_allclose(restored.grid(), reference, atol=1e-4)
+    assert not OccupancyHeatmap(cell_size=8).load(str(tmp_path / 'heatmap.npz'))
+    assert not restored.load(str(tmp_path / 'missing.npz'))
+
+    colors, transparency = colorize(reference, (115, 160), opacity=0.5)
+    assert colors.shape == transparency.shape == (115, 160, 3)
+    assert transparency.min() >= 127 and colors.dtype == np.uint8